@@ -21,6 +21,7 @@ from agents.stt_tts_builder import _build_tts_plugin
 from config import get_settings
 from prompts import _LANG_OVERRIDE_MSGS
 from agents.livekit_client import remove_room_participant
+from agents.phrase_audio_cache import say_phrase
 from services.queue_service import (
     enqueue_colgar_sala,
     enqueue_guardar_encuesta,
@@ -39,6 +40,7 @@ if TYPE_CHECKING:
         JobContext,
     )
     from livekit.agents.metrics import UsageCollector
+    from services.call_events import CallEventPublisher
     from utils.workflow_state import WorkflowStateMachine
 
     from agents.dynamic_agent import DynamicAgent
@@ -87,7 +89,7 @@ class DynamicAgentLifecycleMixin:
         greeting_delay = max(0.1, min(greeting_delay, 3.0))
         await asyncio.sleep(greeting_delay)
         try:
-            await current_session.say(self.greeting, allow_interruptions=True)
+            await say_phrase(self, current_session, self.greeting, allow_interruptions=True)
         except Exception as e:
             logger.error(f"❌ Error al saludar: {e}")
 
@@ -117,12 +119,14 @@ class CallSessionLifecycleMixin:
         REPROMPT_PHRASES: list[str]
         INTERRUPTION_ACKS: list[str]
         LATENCY_FILLERS: list[str]
+        BACKCHANNEL_FILLERS: list[str]
         reprompt_state: dict[str, Any]
         reprompt_phrases_lc: set[str]
         runtime_state: dict[str, Any]
         max_short_interrupt_words: int
         bg_player: BackgroundAudioPlayer | None
         usage_collector: UsageCollector
+        call_events: CallEventPublisher
         _filler_task: asyncio.Task[None] | None
         _llm_responding: bool
         _tasks: list[asyncio.Task[Any]]
@@ -292,10 +296,6 @@ class CallSessionLifecycleMixin:
         last_backchannel_at = 0.0
         cooldown_seconds = 14.0
         trigger_seconds = 5.0
-        fillers = [
-            "Entiendo...", "Sí, claro.", "Ya veo...", "Ajá, sí.",
-            "Mhm, le escucho.", "Sí, sigo con usted.", "Perfecto, adelante.", "Claro, dígame.",
-        ]
         while not self.stop_guard.is_set():
             try:
                 chat_ctx = getattr(
@@ -326,7 +326,10 @@ class CallSessionLifecycleMixin:
                         and (float(now) - float(last_backchannel_at)) >= cooldown_seconds
                     ):
                         try:
-                            await self.session.say(random.choice(fillers), allow_interruptions=True)
+                            await say_phrase(
+                                self, self.session, random.choice(self.BACKCHANNEL_FILLERS),
+                                allow_interruptions=True,
+                            )
                             last_backchannel_at = now
                         except Exception as be:
                             logger.debug(f"[{self.job_id}] Backchannel no enviado: {be}")
@@ -375,8 +378,9 @@ class CallSessionLifecycleMixin:
                     self.reprompt_state["reprompt_count"] += 1
                     self.reprompt_state["last_assistant_at"] = now
                     try:
-                        await self.session.say(
-                            random.choice(self.REPROMPT_PHRASES), allow_interruptions=True
+                        await say_phrase(
+                            self, self.session, random.choice(self.REPROMPT_PHRASES),
+                            allow_interruptions=True,
                         )
                         logger.info(
                             f"🔁 [{self.job_id}] Reprompt por silencio "
@@ -437,8 +441,8 @@ class CallSessionLifecycleMixin:
 
                             async def _say_interrupt_ack():
                                 try:
-                                    await self.session.say(
-                                        random.choice(self.INTERRUPTION_ACKS),
+                                    await say_phrase(
+                                        self, self.session, random.choice(self.INTERRUPTION_ACKS),
                                         allow_interruptions=True,
                                     )
                                 except Exception as ack_err:
@@ -507,6 +511,7 @@ class CallSessionLifecycleMixin:
                 old_state = str(getattr(ev, "old_state", "")).lower()
                 now = self.loop_obj.time()
                 self.runtime_state["agent_state"] = new_state
+                self.call_events.emit("state", state=new_state)
                 if new_state == "listening" and old_state in ("speaking", "thinking"):
                     self.reprompt_state["last_assistant_at"] = now
                     self.reprompt_state["waiting_user"] = True
@@ -521,8 +526,9 @@ class CallSessionLifecycleMixin:
                             try:
                                 if self._llm_responding:
                                     return
-                                await self.session.say(
-                                    random.choice(self.LATENCY_FILLERS), allow_interruptions=True
+                                await say_phrase(
+                                    self, self.session, random.choice(self.LATENCY_FILLERS),
+                                    allow_interruptions=True,
                                 )
                             except Exception as fill_err:
                                 logger.debug(
@@ -585,6 +591,7 @@ class CallSessionLifecycleMixin:
             except Exception as bg_err:
                 logger.warning(f"⚠️ [{self.job_id}] No se pudo iniciar ruido de fondo: {bg_err}")
 
+        self.call_events.emit("status", status="active")
         self._tasks = [
             asyncio.create_task(self.run_amd()),
             asyncio.create_task(self.run_ghost_kicker()),
@@ -618,6 +625,7 @@ class CallSessionLifecycleMixin:
                 self.stop_guard.set()
                 for t in self._tasks:
                     t.cancel()
+                self.call_events.emit("status", status="transferred")
 
                 survey_id_int = int(self.survey_id) if str(self.survey_id).isdigit() else 0
                 if survey_id_int:
@@ -19,8 +19,10 @@ def configure_agent_logging(logger_name: str = "agent-dynamic") -> logging.Logge
         "dev",
         "local",
     ):
+        # AGENT_LOG_FILE permite sacarlo del cwd (p. ej. el benchmark usa un tmpdir).
+        log_file = os.getenv("AGENT_LOG_FILE", "").strip() or "agent.log"
         handlers.append(
-            logging.FileHandler("agent.log", mode="a", encoding="utf-8")
+            logging.FileHandler(log_file, mode="a", encoding="utf-8")
         )
 
     logging.basicConfig(
@@ -17,7 +17,9 @@ from agents.agent_common import (
     normalize_goodbye_message,
     _normalize_message_text,
 )
+from agents.phrase_audio_cache import TRANSFER_NOTICE, say_phrase
 from config import get_settings
+from services.http_client import get_http_session
 from services.queue_service import (
     enqueue_colgar_sala,
     enqueue_guardar_encuesta,
@@ -138,22 +140,22 @@ class AgentToolsMixin:
 
         try:
             url = f"{BRIDGE_SERVER_URL_INTERNAL}/api/empresas/{empresa_id_int}/extensions"
-            async with aiohttp.ClientSession() as http_session:
-                async with http_session.get(
-                    url,
-                    timeout=aiohttp.ClientTimeout(total=4),
-                    headers={"X-Internal-Request": "agent"},
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if isinstance(data, list) and data:
-                            ext = str(data[0].get("extension_number", "")).strip()
-                            if ext:
-                                logger.info(
-                                    f"📞 [{self.room_name}] Extensión dinámica: {ext} "
-                                    f"({data[0].get('extension_name', '')})"
-                                )
-                                return ext
+            http_session = get_http_session("bridge")
+            async with http_session.get(
+                url,
+                timeout=aiohttp.ClientTimeout(total=4),
+                headers={"X-Internal-Request": "agent"},
+            ) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    if isinstance(data, list) and data:
+                        ext = str(data[0].get("extension_number", "")).strip()
+                        if ext:
+                            logger.info(
+                                f"📞 [{self.room_name}] Extensión dinámica: {ext} "
+                                f"({data[0].get('extension_name', '')})"
+                            )
+                            return ext
         except Exception as ext_err:
             logger.warning(f"⚠️ [{self.room_name}] No se pudo obtener extensión dinámica: {ext_err}")
 
@@ -413,9 +415,8 @@ class AgentToolsMixin:
             )
             if current_session:
                 try:
-                    await current_session.say(
-                        "Perfecto, le paso con un companero. Un momento por favor.",
-                        allow_interruptions=False,
+                    await say_phrase(
+                        self, current_session, TRANSFER_NOTICE, allow_interruptions=False,
                     )
                 except Exception as say_err:
                     logger.warning(f"[{self.room_name}] No se pudo reproducir aviso TTS: {say_err}")
@@ -504,7 +505,7 @@ class AgentToolsMixin:
                     logger.info(f"✂️ [{self.room_name}] Despedida normalizada a formato corto: '{safe_goodbye}'")
                 current_session = getattr(self, "session", None)
                 if current_session:
-                    await current_session.say(safe_goodbye, allow_interruptions=False)
+                    await say_phrase(self, current_session, safe_goodbye, allow_interruptions=False)
 
                 # Margen corto para evitar silencios largos tras despedida.
                 # Si se necesita ajustar, usar AGENT_HANGUP_DELAY_SECONDS en entorno.
@@ -14,12 +14,14 @@ from agents.agent_common import (
 )
 from agents.agent_lifecycle import CallSessionLifecycleMixin
 from agents.post_call_processor import finalize_call_session
+from services.call_events import CallEventPublisher
 from services.call_results_service import prepare_transcription_for_storage
 from services.queue_service import (
     enqueue_colgar_sala,
     enqueue_guardar_encuesta,
     enqueue_transfer_to_human,
 )
+from utils.pii_sanitizer import sanitize_free_text_pii
 from utils.prompt_sanitizer import sanitize_untrusted_text
 from utils.workflow_state import WorkflowStateMachine
 
@@ -27,6 +29,7 @@ if TYPE_CHECKING:
     from livekit.agents import AgentSession, JobContext
 
     from agents.dynamic_agent import DynamicAgent
+    from agents.phrase_audio_cache import PhraseAudioCache
 
 logger = logging.getLogger("agent-dynamic")
 class CallSession(CallSessionLifecycleMixin):
@@ -60,6 +63,10 @@ class CallSession(CallSessionLifecycleMixin):
     ]
     LATENCY_FILLERS = ["Mmm...", "A ver...", "Vale..."]
     INTERRUPTION_ACKS = ["Uy, perdona, dime.", "Sí, dime."]
+    BACKCHANNEL_FILLERS = [
+        "Entiendo...", "Sí, claro.", "Ya veo...", "Ajá, sí.",
+        "Mhm, le escucho.", "Sí, sigo con usted.", "Perfecto, adelante.", "Claro, dígame.",
+    ]
 
     def __init__(
         self,
@@ -76,6 +83,7 @@ class CallSession(CallSessionLifecycleMixin):
         tts_model: str,
         call_start_time: float,
         call_metadata: dict | None = None,
+        phrase_audio: "PhraseAudioCache | None" = None,
     ) -> None:
         self.ctx = ctx
         self.job_id = job_id
@@ -90,6 +98,7 @@ class CallSession(CallSessionLifecycleMixin):
         self.speaking_speed = speaking_speed
         self.tts_model = tts_model
         self.call_start_time = call_start_time
+        self.phrase_audio = phrase_audio
 
         # Configuración leída del entorno
         self.AMD_WINDOW_SECONDS = float(os.getenv("AGENT_AMD_WINDOW_SECONDS", "15.0"))
@@ -105,6 +114,8 @@ class CallSession(CallSessionLifecycleMixin):
         # Estado de transcripción
         self.transcript_event_buffer: list[dict] = []
         self.transcript_snapshot: dict = {"transcript": "", "raw": []}
+        # Eventos en vivo para el panel de monitorización (stream Redis por sala)
+        self.call_events = CallEventPublisher(room_name)
 
         # Estado AMD
         self.amd_state: dict = {"detected": False, "human_confirmed": False, "check_count": 0}
@@ -162,6 +173,8 @@ class CallSession(CallSessionLifecycleMixin):
             if last.get("role") == role and _normalize_message_text(last.get("content")) == text:
                 return
         self.transcript_event_buffer.append({"role": role, "content": text})
+        # El stream Redis alimenta vistas en vivo y export: nunca PII en claro.
+        self.call_events.emit("turn", role=role, text=sanitize_free_text_pii(text))
 
     def _build_transcript_from_event_buffer(self) -> tuple[list[dict], str]:
         if not self.transcript_event_buffer:
@@ -453,6 +466,10 @@ class CallSession(CallSessionLifecycleMixin):
         self._cleanup_done = True
 
         self.stop()
+        transfer_event = getattr(self.agent_instance, "_transfer_completed", None)
+        if not (transfer_event and transfer_event.is_set()):
+            self.call_events.emit("status", status="ended")
+        await self.call_events.flush()
 
         all_tasks: list[asyncio.Task | None] = [
             *self._tasks,
@@ -460,6 +477,8 @@ class CallSession(CallSessionLifecycleMixin):
             self._filler_task,
         ]
         await self._await_cancelled(all_tasks)
+        if self.phrase_audio is not None:
+            await self.phrase_audio.cancel()
         self._tasks.clear()
         self._ephemeral_tasks.clear()
         self._filler_task = None
@@ -489,6 +508,20 @@ class CallSession(CallSessionLifecycleMixin):
         except Exception as lk_err:
             logger.debug("[%s] close_livekit_admin_api: %s", self.job_id, lk_err)
 
+        try:
+            from services.http_client import close_http_clients
+
+            await close_http_clients()
+        except Exception as http_err:
+            logger.debug("[%s] close_http_clients: %s", self.job_id, http_err)
+
+        try:
+            from services.external_db_service import close_external_db_pools
+
+            await close_external_db_pools()
+        except Exception as ext_err:
+            logger.debug("[%s] close_external_db_pools: %s", self.job_id, ext_err)
+
         self.transcript_event_buffer.clear()
         self.transcript_snapshot = {"transcript": "", "raw": []}
 
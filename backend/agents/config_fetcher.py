@@ -1,13 +1,22 @@
-"""Obtención de configuración de agente vía Redis cache y HTTP con reintentos."""
+"""
+Obtención de configuración de agente: metadata del dispatch → LRU en proceso →
+Redis cache → HTTP con reintentos.
+
+La LRU guarda cada config con su versión (`config_updated_at`): una entrada
+solo se sirve si no ha caducado y, cuando quien pregunta conoce la versión
+vigente, si coincide con ella.
+"""
 
 from __future__ import annotations
 
 import asyncio
 import json
 import logging
+import os
+import time
+from collections import OrderedDict
 from typing import Any
 
-import aiohttp
 from aiohttp import ClientTimeout
 
 from agents.agent_common import (
@@ -16,27 +25,65 @@ from agents.agent_common import (
     _parse_inbound_caller_from_room,
     _validate_agent_config_tenant,
 )
+from services.agent_config_prefetch import survey_config_cache_key
+from services.http_client import get_http_session
 from services.redis_service import get_redis
 
 logger = logging.getLogger("agent-dynamic")
 
+_CONFIG_LRU_MAX = max(1, int(os.getenv("AGENT_CONFIG_LRU_SIZE", "256")))
+# clave de caché → (caduca_en, versión, config)
+_config_lru: "OrderedDict[str, tuple[float, str, dict[str, Any]]]" = OrderedDict()
+
+
+def _config_version(config: dict[str, Any]) -> str:
+    return str(config.get("config_updated_at") or "")
+
+
+def _lru_get(cache_key: str, version: str | None = None) -> dict[str, Any] | None:
+    entry = _config_lru.get(cache_key)
+    if entry is None:
+        return None
+    expires_at, cached_version, config = entry
+    if expires_at <= time.monotonic() or (version and version != cached_version):
+        del _config_lru[cache_key]
+        return None
+    _config_lru.move_to_end(cache_key)
+    # Copia: el llamador enriquece la config in situ.
+    return dict(config)
+
+
+def _lru_put(cache_key: str, config: dict[str, Any]) -> None:
+    _config_lru[cache_key] = (
+        time.monotonic() + _AGENT_CONFIG_CACHE_TTL,
+        _config_version(config),
+        dict(config),
+    )
+    _config_lru.move_to_end(cache_key)
+    while len(_config_lru) > _CONFIG_LRU_MAX:
+        _config_lru.popitem(last=False)
+
+
+def _agent_cache_key(agent_id: str, expected_empresa_id: str) -> str:
+    return f"ausarta:agent_config:agent_{agent_id}:empresa_{expected_empresa_id or '0'}"
+
 
 async def _fetch_with_retries(url: str, max_attempts: int = 3) -> dict[str, Any] | None:
     """GET HTTP con reintentos y backoff lineal (0.25s * attempt)."""
     for attempt in range(1, max_attempts + 1):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    url,
-                    timeout=ClientTimeout(total=5),
-                    headers={"Cache-Control": "no-cache", "Pragma": "no-cache"},
-                ) as resp:
-                    if resp.status == 200:
-                        body: dict[str, Any] = await resp.json()
-                        return body
-                    logger.warning(
-                        f"⚠️ Intento {attempt}/{max_attempts}: no se pudo obtener config (HTTP {resp.status})"
-                    )
+            session = get_http_session("bridge")
+            async with session.get(
+                url,
+                timeout=ClientTimeout(total=5),
+                headers={"Cache-Control": "no-cache", "Pragma": "no-cache"},
+            ) as resp:
+                if resp.status == 200:
+                    body: dict[str, Any] = await resp.json()
+                    return body
+                logger.warning(
+                    f"⚠️ Intento {attempt}/{max_attempts}: no se pudo obtener config (HTTP {resp.status})"
+                )
         except Exception as e:
             if "Violación de seguridad" in str(e):
                 raise
@@ -62,9 +109,28 @@ async def _cache_agent_config(cache_key: str, config: dict[str, Any], context: s
         logger.warning(f"⚠️ No se pudo cachear config en Redis {context}: {write_err}")
 
 
-async def fetch_agent_config(survey_id: str, expected_empresa_id: str = "0") -> dict[str, Any]:
-    """Consulta config del agente: Redis (TTL 1h) → HTTP fallback → escribe en Redis."""
-    cache_key = f"ausarta:agent_config:survey_{survey_id}"
+async def fetch_agent_config(
+    survey_id: str,
+    expected_empresa_id: str = "0",
+    inline_config: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Consulta config del agente: config embebida en el dispatch → LRU → Redis
+    (TTL agent_config_cache_ttl) → HTTP fallback → escribe en Redis.
+    """
+    cache_key = survey_config_cache_key(survey_id)
+
+    if isinstance(inline_config, dict) and inline_config:
+        _validate_agent_config_tenant(inline_config, expected_empresa_id)
+        _lru_put(cache_key, inline_config)
+        logger.info(f"📋 Config embebida en el dispatch para survey {survey_id}")
+        return dict(inline_config)
+
+    cached = _lru_get(cache_key)
+    if cached is not None:
+        _validate_agent_config_tenant(cached, expected_empresa_id)
+        logger.info(f"📋 Config desde LRU en proceso para survey {survey_id}")
+        return cached
 
     try:
         redis_client = await get_redis()
@@ -72,6 +138,7 @@ async def fetch_agent_config(survey_id: str, expected_empresa_id: str = "0") ->
         if cached_raw:
             config = json.loads(cached_raw)
             _validate_agent_config_tenant(config, expected_empresa_id)
+            _lru_put(cache_key, config)
             logger.info(f"📋 Config desde Redis para survey {survey_id}")
             return config
     except Exception as cache_err:
@@ -85,6 +152,7 @@ async def fetch_agent_config(survey_id: str, expected_empresa_id: str = "0") ->
     config = await _fetch_with_retries(url)
     if config is not None:
         _validate_agent_config_tenant(config, expected_empresa_id)
+        _lru_put(cache_key, config)
         await _cache_agent_config(cache_key, config, f"survey {survey_id}")
         logger.info(
             f"📋 Config HTTP para survey {survey_id}: "
@@ -100,15 +168,28 @@ async def fetch_agent_config(survey_id: str, expected_empresa_id: str = "0") ->
 async def fetch_agent_config_by_agent_id(
     agent_id: str,
     expected_empresa_id: str = "0",
+    config_version: str | None = None,
 ) -> dict[str, Any]:
-    """Consulta config directa por agent_id para llamadas entrantes SIP sin encuesta previa."""
-    cache_key = f"ausarta:agent_config:agent_{agent_id}:empresa_{expected_empresa_id or '0'}"
+    """
+    Consulta config directa por agent_id (entrantes SIP sin encuesta previa y
+    salas warm). Con `config_version` se descarta una entrada de la LRU
+    de otra versión.
+    """
+    cache_key = _agent_cache_key(agent_id, expected_empresa_id)
+    cached = _lru_get(cache_key, config_version)
+    if cached is not None:
+        _validate_agent_config_tenant(cached, expected_empresa_id)
+        return cached
+
     try:
         redis_client = await get_redis()
         cached_raw = await redis_client.get(cache_key)
         if cached_raw:
             config = json.loads(cached_raw)
+            if config_version and _config_version(config) != config_version:
+                raise LookupError(f"versión en caché obsoleta ({_config_version(config)})")
             _validate_agent_config_tenant(config, expected_empresa_id)
+            _lru_put(cache_key, config)
             logger.info(f"Config inbound desde Redis para agent_id {agent_id}")
             return config
     except Exception as cache_err:
@@ -129,6 +210,7 @@ async def fetch_agent_config_by_agent_id(
         raise RuntimeError(f"No se pudo obtener config por agent_id={agent_id} tras reintentos")
 
     _validate_agent_config_tenant(config, expected_empresa_id)
+    _lru_put(cache_key, config)
     await _cache_agent_config(cache_key, config, f"inbound agent_id={agent_id}")
     return config
 
@@ -161,18 +243,18 @@ async def _register_inbound_call_record(
         "agent_type": agent_config.get("agent_type"),
     }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{server_url}/inbound-call/register",
-                json=payload,
-                timeout=ClientTimeout(total=5),
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return int(data.get("encuesta_id") or 0)
-                logger.warning(
-                    "inbound-call/register HTTP %s room=%s", resp.status, room_name
-                )
+        session = get_http_session("bridge")
+        async with session.post(
+            f"{server_url}/inbound-call/register",
+            json=payload,
+            timeout=ClientTimeout(total=5),
+        ) as resp:
+            if resp.status == 200:
+                data = await resp.json()
+                return int(data.get("encuesta_id") or 0)
+            logger.warning(
+                "inbound-call/register HTTP %s room=%s", resp.status, room_name
+            )
     except Exception as exc:
         logger.warning("No se pudo registrar inbound call: %s", exc)
     return 0
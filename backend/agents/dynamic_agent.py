@@ -61,6 +61,7 @@ from agents.agent_common import (
 from agents.semantic_routes import resolve_semantic_routing_config
 from agents.agent_lifecycle import CallSessionLifecycleMixin, DynamicAgentLifecycleMixin
 from agents.agent_tools import AgentToolsMixin
+from agents.phrase_audio_cache import PhraseAudioCache
 from agents.config_fetcher import (
     _fetch_with_retries,
     _register_inbound_call_record,
@@ -161,7 +162,7 @@ from services.semantic_router_service import SemanticRouterService
 class DynamicAgent(Agent, AgentToolsMixin, DynamicAgentLifecycleMixin):
     """Agente dinámico que carga sus instrucciones desde Supabase."""
     
-    def __init__(self, room_name: str, agent_config: dict) -> None:
+    def __init__(self, room_name: str, agent_config: dict, survey_id: str | None = None) -> None:
         self.server_url = BRIDGE_SERVER_URL_INTERNAL
         self._extraction_schema = agent_config.get("extraction_schema") or []
         self.data_saved = False
@@ -176,6 +177,8 @@ class DynamicAgent(Agent, AgentToolsMixin, DynamicAgentLifecycleMixin):
         self.tts_model = agent_config.get("tts_model", get_settings().default_tts_model)
         self.speaking_speed = agent_config.get("speaking_speed", 1.0)
         self.hangup_started = False
+        # Caché de audio de frases fijas; la asigna el entrypoint (None → TTS en vivo).
+        self.phrase_audio: PhraseAudioCache | None = None
         self._transfer_completed = asyncio.Event()
         self._transfer_in_progress = False
 
@@ -184,31 +187,35 @@ class DynamicAgent(Agent, AgentToolsMixin, DynamicAgentLifecycleMixin):
             SemanticRouterService(custom_phrases=custom_phrases) if routing_enabled else None
         )
         
-        self.survey_id = "0"
-        try:
-            # Soportamos formatos:
-            # 1. inigo_local_encuesta_123
-            # 2. encuesta_123
-            # 3. 123
-            parts = room_name.split("_")
-            candidate = parts[-1] if parts else ""
-            if candidate.isdigit():
-                self.survey_id = candidate
-            elif len(parts) >= 2 and parts[-2].isdigit():
-                self.survey_id = parts[-2]
-            else:
+        # Salas warm: el nombre no lleva la encuesta (llega al vincular la sala).
+        if survey_id and str(survey_id) != "0":
+            self.survey_id = str(survey_id)
+        else:
+            self.survey_id = "0"
+            try:
+                # Soportamos formatos:
+                # 1. inigo_local_encuesta_123
+                # 2. encuesta_123
+                # 3. 123
+                parts = room_name.split("_")
+                candidate = parts[-1] if parts else ""
+                if candidate.isdigit():
+                    self.survey_id = candidate
+                elif len(parts) >= 2 and parts[-2].isdigit():
+                    self.survey_id = parts[-2]
+                else:
+                    logger.error(
+                        "No se pudo extraer survey_id numérico desde room_name '%s' (parts=%s); usando '0'",
+                        room_name,
+                        parts,
+                    )
+            except Exception as survey_parse_err:
                 logger.error(
-                    "No se pudo extraer survey_id numérico desde room_name '%s' (parts=%s); usando '0'",
+                    "Error parseando survey_id desde room_name '%s': %s; usando '0'",
                     room_name,
-                    parts,
+                    survey_parse_err,
                 )
-        except Exception as survey_parse_err:
-            logger.error(
-                "Error parseando survey_id desde room_name '%s': %s; usando '0'",
-                room_name,
-                survey_parse_err,
-            )
-            self.survey_id = "0"
+                self.survey_id = "0"
 
         try:
             speaking_speed_f = float(self.speaking_speed)
@@ -35,6 +35,8 @@ from agents.config_fetcher import (
     fetch_agent_config_by_agent_id,
 )
 from agents.dynamic_agent import DynamicAgent
+from agents.phrase_audio_cache import GOODBYE_TEMPLATES, TRANSFER_NOTICE, PhraseAudioCache
+from agents.warm_room import pipeline_signature, prewarm_plugins, wait_for_binding
 from agents.stt_tts_builder import (
     build_resilient_stt_plugin,
     build_resilient_tts_plugin,
@@ -55,6 +57,114 @@ async def notify_system_alert(message: str, details: Optional[dict] = None):
     except Exception as e:
         logger.error(f"❌ Error encolando alerta del sistema: {e}")
 
+async def _build_session_kwargs(job_id: str, agent_config: dict) -> tuple[dict[str, Any], str]:
+    """
+    Construye STT/VAD/LLM/TTS y los kwargs de AgentSession para la config.
+
+    Solo depende de la config del agente (no del lead): las salas warm lo
+    ejecutan antes de conocer la llamada. Devuelve (kwargs, modo de turno).
+    """
+    llm_model = agent_config.get("llm_model", "llama-3.3-70b-versatile")
+    voice_id = agent_config.get("voice_id", os.getenv("VOICE_ID_AUSARTA", get_settings().default_cartesia_voice))
+    tts_model = agent_config.get("tts_model", get_settings().default_tts_model)
+    language = agent_config.get("language", "es")
+    stt_provider = agent_config.get("stt_provider", "deepgram")
+    stt_model = agent_config.get("stt_model", get_settings().default_stt_model)
+    speaking_speed = agent_config.get("speaking_speed", 1.0)
+    has_strict_extraction = bool(
+        agent_config.get("extraction_schema")
+        and isinstance(agent_config.get("extraction_schema"), list)
+    )
+
+    async with traced_span(
+        "voice.stt.init",
+        {"voice.stt_provider": stt_provider, "voice.stt_model": stt_model},
+    ):
+        stt_plugin, delegate_turn_to_stt = await build_resilient_stt_plugin(
+            stt_provider, stt_model, language
+        )
+
+    # VAD Silero solo si el STT no gestiona el turno (p. ej. OpenAI Whisper)
+    vad_model = None
+    if delegate_turn_to_stt:
+        logger.info(f"✅ [{job_id}] Turn detection delegado al STT (sin VAD Silero).")
+    else:
+        min_silence_duration = float(os.getenv("AGENT_MIN_SILENCE_SECONDS", "0.65"))
+        min_silence_duration = max(0.55, min(min_silence_duration, 1.0))
+        vad_model = await get_vad_model(min_silence_duration)
+        logger.info(f"✅ [{job_id}] VAD Silero cargado (min_silence={min_silence_duration}s).")
+
+    from livekit.agents.llm.fallback_adapter import FallbackAdapter  # type: ignore
+
+    # LLM Principal: OpenAI (GPT/o1/o3) o Groq (Llama, Mixtral, etc.)
+    _is_openai_model = any(k in llm_model for k in ("gpt", "o1", "o3"))
+    llm_parallel_tools = False if has_strict_extraction else None
+
+    async with traced_span(
+        "voice.llm.init",
+        {"voice.llm_model": llm_model, "voice.llm_provider": "openai" if _is_openai_model else "groq"},
+    ):
+        if _is_openai_model:
+            logger.info(f"🤖 [{job_id}] Modelo OpenAI detectado ('{llm_model}'). Usando endpoint OpenAI.")
+            main_llm = openai.LLM(
+                model=llm_model,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                temperature=0.35,
+                parallel_tool_calls=llm_parallel_tools,
+            )
+        else:
+            logger.info(f"🤖 [{job_id}] Modelo Groq detectado ('{llm_model}'). Usando endpoint Groq.")
+            main_llm = openai.LLM(
+                model=llm_model,
+                base_url="https://api.groq.com/openai/v1",
+                api_key=os.getenv("GROQ_API_KEY"),
+                temperature=0.35,
+                parallel_tool_calls=llm_parallel_tools,
+            )
+
+        # LLM Secundario (OpenAI - gpt-4o-mini): fallback universal
+        fallback_llm = openai.LLM(
+            model="gpt-4o-mini",
+            api_key=os.getenv("OPENAI_API_KEY"),
+            temperature=0.2,
+            parallel_tool_calls=llm_parallel_tools,
+        )
+
+        # Usar FallbackAdapter transparente al cliente
+        final_llm = FallbackAdapter([main_llm, fallback_llm], attempt_timeout=10.0)
+
+    # --- Crear sesión del agente (latencia objetivo <500ms) ---
+    endpointing_min = float(os.getenv("AGENT_ENDPOINTING_MIN", "0.07"))
+    endpointing_max = float(os.getenv("AGENT_ENDPOINTING_MAX", "0.5"))
+    endpointing_min = max(0.05, min(endpointing_min, 0.3))
+    endpointing_max = max(endpointing_min + 0.05, min(endpointing_max, 1.0))
+
+    async with traced_span("voice.tts.init", {"voice.tts_model": tts_model}):
+        tts_plugin = await build_resilient_tts_plugin(
+            voice_id=voice_id,
+            language=language,
+            speaking_speed=speaking_speed,
+            tts_model=tts_model,
+        )
+
+    session_kwargs: dict[str, Any] = {
+        "stt": stt_plugin,
+        "llm": final_llm,
+        "tts": tts_plugin,
+        "min_endpointing_delay": endpointing_min,
+        "max_endpointing_delay": endpointing_max,
+        "preemptive_generation": True,
+        "use_tts_aligned_transcript": True,
+    }
+    if vad_model is not None:
+        session_kwargs["vad"] = vad_model
+    turn_mode = "vad"
+    if delegate_turn_to_stt:
+        session_kwargs["turn_detection"] = "stt"
+        turn_mode = "stt"
+    return session_kwargs, turn_mode
+
+
 # ============================================================================
 # SERVIDOR Y ENTRYPOINT DINÁMICO
 # ============================================================================
@@ -112,8 +222,17 @@ async def entrypoint(ctx: JobContext):
         await _safe_reject(f"metadata no JSON válido: {e}")
         return
 
+    # Config ya resuelta por el dialer (services/agent_config_prefetch): no viaja
+    # con el resto de la metadata de la llamada.
+    inline_agent_config = meta_data.pop("agent_config", None)
+
     is_inbound_call = str(meta_data.get("call_direction") or "").lower() == "inbound"
     inbound_agent_id = str(meta_data.get("agent_id") or "").strip()
+    # Sala warm del pool: el lead llega después, al vincular la sala.
+    is_warm_room = bool(meta_data.get("warm")) and not is_inbound_call
+    if is_warm_room and not inbound_agent_id:
+        await _safe_reject("sala warm sin agent_id")
+        return
     if not is_inbound_call and "campana_id" not in meta_data and "client_id" not in meta_data:
         await _safe_reject("metadata sin campana_id/client_id")
         return
@@ -132,7 +251,7 @@ async def entrypoint(ctx: JobContext):
         logger.warning(f"⚠️ [{job_id}] Error extrayendo campos de metadata: {e}")
             
     # 2. Fallback: intentar extraer del room_name
-    if survey_id == "0":
+    if survey_id == "0" and not is_warm_room:
         try:
             parts = room_name.split('_')
             survey_id = parts[-1] if parts else "0"
@@ -146,10 +265,20 @@ async def entrypoint(ctx: JobContext):
     # Permite survey_ids numéricos Y alfanuméricos (UUIDs, slugs, etc.)
     if (not survey_id or survey_id == "0") and is_inbound_call:
         survey_id = f"inbound_{empresa_id or '0'}"
-    if not survey_id or survey_id == "0":
+    if (not survey_id or survey_id == "0") and not is_warm_room:
         await _safe_reject(f"Identidad inválida o corrupta: survey_id='{survey_id}'")
         return
 
+    # Índice KB en memoria: se calienta en paralelo al resto del arranque
+    if str(empresa_id).isdigit():
+        from services.knowledge_index import schedule_knowledge_index_warmup
+
+        schedule_knowledge_index_warmup(int(empresa_id))
+    # Modelo del reranker (RAG_RERANKER=onnx): carga fuera del primer turno
+    from services.reranker_service import schedule_reranker_warmup
+
+    schedule_reranker_warmup()
+
     # --- PASO 1.5: Validar Sello Multi-Tenant ANTES de conectar ---
     try:
         # Obtenemos config y validamos que la sala es del mismo tenant que el config
@@ -159,8 +288,18 @@ async def entrypoint(ctx: JobContext):
                 expected_empresa_id=empresa_id,
             )
             agent_config["call_direction"] = "inbound"
+        elif is_warm_room:
+            # Solo para construir los plugins; la config de la llamada llega al vincular.
+            agent_config = await fetch_agent_config_by_agent_id(
+                inbound_agent_id,
+                expected_empresa_id=empresa_id,
+            )
         else:
-            agent_config = await fetch_agent_config(survey_id, expected_empresa_id=empresa_id)
+            agent_config = await fetch_agent_config(
+                survey_id,
+                expected_empresa_id=empresa_id,
+                inline_config=inline_agent_config,
+            )
     except Exception as e:
         if "Violación de seguridad" in str(e):
             await _safe_reject(str(e))
@@ -181,7 +320,10 @@ async def entrypoint(ctx: JobContext):
     ):
         call_start_time = time.time()
         is_duplicate = False
+        warm_unbound = False
+        prebuilt_pipeline: tuple[dict[str, Any], str] | None = None
         cs: "CallSession | None" = None
+        phrase_audio: PhraseAudioCache | None = None
         try:
             logger.info(f"⏱️ [{job_id}] Intentando conectar a sala {room_name}...")
             await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
@@ -195,6 +337,35 @@ async def entrypoint(ctx: JobContext):
 
             logger.info(f"✅ [{job_id}] Conectado a sala {room_name}. Participantes: {len(ctx.room.remote_participants)}")
 
+            if is_warm_room:
+                warm_signature = pipeline_signature(agent_config)
+                prebuilt_pipeline = await _build_session_kwargs(job_id, agent_config)
+                prewarm_plugins(prebuilt_pipeline[0])
+                logger.info(f"🔥 [{job_id}] Sala warm lista ({room_name}); esperando lead.")
+                binding = await wait_for_binding(
+                    ctx.room,
+                    empresa_id=int(empresa_id),
+                    agent_id=int(inbound_agent_id),
+                )
+                if binding is None:
+                    warm_unbound = True
+                    await _safe_reject("sala warm caducada sin lead")
+                    return
+                if str(binding.get("empresa_id", "0")) != empresa_id:
+                    warm_unbound = True
+                    await _safe_reject(
+                        f"Violación de seguridad Multi-Tenant en sala warm: {binding.get('empresa_id')} != {empresa_id}"
+                    )
+                    return
+                meta_data = binding
+                survey_id = str(binding["survey_id"])
+                call_start_time = time.time()
+                logger.info(f"🔗 [{job_id}] Sala warm vinculada a encuesta {survey_id}.")
+                agent_config = await fetch_agent_config(survey_id, expected_empresa_id=empresa_id)
+                if pipeline_signature(agent_config) != warm_signature:
+                    logger.info(f"♻️ [{job_id}] Config de la llamada distinta a la warm; se reconstruyen plugins.")
+                    prebuilt_pipeline = None
+
             if is_inbound_call:
                 caller_phone = _parse_inbound_caller_from_room(room_name)
                 if caller_phone:
@@ -224,7 +395,7 @@ async def entrypoint(ctx: JobContext):
                     )
 
             # --- PASO 4: Crear el asistente ---
-            agent_instance = DynamicAgent(room_name=room_name, agent_config=agent_config)
+            agent_instance = DynamicAgent(room_name=room_name, agent_config=agent_config, survey_id=survey_id)
 
             llm_model = agent_config.get("llm_model", "llama-3.3-70b-versatile")
             voice_id = agent_config.get("voice_id", os.getenv("VOICE_ID_AUSARTA", get_settings().default_cartesia_voice))
@@ -233,107 +404,42 @@ async def entrypoint(ctx: JobContext):
             stt_provider = agent_config.get("stt_provider", "deepgram")
             stt_model = agent_config.get("stt_model", get_settings().default_stt_model)
             speaking_speed = agent_config.get("speaking_speed", 1.0)
-            has_strict_extraction = bool(
-                agent_config.get("extraction_schema")
-                and isinstance(agent_config.get("extraction_schema"), list)
-            )
 
             logger.info(
                 f"🤖 [{job_id}] Config: LLM='{llm_model}', Voice='{voice_id}', TTS='{tts_model}', "
                 f"Lang='{language}', STT='{stt_provider}/{stt_model}', Speed='{speaking_speed}'"
             )
 
-            async with traced_span(
-                "voice.stt.init",
-                {"voice.stt_provider": stt_provider, "voice.stt_model": stt_model},
-            ):
-                stt_plugin, delegate_turn_to_stt = await build_resilient_stt_plugin(
-                    stt_provider, stt_model, language
-                )
-
-            # VAD Silero solo si el STT no gestiona el turno (p. ej. OpenAI Whisper)
-            vad_model = None
-            if delegate_turn_to_stt:
-                logger.info(f"✅ [{job_id}] Turn detection delegado al STT (sin VAD Silero).")
+            # Pre-síntesis de frases fijas en paralelo al arranque de STT/LLM/sesión:
+            # el saludo va primero para que esté listo al entrar en sala.
+            phrase_audio = PhraseAudioCache(
+                voice_id=voice_id,
+                language=language,
+                speaking_speed=float(speaking_speed or 1.0),
+                tts_model=tts_model,
+            )
+            # El saludo personalizado lleva datos del cliente: solo en memoria, nunca a disco.
+            greeting_private = bool(agent_config.get("greeting_personalized"))
+            phrase_audio.schedule_warmup([
+                *([] if greeting_private else [agent_instance.greeting]),
+                *GOODBYE_TEMPLATES,
+                TRANSFER_NOTICE,
+                *CallSession.INTERRUPTION_ACKS,
+                *CallSession.LATENCY_FILLERS,
+                *CallSession.BACKCHANNEL_FILLERS,
+                *CallSession.REPROMPT_PHRASES,
+            ], private=[agent_instance.greeting] if greeting_private else ())
+            agent_instance.phrase_audio = phrase_audio
+
+            if prebuilt_pipeline is not None:
+                session_kwargs, turn_mode = prebuilt_pipeline
             else:
-                min_silence_duration = float(os.getenv("AGENT_MIN_SILENCE_SECONDS", "0.65"))
-                min_silence_duration = max(0.55, min(min_silence_duration, 1.0))
-                vad_model = await get_vad_model(min_silence_duration)
-                logger.info(f"✅ [{job_id}] VAD Silero cargado (min_silence={min_silence_duration}s).")
-
-            from livekit.agents.llm.fallback_adapter import FallbackAdapter  # type: ignore
-
-            # LLM Principal: OpenAI (GPT/o1/o3) o Groq (Llama, Mixtral, etc.)
-            _is_openai_model = any(k in llm_model for k in ("gpt", "o1", "o3"))
-            llm_parallel_tools = False if has_strict_extraction else None
-
-            async with traced_span(
-                "voice.llm.init",
-                {"voice.llm_model": llm_model, "voice.llm_provider": "openai" if _is_openai_model else "groq"},
-            ):
-                if _is_openai_model:
-                    logger.info(f"🤖 [{job_id}] Modelo OpenAI detectado ('{llm_model}'). Usando endpoint OpenAI.")
-                    main_llm = openai.LLM(
-                        model=llm_model,
-                        api_key=os.getenv("OPENAI_API_KEY"),
-                        temperature=0.35,
-                        parallel_tool_calls=llm_parallel_tools,
-                    )
-                else:
-                    logger.info(f"🤖 [{job_id}] Modelo Groq detectado ('{llm_model}'). Usando endpoint Groq.")
-                    main_llm = openai.LLM(
-                        model=llm_model,
-                        base_url="https://api.groq.com/openai/v1",
-                        api_key=os.getenv("GROQ_API_KEY"),
-                        temperature=0.35,
-                        parallel_tool_calls=llm_parallel_tools,
-                    )
-
-                # LLM Secundario (OpenAI - gpt-4o-mini): fallback universal
-                fallback_llm = openai.LLM(
-                    model="gpt-4o-mini",
-                    api_key=os.getenv("OPENAI_API_KEY"),
-                    temperature=0.2,
-                    parallel_tool_calls=llm_parallel_tools,
-                )
-
-                # Usar FallbackAdapter transparente al cliente
-                final_llm = FallbackAdapter([main_llm, fallback_llm], attempt_timeout=10.0)
-
-            # --- Crear sesión del agente (latencia objetivo <500ms) ---
-            endpointing_min = float(os.getenv("AGENT_ENDPOINTING_MIN", "0.07"))
-            endpointing_max = float(os.getenv("AGENT_ENDPOINTING_MAX", "0.5"))
-            endpointing_min = max(0.05, min(endpointing_min, 0.3))
-            endpointing_max = max(endpointing_min + 0.05, min(endpointing_max, 1.0))
-
-            async with traced_span("voice.tts.init", {"voice.tts_model": tts_model}):
-                tts_plugin = await build_resilient_tts_plugin(
-                    voice_id=voice_id,
-                    language=language,
-                    speaking_speed=speaking_speed,
-                    tts_model=tts_model,
-                )
-
-            session_kwargs: dict[str, Any] = {
-                "stt": stt_plugin,
-                "llm": final_llm,
-                "tts": tts_plugin,
-                "min_endpointing_delay": endpointing_min,
-                "max_endpointing_delay": endpointing_max,
-                "preemptive_generation": True,
-                "use_tts_aligned_transcript": True,
-            }
-            if vad_model is not None:
-                session_kwargs["vad"] = vad_model
-            turn_mode = "vad"
-            if delegate_turn_to_stt:
-                session_kwargs["turn_detection"] = "stt"
-                turn_mode = "stt"
+                session_kwargs, turn_mode = await _build_session_kwargs(job_id, agent_config)
 
             try:
                 session = AgentSession(**session_kwargs)
             except TypeError as session_err:
-                if delegate_turn_to_stt and "turn_detection" in str(session_err):
+                if turn_mode == "stt" and "turn_detection" in str(session_err):
                     logger.warning(
                         f"⚠️ [{job_id}] turn_detection='stt' no soportado; fallback a VAD Silero: {session_err}"
                     )
@@ -346,7 +452,8 @@ async def entrypoint(ctx: JobContext):
                     raise
 
             logger.info(
-                f"⚡ [{job_id}] AgentSession endpointing={endpointing_min}-{endpointing_max}s "
+                f"⚡ [{job_id}] AgentSession endpointing="
+                f"{session_kwargs['min_endpointing_delay']}-{session_kwargs['max_endpointing_delay']}s "
                 f"turn_detection={turn_mode}"
             )
 
@@ -365,6 +472,7 @@ async def entrypoint(ctx: JobContext):
                 tts_model=tts_model,
                 call_start_time=call_start_time,
                 call_metadata=meta_data,
+                phrase_audio=phrase_audio,
             )
             cs.setup_events()
             await session.start(room=ctx.room, agent=agent_instance)
@@ -379,8 +487,12 @@ async def entrypoint(ctx: JobContext):
                     await cs.cleanup()
                 except Exception as cleanup_err:
                     logger.warning(f"[{job_id}] Error en cleanup de sesión: {cleanup_err}")
+            elif phrase_audio is not None:
+                await phrase_audio.cancel()
 
-            if not is_duplicate:
+            if warm_unbound:
+                logger.info(f"--- 🧊 FIN DE SALA WARM SIN USAR (Job: {job_id}, Room: {room_name}) ---")
+            elif not is_duplicate:
                 logger.info(
                     f"--- 🏁 FIN DE SESIÓN AGENTE "
                     f"(Job: {job_id}, Room: {room_name}, Survey: {survey_id}) ---"
@@ -0,0 +1,322 @@
+"""
+Caché de audio pre-sintetizado para frases fijas del agente.
+
+Fillers de backchannel, reprompts, acks de interrupción, saludo y plantillas de
+despedida se renderizan una vez por (voz, idioma, velocidad, modelo) y se
+reproducen directamente en la sesión con `session.say(text, audio=...)`, sin
+pasar por el TTS en vivo. Así el TTFB del TTS desaparece justo donde más se nota.
+
+Almacenamiento:
+  - Memoria del proceso (LRU acotada).
+  - Disco local (WAV) compartido entre procesos de job del mismo host, solo
+    para frases sin datos personales. El saludo personalizado ({nombre}) se
+    renderiza únicamente en memoria. El directorio se poda por antigüedad
+    (AGENT_PHRASE_AUDIO_CACHE_MAX_AGE_HOURS) y tamaño
+    (AGENT_PHRASE_AUDIO_CACHE_MAX_MB), del WAV menos usado al más usado.
+
+Si una frase no está en caché se usa el TTS normal; la caché nunca bloquea
+una locución.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import wave
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from livekit import rtc
+
+logger = logging.getLogger("agent-dynamic")
+
+_ENABLED = os.getenv("AGENT_PHRASE_AUDIO_CACHE", "true").strip().lower() in ("1", "true", "yes")
+_CACHE_DIR = os.getenv(
+    "AGENT_PHRASE_AUDIO_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "ausarta-phrase-audio"),
+)
+_MEMORY_MAX_ENTRIES = 256
+_MAX_PHRASE_CHARS = 200
+_FRAME_MS = 20
+_WARMUP_CONCURRENCY = 2
+_DISK_MAX_BYTES = int(float(os.getenv("AGENT_PHRASE_AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024)
+_DISK_MAX_AGE_SECONDS = float(os.getenv("AGENT_PHRASE_AUDIO_CACHE_MAX_AGE_HOURS", "168")) * 3600
+
+# Plantillas de despedida/transferencia que el agente pronuncia literalmente.
+GOODBYE_TEMPLATES: tuple[str, ...] = (
+    "Muchas gracias. Hasta luego.",
+    "Buzón detectado. Hasta luego.",
+    "Entendido, gracias. Hasta luego.",
+)
+TRANSFER_NOTICE = "Perfecto, le paso con un companero. Un momento por favor."
+
+
+@dataclass(frozen=True)
+class _CachedAudio:
+    pcm: bytes
+    sample_rate: int
+    num_channels: int
+
+
+_memory: OrderedDict[str, _CachedAudio] = OrderedDict()
+
+
+def _memory_get(key: str) -> _CachedAudio | None:
+    audio = _memory.get(key)
+    if audio is not None:
+        _memory.move_to_end(key)
+    return audio
+
+
+def _memory_put(key: str, audio: _CachedAudio) -> None:
+    _memory[key] = audio
+    _memory.move_to_end(key)
+    while len(_memory) > _MEMORY_MAX_ENTRIES:
+        _memory.popitem(last=False)
+
+
+def _read_wav(path: str) -> _CachedAudio | None:
+    try:
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2:
+                return None
+            audio = _CachedAudio(
+                pcm=wf.readframes(wf.getnframes()),
+                sample_rate=wf.getframerate(),
+                num_channels=wf.getnchannels(),
+            )
+        # mtime = último uso: la poda por tamaño conserva los WAV más usados.
+        os.utime(path)
+        return audio
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        logger.debug("[phrase-audio] WAV ilegible %s: %s", path, exc)
+        return None
+
+
+def _write_wav(path: str, audio: _CachedAudio) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with wave.open(tmp_path, "wb") as wf:
+        wf.setnchannels(audio.num_channels)
+        wf.setsampwidth(2)
+        wf.setframerate(audio.sample_rate)
+        wf.writeframes(audio.pcm)
+    os.replace(tmp_path, path)
+
+
+def prune_disk_cache(now: float | None = None) -> int:
+    """Borra WAV caducados y, si el directorio supera el tope, los menos usados. Devuelve cuántos."""
+    if not _CACHE_DIR:
+        return 0
+    now = time.time() if now is None else now
+    entries: list[tuple[float, int, str]] = []
+    try:
+        with os.scandir(_CACHE_DIR) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.endswith(".wav"):
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        if now - mtime <= _DISK_MAX_AGE_SECONDS and total <= _DISK_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        total -= size
+    return removed
+
+
+class PhraseAudioCache:
+    """Audio de frases fijas para una combinación concreta de voz/idioma/velocidad/modelo."""
+
+    def __init__(
+        self,
+        *,
+        voice_id: str,
+        language: str,
+        speaking_speed: float,
+        tts_model: str,
+    ) -> None:
+        self.voice_id = voice_id
+        self.language = language
+        self.speaking_speed = float(speaking_speed or 1.0)
+        self.tts_model = tts_model
+        self._warmup_task: asyncio.Task[None] | None = None
+
+    def _key(self, text: str, language: str | None = None) -> str:
+        raw = "|".join(
+            (
+                self.voice_id,
+                language or self.language,
+                f"{self.speaking_speed:.2f}",
+                self.tts_model,
+                text.strip(),
+            )
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(_CACHE_DIR, f"{key}.wav")
+
+    def get(self, text: str, *, language: str | None = None) -> _CachedAudio | None:
+        """Audio en memoria para `text` (no toca disco ni red)."""
+        if not _ENABLED or not text:
+            return None
+        return _memory_get(self._key(text, language))
+
+    async def _load_or_render(self, text: str, tts: Any, *, persist: bool = True) -> bool:
+        """Deja `text` en memoria. Devuelve True si escribió un WAV nuevo en disco."""
+        key = self._key(text)
+        if _memory_get(key) is not None:
+            return False
+        persist = persist and bool(_CACHE_DIR)
+        if persist:
+            audio = await asyncio.to_thread(_read_wav, self._path(key))
+            if audio is not None:
+                _memory_put(key, audio)
+                return False
+
+        frame = await tts.synthesize(text).collect()
+        audio = _CachedAudio(
+            pcm=bytes(frame.data),
+            sample_rate=frame.sample_rate,
+            num_channels=frame.num_channels,
+        )
+        if not audio.pcm:
+            return False
+        _memory_put(key, audio)
+        if not persist:
+            return False
+        try:
+            await asyncio.to_thread(_write_wav, self._path(key), audio)
+        except OSError as exc:
+            logger.debug("[phrase-audio] No se pudo escribir caché en disco: %s", exc)
+            return False
+        return True
+
+    async def warm(self, phrases: Iterable[str], *, private: Iterable[str] = ()) -> None:
+        """
+        Carga desde disco o renderiza (Cartesia directo, sin fallback) las frases que falten.
+
+        Las frases de `private` (con datos del cliente) solo se guardan en memoria.
+        """
+        if not _ENABLED:
+            return
+        private_set = {p.strip() for p in private if p}
+        todo = [
+            p.strip()
+            for p in dict.fromkeys([*private_set, *phrases])
+            if p and p.strip() and len(p) <= _MAX_PHRASE_CHARS and self.get(p) is None
+        ]
+        if not todo:
+            return
+
+        from agents.stt_tts_builder import _build_tts_plugin
+
+        tts = _build_tts_plugin(
+            voice_id=self.voice_id,
+            language=self.language,
+            speaking_speed=self.speaking_speed,
+            tts_model=self.tts_model,
+        )
+        sem = asyncio.Semaphore(_WARMUP_CONCURRENCY)
+
+        async def _one(text: str) -> bool:
+            async with sem:
+                try:
+                    return await self._load_or_render(text, tts, persist=text not in private_set)
+                except Exception as exc:
+                    logger.debug("[phrase-audio] No se pudo pre-sintetizar '%s': %s", text, exc)
+                    return False
+
+        try:
+            # El saludo va primero de la lista: se lanza antes que el resto.
+            written = await asyncio.gather(*(_one(t) for t in todo))
+        finally:
+            try:
+                await tts.aclose()
+            except Exception:
+                pass
+        if any(written):
+            try:
+                await asyncio.to_thread(prune_disk_cache)
+            except OSError as exc:
+                logger.debug("[phrase-audio] No se pudo podar la caché en disco: %s", exc)
+        logger.info("[phrase-audio] %d frase(s) disponibles en caché", sum(1 for t in todo if self.get(t)))
+
+    def schedule_warmup(self, phrases: Iterable[str], *, private: Iterable[str] = ()) -> None:
+        """Lanza `warm` en segundo plano (una sola vez por instancia)."""
+        if not _ENABLED or self._warmup_task is not None:
+            return
+        self._warmup_task = asyncio.create_task(self.warm(list(phrases), private=list(private)))
+
+    async def cancel(self) -> None:
+        """Cancela el warmup pendiente (fin de llamada)."""
+        task = self._warmup_task
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def say(
+        self,
+        session: Any,
+        text: str,
+        *,
+        allow_interruptions: bool = True,
+        language: str | None = None,
+    ) -> Any:
+        """`session.say` con audio pre-sintetizado si existe; si no, TTS en vivo."""
+        audio = self.get(text, language=language)
+        if audio is None:
+            return await session.say(text, allow_interruptions=allow_interruptions)
+        return await session.say(
+            text, audio=_iter_frames(audio), allow_interruptions=allow_interruptions
+        )
+
+
+async def _iter_frames(audio: _CachedAudio) -> AsyncIterator[rtc.AudioFrame]:
+    samples_per_frame = max(1, audio.sample_rate * _FRAME_MS // 1000)
+    bytes_per_frame = samples_per_frame * audio.num_channels * 2
+    for offset in range(0, len(audio.pcm), bytes_per_frame):
+        chunk = audio.pcm[offset : offset + bytes_per_frame]
+        yield rtc.AudioFrame(
+            data=chunk,
+            sample_rate=audio.sample_rate,
+            num_channels=audio.num_channels,
+            samples_per_channel=len(chunk) // (2 * audio.num_channels),
+        )
+
+
+async def say_phrase(
+    owner: Any,
+    session: Any,
+    text: str,
+    *,
+    allow_interruptions: bool = True,
+) -> Any:
+    """Usa la caché de `owner.phrase_audio` si existe (agente o CallSession)."""
+    cache: PhraseAudioCache | None = getattr(owner, "phrase_audio", None)
+    if cache is None:
+        return await session.say(text, allow_interruptions=allow_interruptions)
+    lang_state = getattr(owner, "lang_state", None)
+    language = lang_state.get("active_lang") if isinstance(lang_state, dict) else None
+    return await cache.say(session, text, allow_interruptions=allow_interruptions, language=language)
@@ -123,9 +123,12 @@ def _build_deepgram_stt_plugin(stt_model: str, language: str) -> Any:
         return deepgram.STT(**dg_kwargs)
 
 
-def _build_openai_stt_fallback(language: str) -> Any:
-    logger.info("🎙️ Fallback STT: OpenAI Whisper lang=%s", language)
-    return openai.STT(language=language)
+def _build_openai_stt_fallback(language: str, *, streaming: bool = False) -> Any:
+    logger.info("🎙️ Fallback STT: OpenAI Whisper lang=%s streaming=%s", language, streaming)
+    # El STT FallbackAdapter exige que todos sus STT hagan streaming salvo que
+    # reciba un VAD (lanza ValueError al construirse); el modo REST de
+    # openai.STT no lo hace, así que dentro del adapter va en modo realtime.
+    return openai.STT(language=language, use_realtime=streaming)
 
 
 async def build_resilient_tts_plugin(
@@ -178,15 +181,14 @@ async def build_resilient_stt_plugin(
         return openai.STT(language=language), False
 
     breaker = await deepgram_stt_breaker()
-    openai_stt = _build_openai_stt_fallback(language)
 
     if await breaker.is_open():
         logger.warning("🔴 Circuit OPEN %s → STT solo OpenAI Whisper", breaker.name)
-        return openai_stt, False
+        return _build_openai_stt_fallback(language), False
 
     deepgram_stt = _build_deepgram_stt_plugin(stt_model, language)
     adapter = STTFallbackAdapter(
-        [deepgram_stt, openai_stt],
+        [deepgram_stt, _build_openai_stt_fallback(language, streaming=True)],
         attempt_timeout=float(os.getenv("CIRCUIT_BREAKER_STT_ATTEMPT_TIMEOUT", "10")),
         max_retry_per_stt=1,
     )
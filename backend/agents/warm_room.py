@@ -0,0 +1,107 @@
+"""
+Lado agente del pool de salas warm (ver services/warm_room_pool).
+
+El agente de una sala warm arranca todo lo que no depende del lead (VAD,
+STT/TTS/LLM con conexión abierta), se anuncia como disponible y espera a que
+el dialer vincule la sala a una encuesta actualizando su metadata.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Optional
+
+from livekit import rtc
+
+logger = logging.getLogger("agent-dynamic")
+
+# Tras retirar la sala sin éxito (ya reclamada), tiempo máximo hasta la vinculación.
+_BIND_GRACE_SECONDS = 20.0
+
+_PIPELINE_FIELDS = ("llm_model", "voice_id", "tts_model", "language", "stt_provider", "stt_model", "speaking_speed")
+
+
+def pipeline_signature(agent_config: dict[str, Any]) -> tuple:
+    """Campos de la config que determinan los plugins de voz ya construidos."""
+    return (
+        *(str(agent_config.get(f) or "") for f in _PIPELINE_FIELDS),
+        bool(agent_config.get("extraction_schema")),
+    )
+
+
+def parse_binding(raw_metadata: str | None) -> Optional[dict[str, Any]]:
+    """Metadata de vinculación (sala ya asignada a una encuesta) o None."""
+    if not raw_metadata:
+        return None
+    try:
+        meta = json.loads(raw_metadata)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(meta, dict) or meta.get("warm"):
+        return None
+    try:
+        return meta if int(meta.get("survey_id") or 0) > 0 else None
+    except (TypeError, ValueError):
+        return None
+
+
+def prewarm_plugins(session_kwargs: dict[str, Any]) -> None:
+    """Abre conexiones de STT/TTS por adelantado (los plugins que lo soportan)."""
+    for key in ("stt", "tts"):
+        plugin = session_kwargs.get(key)
+        prewarm = getattr(plugin, "prewarm", None)
+        if callable(prewarm):
+            try:
+                prewarm()
+            except Exception as e:
+                logger.debug(f"prewarm {key} ignorado: {e}")
+
+
+async def wait_for_binding(
+    room: rtc.Room,
+    *,
+    empresa_id: int,
+    agent_id: int,
+) -> Optional[dict[str, Any]]:
+    """
+    Anuncia la sala como lista y espera la vinculación a un lead.
+
+    Devuelve la metadata de la llamada, o None si la sala caduca sin usarse
+    o se desconecta (el pool la descartó).
+    """
+    from services.warm_room_pool import mark_warm_room_ready, warm_room_idle_seconds, withdraw_warm_room
+
+    loop = asyncio.get_running_loop()
+    bound: asyncio.Future = loop.create_future()
+
+    def _on_metadata(_old: str, new: str) -> None:
+        binding = parse_binding(new)
+        if binding and not bound.done():
+            bound.set_result(binding)
+
+    def _on_disconnected(*_args: Any) -> None:
+        if not bound.done():
+            bound.set_result(None)
+
+    room.on("room_metadata_changed", _on_metadata)
+    room.on("disconnected", _on_disconnected)
+    try:
+        already = parse_binding(room.metadata)
+        if already:
+            return already
+        await mark_warm_room_ready(empresa_id, agent_id, room.name)
+        try:
+            return await asyncio.wait_for(asyncio.shield(bound), warm_room_idle_seconds())
+        except asyncio.TimeoutError:
+            pass
+        if await withdraw_warm_room(empresa_id, agent_id, room.name):
+            return None
+        # Un dialer la reclamó justo al caducar: la metadata está en camino.
+        try:
+            return await asyncio.wait_for(bound, _BIND_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+    finally:
+        room.off("room_metadata_changed", _on_metadata)
+        room.off("disconnected", _on_disconnected)
@@ -17,6 +17,13 @@ from services.auth import get_supabase_jwt_secret
 from services.redis_service import get_redis, close_redis
 from services.queue_service import get_arq_pool, close_arq_pool
 from services.livekit_service import close_livekit_api
+from services.http_client import close_http_clients
+from services.external_db_service import close_external_db_pools
+from services.knowledge_index import close_knowledge_index
+from services.profile_cache import close_profile_cache, ensure_profile_invalidation_listener
+from services.sse_fanout import close_sse_topics
+from services.call_events import close_call_events
+from services.campaign_lead_import import close_lead_imports
 from services.queue_service import enqueue_telegram_alert
 from middleware.tenant_context import TenantContextMiddleware
 
@@ -110,6 +117,9 @@ async def lifespan(app: FastAPI):
             f"⚠️ Redis no disponible al arrancar: {e}. Los locks usarán fallback en memoria."
         )
 
+    # Invalidaciones de perfil de otras réplicas (L1 con TTL largo)
+    ensure_profile_invalidation_listener()
+
     try:
         await get_arq_pool()
         logger.info("✅ Cliente ARQ inicializado.")
@@ -126,6 +136,18 @@ async def lifespan(app: FastAPI):
     shutdown_tracing()
 
     logger.info("🌙 Apagando API Ausarta v2...")
+    try:
+        await close_sse_topics()
+    except Exception:
+        pass
+    try:
+        await close_call_events()
+    except Exception:
+        pass
+    try:
+        await close_lead_imports()
+    except Exception:
+        pass
     try:
         await close_redis()
     except Exception:
@@ -138,6 +160,22 @@ async def lifespan(app: FastAPI):
         await close_livekit_api()
     except Exception:
         pass
+    try:
+        await close_http_clients()
+    except Exception:
+        pass
+    try:
+        await close_external_db_pools()
+    except Exception:
+        pass
+    try:
+        await close_knowledge_index()
+    except Exception:
+        pass
+    try:
+        await close_profile_cache()
+    except Exception:
+        pass
 
 
 app = FastAPI(title="Ausarta Voice Agent API", version="2.0.0", lifespan=lifespan)
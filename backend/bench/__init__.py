@@ -0,0 +1,19 @@
+"""
+Benchmark offline del camino de llamada (latencia p50/p95/p99 y ops/s).
+
+Ejecuta los hot paths reales del backend y del agente contra dobles locales
+deterministas, sin servicios externos:
+
+  - Redis → fakeredis (in-process, con Lua vía lupa).
+  - Supabase/PostgREST → `FakeSupabase` en memoria (filtros, inserts, RPCs).
+  - OpenAI / Groq / Cartesia / Deepgram / bridge HTTP → servidor aiohttp local;
+    las peticiones salientes de aiohttp se redirigen a él por host.
+  - LiveKit (API de salas, dispatch, SIP) y ARQ → dobles async.
+
+Cada servicio tiene una latencia configurable (`--latency groq=120,openai=60`).
+
+Uso:
+  cd backend && python -m bench
+  cd backend && python -m bench --scenarios search_knowledge,semantic_router -n 500 -c 16
+  cd backend && python -m bench --output bench.json --baseline main.json --tolerance 0.2
+"""
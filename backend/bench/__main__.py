@@ -0,0 +1,118 @@
+"""CLI del benchmark: `python -m bench --help`."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+
+# Antes de importar la app: claves ficticias (los plugins exigen API key pero
+# no conectan al construirse) y sin caché de frases ni trazas hacia fuera.
+_ENV_DEFAULTS = {
+    "OPENAI_API_KEY": "bench",
+    "GROQ_API_KEY": "bench",
+    "DEEPGRAM_API_KEY": "bench",
+    "CARTESIA_API_KEY": "bench",
+    "LIVEKIT_URL": "ws://127.0.0.1:7880",
+    "LIVEKIT_API_KEY": "bench",
+    "LIVEKIT_API_SECRET": "bench",
+    "BRIDGE_SERVER_URL_INTERNAL": "http://127.0.0.1:9/bridge",
+    "AGENT_PHRASE_AUDIO_CACHE": "false",
+    "OTEL_SDK_DISABLED": "true",
+    "REDIS_URL": "redis://127.0.0.1:6379/15",
+    # Miles de lotes de la misma empresa en segundos: los cupos y rate limits se
+    # siguen evaluando, pero con techos que el benchmark no alcanza.
+    "MAX_CONCURRENT_CALLS": "1000",
+    "MAX_CALLS_PER_EMPRESA": "1000",
+    "SIP_OUTBOUND_MAX_PER_EMPRESA_MINUTE": "1000000",
+    "SIP_OUTBOUND_MAX_PER_DEST_HOUR": "1000000",
+    "DIALER_GLOBAL_CPS": "1000000",
+    "DIALER_TRUNK_CPS": "1000000",
+    "DIALER_EMPRESA_CPS": "1000000",
+}
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    from bench.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Benchmark offline del camino de llamada (p50/p95/p99 y ops/s en JSON).",
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"Lista separada por comas (por defecto todos): {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument("-n", "--iterations", type=int, default=100)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--latency",
+        default="",
+        help="Latencias simuladas en ms, p. ej. groq=120,openai=60,supabase=8,jitter=0.2",
+    )
+    parser.add_argument("--output", help="Fichero JSON de salida (por defecto stdout)")
+    parser.add_argument("--baseline", help="Informe JSON previo con el que comparar p95")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento relativo admitido")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Muestra los logs de la app")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    for key, value in _ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    # Con ENVIRONMENT=development el agente escribe agent.log en el cwd (el repo).
+    os.environ.setdefault(
+        "AGENT_LOG_FILE", os.path.join(tempfile.mkdtemp(prefix="ausarta-bench-"), "agent.log")
+    )
+
+    args = _parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    logging.getLogger("bench").setLevel(logging.INFO)
+    if not args.verbose:
+        # Los fallos esperados (RPCs inexistentes → fallback) no deben ensuciar la
+        # salida; los errores reales quedan en `errors`/`first_error` del informe.
+        logging.disable(logging.CRITICAL)
+
+    from bench.fakes import LatencyProfile
+    from bench.runner import compare_with_baseline, run_benchmark
+
+    report = asyncio.run(
+        run_benchmark(
+            [s.strip() for s in args.scenarios.split(",") if s.strip()],
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            latency=LatencyProfile.from_spec(args.latency),
+        )
+    )
+    logging.disable(logging.NOTSET)
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare_with_baseline(report, baseline, tolerance=args.tolerance)
+        if regressions:
+            for line in regressions:
+                print(f"REGRESIÓN {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,613 @@
+"""Dobles locales deterministas para el benchmark (Supabase, proveedores HTTP, LiveKit, ARQ)."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, field, fields
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+
+EMBEDDING_DIMS = 1536
+
+# ──────────────────────────────────────────────
+# Latencias simuladas
+# ──────────────────────────────────────────────
+
+
+@dataclass
+class LatencyProfile:
+    """Latencia base (ms) por servicio simulado; `jitter` es la variación relativa ±."""
+
+    supabase: float = 8.0
+    bridge: float = 15.0
+    openai: float = 60.0
+    groq: float = 120.0
+    cartesia: float = 80.0
+    deepgram: float = 40.0
+    livekit: float = 25.0
+    sip: float = 150.0
+    jitter: float = 0.2
+    seed: int = 1234
+    _rng: random.Random = field(default=None, init=False, repr=False, compare=False)  # type: ignore[assignment]
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def from_spec(cls, spec: str | None, **overrides: Any) -> "LatencyProfile":
+        """Parsea `servicio=ms,...` (p. ej. `groq=120,openai=60,jitter=0.1`)."""
+        values: dict[str, Any] = dict(overrides)
+        for item in (spec or "").split(","):
+            if not item.strip():
+                continue
+            name, _, raw = item.partition("=")
+            name = name.strip()
+            if name not in cls.__dataclass_fields__ or name.startswith("_"):
+                raise ValueError(f"Servicio de latencia desconocido: {name!r}")
+            values[name] = int(raw) if name == "seed" else float(raw)
+        return cls(**values)
+
+    def sample(self, service: str) -> float:
+        """Latencia en segundos para una llamada a `service`."""
+        base = float(getattr(self, service)) / 1000.0
+        if base <= 0:
+            return 0.0
+        with self._lock:
+            factor = 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, base * factor)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+
+
+# ──────────────────────────────────────────────
+# Embeddings deterministas
+# ──────────────────────────────────────────────
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _token_vector(token: str) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(token.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(EMBEDDING_DIMS).astype(np.float32)
+
+
+def fake_embedding(text: str) -> list[float]:
+    """Bag-of-words con vectores por token: textos que comparten palabras quedan cerca."""
+    tokens = _TOKEN_RE.findall((text or "").lower()) or ["_"]
+    vec = np.zeros(EMBEDDING_DIMS, dtype=np.float32)
+    for token in tokens:
+        vec += _token_vector(token)
+    norm = float(np.linalg.norm(vec)) or 1.0
+    return (vec / norm).tolist()
+
+
+# ──────────────────────────────────────────────
+# Supabase / PostgREST en memoria
+# ──────────────────────────────────────────────
+
+
+class FakeApiError(Exception):
+    """Equivalente local a postgrest.APIError (p. ej. RPC inexistente)."""
+
+
+def _same(a: Any, b: Any) -> bool:
+    return a == b or (a is not None and b is not None and str(a) == str(b))
+
+
+def _compare(a: Any, b: Any) -> int | None:
+    if a is None or b is None:
+        return None
+    try:
+        return (float(a) > float(b)) - (float(a) < float(b))
+    except (TypeError, ValueError):
+        return (str(a) > str(b)) - (str(a) < str(b))
+
+
+def _is(value: Any, target: Any) -> bool:
+    if target in (None, "null"):
+        return value is None
+    if target in (True, "true"):
+        return value is True
+    if target in (False, "false"):
+        return value is False
+    return _same(value, target)
+
+
+class _NotProxy:
+    def __init__(self, query: "FakeQuery") -> None:
+        self._query = query
+
+    def __getattr__(self, name: str) -> Callable[..., "FakeQuery"]:
+        method = getattr(self._query, name)
+
+        def _negated(*args: Any, **kwargs: Any) -> "FakeQuery":
+            before = len(self._query._filters)
+            method(*args, **kwargs)
+            for i in range(before, len(self._query._filters)):
+                pred = self._query._filters[i]
+                self._query._filters[i] = lambda row, p=pred: not p(row)
+            return self._query
+
+        return _negated
+
+
+class FakeQuery:
+    """Builder PostgREST síncrono (select/insert/update/upsert/delete + filtros)."""
+
+    def __init__(self, db: "FakeSupabase", table: str) -> None:
+        self._db = db
+        self._table = table
+        self._op = "select"
+        self._payload: Any = None
+        self._on_conflict = "id"
+        self._count: str | None = None
+        self._filters: list[Callable[[dict[str, Any]], bool]] = []
+        self._order: list[tuple[str, bool, bool]] = []
+        self._limit: int | None = None
+        self._range: tuple[int, int] | None = None
+        self._single = False
+
+    # Operaciones
+    def select(self, *_columns: Any, count: str | None = None, **_: Any) -> "FakeQuery":
+        self._count = count
+        return self
+
+    def insert(self, rows: Any, **_: Any) -> "FakeQuery":
+        self._op, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows: Any, on_conflict: str = "id", **_: Any) -> "FakeQuery":
+        self._op, self._payload, self._on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values: dict[str, Any], **_: Any) -> "FakeQuery":
+        self._op, self._payload = "update", values
+        return self
+
+    def delete(self, **_: Any) -> "FakeQuery":
+        self._op = "delete"
+        return self
+
+    # Filtros
+    def _add(self, pred: Callable[[dict[str, Any]], bool]) -> "FakeQuery":
+        self._filters.append(pred)
+        return self
+
+    def eq(self, col: str, val: Any) -> "FakeQuery":
+        return self._add(lambda r: _same(r.get(col), val))
+
+    def neq(self, col: str, val: Any) -> "FakeQuery":
+        return self._add(lambda r: not _same(r.get(col), val))
+
+    def gt(self, col: str, val: Any) -> "FakeQuery":
+        return self._add(lambda r: _compare(r.get(col), val) == 1)
+
+    def gte(self, col: str, val: Any) -> "FakeQuery":
+        return self._add(lambda r: _compare(r.get(col), val) in (0, 1))
+
+    def lt(self, col: str, val: Any) -> "FakeQuery":
+        return self._add(lambda r: _compare(r.get(col), val) == -1)
+
+    def lte(self, col: str, val: Any) -> "FakeQuery":
+        return self._add(lambda r: _compare(r.get(col), val) in (0, -1))
+
+    def in_(self, col: str, values: Any) -> "FakeQuery":
+        allowed = list(values or [])
+        return self._add(lambda r: any(_same(r.get(col), v) for v in allowed))
+
+    def is_(self, col: str, val: Any) -> "FakeQuery":
+        return self._add(lambda r: _is(r.get(col), val))
+
+    def ilike(self, col: str, pattern: str) -> "FakeQuery":
+        regex = re.compile("^" + re.escape(pattern).replace("%", ".*") + "$", re.IGNORECASE)
+        return self._add(lambda r: bool(regex.match(str(r.get(col) or ""))))
+
+    def like(self, col: str, pattern: str) -> "FakeQuery":
+        regex = re.compile("^" + re.escape(pattern).replace("%", ".*") + "$")
+        return self._add(lambda r: bool(regex.match(str(r.get(col) or ""))))
+
+    def or_(self, *_: Any, **__: Any) -> "FakeQuery":
+        # Los `or_` del backend son ventanas de reintento (next_retry_at); en el
+        # benchmark no filtran.
+        return self
+
+    def filter(self, col: str, op: str, val: Any) -> "FakeQuery":
+        return getattr(self, {"in": "in_", "is": "is_"}.get(op, op))(col, val)
+
+    @property
+    def not_(self) -> _NotProxy:
+        return _NotProxy(self)
+
+    # Modificadores
+    def order(self, col: str, desc: bool = False, nullsfirst: bool = False, **_: Any) -> "FakeQuery":
+        self._order.append((col, desc, nullsfirst))
+        return self
+
+    def limit(self, n: int, **_: Any) -> "FakeQuery":
+        self._limit = int(n)
+        return self
+
+    def range(self, start: int, end: int, **_: Any) -> "FakeQuery":
+        self._range = (int(start), int(end))
+        return self
+
+    def single(self) -> "FakeQuery":
+        self._single = True
+        return self
+
+    maybe_single = single
+
+    def execute(self) -> SimpleNamespace:
+        self._db.wait()
+        with self._db.lock:
+            data, count = self._run()
+        data = copy.deepcopy(data)
+        if self._single:
+            data = data[0] if data else None
+        return SimpleNamespace(data=data, count=count)
+
+    def _matches(self, row: dict[str, Any]) -> bool:
+        return all(pred(row) for pred in self._filters)
+
+    def _run(self) -> tuple[list[dict[str, Any]], int | None]:
+        rows = self._db.tables.setdefault(self._table, [])
+        if self._op == "insert":
+            payload = self._payload if isinstance(self._payload, list) else [self._payload]
+            return [self._db.insert_row(self._table, dict(r)) for r in payload], None
+        if self._op == "upsert":
+            payload = self._payload if isinstance(self._payload, list) else [self._payload]
+            keys = [k.strip() for k in self._on_conflict.split(",")]
+            out = []
+            for new in payload:
+                existing = next(
+                    (r for r in rows if all(_same(r.get(k), new.get(k)) for k in keys)), None
+                )
+                if existing is not None:
+                    existing.update(new)
+                    out.append(existing)
+                else:
+                    out.append(self._db.insert_row(self._table, dict(new)))
+            return out, None
+
+        matched = [r for r in rows if self._matches(r)]
+        if self._op == "update":
+            for row in matched:
+                row.update(self._payload)
+            return matched, None
+        if self._op == "delete":
+            self._db.tables[self._table] = [r for r in rows if not self._matches(r)]
+            return matched, None
+
+        for col, desc, nullsfirst in reversed(self._order):
+            present = [r for r in matched if r.get(col) is not None]
+            missing = [r for r in matched if r.get(col) is None]
+            present.sort(key=lambda r, c=col: r[c], reverse=desc)
+            matched = missing + present if nullsfirst else present + missing
+        count = len(matched) if self._count else None
+        if self._range is not None:
+            matched = matched[self._range[0] : self._range[1] + 1]
+        if self._limit is not None:
+            matched = matched[: self._limit]
+        return matched, count
+
+
+class _FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, args: dict[str, Any]) -> None:
+        self._db, self._name, self._args = db, name, args or {}
+
+    def execute(self) -> SimpleNamespace:
+        self._db.wait()
+        handler = self._db.rpcs.get(self._name)
+        if handler is None:
+            raise FakeApiError(f"function public.{self._name} does not exist")
+        with self._db.lock:
+            data = handler(self._db, self._args)
+        return SimpleNamespace(data=copy.deepcopy(data), count=None)
+
+
+class FakeSupabase:
+    """Cliente supabase-py mínimo sobre tablas en memoria, con latencia por petición."""
+
+    def __init__(self, latency: LatencyProfile) -> None:
+        self.latency = latency
+        self.tables: dict[str, list[dict[str, Any]]] = {}
+        self.rpcs: dict[str, Callable[["FakeSupabase", dict[str, Any]], Any]] = {}
+        self.lock = threading.RLock()
+        self.requests = 0
+        self._ids: dict[str, itertools.count] = {}
+
+    def wait(self) -> None:
+        # Se ejecuta dentro de asyncio.to_thread (sb_query): bloquea el hilo,
+        # igual que el cliente síncrono real.
+        with self.lock:
+            self.requests += 1
+        time.sleep(self.latency.sample("supabase"))
+
+    def insert_row(self, table: str, row: dict[str, Any]) -> dict[str, Any]:
+        counter = self._ids.setdefault(table, itertools.count(1_000_000))
+        row.setdefault("id", next(counter))
+        self.tables.setdefault(table, []).append(row)
+        return row
+
+    def seed(self, table: str, rows: list[dict[str, Any]]) -> None:
+        with self.lock:
+            for row in rows:
+                self.insert_row(table, dict(row))
+
+    def register_rpc(self, name: str, handler: Callable[["FakeSupabase", dict[str, Any]], Any]) -> None:
+        self.rpcs[name] = handler
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, args: dict[str, Any] | None = None) -> _FakeRpc:
+        return _FakeRpc(self, name, args or {})
+
+
+# ──────────────────────────────────────────────
+# Proveedores HTTP (OpenAI, Groq, Cartesia, Deepgram, bridge)
+# ──────────────────────────────────────────────
+
+PROVIDER_HOSTS: dict[str, str] = {
+    "api.openai.com": "openai",
+    "api.groq.com": "groq",
+    "api.cartesia.ai": "cartesia",
+    "api.deepgram.com": "deepgram",
+}
+
+# Respuesta JSON del chat según un marcador del prompt de sistema.
+CHAT_RESPONSES: tuple[tuple[str, dict[str, Any]], ...] = (
+    ("transfer_human", {"intent": "continue", "confidence": 0.92}),
+    ("customer_anger_score", {
+        "customer_anger_score": 2,
+        "requires_urgent_human_attention": False,
+        "anger_signals": [],
+    }),
+    ("disposicion", {
+        "disposicion": "completada",
+        "sentimiento_cliente": "Positivo",
+        "resumen_narrativo": "El cliente respondió a la encuesta y valoró bien el servicio.",
+    }),
+)
+
+
+class FakeProviderServer:
+    """Servidor aiohttp local que imita las APIs externas del camino de llamada."""
+
+    def __init__(self, latency: LatencyProfile) -> None:
+        self.latency = latency
+        self.requests: dict[str, int] = {}
+        self.agent_configs: dict[str, dict[str, Any]] = {}
+        self.base_url = ""
+        self._runner: Any = None
+
+    async def start(self) -> None:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post("/{provider}/v1/embeddings", self._embeddings)
+        app.router.add_post("/{provider}/openai/v1/chat/completions", self._chat)
+        app.router.add_post("/{provider}/v1/chat/completions", self._chat)
+        app.router.add_get("/bridge/api/agent_config_by_survey/{survey_id}", self._agent_config)
+        app.router.add_route("*", "/{provider}/{tail:.*}", self._not_found)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _delay(self, service: str) -> None:
+        self.requests[service] = self.requests.get(service, 0) + 1
+        await asyncio.sleep(self.latency.sample(service))
+
+    async def _embeddings(self, request: Any) -> Any:
+        from aiohttp import web
+
+        await self._delay(request.match_info["provider"])
+        body = await request.json()
+        inputs = body.get("input")
+        texts = inputs if isinstance(inputs, list) else [inputs]
+        return web.json_response({
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(t))}
+                for i, t in enumerate(texts)
+            ],
+            "model": body.get("model"),
+        })
+
+    async def _chat(self, request: Any) -> Any:
+        from aiohttp import web
+
+        await self._delay(request.match_info["provider"])
+        body = await request.json()
+        system = " ".join(
+            str(m.get("content") or "") for m in body.get("messages") or [] if m.get("role") == "system"
+        )
+        content: dict[str, Any] = {}
+        for marker, payload in CHAT_RESPONSES:
+            if marker in system:
+                content = payload
+                break
+        return web.json_response({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)},
+            }],
+            "usage": {"prompt_tokens": 200, "completion_tokens": 30, "total_tokens": 230},
+        })
+
+    async def _agent_config(self, request: Any) -> Any:
+        from aiohttp import web
+
+        await self._delay("bridge")
+        survey_id = request.match_info["survey_id"]
+        config = self.agent_configs.get(survey_id) or self.agent_configs.get("*")
+        if config is None:
+            return web.json_response({"detail": "not found"}, status=404)
+        return web.json_response(config)
+
+    async def _not_found(self, request: Any) -> Any:
+        from aiohttp import web
+
+        provider = request.match_info["provider"]
+        if provider in PROVIDER_HOSTS.values():
+            await self._delay(provider)
+        return web.json_response({"detail": "no simulado en el benchmark"}, status=404)
+
+
+def install_http_redirect(server: FakeProviderServer) -> Callable[[], None]:
+    """Redirige las peticiones aiohttp a hosts de proveedores hacia el servidor local."""
+    import aiohttp
+    from yarl import URL
+
+    original = aiohttp.ClientSession._request
+    base = URL(server.base_url)
+
+    async def _request(self: Any, method: str, str_or_url: Any, *args: Any, **kwargs: Any) -> Any:
+        url = URL(str(str_or_url))
+        provider = PROVIDER_HOSTS.get(url.host or "")
+        if provider:
+            str_or_url = base.with_path(f"/{provider}{url.path}").with_query(url.query)
+        return await original(self, method, str_or_url, *args, **kwargs)
+
+    aiohttp.ClientSession._request = _request  # type: ignore[method-assign]
+
+    def _restore() -> None:
+        aiohttp.ClientSession._request = original  # type: ignore[method-assign]
+
+    return _restore
+
+
+# ──────────────────────────────────────────────
+# LiveKit, ARQ y JobContext
+# ──────────────────────────────────────────────
+
+
+class _FakeRoomService:
+    def __init__(self, lk: "FakeLiveKitAPI") -> None:
+        self._lk = lk
+
+    async def create_room(self, req: Any) -> Any:
+        await self._lk.delay("livekit")
+        self._lk.rooms[req.name] = []
+        return SimpleNamespace(name=req.name, sid=f"RM_{uuid.uuid4().hex[:10]}")
+
+    async def delete_room(self, req: Any) -> Any:
+        await self._lk.delay("livekit")
+        self._lk.rooms.pop(getattr(req, "room", ""), None)
+        return SimpleNamespace()
+
+    async def list_participants(self, req: Any) -> Any:
+        await self._lk.delay("livekit")
+        identities = self._lk.rooms.get(req.room, [])
+        return SimpleNamespace(participants=[SimpleNamespace(identity=i) for i in identities])
+
+    async def list_rooms(self, req: Any) -> Any:
+        await self._lk.delay("livekit")
+        return SimpleNamespace(rooms=[])
+
+
+class _FakeDispatchService:
+    def __init__(self, lk: "FakeLiveKitAPI") -> None:
+        self._lk = lk
+
+    async def create_dispatch(self, req: Any) -> Any:
+        await self._lk.delay("livekit")
+        # El agente entra en sala en cuanto se despacha.
+        self._lk.rooms.setdefault(req.room, []).append(f"agent-{uuid.uuid4().hex[:8]}")
+        return SimpleNamespace(id=f"AD_{uuid.uuid4().hex[:10]}")
+
+
+class _FakeSipService:
+    def __init__(self, lk: "FakeLiveKitAPI") -> None:
+        self._lk = lk
+
+    async def create_sip_participant(self, req: Any) -> Any:
+        await self._lk.delay("sip")
+        self._lk.rooms.setdefault(req.room_name, []).append(req.participant_identity)
+        self._lk.sip_calls += 1
+        return SimpleNamespace(participant_identity=req.participant_identity)
+
+
+class FakeLiveKitAPI:
+    """Sustituto de `livekit.api.LiveKitAPI` (salas, dispatch de agentes y SIP)."""
+
+    def __init__(self, latency: LatencyProfile) -> None:
+        self.latency = latency
+        self.rooms: dict[str, list[str]] = {}
+        self.sip_calls = 0
+        self.room = _FakeRoomService(self)
+        self.agent_dispatch = _FakeDispatchService(self)
+        self.sip = _FakeSipService(self)
+
+    async def delay(self, service: str) -> None:
+        await asyncio.sleep(self.latency.sample(service))
+
+    async def aclose(self) -> None:
+        return None
+
+
+class FakeArqPool:
+    """Pool ARQ que solo registra los jobs encolados."""
+
+    def __init__(self) -> None:
+        self.jobs: list[tuple[str, tuple[Any, ...]]] = []
+
+    async def enqueue_job(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        self.jobs.append((name, args))
+        return SimpleNamespace(job_id=kwargs.get("_job_id") or uuid.uuid4().hex)
+
+
+class FakeRoom:
+    def __init__(self, name: str, latency: LatencyProfile) -> None:
+        self.name = name
+        self.remote_participants: dict[str, Any] = {}
+        self._latency = latency
+
+    async def disconnect(self) -> None:
+        return None
+
+    def on(self, *_: Any, **__: Any) -> Callable[[Any], Any]:
+        return lambda fn: fn
+
+
+class FakeJobContext:
+    """JobContext mínimo: sala, job con metadata y `connect` con latencia LiveKit."""
+
+    def __init__(self, room_name: str, metadata: dict[str, Any], latency: LatencyProfile) -> None:
+        self.job = SimpleNamespace(id=f"AJ_{uuid.uuid4().hex[:10]}", metadata=json.dumps(metadata))
+        self.room = FakeRoom(room_name, latency)
+        self._latency = latency
+
+    async def connect(self, **_: Any) -> None:
+        await asyncio.sleep(self._latency.sample("livekit"))
+
+    def shutdown(self, reason: str = "") -> None:
+        return None
@@ -0,0 +1,155 @@
+"""Ejecución de escenarios, percentiles y comparación contra un baseline."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import platform
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+from bench.fakes import LatencyProfile
+from bench.scenarios import SCENARIOS, BenchEnvironment, Scenario
+
+logger = logging.getLogger("bench")
+
+
+@dataclass
+class ScenarioResult:
+    n: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    max_ms: float
+    ops_per_s: float
+    first_error: str | None = None
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Percentil con interpolación lineal (mismo criterio que numpy 'linear')."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+async def run_scenario(
+    env: BenchEnvironment,
+    scenario: Scenario,
+    *,
+    iterations: int,
+    concurrency: int,
+    warmup: int,
+) -> ScenarioResult:
+    for i in range(warmup):
+        try:
+            await scenario(env, i)
+        except Exception as exc:
+            logger.debug("warmup falló: %s", exc)
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    durations: list[float] = []
+    errors: list[str] = []
+
+    async def _one(i: int) -> None:
+        async with sem:
+            started = time.perf_counter()
+            try:
+                await scenario(env, warmup + i)
+            except Exception as exc:
+                errors.append(f"{type(exc).__name__}: {exc}")
+                return
+            durations.append((time.perf_counter() - started) * 1000.0)
+
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(_one(i) for i in range(iterations)))
+    wall_s = time.perf_counter() - wall_started
+
+    durations.sort()
+    return ScenarioResult(
+        n=iterations,
+        errors=len(errors),
+        p50_ms=round(percentile(durations, 50), 3),
+        p95_ms=round(percentile(durations, 95), 3),
+        p99_ms=round(percentile(durations, 99), 3),
+        mean_ms=round(sum(durations) / len(durations), 3) if durations else 0.0,
+        max_ms=round(durations[-1], 3) if durations else 0.0,
+        ops_per_s=round(len(durations) / wall_s, 3) if wall_s > 0 else 0.0,
+        first_error=errors[0] if errors else None,
+    )
+
+
+async def run_benchmark(
+    scenario_names: list[str],
+    *,
+    iterations: int,
+    concurrency: int,
+    warmup: int,
+    latency: LatencyProfile,
+) -> dict[str, Any]:
+    unknown = [name for name in scenario_names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Escenarios desconocidos: {', '.join(unknown)}")
+
+    env = BenchEnvironment(latency)
+    await env.start()
+    results: dict[str, Any] = {}
+    try:
+        for name in scenario_names:
+            logger.info("▶ %s (n=%d, c=%d)", name, iterations, concurrency)
+            result = await run_scenario(
+                env,
+                SCENARIOS[name],
+                iterations=iterations,
+                concurrency=concurrency,
+                warmup=warmup,
+            )
+            results[name] = asdict(result)
+    finally:
+        await env.stop()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "warmup": warmup,
+            "latency_ms": latency.as_dict(),
+        },
+        "scenarios": results,
+    }
+
+
+def compare_with_baseline(
+    report: dict[str, Any],
+    baseline: dict[str, Any],
+    *,
+    tolerance: float,
+    metric: str = "p95_ms",
+) -> list[str]:
+    """Escenarios cuyo `metric` empeora más de `tolerance` (relativo) respecto al baseline."""
+    regressions: list[str] = []
+    base_scenarios = baseline.get("scenarios") or {}
+    for name, current in (report.get("scenarios") or {}).items():
+        previous = base_scenarios.get(name)
+        if not previous or not previous.get(metric):
+            continue
+        before = float(previous[metric])
+        after = float(current[metric])
+        if after > before * (1.0 + tolerance):
+            regressions.append(
+                f"{name}: {metric} {before:.1f} → {after:.1f} ms (+{(after / before - 1) * 100:.0f}%)"
+            )
+        if current.get("errors") and not previous.get("errors"):
+            regressions.append(f"{name}: {current['errors']} error(es) (baseline sin errores)")
+    return regressions
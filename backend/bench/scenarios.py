@@ -0,0 +1,452 @@
+"""Entorno simulado y escenarios del benchmark (un coroutine por hot path)."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import itertools
+import sys
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+
+import numpy as np
+
+from bench.fakes import (
+    FakeArqPool,
+    FakeJobContext,
+    FakeLiveKitAPI,
+    FakeProviderServer,
+    FakeSupabase,
+    LatencyProfile,
+    fake_embedding,
+    install_http_redirect,
+)
+
+EMPRESA_ID = 1
+AGENT_ID = 10
+CAMPAIGN_ID = 100
+BENCH_PHONE = "+34600000000"
+
+# Paquetes del backend cuyos módulos importan `supabase` a nivel de módulo.
+_APP_PACKAGES = ("services", "utils", "agents", "tasks", "routers")
+# Se cargan antes de sustituir `supabase` en los módulos de la app: arrastran el
+# grafo de módulos que usan los escenarios (imports perezosos incluidos).
+_PRELOADED_MODULES = ("agents.entrypoint", "tasks.campaign_orchestrator", "utils.call_loader")
+
+KB_DOCUMENTS: tuple[tuple[str, str], ...] = (
+    ("Horario de atención", "Nuestro horario de atención al cliente es de lunes a viernes de 9 a 18 horas."),
+    ("Tarifas fibra", "La tarifa de fibra de 600 megas cuesta 30 euros al mes con permanencia de 12 meses."),
+    ("Instalación", "El técnico instalador acude en un plazo de 48 horas tras la contratación."),
+    ("Portabilidad", "La portabilidad del número móvil tarda entre 3 y 5 días laborables."),
+    ("Facturación", "Las facturas se emiten el día 1 de cada mes y se pueden descargar en el área de cliente."),
+    ("Averías", "Para averías llame al servicio técnico, disponible 24 horas todos los días."),
+    ("Baja del servicio", "La baja se tramita por teléfono y se hace efectiva al final del ciclo de facturación."),
+    ("Encuesta de satisfacción", "Valoramos del 1 al 10 la atención comercial, la instalación y la rapidez."),
+)
+
+KB_QUERIES: tuple[str, ...] = (
+    "¿cuál es el horario de atención?",
+    "cuánto cuesta la fibra de 600 megas",
+    "cuándo viene el técnico instalador",
+    "quiero hacer la portabilidad del móvil",
+    "dónde descargo las facturas",
+    "tengo una avería en la línea",
+    "cómo me doy de baja",
+    "valoración de la instalación del 1 al 10",
+)
+
+# Frases que no resuelve el Tier 0 (regex) y obligan a consultar el clasificador Groq.
+ROUTER_UTTERANCES: tuple[str, ...] = (
+    "la verdad es que preferiría comentarlo con alguien de la oficina",
+    "no sé, esto me lo tendría que explicar otra persona",
+    "vale, sigamos con las preguntas",
+    "me parece bien, un ocho para el comercial",
+    "oiga, ¿hay alguien más ahí que me pueda ayudar?",
+)
+
+TRANSCRIPT_TURNS: tuple[tuple[str, str], ...] = (
+    ("assistant", "Hola, le llamamos de Ausarta para una breve encuesta de satisfacción."),
+    ("user", "Sí, dígame."),
+    ("assistant", "Del 1 al 10, ¿cómo valora la atención del comercial?"),
+    ("user", "Un nueve, muy amable."),
+    ("assistant", "¿Y la instalación?"),
+    ("user", "Un ocho, vinieron rápido."),
+    ("assistant", "Muchas gracias. Hasta luego."),
+)
+
+
+def agent_config_payload() -> dict[str, Any]:
+    return {
+        "id": AGENT_ID,
+        "agent_id": AGENT_ID,
+        "empresa_id": EMPRESA_ID,
+        "name": "Agente Bench",
+        "agent_type": "ENCUESTA_NUMERICA",
+        "instructions": "Realiza una encuesta de satisfacción. Pregunta 1: atención comercial del 1 al 10.",
+        "greeting": "Hola, le llamamos de Ausarta para una breve encuesta sobre la instalación de fibra.",
+        "llm_model": "llama-3.3-70b-versatile",
+        "voice_id": "bench-voice",
+        "tts_model": "sonic-2",
+        "language": "es",
+        "stt_provider": "deepgram",
+        "speaking_speed": 1.0,
+        "contacto_phone": BENCH_PHONE,
+    }
+
+
+# ──────────────────────────────────────────────
+# RPCs simuladas
+# ──────────────────────────────────────────────
+
+
+def _rpc_search_knowledge_base(db: FakeSupabase, args: dict[str, Any]) -> list[dict[str, Any]]:
+    query = np.asarray(args.get("p_embedding") or [], dtype=np.float32)
+    threshold = float(args.get("p_threshold") or 0.0)
+    rows = []
+    for row in db.tables.get("knowledge_base", []):
+        if row.get("empresa_id") != args.get("p_empresa_id"):
+            continue
+        similarity = float(np.dot(row["_vec"], query))
+        if similarity >= threshold:
+            rows.append({
+                "id": row["id"],
+                "titulo": row["titulo"],
+                "contenido": row["contenido"],
+                "similarity": similarity,
+                "match_stats": row.get("match_stats"),
+            })
+    rows.sort(key=lambda r: r["similarity"], reverse=True)
+    return rows[: int(args.get("p_limit") or 5)]
+
+
+def _rpc_search_knowledge_base_keyword(db: FakeSupabase, args: dict[str, Any]) -> list[dict[str, Any]]:
+    terms = {t for t in str(args.get("p_query") or "").lower().split() if len(t) > 3}
+    rows = []
+    for row in db.tables.get("knowledge_base", []):
+        if row.get("empresa_id") != args.get("p_empresa_id"):
+            continue
+        text = f"{row['titulo']} {row['contenido']}".lower()
+        hits = sum(1 for t in terms if t in text)
+        if hits:
+            rows.append({
+                "id": row["id"],
+                "titulo": row["titulo"],
+                "contenido": row["contenido"],
+                "rank": hits / max(len(terms), 1),
+                "match_stats": row.get("match_stats"),
+            })
+    rows.sort(key=lambda r: r["rank"], reverse=True)
+    return rows[: int(args.get("p_limit") or 5)]
+
+
+def _rpc_claim_campaign_leads(db: FakeSupabase, args: dict[str, Any]) -> list[dict[str, Any]]:
+    claimed = []
+    for lead in db.tables.get("campaign_leads", []):
+        if len(claimed) >= int(args.get("p_limit") or 0):
+            break
+        if lead.get("campaign_id") == args.get("p_campaign_id") and lead.get("status") == "pending":
+            lead["status"] = "calling"
+            claimed.append(dict(lead))
+    return claimed
+
+
+def _rpc_link_campaign_lead_calls(db: FakeSupabase, args: dict[str, Any]) -> None:
+    links = {int(link["lead_id"]): link for link in args.get("p_links") or []}
+    for lead in db.tables.get("campaign_leads", []):
+        link = links.get(int(lead["id"]))
+        if link:
+            lead["call_id"] = link.get("call_id")
+    return None
+
+
+# ──────────────────────────────────────────────
+# Entorno
+# ──────────────────────────────────────────────
+
+
+@dataclass
+class BenchEnvironment:
+    """Arranca los dobles, los inyecta en los módulos del backend y siembra datos."""
+
+    latency: LatencyProfile
+    supabase: FakeSupabase = field(init=False)
+    providers: FakeProviderServer = field(init=False)
+    livekit: FakeLiveKitAPI = field(init=False)
+    arq: FakeArqPool = field(init=False)
+    _restore: list[Callable[[], None]] = field(default_factory=list, init=False)
+    _seq: itertools.count = field(default_factory=lambda: itertools.count(1), init=False)
+
+    def __post_init__(self) -> None:
+        self.supabase = FakeSupabase(self.latency)
+        self.providers = FakeProviderServer(self.latency)
+        self.livekit = FakeLiveKitAPI(self.latency)
+        self.arq = FakeArqPool()
+
+    def next_id(self) -> int:
+        return next(self._seq)
+
+    async def start(self) -> None:
+        import fakeredis
+
+        await self.providers.start()
+        self._restore.append(install_http_redirect(self.providers))
+
+        # Imports de la app después de fijar el entorno (ver bench.__main__).
+        import agents.config_fetcher as config_fetcher
+        import services.livekit_service as livekit_service
+        import services.queue_service as queue_service
+        import services.redis_service as redis_service
+
+        for module_name in _PRELOADED_MODULES:
+            importlib.import_module(module_name)
+
+        redis_service._redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        livekit_service.lkapi._instance = self.livekit
+        queue_service._arq_pool = self.arq
+        queue_service._last_pool_use = float("inf")
+        self._set_attr(config_fetcher, "BRIDGE_SERVER_URL_INTERNAL", f"{self.providers.base_url}/bridge")
+
+        for name, module in list(sys.modules.items()):
+            if module is None or name.split(".")[0] not in _APP_PACKAGES:
+                continue
+            if "supabase" in vars(module) and not isinstance(vars(module)["supabase"], type(sys)):
+                self._set_attr(module, "supabase", self.supabase)
+
+        self._seed()
+
+    def _set_attr(self, target: Any, name: str, value: Any) -> None:
+        previous = getattr(target, name)
+        setattr(target, name, value)
+        self._restore.append(lambda: setattr(target, name, previous))
+
+    async def stop(self) -> None:
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        from services.external_db_service import close_external_db_pools
+        from services.http_client import close_http_clients
+
+        await close_http_clients()
+        await close_external_db_pools()
+        for restore in reversed(self._restore):
+            restore()
+        self._restore.clear()
+        await self.providers.stop()
+
+    def _seed(self) -> None:
+        from services.rag_hybrid import chunk_match_stats
+
+        db = self.supabase
+        db.seed("empresas", [{
+            "id": EMPRESA_ID,
+            "nombre": "Empresa Bench",
+            "sip_outbound_trunk_id": "ST_bench",
+            "monthly_spend_limit_eur": None,
+        }])
+        agent_row = agent_config_payload()
+        agent_row.pop("agent_id")
+        db.seed("agent_config", [agent_row])
+        db.seed("knowledge_base", [
+            {
+                "empresa_id": EMPRESA_ID,
+                "agent_id": None,
+                "titulo": titulo,
+                "contenido": contenido,
+                "match_stats": chunk_match_stats(titulo, contenido),
+                "_vec": np.asarray(fake_embedding(f"{titulo} {contenido}"), dtype=np.float32),
+            }
+            for titulo, contenido in KB_DOCUMENTS
+        ])
+        db.seed("contactos", [{
+            "empresa_id": EMPRESA_ID,
+            "telefono": BENCH_PHONE,
+            "nombre": "Cliente Bench",
+            "notas": "Cliente con fibra desde 2024",
+            "datos_extra": {"llamadas": [{"fecha": "2026-01-10", "disposicion": "completada"}]},
+            "ultima_disposicion": "completada",
+        }])
+        db.register_rpc("search_knowledge_base", _rpc_search_knowledge_base)
+        db.register_rpc("search_knowledge_base_keyword", _rpc_search_knowledge_base_keyword)
+        db.register_rpc("claim_campaign_leads", _rpc_claim_campaign_leads)
+        db.register_rpc("link_campaign_lead_calls", _rpc_link_campaign_lead_calls)
+        self.providers.agent_configs["*"] = agent_config_payload()
+
+    def campaign(self, leads: int) -> dict[str, Any]:
+        """Campaña nueva con `leads` leads pendientes (cada iteración usa la suya)."""
+        camp_id = CAMPAIGN_ID * 1000 + self.next_id()
+        campaign = {
+            "id": camp_id,
+            "empresa_id": EMPRESA_ID,
+            "agent_id": AGENT_ID,
+            "name": f"Campaña bench {camp_id}",
+            "status": "running",
+            "call_timezone": "Europe/Madrid",
+            # "0" y no 0: el orquestador hace `or 9` sobre la hora de inicio.
+            "call_start_hour": "0",
+            "call_end_hour": 24,
+            "forbidden_weekdays": [7],
+        }
+        self.supabase.seed("campaigns", [campaign])
+        self.supabase.seed("campaign_leads", [
+            {
+                "campaign_id": camp_id,
+                "empresa_id": EMPRESA_ID,
+                "phone_number": f"+3460{camp_id % 10000:04d}{i:03d}",
+                "status": "pending",
+            }
+            for i in range(leads)
+        ])
+        return campaign
+
+
+# ──────────────────────────────────────────────
+# Escenarios
+# ──────────────────────────────────────────────
+
+Scenario = Callable[[BenchEnvironment, int], Awaitable[Any]]
+
+
+async def scenario_entrypoint_setup(env: BenchEnvironment, i: int) -> None:
+    """Arranque del job hasta `session.start` (config, contexto, plugins, CallSession)."""
+    await _run_entrypoint(env, extra_metadata={})
+
+
+async def scenario_entrypoint_setup_prefetched(env: BenchEnvironment, i: int) -> None:
+    """Como entrypoint_setup, con la config enriquecida embebida por el dialer."""
+    config = {
+        **agent_config_payload(),
+        "_kb_context": "[Tarifas]\nFibra 600Mb",
+        "_customer_context": "Cliente Bench",
+        "_context_prefetched": True,
+    }
+    await _run_entrypoint(env, extra_metadata={"agent_config": config})
+
+
+async def _run_entrypoint(env: BenchEnvironment, extra_metadata: dict[str, Any]) -> None:
+    from agents.call_session import CallSession
+    from agents.entrypoint import entrypoint
+    from livekit.agents import AgentSession
+
+    survey_id = 500_000 + env.next_id()
+    ctx = FakeJobContext(
+        room_name=f"llamada_ausarta_empresa_{EMPRESA_ID}_campana_{CAMPAIGN_ID}_encuesta_{survey_id}",
+        metadata={
+            "campana_id": CAMPAIGN_ID,
+            "survey_id": survey_id,
+            "empresa_id": EMPRESA_ID,
+            "telefono": BENCH_PHONE,
+            **extra_metadata,
+        },
+        latency=env.latency,
+    )
+    with (
+        patch.object(AgentSession, "start", _noop),
+        patch.object(CallSession, "start", _noop),
+        patch.object(CallSession, "cleanup", _noop),
+        patch.object(CallSession, "finalize", _noop),
+    ):
+        await entrypoint(ctx)
+
+
+async def scenario_enrich_agent_config(env: BenchEnvironment, i: int) -> None:
+    from utils.call_loader import enrich_agent_config_with_context
+
+    config = agent_config_payload()
+    config["greeting"] = KB_QUERIES[i % len(KB_QUERIES)]
+    await enrich_agent_config_with_context(
+        job_id=f"bench-{i}",
+        agent_config=config,
+        empresa_id_str=str(EMPRESA_ID),
+        meta_data={"telefono": BENCH_PHONE},
+    )
+    if not config["_kb_context"]:
+        raise RuntimeError("KB context vacío")
+
+
+async def scenario_search_knowledge(env: BenchEnvironment, i: int) -> None:
+    from services.embedding_service import search_knowledge
+
+    results = await search_knowledge(EMPRESA_ID, KB_QUERIES[i % len(KB_QUERIES)], limit=3, threshold=0.3)
+    if not results:
+        raise RuntimeError("search_knowledge sin resultados")
+
+
+async def scenario_semantic_router(env: BenchEnvironment, i: int) -> None:
+    from services.semantic_router_service import SemanticRouterService
+
+    result = await SemanticRouterService().classify(ROUTER_UTTERANCES[i % len(ROUTER_UTTERANCES)])
+    if result.tier != "tier1":
+        raise RuntimeError(f"clasificación sin Tier 1 (tier={result.tier})")
+
+
+async def scenario_campaign_dispatch(env: BenchEnvironment, i: int) -> None:
+    """Un lote completo: claim, límites, agentes, encuestas, salas, dispatch y SIP."""
+    from tasks.campaign_orchestrator import process_campaign_empresa
+
+    from services.campaign_locks import release_active_call
+
+    campaign = env.campaign(leads=5)
+    sip_before = env.livekit.sip_calls
+    await process_campaign_empresa({"redis": None}, campaign)
+    if env.livekit.sip_calls == sip_before:
+        raise RuntimeError("el lote no lanzó ninguna llamada SIP")
+    # Fin de las llamadas (lo haría el webhook room_finished): libera el cupo.
+    for row in env.supabase.tables.get("encuestas", []):
+        if row.get("campaign_id") == campaign["id"]:
+            await release_active_call(int(row["id"]))
+
+
+async def scenario_finalize_call(env: BenchEnvironment, i: int) -> None:
+    """Post-llamada: ira + disposición (Groq), billing y encolado de resultados."""
+    from agents.post_call_processor import finalize_call_session
+
+    jobs_before = len(env.arq.jobs)
+    await finalize_call_session(_fake_call_session(env, 700_000 + i))
+    if len(env.arq.jobs) == jobs_before:
+        raise RuntimeError("finalize no encoló resultados")
+
+
+async def _noop(*_: Any, **__: Any) -> None:
+    return None
+
+
+def _fake_call_session(env: BenchEnvironment, survey_id: int) -> Any:
+    from livekit.agents.metrics import UsageSummary
+
+    messages = [SimpleNamespace(role=role, content=[text]) for role, text in TRANSCRIPT_TURNS]
+    usage = UsageSummary(
+        llm_prompt_tokens=1800,
+        llm_completion_tokens=240,
+        tts_characters_count=420,
+        stt_audio_duration=65.0,
+    )
+    return SimpleNamespace(
+        job_id=f"bench-finalize-{survey_id}",
+        session=SimpleNamespace(chat_ctx=SimpleNamespace(messages=messages)),
+        agent_config=agent_config_payload(),
+        survey_id=str(survey_id),
+        lang_state={"active_lang": "es"},
+        language="es",
+        agent_instance=SimpleNamespace(data_saved=True, _detected_customer_name="Cliente Bench"),
+        transcript_snapshot={},
+        call_start_time=None,
+        room_name=f"llamada_ausarta_empresa_{EMPRESA_ID}_encuesta_{survey_id}",
+        usage_collector=SimpleNamespace(get_summary=lambda: usage),
+        _build_transcript_from_event_buffer=lambda: ([], ""),
+    )
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "entrypoint_setup": scenario_entrypoint_setup,
+    "entrypoint_setup_prefetched": scenario_entrypoint_setup_prefetched,
+    "enrich_agent_config": scenario_enrich_agent_config,
+    "search_knowledge": scenario_search_knowledge,
+    "semantic_router": scenario_semantic_router,
+    "campaign_dispatch": scenario_campaign_dispatch,
+    "finalize_call": scenario_finalize_call,
+}
@@ -62,6 +62,16 @@ class Settings(BaseSettings):
         validation_alias="RAG_RERANKER_MODEL",
     )
     rag_reranker_timeout_ms: int = Field(default=400, validation_alias="RAG_RERANKER_TIMEOUT_MS")
+    # Cross-encoder local (RAG_RERANKER=onnx): directorio con model.onnx + tokenizer.json
+    rag_cross_encoder_dir: str = Field(default="", validation_alias="RAG_CROSS_ENCODER_DIR")
+    rag_cross_encoder_max_length: int = Field(default=256, validation_alias="RAG_CROSS_ENCODER_MAX_LENGTH")
+    rag_cross_encoder_threads: int = Field(default=2, validation_alias="RAG_CROSS_ENCODER_THREADS")
+    # Índice vectorial en memoria por empresa (evita el RPC pgvector en llamada)
+    rag_ann_index_enabled: bool = Field(default=False, validation_alias="RAG_ANN_INDEX_ENABLED")
+    rag_ann_max_vectors: int = Field(default=20000, validation_alias="RAG_ANN_MAX_VECTORS")
+    rag_ann_max_tenants: int = Field(default=8, validation_alias="RAG_ANN_MAX_TENANTS")
+    # Segundos que una empresa por encima de RAG_ANN_MAX_VECTORS va directa al RPC sin reintentar la carga
+    rag_ann_oversize_ttl_seconds: int = Field(default=900, validation_alias="RAG_ANN_OVERSIZE_TTL_SECONDS")
 
     # Drip campaign
     drip_cooldown_min: int = Field(default=120, validation_alias="DRIP_COOLDOWN_MIN_SECONDS")
@@ -30,6 +30,8 @@ async def get_live_calls_metrics(current_user: CurrentUser = Depends(require_adm
     """
     from livekit import api
     from services.livekit_service import lkapi
+    from services.telephony_room_utils import resolve_room_call, room_call_started_at
+    from services.warm_room_pool import is_warm_room
 
     _ = current_user
     try:
@@ -39,7 +41,10 @@ async def get_live_calls_metrics(current_user: CurrentUser = Depends(require_adm
             name = r.name or ""
             if not name.startswith(LIVEKIT_ROOM_PREFIX):
                 continue
-            created_at = r.creation_time
+            # Las salas warm sin vincular son agentes en espera, no llamadas.
+            if is_warm_room(name) and not resolve_room_call(name, r.metadata)["encuesta_id"]:
+                continue
+            created_at = room_call_started_at(name, r.metadata, r.creation_time)
             rooms.append({
                 "sid": r.sid,
                 "name": name,
@@ -7,10 +7,12 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import shutil
+import tempfile
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from models.schemas import CampaignLeadModel, CampaignModel
 from routers.campaign_access import (
     load_campaign_or_404,
@@ -27,7 +29,12 @@ from services.campaign_crud_service import (
     update_campaign_record,
 )
 from services.campaign_details_service import fetch_campaign_details, fetch_result_transcription
-from services.campaign_export_service import build_campaign_results_csv
+from services.campaign_export_service import stream_campaign_results_csv
+from services.campaign_lead_import import (
+    LeadImportInProgressError,
+    get_lead_import_progress,
+    start_lead_import,
+)
 from services.campaign_simulate_service import simulate_campaign_dispatch
 from services.supabase_service import supabase
 
@@ -54,6 +61,8 @@ async def create_campaign(
 ):
     try:
         return await create_campaign_record(campaign, leads, current_user)
+    except HTTPException:
+        raise
     except Exception as err:
         logger.error("Error creando campaña: %s", err)
         return JSONResponse(status_code=500, content={"error": str(err)})
@@ -83,7 +92,7 @@ async def list_campaigns(
 ):
     try:
         scoped_empresa = _resolve_empresa(current_user, empresa_id)
-        return list_campaigns_for_user(scoped_empresa)
+        return await list_campaigns_for_user(scoped_empresa)
     except Exception as err:
         logger.error("Error listing campaigns: %s", err)
         return []
@@ -162,28 +171,74 @@ async def simulate_campaign(
 async def export_campaign_results(
     campaign_id: int,
     format: str = "csv",
+    gzip: bool = False,
     current_user: CurrentUser = Depends(get_current_user),
 ):
-    """Exporta resultados de la campaña (CSV)."""
+    """Exporta resultados de la campaña (CSV en streaming; ``gzip=true`` → .csv.gz)."""
     load_campaign_or_404(campaign_id, current_user)
     if format.lower() not in ("csv",):
         raise HTTPException(status_code=400, detail="format debe ser csv")
 
-    res = await asyncio.to_thread(
-        lambda: supabase.table("encuestas")
-        .select("id, telefono, fecha, status, seconds_used, comentarios, datos_extra, agent_results")
-        .eq("campaign_id", campaign_id)
-        .order("fecha", desc=True)
-        .execute()
-    )
-    csv_body = build_campaign_results_csv(res.data or [])
-    return PlainTextResponse(
-        content=csv_body,
-        media_type="text/csv",
-        headers={"Content-Disposition": f'attachment; filename="campaign_{campaign_id}_results.csv"'},
+    filename = f"campaign_{campaign_id}_results.csv" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_campaign_results_csv(campaign_id, gzip=gzip),
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
+@router.post("/campaigns/{campaign_id}/leads/import", status_code=202)
+async def import_campaign_leads_file(
+    campaign_id: int,
+    request: Request,
+    current_user: CurrentUser = Depends(require_admin),
+):
+    """
+    Importa leads en bloque: multipart (campo ``file``: CSV o XLSX) o cuerpo
+    JSON / NDJSON. El fichero se vuelca a disco y se procesa en segundo plano;
+    el progreso se consulta en ``GET .../leads/import/{job_id}``.
+    """
+    camp = load_campaign_or_404(campaign_id, current_user)
+    content_type = request.headers.get("content-type", "")
+    spool = tempfile.TemporaryFile()
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or not hasattr(upload, "file"):
+                raise HTTPException(status_code=400, detail="Falta el fichero (campo 'file')")
+            filename, file_type = upload.filename or "", upload.content_type or ""
+            await asyncio.to_thread(shutil.copyfileobj, upload.file, spool, 1024 * 1024)
+        else:
+            # Cuerpo crudo: text/csv como CSV, cualquier otro tipo como JSON / NDJSON
+            filename = "leads.csv" if "csv" in content_type.lower() else "leads.json"
+            file_type = content_type
+            async for chunk in request.stream():
+                await asyncio.to_thread(spool.write, chunk)
+        spool.seek(0)
+        job_id = await start_lead_import(campaign_id, camp.get("empresa_id"), spool, filename, file_type)
+    except LeadImportInProgressError as err:
+        raise HTTPException(status_code=409, detail=str(err)) from err
+    except BaseException:
+        spool.close()
+        raise
+    return {"job_id": job_id, "campaign_id": campaign_id, "status": "queued"}
+
+
+@router.get("/campaigns/{campaign_id}/leads/import/{job_id}")
+async def get_campaign_leads_import(
+    campaign_id: int,
+    job_id: str,
+    current_user: CurrentUser = Depends(require_admin),
+):
+    """Progreso de una importación de leads (contadores y estado)."""
+    load_campaign_or_404(campaign_id, current_user)
+    progress = await get_lead_import_progress(job_id)
+    if not progress or progress.get("campaign_id") != campaign_id:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return progress
+
+
 @router.post("/campaigns/{campaign_id}/start")
 async def start_campaign(campaign_id: int, current_user: CurrentUser = Depends(require_admin)):
     """Marca la campaña como 'active' para que el scheduler la procese."""
@@ -5,6 +5,9 @@ from services.supabase_service import supabase, get_ui_cache, sb_query
 from services.user_profiles_service import list_user_profiles_with_empresa
 from services.livekit_service import lkapi
 from services.auth import CurrentUser, get_current_user, require_admin
+from services.dashboard_stats_service import DashboardStatsFilters
+from services.dashboard_stats_service import get_dashboard_stats as get_cached_dashboard_stats
+from services.telephony_room_utils import resolve_room_call, room_call_started_at
 import os
 import asyncio
 import aiohttp
@@ -36,12 +39,15 @@ async def _assert_room_allowed(room_name: str, user: CurrentUser) -> None:
         return
     if not supabase:
         raise HTTPException(status_code=503, detail="Database not connected")
-    import re
-
-    encuesta_match = re.search(r"encuesta_(\d+)", room_name)
-    if not encuesta_match:
+    from services.warm_room_pool import bound_encuesta_id, is_warm_room
+
+    if is_warm_room(room_name):
+        # La encuesta de una sala warm solo está en su metadata (al vincularla).
+        encuesta_id = await bound_encuesta_id(room_name)
+    else:
+        encuesta_id = resolve_room_call(room_name)["encuesta_id"]
+    if not encuesta_id:
         raise HTTPException(status_code=403, detail="Sala no autorizada")
-    encuesta_id = int(encuesta_match.group(1))
     res = await sb_query(
         lambda eid=encuesta_id: supabase.table("encuestas")
         .select("empresa_id")
@@ -63,119 +69,17 @@ async def get_dashboard_stats(
 ):
     empresa_id = _resolve_empresa(current_user, empresa_id)
     if not supabase: return {"error": "Database not connected"}
-    
-    def fetch_total():
-        q = supabase.table("encuestas").select("id", count="exact")
-        if empresa_id: q = q.eq("empresa_id", empresa_id)
-        if agent_id: q = q.eq("agent_id", agent_id)
-        if campaign_id: q = q.eq("campaign_id", campaign_id)
-        if start_date: q = q.gte("fecha", start_date)
-        if end_date: q = q.lte("fecha", end_date)
-        r = q.execute()
-        return r.count if r.count is not None else 0
-
-    def fetch_completed():
-        q = supabase.table("encuestas").select("id", count="exact").eq("completada", 1)
-        if empresa_id: q = q.eq("empresa_id", empresa_id)
-        if agent_id: q = q.eq("agent_id", agent_id)
-        if campaign_id: q = q.eq("campaign_id", campaign_id)
-        if start_date: q = q.gte("fecha", start_date)
-        if end_date: q = q.lte("fecha", end_date)
-        r = q.execute()
-        return r.count if r.count is not None else 0
-
-    def fetch_pending():
-        if empresa_id:
-            camps_res = supabase.table("campaigns").select("id").eq("empresa_id", empresa_id).execute()
-            camp_ids = [c['id'] for c in camps_res.data]
-            if camp_ids:
-                q = supabase.table("campaign_leads").select("id", count="exact").eq("status", "pending").in_("campaign_id", camp_ids)
-                if start_date: q = q.gte("created_at", start_date)
-                if end_date: q = q.lte("created_at", end_date)
-                r = q.execute()
-                return r.count if r.count is not None else 0
-            return 0
-        q = supabase.table("campaign_leads").select("id", count="exact").eq("status", "pending")
-        if start_date: q = q.gte("created_at", start_date)
-        if end_date: q = q.lte("created_at", end_date)
-        r = q.execute()
-        return r.count if r.count is not None else 0
-
-    def fetch_scores():
-        q = supabase.table("encuestas").select("puntuacion_comercial, puntuacion_instalador, puntuacion_rapidez, datos_extra")
-        if empresa_id: q = q.eq("empresa_id", empresa_id)
-        if agent_id: q = q.eq("agent_id", agent_id)
-        if campaign_id: q = q.eq("campaign_id", campaign_id)
-        if start_date: q = q.gte("fecha", start_date)
-        if end_date: q = q.lte("fecha", end_date)
-        return q.execute().data
-
-    def fetch_status_breakdown():
-        q = supabase.table("encuestas").select("status")
-        if empresa_id: q = q.eq("empresa_id", empresa_id)
-        if agent_id: q = q.eq("agent_id", agent_id)
-        if campaign_id: q = q.eq("campaign_id", campaign_id)
-        if start_date: q = q.gte("fecha", start_date)
-        if end_date: q = q.lte("fecha", end_date)
-        r = q.execute()
-        if not r.data:
-            return {}
-        from collections import Counter
-        statuses = [row.get("status") or "unknown" for row in r.data]
-        return dict(Counter(statuses))
-
-    def check_question_based():
-        try:
-            target_agent_id = agent_id
-            if not target_agent_id and campaign_id:
-                camp_res = supabase.table("campaigns").select("agent_id").eq("id", campaign_id).limit(1).execute()
-                if camp_res.data and len(camp_res.data) > 0: target_agent_id = camp_res.data[0].get("agent_id")
-            if target_agent_id:
-                agent_res = supabase.table("agent_config").select("instructions").eq("id", target_agent_id).limit(1).execute()
-                if agent_res.data and len(agent_res.data) > 0:
-                    inst = agent_res.data[0].get("instructions", "").lower()
-                    has_preguntas = "pregunta 1" in inst or "pregunta 2" in inst or "pregunta:" in inst
-                    is_numeric = "1 al 10" in inst or "del uno al diez" in inst or "numérica" in inst or "puntuación" in inst
-                    return has_preguntas and not is_numeric
-        except Exception as e:
-            logger.warning(f"⚠️ [dashboard] check_question_based falló: {e}")
-        return False
 
     try:
-        loop = asyncio.get_event_loop()
-        results = await asyncio.gather(
-            loop.run_in_executor(executor, fetch_total),
-            loop.run_in_executor(executor, fetch_completed),
-            loop.run_in_executor(executor, fetch_pending),
-            loop.run_in_executor(executor, fetch_scores),
-            loop.run_in_executor(executor, fetch_status_breakdown),
-            loop.run_in_executor(executor, check_question_based)
+        return await get_cached_dashboard_stats(
+            DashboardStatsFilters(
+                empresa_id=empresa_id,
+                agent_id=agent_id,
+                campaign_id=campaign_id,
+                start_date=start_date,
+                end_date=end_date,
+            )
         )
-        total_calls, completed_calls, pending_calls, scores_data, status_breakdown, is_question_based = results
-
-        avg_comercial = 0.0; avg_instalador = 0.0; avg_rapidez = 0.0; avg_overall = 0.0
-        if scores_data:
-            vals_com = [r['puntuacion_comercial'] for r in scores_data if r.get('puntuacion_comercial') is not None]
-            vals_ins = [r['puntuacion_instalador'] for r in scores_data if r.get('puntuacion_instalador') is not None]
-            vals_rap = [r['puntuacion_rapidez'] for r in scores_data if r.get('puntuacion_rapidez') is not None]
-            if vals_com: avg_comercial = sum(vals_com) / len(vals_com)
-            if vals_ins: avg_instalador = sum(vals_ins) / len(vals_ins)
-            if vals_rap: avg_rapidez = sum(vals_rap) / len(vals_rap)
-            all_vals = vals_com + vals_ins + vals_rap
-            if all_vals:
-                avg_overall = sum(all_vals) / len(all_vals)
-
-        return {
-            "total_calls": total_calls, "completed_calls": completed_calls, "pending_calls": pending_calls,
-            "is_question_based": is_question_based,
-            "status_breakdown": status_breakdown or {},
-            "avg_scores": {
-                "comercial": round(float(avg_comercial), 1),
-                "instalador": round(float(avg_instalador), 1),
-                "rapidez": round(float(avg_rapidez), 1),
-                "overall": round(float(avg_overall), 1)
-            }
-        }
     except Exception as e:
         logger.error(f"Error stats: {e}")
         return {"total_calls": 0, "completed_calls": 0, "pending_calls": 0, "avg_scores": {}}
@@ -581,30 +485,27 @@ async def get_live_sessions(current_user: CurrentUser = Depends(get_current_user
         return []
     try:
         from livekit import api
-        import re
+        from services.warm_room_pool import is_warm_room
         rooms_res = await lkapi.room.list_rooms(api.ListRoomsRequest())
         sessions = []
         now_ts = int(time.time())
         for r in rooms_res.rooms:
-            # Extraer metadata del nombre de sala
+            # Extraer metadata del nombre de sala (salas warm: de su metadata)
             name = r.name or ""
-            encuesta_match = re.search(r"encuesta_(\d+)", name)
-            empresa_match = re.search(r"empresa_(\d+)", name)
-            campana_match = re.search(r"campana_(\d+)", name)
+            ids = resolve_room_call(name, r.metadata)
+            if is_warm_room(name) and not ids["encuesta_id"]:
+                continue
 
-            duration_secs = max(0, now_ts - r.creation_time) if r.creation_time else 0
+            started_at = room_call_started_at(name, r.metadata, r.creation_time)
+            duration_secs = max(0, now_ts - started_at) if started_at else 0
 
             session_data = {
                 "sid": r.sid,
                 "name": name,
                 "num_participants": r.num_participants,
-                "created_at": r.creation_time,
+                "created_at": started_at,
                 "duration_seconds": duration_secs,
-                "metadata": {
-                    "encuesta_id": int(encuesta_match.group(1)) if encuesta_match else None,
-                    "empresa_id": int(empresa_match.group(1)) if empresa_match else None,
-                    "campaign_id": int(campana_match.group(1)) if campana_match else None,
-                },
+                "metadata": ids,
             }
             if current_user.role != "superadmin" and session_data["metadata"]["empresa_id"] != current_user.empresa_id:
                 continue
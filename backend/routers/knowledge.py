@@ -3,7 +3,7 @@ knowledge.py — Base de Conocimiento RAG por empresa.
 
 Endpoints:
   GET    /api/knowledge/           lista paginada de documentos
-  POST   /api/knowledge/upload     sube texto/PDF, chunking + embeddings
+  POST   /api/knowledge/upload     sube texto/PDF, chunking + embeddings (incremental por documento)
   DELETE /api/knowledge/{doc_id}   elimina un documento y sus chunks
   GET    /api/knowledge/search     búsqueda semántica de prueba
   GET    /api/knowledge/external   config BD externa
@@ -12,12 +12,10 @@ Endpoints:
 from __future__ import annotations
 
 import asyncio
-import csv
-import io
-import json
+import itertools
 import logging
 import re
-from typing import Any
+from typing import Any, BinaryIO, Iterable, Iterator
 
 import aiohttp
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
@@ -25,10 +23,14 @@ from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File,
 from services.supabase_service import supabase, sb_query
 from utils.url_safety import is_safe_external_url_async
 from services.auth import CurrentUser, require_admin, get_current_user
-from services.embedding_service import get_embedding, search_knowledge, _split_into_chunks
+from services.embedding_service import iter_text_chunks, search_knowledge, _split_into_chunks
+from services.knowledge_index import publish_knowledge_change
+from services.external_db_service import invalidate_external_db_config
 from services.crypto_service import encrypt_data, decrypt_data
-from services.document_parser import parse_services_excel, stringify_json_document
-from services.chunk_builder import chunks_to_kb_rows, parse_jsonl_bytes
+from services.document_parser import iter_document_text, iter_services_excel
+from services.chunk_builder import iter_jsonl_chunks, iter_kb_rows
+from services.knowledge_ingest import EmptyDocumentError, sync_document_chunks
+from services.rag_hybrid import chunk_match_stats
 
 logger = logging.getLogger("api-backend")
 
@@ -52,6 +54,51 @@ def _resolve_empresa(user: CurrentUser, empresa_id_param: int | None) -> int:
     return int(user.empresa_id or 0)
 
 
+def _text_chunks_to_kb_rows(
+    chunks: Iterable[str], eid: int, titulo: str, source_type: str, agent_id: int | None
+) -> Iterator[dict]:
+    for i, chunk in enumerate(chunks):
+        row: dict = {
+            "empresa_id": eid,
+            "titulo": titulo,
+            "contenido": chunk,
+            "chunk_index": i,
+            "source_type": source_type,
+            "match_stats": chunk_match_stats(titulo, chunk),
+        }
+        if agent_id is not None:
+            row["agent_id"] = int(agent_id)
+        yield row
+
+
+def _iter_semantic_chunks(
+    source: BinaryIO, ext: str, eid: int, agent_id: int | None, filename: str
+) -> Iterator[dict[str, Any]]:
+    """Chunks semánticos (Excel de servicios o JSONL) leídos fila a fila."""
+    source.seek(0)
+    if ext == "jsonl":
+        for chunk in iter_jsonl_chunks(source, empresa_id=eid):
+            if chunk.get("empresa_id") is None:
+                chunk["empresa_id"] = eid
+            if agent_id is not None and chunk.get("agent_id") is None:
+                chunk["agent_id"] = int(agent_id)
+            yield chunk
+        return
+    yield from iter_services_excel(source, eid, agent_id=agent_id, fuente=filename or "services_excel")
+
+
+def _peek(items: Iterator[Any]) -> tuple[Any, Iterator[Any]]:
+    """Primer elemento (None si no hay) y el iterador con el resto."""
+    return next(items, None), items
+
+
+def _collect_preview(chunks: Iterable[dict], preview: list[dict], limit: int = 10) -> Iterator[dict]:
+    for chunk in chunks:
+        if len(preview) < limit:
+            preview.append(chunk)
+        yield chunk
+
+
 def _apply_agent_scope(query, agent_id: int | None):
     """NULL agent_id = documentos compartidos de la empresa."""
     if agent_id is not None:
@@ -185,7 +232,9 @@ async def upload_knowledge(
 ):
     """
     Sube un documento (PDF o texto), lo divide en chunks de 800 tokens
-    con 100 de solapamiento, genera embeddings y los inserta en knowledge_base.
+    con 100 de solapamiento y lo sincroniza con knowledge_base: si el documento
+    ya existía solo se embeben los chunks nuevos o modificados y se borran los
+    que desaparecen (ver services/knowledge_ingest).
     """
     if not supabase:
         raise HTTPException(status_code=503, detail="Sin conexión a la base de datos")
@@ -194,101 +243,65 @@ async def upload_knowledge(
     if not eid:
         raise HTTPException(status_code=400, detail="empresa_id requerido")
 
-    # Leer contenido del archivo
-    content_bytes = await file.read()
     filename = file.filename or ""
     content_type = (file.content_type or "").lower()
-
     ext = (filename or "").lower().rsplit(".", 1)[-1] if "." in (filename or "") else ""
-    parsed_documents: list[dict[str, Any]] = []
-    semantic_chunks: list[dict[str, Any]] = []
 
-    if ext in {"xlsx", "xls"}:
-        parsed_documents = await parse_services_excel(
-            content_bytes, eid, agent_id=agent_id, fuente=filename or "services_excel"
-        )
-        semantic_chunks = parsed_documents
-    elif ext == "jsonl":
+    # Starlette vuelca a disco (SpooledTemporaryFile) los ficheros > 1 MB: se
+    # parsea desde ahí en streaming y se sincroniza por lotes, sin cargarlo entero.
+    source = file.file
+    preview: list[dict[str, Any]] = []
+    kb_rows: Iterator[dict] | None = None
+    modo = "text_split"
+
+    if ext in {"xlsx", "xls", "jsonl"}:
         try:
-            semantic_chunks = parse_jsonl_bytes(content_bytes, empresa_id=eid)
+            first, semantic_chunks = await asyncio.to_thread(
+                _peek, _iter_semantic_chunks(source, ext, eid, agent_id, filename)
+            )
         except ValueError as jsonl_err:
             raise HTTPException(status_code=400, detail=str(jsonl_err)) from jsonl_err
-        for chunk in semantic_chunks:
-            if agent_id is not None and chunk.get("agent_id") is None:
-                chunk["agent_id"] = int(agent_id)
-
-    rows_to_insert: list[dict] = []
-
-    if semantic_chunks:
-        # 1 producto/tarifa = 1 chunk (sin re-partir por tokens)
-        kb_rows = chunks_to_kb_rows(semantic_chunks, default_titulo=titulo)
-        if not kb_rows:
-            raise HTTPException(status_code=400, detail="No se generaron chunks válidos del archivo")
-        rows_to_insert = [{**r, "embedding": None} for r in kb_rows]
-    else:
-        texto = _extract_text_from_uploaded_file(filename, content_type, content_bytes).strip()
-        if not texto:
-            raise HTTPException(status_code=400, detail="El archivo no contiene texto extraíble")
-
-        text_chunks = _split_into_chunks(texto, max_tokens=800, overlap=100)
-        if not text_chunks:
-            raise HTTPException(status_code=400, detail="No se pudieron generar chunks del texto")
-
-        for i, chunk in enumerate(text_chunks):
-            row: dict = {
-                "empresa_id": eid,
-                "titulo": titulo,
-                "contenido": chunk,
-                "chunk_index": i,
-                "embedding": None,
-                "source_type": source_type,
-            }
-            if agent_id is not None:
-                row["agent_id"] = int(agent_id)
-            rows_to_insert.append(row)
-
-    # Generar embeddings en paralelo (lotes de 5)
-    BATCH = 5
-    for i in range(0, len(rows_to_insert), BATCH):
-        batch = rows_to_insert[i : i + BATCH]
-        embeddings = await asyncio.gather(
-            *[get_embedding(r["contenido"]) for r in batch], return_exceptions=True
+        if first is not None:
+            # 1 producto/tarifa = 1 chunk (sin re-partir por tokens)
+            modo = "semantic"
+            kb_rows = iter_kb_rows(
+                _collect_preview(itertools.chain([first], semantic_chunks), preview),
+                default_titulo=titulo,
+            )
+
+    if kb_rows is None:
+        text_chunks = iter_text_chunks(
+            iter_document_text(source, filename, content_type), max_tokens=800, overlap=100
         )
-        for j, emb in enumerate(embeddings):
-            if isinstance(emb, Exception) or emb is None:
-                logger.warning("[knowledge] Embedding fallido chunk %d, se inserta sin vector", i + j)
-                rows_to_insert[i + j]["embedding"] = None
-            else:
-                rows_to_insert[i + j]["embedding"] = emb
-
-    # Insertar en Supabase
+        kb_rows = _text_chunks_to_kb_rows(text_chunks, eid, titulo, source_type, agent_id)
+
+    # Solo se embeben e insertan los chunks nuevos o modificados del documento
     try:
-        res = await sb_query(
-            lambda rows=rows_to_insert: supabase.table("knowledge_base").insert(rows).execute()
+        stats = await sync_document_chunks(eid, agent_id, titulo, kb_rows)
+    except EmptyDocumentError:
+        detail = (
+            "No se generaron chunks válidos del archivo"
+            if modo == "semantic"
+            else "El archivo no contiene texto extraíble"
         )
+        raise HTTPException(status_code=400, detail=detail)
+    except ValueError as parse_err:
+        raise HTTPException(status_code=400, detail=str(parse_err)) from parse_err
     except Exception as ins_err:
-        logger.error("[knowledge] Error insertando chunks: %s", ins_err)
+        logger.error("[knowledge] Error guardando chunks: %s", ins_err)
         raise HTTPException(status_code=500, detail=f"Error al guardar en la base de datos: {ins_err}")
 
-    inserted = len(res.data) if res.data else 0
-    logger.info(
-        "[knowledge] Documento '%s' indexado: %d chunks, %d con embedding para empresa %d",
-        titulo, len(rows_to_insert), sum(1 for r in rows_to_insert if r["embedding"]), eid,
-    )
-    preview_source = semantic_chunks or parsed_documents
     return {
         "status": "ok",
         "titulo": titulo,
-        "chunks_total": len(rows_to_insert),
-        "chunks_con_embedding": sum(1 for r in rows_to_insert if r["embedding"]),
-        "insertados": inserted,
-        "modo": "semantic" if semantic_chunks else "text_split",
+        **stats,
+        "modo": modo,
         "preview": [
             {
                 "titulo": doc.get("titulo"),
                 "contenido_preview": str(doc.get("contenido") or "")[:240],
             }
-            for doc in preview_source[:10]
+            for doc in preview
         ],
     }
 
@@ -325,124 +338,10 @@ async def upload_knowledge_url(
     if not chunks:
         raise HTTPException(status_code=400, detail="No se pudieron generar chunks del texto")
 
-    rows_to_insert: list[dict] = []
-    BATCH = 5
-    for i in range(0, len(chunks), BATCH):
-        batch = chunks[i:i + BATCH]
-        embeddings = await asyncio.gather(
-            *[get_embedding(c) for c in batch], return_exceptions=True
-        )
-        for j, (chunk, emb) in enumerate(zip(batch, embeddings)):
-            if isinstance(emb, Exception) or emb is None:
-                emb = None
-            row: dict = {
-                "empresa_id": eid,
-                "titulo": titulo,
-                "contenido": chunk,
-                "chunk_index": i + j,
-                "embedding": emb,
-                "source_type": source_type or "web",
-            }
-            if agent_id is not None:
-                row["agent_id"] = int(agent_id)
-            rows_to_insert.append(row)
-
-    res = await sb_query(
-        lambda rows=rows_to_insert: supabase.table("knowledge_base").insert(rows).execute()
+    stats = await sync_document_chunks(
+        eid, agent_id, titulo, _text_chunks_to_kb_rows(chunks, eid, titulo, source_type or "web", agent_id)
     )
-    return {
-        "status": "ok",
-        "titulo": titulo,
-        "chunks_total": len(chunks),
-        "chunks_con_embedding": sum(1 for r in rows_to_insert if r["embedding"]),
-        "insertados": len(res.data) if res.data else 0,
-    }
-
-
-def _extract_text_from_pdf(content: bytes) -> str:
-    """Extrae texto de un PDF. Intenta pypdf, luego pymupdf como fallback."""
-    try:
-        import pypdf  # type: ignore
-        import io
-        reader = pypdf.PdfReader(io.BytesIO(content))
-        pages = [page.extract_text() or "" for page in reader.pages]
-        return "\n".join(pages)
-    except ImportError:
-        pass
-
-    try:
-        import fitz  # type: ignore (PyMuPDF)
-        doc = fitz.open(stream=content, filetype="pdf")
-        pages = [page.get_text() for page in doc]
-        return "\n".join(pages)
-    except ImportError:
-        pass
-
-    logger.warning("[knowledge] No hay librería PDF disponible (pypdf / PyMuPDF). Instala una de ellas.")
-    return ""
-
-
-def _extract_text_from_excel(content: bytes) -> str:
-    """Extrae texto de Excel (.xlsx/.xls) como líneas tabuladas por fila."""
-    try:
-        from openpyxl import load_workbook  # type: ignore
-    except ImportError:
-        logger.warning("[knowledge] openpyxl no instalado: no se puede procesar Excel")
-        return ""
-
-    try:
-        wb = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
-        lines: list[str] = []
-        for sheet in wb.worksheets:
-            lines.append(f"### Hoja: {sheet.title}")
-            for row in sheet.iter_rows(values_only=True):
-                row_vals = [str(c).strip() for c in row if c is not None and str(c).strip()]
-                if row_vals:
-                    lines.append(" | ".join(row_vals))
-        return "\n".join(lines)
-    except Exception as exc:
-        logger.warning("[knowledge] Error leyendo Excel: %s", exc)
-        return ""
-
-
-def _extract_text_from_uploaded_file(filename: str, content_type: str, content_bytes: bytes) -> str:
-    ext = (filename or "").lower().rsplit(".", 1)[-1] if "." in (filename or "") else ""
-    is_pdf = "pdf" in content_type or ext == "pdf"
-    is_excel = ext in {"xlsx", "xls"} or "spreadsheet" in content_type or "excel" in content_type
-    is_csv = ext == "csv" or "csv" in content_type
-    is_json = ext == "json" or "json" in content_type
-    is_docx = ext == "docx" or "word" in content_type
-
-    if is_pdf:
-        return _extract_text_from_pdf(content_bytes)
-    if is_excel:
-        return _extract_text_from_excel(content_bytes)
-    if is_docx:
-        try:
-            from docx import Document  # type: ignore
-
-            doc = Document(io.BytesIO(content_bytes))
-            return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
-        except Exception:
-            return ""
-    if is_csv:
-        try:
-            decoded = content_bytes.decode("utf-8", errors="replace")
-            rows = list(csv.reader(io.StringIO(decoded)))
-            return "\n".join(" | ".join(cell.strip() for cell in row if cell and cell.strip()) for row in rows)
-        except Exception:
-            return ""
-    if is_json:
-        try:
-            parsed = json.loads(content_bytes.decode("utf-8", errors="replace"))
-            return stringify_json_document(parsed)
-        except Exception:
-            return content_bytes.decode("utf-8", errors="replace")
-
-    try:
-        return content_bytes.decode("utf-8", errors="replace")
-    except Exception:
-        return ""
+    return {"status": "ok", "titulo": titulo, **stats}
 
 
 async def _extract_text_from_url(url: str) -> str:
@@ -478,7 +377,7 @@ async def delete_knowledge_by_title(
     agent_id: int | None = Query(None),
     current_user: CurrentUser = Depends(require_admin),
 ):
-    """Elimina todos los chunks de un documento por título."""
+    """Elimina todos los chunks de un documento (por document_key o, en filas antiguas, por título)."""
     if not supabase:
         raise HTTPException(status_code=503, detail="Sin conexión a la base de datos")
 
@@ -489,15 +388,19 @@ async def delete_knowledge_by_title(
     from urllib.parse import unquote
     titulo = unquote(titulo_encoded)
 
-    await sb_query(
-        lambda eid=eid, aid=agent_id, t=titulo: _apply_agent_scope(
-            supabase.table("knowledge_base")
-            .delete()
-            .eq("empresa_id", eid)
-            .eq("titulo", t),
-            aid,
-        ).execute()
-    )
+    deleted_ids: list[int] = []
+    for column in ("document_key", "titulo"):
+        res = await sb_query(
+            lambda eid=eid, aid=agent_id, t=titulo, col=column: _apply_agent_scope(
+                supabase.table("knowledge_base")
+                .delete()
+                .eq("empresa_id", eid)
+                .eq(col, t),
+                aid,
+            ).execute()
+        )
+        deleted_ids.extend(r["id"] for r in res.data or [] if r.get("id"))
+    await publish_knowledge_change(eid, deleted_ids=deleted_ids, reload=not deleted_ids)
     return
 
 
@@ -599,4 +502,5 @@ async def save_external_db_config(
         .upsert(d, on_conflict="empresa_id")
         .execute()
     )
+    await invalidate_external_db_config(eid)
     return {"status": "ok", "config": res.data[0] if res.data else {}}
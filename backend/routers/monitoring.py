@@ -6,23 +6,32 @@ FIX H: Sustituye el polling HTTP cada 8-15s del frontend por un Server-Sent Even
 Esto reduce la latencia perceptible de 8-15s a 2s sin aumentar carga en el servidor
 (1 conexión persistente vs peticiones repetidas).
 
+Cada stream (métricas globales, llamada individual) tiene un único productor
+compartido por todos los clientes (services/sse_fanout.py): el snapshot se
+calcula una vez por intervalo, se filtra por empresa al entregarlo y tras el
+primer evento completo solo se envían las claves que cambian (``event: patch``).
+La vista de llamada sigue el stream de eventos que publica el agente
+(services/call_events.py) en lugar de releer encuestas en cada intervalo.
+
 Protegido con Bearer JWT (require_admin).
 """
 
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
 import os
 import time
-from typing import AsyncGenerator
+from datetime import datetime, timezone
+from typing import AsyncGenerator, AsyncIterator
 
 from fastapi import APIRouter, Depends, Query, HTTPException
 from fastapi.responses import StreamingResponse
 
 from services.auth import CurrentUser, require_admin, _get_user_from_supabase_jwt
 from services.profile_cache import get_user_profile_cached
+from services.call_events import read_call_history, watch_call_events
+from services.sse_fanout import subscribe, subscribe_source
 
 logger = logging.getLogger("api-backend")
 
@@ -50,25 +59,25 @@ async def _build_metrics_payload() -> dict:
     try:
         if lkapi:
             from livekit import api as lk_api
+            from services.telephony_room_utils import resolve_room_call, room_call_started_at
+            from services.warm_room_pool import is_warm_room
+
             rooms_res = await lkapi.room.list_rooms(lk_api.ListRoomsRequest())
-            import re
             now_ts = int(time.time())
             for r in rooms_res.rooms:
                 name = r.name or ""
-                enc_m = re.search(r"encuesta_(\d+)", name)
-                emp_m = re.search(r"empresa_(\d+)", name)
-                cam_m = re.search(r"campana_(\d+)", name)
+                ids = resolve_room_call(name, r.metadata)
+                # Sala warm sin vincular: agente esperando lead, no es una llamada.
+                if is_warm_room(name) and not ids["encuesta_id"]:
+                    continue
+                started_at = room_call_started_at(name, r.metadata, r.creation_time)
                 rooms_data.append({
                     "sid": r.sid,
                     "name": name,
                     "num_participants": r.num_participants,
-                    "created_at": r.creation_time,
-                    "duration_seconds": max(0, now_ts - r.creation_time) if r.creation_time else 0,
-                    "metadata": {
-                        "encuesta_id": int(enc_m.group(1)) if enc_m else None,
-                        "empresa_id": int(emp_m.group(1)) if emp_m else None,
-                        "campaign_id": int(cam_m.group(1)) if cam_m else None,
-                    },
+                    "created_at": started_at,
+                    "duration_seconds": max(0, now_ts - started_at) if started_at else 0,
+                    "metadata": ids,
                 })
             total_rooms = len(rooms_data)
     except Exception as lk_err:
@@ -106,34 +115,38 @@ async def _build_metrics_payload() -> dict:
     }
 
 
+def _metrics_view(user: CurrentUser):
+    """Vista del snapshot de métricas para el usuario (admins: solo su empresa)."""
+    if user.role == "superadmin":
+        return None, "superadmin"
+
+    def _view(payload: dict) -> dict:
+        rooms = [
+            r for r in payload["live_calls"]["rooms"]
+            if r["metadata"]["empresa_id"] == user.empresa_id
+        ]
+        return {**payload, "live_calls": {"total": len(rooms), "rooms": rooms}}
+
+    return _view, ("empresa", user.empresa_id)
+
+
 async def _event_generator(user: CurrentUser) -> AsyncGenerator[str, None]:
     """
-    Generador async que emite eventos SSE mientras el cliente esté conectado.
-    Emite cada _SSE_INTERVAL segundos.
-    Emite keepalive comment (": keep-alive\n\n") para mantener la conexión.
-    """
-    last_keepalive = time.monotonic()
-    while True:
-        try:
-            payload = await _build_metrics_payload()
-            data = json.dumps(payload, ensure_ascii=False)
-            yield f"data: {data}\n\n"
-        except asyncio.CancelledError:
-            logger.debug("[SSE] Cliente desconectado (%s)", user.user_id)
-            return
-        except Exception as err:
-            logger.warning("[SSE] Error construyendo payload: %s", err)
-            yield f"data: {json.dumps({'error': str(err)})}\n\n"
-
-        now = time.monotonic()
-        if now - last_keepalive >= _SSE_KEEPALIVE_INTERVAL:
-            yield ": keep-alive\n\n"
-            last_keepalive = now
+    Eventos SSE de métricas para un cliente conectado.
 
-        try:
-            await asyncio.sleep(_SSE_INTERVAL)
-        except asyncio.CancelledError:
-            return
+    El snapshot lo construye un único productor compartido (cada
+    _SSE_INTERVAL segundos); aquí solo se filtra por empresa y se envían
+    los cambios respecto al último evento del cliente.
+    """
+    view, view_key = _metrics_view(user)
+    try:
+        async for event in subscribe(
+            "metrics", _build_metrics_payload, _SSE_INTERVAL,
+            view=view, view_key=view_key, keepalive=_SSE_KEEPALIVE_INTERVAL,
+        ):
+            yield event
+    finally:
+        logger.debug("[SSE] Cliente desconectado (%s)", user.user_id)
 
 
 async def _resolve_sse_user(token: str) -> CurrentUser:
@@ -172,6 +185,7 @@ async def _build_call_payload(room_name: str) -> dict:
     Extrae transcript, contacto y extensiones desde Supabase + LiveKit.
     """
     from services.supabase_service import supabase, sb_query
+    from services.telephony_room_utils import resolve_room_call, room_call_started_at
     import re as _re
 
     status = "active"
@@ -181,6 +195,7 @@ async def _build_call_payload(room_name: str) -> dict:
     transfer_briefing: str | None = None
     extensions_available: list[dict] = []
     empresa_id: int | None = None
+    room_metadata: object = None
 
     # ── Duración y status de la sala (LiveKit) ──────────────────────────────
     try:
@@ -190,16 +205,20 @@ async def _build_call_payload(room_name: str) -> dict:
             rooms_res = await lkapi.room.list_rooms(lk_api.ListRoomsRequest(names=[room_name]))
             if rooms_res.rooms:
                 r = rooms_res.rooms[0]
+                room_metadata = r.metadata
                 now_ts = int(time.time())
-                duration_seconds = max(0, now_ts - r.creation_time) if r.creation_time else 0
+                started_at = room_call_started_at(room_name, r.metadata, r.creation_time)
+                duration_seconds = max(0, now_ts - started_at) if started_at else 0
     except Exception:
         pass
 
+    # Salas warm: encuesta y empresa vienen en la metadata, no en el nombre.
+    room_ids = resolve_room_call(room_name, room_metadata)
+
     # ── Datos de encuesta (Supabase) ─────────────────────────────────────────
     if supabase:
         try:
-            enc_m = _re.search(r"encuesta_(\d+)", room_name)
-            enc_id = int(enc_m.group(1)) if enc_m else None
+            enc_id = room_ids["encuesta_id"]
 
             if enc_id:
                 enc_res = await sb_query(
@@ -243,8 +262,7 @@ async def _build_call_payload(room_name: str) -> dict:
 
             # ── Contacto ─────────────────────────────────────────────────────
             if empresa_id:
-                emp_m = _re.search(r"empresa_(\d+)", room_name)
-                eid_room = int(emp_m.group(1)) if emp_m else empresa_id
+                eid_room = room_ids["empresa_id"] or empresa_id
 
                 phone_patterns = _re.findall(r"\+?[\d]{9,15}", room_name)
                 if not phone_patterns:
@@ -288,6 +306,7 @@ async def _build_call_payload(room_name: str) -> dict:
 
     return {
         "room_name": room_name,
+        "empresa_id": empresa_id if empresa_id is not None else room_ids["empresa_id"],
         "status": status,
         "duration_seconds": duration_seconds,
         "transcript": transcript,
@@ -297,29 +316,113 @@ async def _build_call_payload(room_name: str) -> dict:
     }
 
 
-async def _call_event_generator(room_name: str, user: CurrentUser) -> AsyncGenerator[str, None]:
-    """Generador SSE para una llamada individual. Emite cada 1.5 s."""
-    last_keepalive = time.monotonic()
-    while True:
-        try:
-            payload = await _build_call_payload(room_name)
-            data = json.dumps(payload, ensure_ascii=False)
-            yield f"data: {data}\n\n"
-        except asyncio.CancelledError:
-            return
-        except Exception as err:
-            logger.warning("[SSE call] Error construyendo payload: %s", err)
-            yield f"data: {json.dumps({'error': str(err)})}\n\n"
-
-        now = time.monotonic()
-        if now - last_keepalive >= _SSE_KEEPALIVE_INTERVAL:
-            yield ": keep-alive\n\n"
-            last_keepalive = now
+def _call_view(user: CurrentUser):
+    """Vista del snapshot de una llamada: sin el empresa_id interno y solo para su empresa."""
+    def _view(payload: dict) -> dict:
+        data = dict(payload)
+        empresa_id = data.pop("empresa_id", None)
+        if user.role != "superadmin" and empresa_id is not None and empresa_id != user.empresa_id:
+            return {"error": "Sin acceso a esta llamada"}
+        return data
 
-        try:
+    return _view, ("superadmin" if user.role == "superadmin" else ("empresa", user.empresa_id))
+
+
+class _LiveCallState:
+    """
+    Estado de la vista en vivo: datos base de la BD (una lectura por sala) más
+    los eventos del stream de la llamada (services/call_events.py).
+    """
+
+    def __init__(self, base: dict) -> None:
+        self.base = base
+        self.live = False
+        self.status = base.get("status") or "active"
+        self.transfer_briefing = base.get("transfer_briefing")
+        self.agent_state: str | None = None
+        self.turns: list[dict] = []
+        self._started = time.monotonic() - int(base.get("duration_seconds") or 0)
+        self._frozen_duration: int | None = None
+
+    def apply(self, events: list[dict]) -> None:
+        for event in events:
+            self.live = True
+            kind = event.get("type")
+            if kind == "turn":
+                ts = event.get("ts")
+                self.turns.append({
+                    "speaker": "agent" if event.get("role") == "assistant" else "user",
+                    "text": event.get("text") or "",
+                    "ts": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat() if ts else "",
+                })
+            elif kind == "state":
+                self.agent_state = event.get("state")
+            elif kind == "status" and event.get("status"):
+                self.status = event["status"]
+                if self.status == "ended" and self._frozen_duration is None:
+                    self._frozen_duration = self._duration()
+            elif kind == "transfer_briefing":
+                self.transfer_briefing = event.get("text") or self.transfer_briefing
+
+    def _duration(self) -> int:
+        return max(0, int(time.monotonic() - self._started))
+
+    def payload(self) -> dict:
+        return {
+            **self.base,
+            "status": self.status,
+            "duration_seconds": self._frozen_duration if self._frozen_duration is not None else self._duration(),
+            "transcript": self.turns[-50:] if self.turns else self.base.get("transcript", []),
+            "transfer_briefing": self.transfer_briefing,
+            "agent_state": self.agent_state,
+        }
+
+
+async def _call_snapshots(room_name: str) -> AsyncIterator[dict]:
+    """
+    Snapshots de una llamada a partir de su stream de eventos.
+
+    Contacto, extensiones y empresa se leen una vez; la transcripción y el
+    estado llegan del stream en cuanto el agente los publica. Mientras la sala
+    no tenga eventos (agente sin publicar todavía) se sigue refrescando desde
+    la BD; si Redis no está disponible, todo va por polling como antes.
+    """
+    try:
+        last_id, history = await read_call_history(room_name)
+    except Exception as redis_err:
+        logger.debug("[SSE call] Stream de eventos no disponible, polling BD: %s", redis_err)
+        while True:
+            yield await _build_call_payload(room_name)
             await asyncio.sleep(_CALL_SSE_INTERVAL)
-        except asyncio.CancelledError:
-            return
+
+    state = _LiveCallState(await _build_call_payload(room_name))
+    state.apply(history)
+    async with watch_call_events(room_name, last_id) as queue:
+        while True:
+            yield state.payload()
+            try:
+                events = await asyncio.wait_for(queue.get(), timeout=_CALL_SSE_INTERVAL)
+            except asyncio.TimeoutError:
+                if not state.live:
+                    state = _LiveCallState(await _build_call_payload(room_name))
+                continue
+            state.apply(events)
+            while not queue.empty():
+                state.apply(queue.get_nowait())
+
+
+async def _call_event_generator(room_name: str, user: CurrentUser) -> AsyncGenerator[str, None]:
+    """Eventos SSE de una llamada; un productor por sala que sigue su stream de eventos."""
+    view, view_key = _call_view(user)
+    async for event in subscribe_source(
+        f"call:{room_name}",
+        lambda: _call_snapshots(room_name),
+        retry_delay=_CALL_SSE_INTERVAL,
+        view=view,
+        view_key=view_key,
+        keepalive=_SSE_KEEPALIVE_INTERVAL,
+    ):
+        yield event
 
 
 @router.get("/call/{room_name}/stream")
@@ -329,7 +432,10 @@ async def call_stream(
 ) -> StreamingResponse:
     """
     SSE endpoint de llamada individual en tiempo real.
-    Emite cada 1.5 s con: status, duration, transcript, contact, transfer_briefing, extensions.
+    Primer evento con: status, duration, transcript, contact, transfer_briefing,
+    extensions, agent_state; después ``event: patch`` con los campos que cambian,
+    en cuanto el agente publica un turno o cambio de estado (y cada 1.5 s la
+    duración).
     Autenticación: pasa el JWT como ?token=<jwt>.
     """
     user = await _resolve_sse_user(token)
@@ -350,9 +456,10 @@ async def monitoring_stream(
     """
     SSE endpoint de métricas de monitorización en tiempo real.
 
-    Emite eventos 'message' cada 2s con:
-      - live_calls.total, live_calls.rooms
+    Emite un evento 'message' con el snapshot completo:
+      - live_calls.total, live_calls.rooms (solo la empresa del admin)
       - redis
+    y después, cada 2s, eventos 'patch' con las claves que cambian.
 
     Autenticación: pasa el JWT como ?token=<jwt> (necesario porque EventSource
     nativo del navegador no admite cabeceras Authorization personalizadas).
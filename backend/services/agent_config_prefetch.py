@@ -0,0 +1,89 @@
+"""
+Prefetch de la config del agente en el dialer (antes del dispatch).
+
+Sin prefetch, el agente arranca y en serie pide la config por HTTP al backend
+(4-5 consultas a Supabase), busca en la KB y consulta el CRM antes de poder
+saludar. El dialer ya conoce la encuesta y el teléfono al crear la llamada,
+así que resuelve aquí la config enriquecida (prompt, KB, contexto CRM) y:
+
+  - la escribe en la caché Redis que lee el agente
+    (`ausarta:agent_config:survey_{id}`, mismo TTL que el agente);
+  - devuelve la metadata del dispatch con la config embebida si cabe en
+    AGENT_CONFIG_INLINE_MAX_BYTES, para que el agente no haga ninguna
+    petición de red para configurarse.
+
+La config va solo en la metadata del dispatch (privada del job), nunca en la
+de la sala: esta última viaja en webhooks y logs. Marcada con
+`_context_prefetched`, el agente no repite la carga de KB/CRM.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Optional
+
+from config import get_settings
+
+logger = logging.getLogger("api-backend")
+
+SURVEY_CONFIG_CACHE_PREFIX = "ausarta:agent_config:survey_"
+INLINE_CONFIG_FIELD = "agent_config"
+PREFETCHED_FLAG = "_context_prefetched"
+
+
+def prefetch_enabled() -> bool:
+    return os.getenv("AGENT_CONFIG_PREFETCH", "true").lower() in ("1", "true", "yes")
+
+
+def survey_config_cache_key(survey_id: Any) -> str:
+    return f"{SURVEY_CONFIG_CACHE_PREFIX}{survey_id}"
+
+
+def _inline_max_bytes() -> int:
+    return max(0, int(os.getenv("AGENT_CONFIG_INLINE_MAX_BYTES", "32000")))
+
+
+async def prefetch_agent_config(survey_id: int, *, phone: str | None = None) -> Optional[dict[str, Any]]:
+    """
+    Resuelve y enriquece la config de la encuesta y la deja en la caché Redis.
+
+    Nunca lanza: si algo falla devuelve None y el agente sigue el camino
+    habitual (caché → HTTP → enriquecimiento propio).
+    """
+    if not prefetch_enabled():
+        return None
+    try:
+        from services.campaign_agent_config_service import resolve_agent_config_by_survey
+        from services.redis_service import get_redis
+        from utils.call_loader import enrich_agent_config_with_context
+
+        config = await asyncio.to_thread(resolve_agent_config_by_survey, int(survey_id))
+        await enrich_agent_config_with_context(
+            job_id=f"prefetch-{survey_id}",
+            agent_config=config,
+            empresa_id_str=str(config.get("empresa_id") or 0),
+            meta_data={"telefono": phone} if phone else {},
+        )
+        config[PREFETCHED_FLAG] = True
+
+        r = await get_redis()
+        await r.set(
+            survey_config_cache_key(survey_id),
+            json.dumps(config, ensure_ascii=False),
+            ex=get_settings().agent_config_cache_ttl,
+        )
+        return config
+    except Exception as e:
+        logger.warning(f"[ConfigPrefetch] Sin prefetch para encuesta {survey_id}: {e}")
+        return None
+
+
+def with_inline_agent_config(metadata: dict[str, Any], config: Optional[dict[str, Any]]) -> dict[str, Any]:
+    """Metadata de dispatch con la config embebida (o la original si no cabe)."""
+    if not config:
+        return metadata
+    if len(json.dumps(config, ensure_ascii=True)) > _inline_max_bytes():
+        return metadata
+    return {**metadata, INLINE_CONFIG_FIELD: config}
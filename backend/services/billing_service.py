@@ -6,6 +6,10 @@ Diseño:
   - Supabase (eventos + agregados mensuales) en segundo plano para no penalizar latencia.
   - Claves Redis con TTL largo (100 días) para cubrir el mes en curso + cierre contable.
 
+  - Write-behind opcional: los eventos se encolan en un Redis Stream y un cron del
+    worker ARQ los vuelca por lotes (un INSERT multi-fila + un upsert pre-sumado por
+    tenant/mes/categoría). XACK solo tras escribir en BD → entrega al-menos-una-vez.
+
 Uso típico al finalizar turnos/llamadas:
   await billing.log_llm_tokens(empresa_id, prompt_tokens, completion_tokens, model_name)
   await billing.log_tts_characters(empresa_id, chars, "cartesia")
@@ -15,15 +19,18 @@ Uso típico al finalizar turnos/llamadas:
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
+import os
 import re
+import socket
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Any, Final, Literal, Optional
+from typing import Any, Final, Literal
 
 from services.redis_service import get_redis
-from services.supabase_service import sb_query, supabase
+from services.supabase_service import is_missing_rpc_error, sb_query, supabase
 
 logger = logging.getLogger("billing")
 
@@ -46,6 +53,15 @@ FIELD_STT_AUDIO_SECONDS: Final[str] = "stt:audio_seconds"
 FIELD_TELEPHONY_SECONDS: Final[str] = "telephony:seconds"
 FIELD_COST_EUR_MICRO: Final[str] = "cost:eur_micro"
 
+USAGE_STREAM_KEY: Final[str] = f"{BILLING_PREFIX}:usage_stream"
+USAGE_STREAM_GROUP: Final[str] = "billing-flush"
+# Tope de memoria del stream: solo se alcanza si el flusher lleva mucho tiempo caído.
+USAGE_STREAM_MAXLEN: Final[int] = int(os.getenv("BILLING_USAGE_STREAM_MAXLEN", "200000"))
+USAGE_FLUSH_BATCH_SIZE: Final[int] = int(os.getenv("BILLING_FLUSH_BATCH_SIZE", "500"))
+# Entradas pendientes de un consumidor muerto se reclaman tras este tiempo sin ACK.
+USAGE_FLUSH_RECLAIM_IDLE_MS: Final[int] = 60_000
+_USAGE_RPC_ATTEMPTS: Final[int] = 3
+
 _INCR_HASH_SCRIPT: Final[str] = """
 local key = KEYS[1]
 local ttl = tonumber(ARGV[1])
@@ -153,8 +169,9 @@ class TenantUsageSnapshot:
 class BillingService:
     """Registro de consumo por tenant con Redis (tiempo real) y Supabase (histórico)."""
 
-    def __init__(self, *, defer_persistence: bool = True) -> None:
+    def __init__(self, *, defer_persistence: bool = True, write_behind: bool = False) -> None:
         self._defer_persistence = defer_persistence
+        self._write_behind = write_behind
         self._pending_tasks: set[asyncio.Task[None]] = set()
         self._rates = None
 
@@ -561,14 +578,14 @@ class BillingService:
         return await self.load_monthly_usage_from_db(tid, period=current_period)
 
     async def _incr_redis(self, key: str, deltas: dict[str, int]) -> None:
-        filtered = {field: int(delta) for field, delta in deltas.items() if int(delta) != 0}
+        filtered = {field_name: int(delta) for field_name, delta in deltas.items() if int(delta) != 0}
         if not filtered:
             return
 
         redis = await get_redis()
         args: list[str] = [str(BILLING_TTL_SECONDS)]
-        for field, delta in filtered.items():
-            args.extend([field, str(delta)])
+        for field_name, delta in filtered.items():
+            args.extend([field_name, str(delta)])
 
         await redis.eval(_INCR_HASH_SCRIPT, 1, key, *args)
 
@@ -587,6 +604,25 @@ class BillingService:
             logger.debug("[billing] Supabase no configurado; solo Redis para tenant=%s", tenant_id)
             return
 
+        if self._write_behind:
+            try:
+                await self._enqueue_usage(
+                    tenant_id=tenant_id,
+                    period=period,
+                    event_type=event_type,
+                    quantity=quantity,
+                    unit=unit,
+                    metadata=metadata,
+                    monthly_updates=monthly_updates,
+                )
+                return
+            except Exception as exc:
+                logger.warning(
+                    "[billing] No se pudo encolar uso en Redis (tenant=%s): %s — persistencia directa",
+                    tenant_id,
+                    exc,
+                )
+
         coro = self._persist_usage(
             tenant_id=tenant_id,
             period=period,
@@ -605,6 +641,34 @@ class BillingService:
 
         await coro
 
+    async def _enqueue_usage(
+        self,
+        *,
+        tenant_id: int,
+        period: str,
+        event_type: UsageEventType,
+        quantity: int,
+        unit: str,
+        metadata: dict[str, Any],
+        monthly_updates: list[tuple[MonthlyCategory, str, int]],
+    ) -> None:
+        payload = {
+            "empresa_id": tenant_id,
+            "period": period,
+            "event_type": event_type,
+            "quantity": quantity,
+            "unit": unit,
+            "metadata": metadata,
+            "monthly": [[cat, sk, int(d)] for cat, sk, d in monthly_updates if d > 0],
+        }
+        redis = await get_redis()
+        await redis.xadd(
+            USAGE_STREAM_KEY,
+            {"payload": json.dumps(payload, separators=(",", ":"))},
+            maxlen=USAGE_STREAM_MAXLEN,
+            approximate=True,
+        )
+
     async def _persist_usage(
         self,
         *,
@@ -656,11 +720,177 @@ class BillingService:
             )
 
 
+def aggregate_usage_entries(
+    payloads: list[dict[str, Any]],
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Convierte eventos encolados en filas de eventos + deltas mensuales pre-sumados."""
+    events: list[dict[str, Any]] = []
+    monthly: dict[tuple[int, str, str, str], int] = {}
+    for payload in payloads:
+        tid = int(payload["empresa_id"])
+        period = str(payload["period"])
+        events.append(
+            {
+                "empresa_id": tid,
+                "event_type": payload["event_type"],
+                "period": period,
+                "quantity": str(Decimal(payload["quantity"])),
+                "unit": payload["unit"],
+                "metadata": payload.get("metadata") or {},
+            }
+        )
+        for category, sub_key, delta in payload.get("monthly") or []:
+            if int(delta) <= 0:
+                continue
+            key = (tid, period, str(category), str(sub_key or ""))
+            monthly[key] = monthly.get(key, 0) + int(delta)
+
+    monthly_rows = [
+        {"empresa_id": tid, "period": period, "category": cat, "sub_key": sk, "quantity": qty}
+        for (tid, period, cat, sk), qty in monthly.items()
+    ]
+    return events, monthly_rows
+
+
+async def _persist_usage_batch(
+    events: list[dict[str, Any]],
+    monthly_rows: list[dict[str, Any]],
+) -> None:
+    """
+    Escribe un lote en una transacción (RPC). Los errores transitorios se
+    reintentan sobre la propia RPC; solo si no está desplegada se usa el
+    camino legacy (INSERT multi-fila + upsert por clave, no transaccional).
+    """
+    for attempt in range(1, _USAGE_RPC_ATTEMPTS + 1):
+        try:
+            await sb_query(
+                lambda: supabase.rpc(
+                    "record_tenant_usage_batch",
+                    {"p_events": events, "p_monthly": monthly_rows},
+                ).execute()
+            )
+            return
+        except Exception as exc:
+            if is_missing_rpc_error(exc, "record_tenant_usage_batch"):
+                logger.warning("[billing] record_tenant_usage_batch no disponible (%s); fallback", exc)
+                break
+            if attempt == _USAGE_RPC_ATTEMPTS:
+                raise
+            logger.warning("[billing] record_tenant_usage_batch falló (intento %d): %s", attempt, exc)
+            await asyncio.sleep(0.5 * attempt)
+
+    if events:
+        await sb_query(lambda: supabase.table("tenant_usage_events").insert(events).execute())
+    for row in monthly_rows:
+        await sb_query(
+            lambda r=row: supabase.rpc(
+                "upsert_tenant_usage_monthly",
+                {
+                    "p_empresa_id": r["empresa_id"],
+                    "p_period": r["period"],
+                    "p_category": r["category"],
+                    "p_sub_key": r["sub_key"],
+                    "p_quantity": float(r["quantity"]),
+                },
+            ).execute()
+        )
+
+
+def _read_group_messages(response: Any) -> list[tuple[str, dict[str, str]]]:
+    """Aplana la respuesta de XREADGROUP (lista RESP2 o dict RESP3)."""
+    if not response:
+        return []
+    streams = response.items() if isinstance(response, dict) else response
+    messages: list[tuple[str, dict[str, str]]] = []
+    for _, entries in streams:
+        messages.extend(entries or [])
+    return messages
+
+
+async def _ensure_usage_group(redis: Any) -> None:
+    try:
+        await redis.xgroup_create(USAGE_STREAM_KEY, USAGE_STREAM_GROUP, id="0", mkstream=True)
+    except Exception as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+async def flush_usage_stream(*, max_batches: int = 20, consumer: str | None = None) -> int:
+    """
+    Vuelca a Supabase los eventos de uso encolados. Devuelve cuántos eventos persistió.
+
+    Primero reclama entradas sin ACK de consumidores caídos; luego lee nuevas. Si la
+    escritura falla no se hace XACK y el lote se reintenta en el siguiente ciclo.
+    """
+    if not supabase:
+        return 0
+
+    redis = await get_redis()
+    await _ensure_usage_group(redis)
+    consumer_name = consumer or f"{socket.gethostname()}-{os.getpid()}"
+    flushed = 0
+
+    for batch_no in range(max_batches):
+        messages: list[tuple[str, dict[str, str]]] = []
+        if batch_no == 0:
+            claimed = await redis.xautoclaim(
+                USAGE_STREAM_KEY,
+                USAGE_STREAM_GROUP,
+                consumer_name,
+                min_idle_time=USAGE_FLUSH_RECLAIM_IDLE_MS,
+                start_id="0-0",
+                count=USAGE_FLUSH_BATCH_SIZE,
+            )
+            messages.extend(claimed[1] if claimed else [])
+
+        remaining = USAGE_FLUSH_BATCH_SIZE - len(messages)
+        if remaining > 0:
+            fresh = await redis.xreadgroup(
+                USAGE_STREAM_GROUP,
+                consumer_name,
+                {USAGE_STREAM_KEY: ">"},
+                count=remaining,
+            )
+            messages.extend(_read_group_messages(fresh))
+
+        if not messages:
+            break
+
+        ids = [msg_id for msg_id, _ in messages]
+        payloads: list[dict[str, Any]] = []
+        for msg_id, fields in messages:
+            try:
+                payloads.append(json.loads((fields or {})["payload"]))
+            except (KeyError, TypeError, ValueError):
+                logger.error("[billing] Entrada de uso corrupta descartada id=%s", msg_id)
+
+        events, monthly_rows = aggregate_usage_entries(payloads)
+        if events:
+            try:
+                await _persist_usage_batch(events, monthly_rows)
+            except Exception:
+                logger.exception(
+                    "[billing] Error volcando %d evento(s) de uso; se reintentará", len(events)
+                )
+                break
+
+        await redis.xack(USAGE_STREAM_KEY, USAGE_STREAM_GROUP, *ids)
+        await redis.xdel(USAGE_STREAM_KEY, *ids)
+        flushed += len(events)
+        if len(messages) < USAGE_FLUSH_BATCH_SIZE:
+            break
+
+    return flushed
+
+
 _billing_service: BillingService | None = None
 
 
 def get_billing_service() -> BillingService:
     global _billing_service
     if _billing_service is None:
-        _billing_service = BillingService(defer_persistence=True)
+        _billing_service = BillingService(
+            defer_persistence=True,
+            write_behind=os.getenv("BILLING_WRITE_BEHIND", "true").strip().lower() in ("1", "true", "yes"),
+        )
     return _billing_service
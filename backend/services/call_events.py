@@ -0,0 +1,180 @@
+"""
+call_events.py — Eventos en vivo de una llamada en un stream Redis por sala.
+
+El agente publica lo que pasa en la llamada según ocurre (turnos de la
+transcripción, estado speaking/listening/thinking, cambios de status); el
+worker añade el briefing de transferencia. La vista en vivo del panel de
+monitorización (routers/monitoring.py) lee el histórico con XRANGE y después
+sigue el stream, sin consultar Supabase en cada intervalo.
+
+Eventos (campo ``payload`` JSON del stream):
+  - ``{"type": "turn", "role": "user"|"assistant", "text": ...}``
+  - ``{"type": "state", "state": "speaking"|"listening"|"thinking"|...}``
+  - ``{"type": "status", "status": "active"|"transferred"|"ended"}``
+  - ``{"type": "transfer_briefing", "text": ...}``
+Todos llevan ``ts`` (epoch en segundos).
+
+El stream es best-effort: si Redis no está disponible los eventos se
+descartan (la transcripción persistida sigue yendo por el worker) y la vista
+en vivo vuelve al polling de la BD.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from typing import Any, AsyncIterator
+
+from services.redis_service import get_redis
+
+logger = logging.getLogger("api-backend")
+
+CALL_EVENTS_KEY_PREFIX = "ausarta:call_events:"
+CALL_EVENTS_MAXLEN = 500
+CALL_EVENTS_TTL_SECONDS = 6 * 3600
+
+_READ_BLOCK_MS = 1000
+_READ_COUNT = 200
+
+# Tail compartido: un único XREAD bloqueante para todas las salas vigiladas.
+_watchers: dict[str, list[asyncio.Queue]] = {}
+_cursors: dict[str, str] = {}
+_tail_task: asyncio.Task | None = None
+
+
+def call_events_key(room_name: str) -> str:
+    return f"{CALL_EVENTS_KEY_PREFIX}{room_name}"
+
+
+def _decode(fields: dict[str, Any]) -> dict[str, Any] | None:
+    try:
+        event = json.loads(fields.get("payload") or "")
+    except (TypeError, ValueError):
+        return None
+    return event if isinstance(event, dict) else None
+
+
+async def publish_call_events(room_name: str, events: list[dict[str, Any]]) -> None:
+    """XADD de los eventos (en orden) + TTL del stream, en un solo round-trip."""
+    if not events:
+        return
+    redis = await get_redis()
+    key = call_events_key(room_name)
+    async with redis.pipeline(transaction=False) as pipe:
+        for event in events:
+            pipe.xadd(
+                key,
+                {"payload": json.dumps(event, ensure_ascii=False, separators=(",", ":"))},
+                maxlen=CALL_EVENTS_MAXLEN,
+                approximate=True,
+            )
+        pipe.expire(key, CALL_EVENTS_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def publish_call_event(room_name: str, event_type: str, **fields: Any) -> None:
+    await publish_call_events(room_name, [{"type": event_type, "ts": time.time(), **fields}])
+
+
+class CallEventPublisher:
+    """
+    Publicador del agente: ``emit`` no bloquea ni lanza; una única tarea
+    vacía la cola en orden (un pipeline por ráfaga de eventos).
+    """
+
+    def __init__(self, room_name: str) -> None:
+        self.room_name = room_name
+        self._pending: list[dict[str, Any]] = []
+        self._task: asyncio.Task | None = None
+
+    def emit(self, event_type: str, **fields: Any) -> None:
+        self._pending.append({"type": event_type, "ts": time.time(), **fields})
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await publish_call_events(self.room_name, batch)
+            except Exception as exc:
+                logger.debug("[call_events] %d eventos descartados (%s): %s", len(batch), self.room_name, exc)
+
+    async def flush(self, timeout: float = 2.0) -> None:
+        """Espera a que salgan los eventos pendientes (fin de llamada)."""
+        if self._task is not None and not self._task.done():
+            with contextlib.suppress(Exception):
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+
+
+async def read_call_history(room_name: str) -> tuple[str, list[dict[str, Any]]]:
+    """Eventos guardados de la sala y el id del último (``"0-0"`` si no hay)."""
+    redis = await get_redis()
+    entries = await redis.xrange(call_events_key(room_name), count=CALL_EVENTS_MAXLEN)
+    last_id = entries[-1][0] if entries else "0-0"
+    return last_id, [e for e in (_decode(fields) for _, fields in entries) if e is not None]
+
+
+@contextlib.asynccontextmanager
+async def watch_call_events(room_name: str, after_id: str) -> AsyncIterator[asyncio.Queue]:
+    """
+    Cola con las listas de eventos nuevos de la sala (posteriores a ``after_id``).
+
+    Todas las salas vigiladas del proceso comparten un único XREAD
+    bloqueante, así que el número de conexiones Redis no crece con las salas.
+    """
+    global _tail_task
+    queue: asyncio.Queue = asyncio.Queue()
+    _watchers.setdefault(room_name, []).append(queue)
+    _cursors.setdefault(room_name, after_id)
+    if _tail_task is None or _tail_task.done():
+        _tail_task = asyncio.create_task(_tail_call_events(), name="call-events-tail")
+    try:
+        yield queue
+    finally:
+        queues = _watchers.get(room_name, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            _watchers.pop(room_name, None)
+            _cursors.pop(room_name, None)
+
+
+async def _tail_call_events() -> None:
+    backoff = 1.0
+    while _watchers:
+        streams = {call_events_key(room): _cursors.get(room, "0-0") for room in list(_watchers)}
+        try:
+            redis = await get_redis()
+            result = await redis.xread(streams, count=_READ_COUNT, block=_READ_BLOCK_MS)
+            backoff = 1.0
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("[call_events] Error leyendo streams: %s (reintento en %.0fs)", exc, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+            continue
+        for key, entries in result or []:
+            room = key[len(CALL_EVENTS_KEY_PREFIX):]
+            if room not in _watchers or not entries:
+                continue
+            _cursors[room] = entries[-1][0]
+            events = [e for e in (_decode(fields) for _, fields in entries) if e is not None]
+            if events:
+                for queue in _watchers[room]:
+                    queue.put_nowait(events)
+
+
+async def close_call_events() -> None:
+    """Cancela el tail compartido (shutdown de la API)."""
+    global _tail_task
+    if _tail_task is not None and not _tail_task.done():
+        _tail_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await _tail_task
+    _tail_task = None
+    _watchers.clear()
+    _cursors.clear()
@@ -248,6 +248,14 @@ def prepare_narrative_text_for_storage(text: str | None) -> str | None:
     return sanitize_free_text_pii(text)
 
 
+def prepare_texts_for_storage(texts: list[str | None]) -> list[str | None]:
+    """Versión por lotes de prepare_*_for_storage: un solo análisis PII para todos."""
+    from utils.pii_sanitizer import sanitize_transcriptions_pii
+
+    sanitized = sanitize_transcriptions_pii(texts)
+    return [None if text is None else result.text for text, result in zip(texts, sanitized)]
+
+
 @dataclass(frozen=True)
 class CallUsageMetrics:
     """Métricas de consumo de una llamada para unit economics."""
@@ -3,11 +3,11 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import re
 import time
 from typing import Any
 
 from services.supabase_service import sb_query, supabase
+from services.telephony_room_utils import resolve_room_call, room_call_started_at
 
 logger = logging.getLogger("api-backend")
 
@@ -17,15 +17,8 @@ ACTIVE_STATUSES = frozenset(
 )
 
 
-def _parse_room_name(room_name: str) -> dict[str, int | None]:
-    enc_m = re.search(r"encuesta_(\d+)", room_name)
-    emp_m = re.search(r"empresa_(\d+)", room_name)
-    camp_m = re.search(r"campana_(\d+)", room_name)
-    return {
-        "encuesta_id": int(enc_m.group(1)) if enc_m else None,
-        "empresa_id": int(emp_m.group(1)) if emp_m else None,
-        "campaign_id": int(camp_m.group(1)) if camp_m else None,
-    }
+def _parse_room_name(room_name: str, metadata: object = None) -> dict[str, int | None]:
+    return resolve_room_call(room_name, metadata)
 
 
 async def fetch_live_rooms_map() -> dict[int, dict[str, Any]]:
@@ -47,17 +40,17 @@ async def fetch_live_rooms_map() -> dict[int, dict[str, Any]]:
             name = room.name or ""
             if not name.startswith(ROOM_PREFIX):
                 continue
-            meta = _parse_room_name(name)
+            # Salas warm: la encuesta llega en la metadata al vincularlas.
+            meta = _parse_room_name(name, room.metadata)
             enc_id = meta.get("encuesta_id")
             if not enc_id:
                 continue
+            started_at = room_call_started_at(name, room.metadata, room.creation_time)
             out[int(enc_id)] = {
                 "room_name": name,
                 "num_participants": room.num_participants,
-                "duration_seconds": max(0, now_ts - room.creation_time)
-                if room.creation_time
-                else 0,
-                "created_at": room.creation_time,
+                "duration_seconds": max(0, now_ts - started_at) if started_at else 0,
+                "created_at": started_at,
             }
     except Exception as exc:
         logger.warning("📞 [calls] No se pudo listar salas LiveKit: %s", exc)
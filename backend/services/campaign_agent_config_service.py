@@ -63,7 +63,8 @@ def _build_agent_payload(
         else "Hola, has llamado a Ausarta."
     )
     greeting = agent_data.get("greeting", greeting_default)
-    if nombre_cliente is not None:
+    greeting_personalized = nombre_cliente is not None and "{nombre}" in greeting
+    if greeting_personalized:
         greeting = greeting.replace("{nombre}", nombre_cliente or "Cliente")
 
     resolved_agent_type = (
@@ -75,6 +76,8 @@ def _build_agent_payload(
     payload: dict[str, Any] = {
         "name": agent_data.get("name", "Bot"),
         "greeting": greeting,
+        # Con el nombre del cliente dentro: no se persiste en la caché de audio en disco.
+        "greeting_personalized": greeting_personalized,
         "instructions": agent_data.get("instructions", "Eres un asistente"),
         "critical_rules": agent_data.get("critical_rules", ""),
         "voice_id": agent_data.get("voice_id") or ai_data.get("tts_voice") or DEFAULT_AUSARTA_VOICE_ID,
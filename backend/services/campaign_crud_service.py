@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from datetime import datetime, timezone
 from typing import Any
@@ -13,8 +14,9 @@ from models.schemas import CampaignLeadModel, CampaignModel
 from services.audit import log_audit_event
 from services.auth import CurrentUser
 from services.campaign_ab_service import validate_ab_campaign_payload
+from services.campaign_lead_import import import_campaign_leads, normalize_lead_phone
 from services.campaign_locks import enqueue_scheduler_tick
-from services.supabase_service import supabase
+from services.supabase_service import sb_query, supabase
 
 logger = logging.getLogger("api-backend")
 
@@ -54,6 +56,22 @@ async def create_campaign_record(
     if not supabase:
         return {"error": "No DB"}
 
+    # Los leads se guardan en E.164: un teléfono no normalizable rechaza la
+    # creación entera (con las filas afectadas) en vez de perderse en silencio.
+    rejected = [
+        {"index": index, "phone_number": lead.phone_number}
+        for index, lead in enumerate(leads)
+        if normalize_lead_phone(lead.phone_number) is None
+    ]
+    if rejected:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": f"{len(rejected)} lead(s) con teléfono inválido",
+                "invalid_leads": rejected[:100],
+            },
+        )
+
     status_final = campaign.status
     if not campaign.scheduled_time and status_final == "pending":
         status_final = "running"
@@ -77,18 +95,14 @@ async def create_campaign_record(
     res_camp = supabase.table("campaigns").insert(camp_data).execute()
     campaign_id = res_camp.data[0]["id"]
 
-    leads_data = [
-        {
-            "campaign_id": campaign_id,
-            "phone_number": lead.phone_number,
-            "customer_name": lead.customer_name,
-            "status": "pending",
-            "retries_attempted": 0,
-        }
-        for lead in leads
-    ]
-    if leads_data:
-        supabase.table("campaign_leads").insert(leads_data).execute()
+    # Mismo camino que la importación de ficheros: normaliza a E.164, descarta
+    # duplicados e inserta por lotes concurrentes acotados.
+    stats = await import_campaign_leads(
+        campaign_id,
+        ({"phone_number": lead.phone_number, "customer_name": lead.customer_name} for lead in leads),
+    )
+    if stats["insertados"] and status_final in ("active", "running"):
+        await enqueue_scheduler_tick(campaign.empresa_id)
 
     await log_audit_event(
         user_id=current_user.user_id,
@@ -98,10 +112,14 @@ async def create_campaign_record(
         metadata={
             "empresa_id": campaign.empresa_id,
             "agent_id": campaign.agent_id,
-            "leads_count": len(leads_data),
+            "leads_count": stats["insertados"],
         },
     )
-    return {"id": campaign_id, "message": f"Campaña creada con {len(leads_data)} leads"}
+    return {
+        "id": campaign_id,
+        "message": f"Campaña creada con {stats['insertados']} leads",
+        "leads_import": stats,
+    }
 
 
 async def update_campaign_record(
@@ -133,38 +151,66 @@ async def update_campaign_record(
     return {"status": "ok"}
 
 
-def list_campaigns_for_user(empresa_id: int | None) -> list[dict[str, Any]]:
+def _apply_lead_counters(campaign: dict[str, Any]) -> None:
+    """Contadores agregados de campaigns (triggers sobre campaign_leads) → campos del listado."""
+    total = int(campaign.get("leads_total") or 0)
+    pending = int(campaign.get("leads_pending") or 0)
+    calling = int(campaign.get("leads_calling") or 0)
+    campaign["total_leads"] = total
+    campaign["called_leads"] = max(0, total - pending - calling)
+    campaign["pending_leads"] = pending
+    campaign["calling_leads"] = calling
+
+
+def _count_leads_legacy(campaign: dict[str, Any]) -> None:
+    """Dos COUNT por campaña; solo si la migración de contadores no está aplicada."""
+    try:
+        total_r = (
+            supabase.table("campaign_leads")
+            .select("id", count="exact")
+            .eq("campaign_id", campaign["id"])
+            .execute()
+        )
+        total_leads = total_r.count if total_r.count is not None else 0
+        campaign["total_leads"] = total_leads
+        pending_r = (
+            supabase.table("campaign_leads")
+            .select("id", count="exact")
+            .eq("campaign_id", campaign["id"])
+            .in_("status", ["pending", "calling"])
+            .execute()
+        )
+        pending_calling = pending_r.count if pending_r.count is not None else 0
+        campaign["called_leads"] = max(0, total_leads - pending_calling)
+    except Exception:
+        campaign["total_leads"] = 0
+        campaign["called_leads"] = 0
+
+
+async def list_campaigns_for_user(empresa_id: int | None) -> list[dict[str, Any]]:
+    """
+    Últimas 100 campañas con su progreso de leads en una sola consulta: los
+    contadores (leads_total/pending/calling/done) viven en campaigns.
+    """
     if not supabase:
         return []
 
-    query = supabase.table("campaigns").select("*, empresas:empresa_id(nombre)")
-    if empresa_id:
-        query = query.eq("empresa_id", empresa_id)
-    res = query.order("created_at", desc=True).limit(100).execute()
+    def _fetch():
+        query = supabase.table("campaigns").select("*, empresas:empresa_id(nombre)")
+        if empresa_id:
+            query = query.eq("empresa_id", empresa_id)
+        return query.order("created_at", desc=True).limit(100).execute()
+
+    res = await sb_query(_fetch)
     campaigns = res.data or []
 
+    if campaigns and "leads_total" not in campaigns[0]:
+        logger.warning("[campaigns] Contadores de leads no migrados; conteo legacy por campaña")
+        await asyncio.to_thread(lambda: [_count_leads_legacy(c) for c in campaigns])
+        return campaigns
+
     for campaign in campaigns:
-        try:
-            total_r = (
-                supabase.table("campaign_leads")
-                .select("id", count="exact")
-                .eq("campaign_id", campaign["id"])
-                .execute()
-            )
-            total_leads = total_r.count if total_r.count is not None else 0
-            campaign["total_leads"] = total_leads
-            pending_r = (
-                supabase.table("campaign_leads")
-                .select("id", count="exact")
-                .eq("campaign_id", campaign["id"])
-                .in_("status", ["pending", "calling"])
-                .execute()
-            )
-            pending_calling = pending_r.count if pending_r.count is not None else 0
-            campaign["called_leads"] = max(0, total_leads - pending_calling)
-        except Exception:
-            campaign["total_leads"] = 0
-            campaign["called_leads"] = 0
+        _apply_lead_counters(campaign)
     return campaigns
 
 
@@ -192,8 +238,8 @@ async def start_campaign_record(campaign_id: int) -> dict[str, str]:
     except Exception:
         pass
 
-    await enqueue_scheduler_tick()
+    await enqueue_scheduler_tick(res.data[0].get("empresa_id"))
     return {
         "status": "ok",
-        "message": "Campaña marcada como activa. El scheduler la procesará en el próximo ciclo.",
+        "message": "Campaña marcada como activa. El scheduler la procesará de inmediato.",
     }
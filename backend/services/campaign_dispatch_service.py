@@ -28,3 +28,33 @@ async def resolve_campaign_dispatch_agent(
         "ab_variant": assignment.variant,
         "ab_test_enabled": assignment.ab_test_enabled,
     }
+
+
+async def resolve_campaign_dispatch_agents(
+    campaign: dict[str, Any],
+    lead_ids: list[int],
+) -> dict[int, dict[str, Any]]:
+    """
+    Versión por lotes de ``resolve_campaign_dispatch_agent``.
+    Un lote tiene como mucho dos agentes distintos (variantes A/B), así que
+    ``resolve_outbound_agent`` se consulta una vez por agente, no por lead.
+    """
+    assignments = {int(lead_id): assign_ab_variant(campaign, int(lead_id)) for lead_id in lead_ids}
+    resolved_by_agent: dict[int, dict[str, Any]] = {}
+    for assignment in assignments.values():
+        if assignment.agent_id in resolved_by_agent:
+            continue
+        resolved_by_agent[assignment.agent_id] = await resolve_outbound_agent(
+            empresa_id=int(campaign.get("empresa_id") or 0) or None,
+            campaign_agent_id=assignment.agent_id,
+            agent_type=campaign.get("agent_type"),
+            call_purpose=campaign.get("call_purpose"),
+        )
+    return {
+        lead_id: {
+            **resolved_by_agent[assignment.agent_id],
+            "ab_variant": assignment.variant,
+            "ab_test_enabled": assignment.ab_test_enabled,
+        }
+        for lead_id, assignment in assignments.items()
+    }
@@ -11,6 +11,7 @@ from datetime import datetime, timedelta, timezone
 
 from livekit import api as lk_api
 
+from services.agent_config_prefetch import prefetch_agent_config, with_inline_agent_config
 from services.agent_router import build_outbound_room_metadata
 from services.campaign_dispatch_service import resolve_campaign_dispatch_agent
 from services.campaign_locks import (
@@ -19,9 +20,11 @@ from services.campaign_locks import (
     acquire_empresa_lock,
     get_active_call_count,
     is_empresa_locked,
+    release_active_call,
     release_empresa_lock,
 )
-from services.livekit_service import create_isolated_room, dispatch_agent_explicit, lkapi
+from services.dialer_pacing import acquire_dial_slot
+from services.livekit_service import create_isolated_room, dispatch_agent_explicit, lkapi, wait_for_agent_ready
 from services.sip_call_service import (
     create_sip_participant_with_retry,
     mark_call_failed,
@@ -29,6 +32,7 @@ from services.sip_call_service import (
 )
 from services.supabase_service import supabase
 from services.trunk_service import resolve_outbound_trunk_id
+from services.warm_room_pool import bind_warm_room, claim_warm_room
 
 logger = logging.getLogger("api-backend")
 
@@ -52,6 +56,7 @@ async def dispatch_single_lead_drip(
     sip_trunk_id = await resolve_outbound_trunk_id(int(empresa_id) if empresa_id else None)
 
     encuesta_id = None
+    call_token = None
 
     try:
         logger.info(f"☎️  [Drip] Iniciando lead {lead_id} ({phone}) → empresa={empresa_id} camp={campaign_id}")
@@ -139,23 +144,66 @@ async def dispatch_single_lead_drip(
             extra={"ab_variant": ab_variant} if ab_variant else None,
         )
 
-        try:
-            await create_isolated_room(room_name, metadata=room_metadata)
-        except Exception as room_err:
-            logger.warning(f"⚠️ [Drip] Aviso creando sala {room_name}: {room_err}")
+        # Config enriquecida lista antes de que arranque el agente (sala warm o nueva).
+        prefetched_config = await prefetch_agent_config(int(encuesta_id), phone=str(phone))
 
-        try:
-            await dispatch_agent_explicit(
+        # Sala warm (agente ya arrancado): se vincula al lead y se marca sin esperar.
+        warm_room = await claim_warm_room(int(empresa_id or 0), int(resolved_agent_id))
+        if warm_room:
+            try:
+                await bind_warm_room(warm_room, room_metadata)
+                room_name = warm_room
+                logger.info(f"🔥 [Drip] Lead {lead_id} vinculado a sala warm {room_name}")
+            except Exception as bind_err:
+                logger.warning(f"⚠️ [Drip] Sala warm {warm_room} no vinculable: {bind_err}")
+                warm_room = None
+
+        if not warm_room:
+            try:
+                await create_isolated_room(room_name, metadata=room_metadata)
+            except Exception as room_err:
+                logger.warning(f"⚠️ [Drip] Aviso creando sala {room_name}: {room_err}")
+
+            try:
+                await dispatch_agent_explicit(
+                    room_name=room_name,
+                    agent_name=agent_name_dispatch,
+                    metadata=with_inline_agent_config(room_metadata, prefetched_config),
+                )
+                logger.info(
+                    f"🚀 [Drip] Agente '{agent_name_dispatch}' (tipo={resolved_agent_type}) despachado a {room_name}"
+                )
+            except Exception as dispatch_err:
+                logger.warning(f"⚠️ [Drip] Dispatch explícito fallido (auto-dispatch como fallback): {dispatch_err}")
+
+            # Espera real al agente en sala (no un sleep fijo); sin él se marca igual,
+            # como antes, y el auto-dispatch puede llegar todavía.
+            if not await wait_for_agent_ready(room_name):
+                logger.warning(f"⚠️ [Drip] Agente no confirmado en {room_name}; se continúa con el SIP.")
+
+        # El dialer registra el lease de la llamada al conceder el hueco.
+        dial_slot = await acquire_dial_slot(
+            empresa_id=int(empresa_id) if empresa_id else None,
+            trunk_id=sip_trunk_id,
+            encuesta_id=int(encuesta_id),
+            source="campaign_drip",
+        )
+        call_token = dial_slot.call_token
+        if not dial_slot.granted:
+            await mark_call_failed(
+                int(encuesta_id),
+                "Sin hueco de marcado (pacing del dialer)",
+                error_code="dialer_pacing_timeout",
+                notify=False,
+                source="campaign_drip",
+                empresa_id=int(empresa_id) if empresa_id else None,
+                phone=str(phone),
                 room_name=room_name,
-                agent_name=agent_name_dispatch,
-                metadata=room_metadata,
             )
-            logger.info(
-                f"🚀 [Drip] Agente '{agent_name_dispatch}' (tipo={resolved_agent_type}) despachado a {room_name}"
+            await asyncio.to_thread(
+                supabase.table("campaign_leads").update({"status": "pending"}).eq("id", lead_id).execute
             )
-            await asyncio.sleep(float(os.getenv("DRIP_AGENT_JOIN_DELAY_SECONDS", "3")))
-        except Exception as dispatch_err:
-            logger.warning(f"⚠️ [Drip] Dispatch explícito fallido (auto-dispatch como fallback): {dispatch_err}")
+            return
 
         try:
             await create_sip_participant_with_retry(
@@ -192,6 +240,7 @@ async def dispatch_single_lead_drip(
         POLL_INTERVAL_S = 2
         waited = 0
         answer_timeout_applied = False
+        call_finished = False
         while waited < MAX_WAIT_SECONDS:
             await asyncio.sleep(POLL_INTERVAL_S)
             waited += POLL_INTERVAL_S
@@ -203,6 +252,7 @@ async def dispatch_single_lead_drip(
                 current = enc_check.data[0].get("status") if enc_check.data else None
                 if current in TERMINAL:
                     logger.info(f"✅ [Drip] Encuesta {encuesta_id} terminal ('{current}') tras {waited}s de espera")
+                    call_finished = True
                     break
                 if waited >= ANSWER_TIMEOUT_SECONDS and current in (None, "", "initiated", "calling", "pending"):
                     answer_timeout_applied = True
@@ -218,10 +268,17 @@ async def dispatch_single_lead_drip(
                         supabase.table("encuestas").update({"status": "failed"}).eq("id", encuesta_id).execute
                     )
                     await apply_retry_after_failure(lead_id=lead_id, campaign=campaign)
+                    call_finished = True
                     break
             except Exception as poll_err:
                 logger.warning(f"[Drip] Error en poll de estado encuesta {encuesta_id}: {poll_err}")
 
+        # Si la llamada sigue viva tras MAX_WAIT_SECONDS, el lease se libera en
+        # room_finished (webhook LiveKit) o al caducar.
+        if call_finished:
+            await release_active_call(encuesta_id, call_token)
+        call_token = None
+
         if answer_timeout_applied:
             logger.info(f"📵 [Drip] Lead {lead_id} marcado fallido por no contestar en tiempo.")
 
@@ -230,6 +287,8 @@ async def dispatch_single_lead_drip(
         await asyncio.sleep(cooldown)
 
     finally:
+        if call_token:
+            await release_active_call(encuesta_id, call_token)
         await release_empresa_lock(empresa_id, lock_token)
         logger.info(f"🔓 [Drip] Lock liberado para empresa {empresa_id}")
 
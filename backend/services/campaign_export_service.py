@@ -1,45 +1,151 @@
-"""Exportación de resultados de campaña."""
+"""
+Exportación de resultados de campaña.
+
+El CSV se genera en streaming (``stream_campaign_results_csv``): páginas de
+encuestas por keyset (fecha, id) descendente, seleccionando solo los campos
+JSON que usa el CSV (no ``datos_extra``/``agent_results`` completos), y cada
+página se escribe y se envía antes de pedir la siguiente. La memoria no
+depende del número de llamadas y no se topa con el límite de filas de
+PostgREST. Opcionalmente se comprime con gzip al vuelo. Los comentarios se
+sanitizan (PII) por lotes, una llamada por página.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import csv
 import io
-from typing import Any
+import zlib
+from typing import Any, AsyncIterator, Iterable
 
+from services.supabase_service import supabase
+from utils.pii_sanitizer import sanitize_transcriptions_pii
 
-def build_campaign_results_csv(rows: list[dict[str, Any]]) -> str:
-    output = io.StringIO()
-    fieldnames = [
+EXPORT_PAGE_SIZE = 1000
+
+CSV_FIELDNAMES = [
+    "id",
+    "telefono",
+    "fecha",
+    "status",
+    "seconds_used",
+    "comentarios",
+    "customer_anger_score",
+    "requires_urgent_human_attention",
+]
+
+# Sub-campos JSON (operador -> de PostgREST) en lugar de los documentos enteros.
+_EXPORT_SELECT = ",".join(
+    [
         "id",
         "telefono",
         "fecha",
         "status",
         "seconds_used",
         "comentarios",
-        "customer_anger_score",
-        "requires_urgent_human_attention",
+        "analysis_anger:agent_results->analysis->customer_anger_score",
+        "analysis_urgent:agent_results->analysis->requires_urgent_human_attention",
+        "extra_anger:datos_extra->customer_anger_score",
+        "extra_urgent:datos_extra->requires_urgent_human_attention",
     ]
-    writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore")
-    writer.writeheader()
-    for row in rows:
-        extra = row.get("datos_extra") if isinstance(row.get("datos_extra"), dict) else {}
-        analysis = {}
-        ar = row.get("agent_results")
-        if isinstance(ar, dict) and isinstance(ar.get("analysis"), dict):
-            analysis = ar["analysis"]
-        writer.writerow(
-            {
-                "id": row.get("id"),
-                "telefono": row.get("telefono"),
-                "fecha": row.get("fecha"),
-                "status": row.get("status"),
-                "seconds_used": row.get("seconds_used"),
-                "comentarios": (row.get("comentarios") or "")[:500],
-                "customer_anger_score": analysis.get("customer_anger_score")
-                or extra.get("customer_anger_score"),
-                "requires_urgent_human_attention": analysis.get("requires_urgent_human_attention")
-                if "requires_urgent_human_attention" in analysis
-                else extra.get("requires_urgent_human_attention"),
-            }
-        )
+)
+
+
+def _project_row(row: dict[str, Any]) -> dict[str, Any]:
+    """Fila completa de encuestas → misma forma que devuelve ``_EXPORT_SELECT``."""
+    extra = row.get("datos_extra") if isinstance(row.get("datos_extra"), dict) else {}
+    analysis = {}
+    ar = row.get("agent_results")
+    if isinstance(ar, dict) and isinstance(ar.get("analysis"), dict):
+        analysis = ar["analysis"]
+    return {
+        **row,
+        "analysis_anger": analysis.get("customer_anger_score"),
+        "analysis_urgent": analysis.get("requires_urgent_human_attention"),
+        "extra_anger": extra.get("customer_anger_score"),
+        "extra_urgent": extra.get("requires_urgent_human_attention"),
+    }
+
+
+def _csv_record(row: dict[str, Any], comentarios: str) -> dict[str, Any]:
+    return {
+        "id": row.get("id"),
+        "telefono": row.get("telefono"),
+        "fecha": row.get("fecha"),
+        "status": row.get("status"),
+        "seconds_used": row.get("seconds_used"),
+        "comentarios": comentarios[:500],
+        "customer_anger_score": row.get("analysis_anger") or row.get("extra_anger"),
+        "requires_urgent_human_attention": row.get("analysis_urgent")
+        if row.get("analysis_urgent") is not None
+        else row.get("extra_urgent"),
+    }
+
+
+def _csv_text(rows: Iterable[dict[str, Any]], *, header: bool) -> str:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDNAMES, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    rows = list(rows)
+    # Comentarios antiguos o escritos fuera del post-llamada: PII en un lote por página.
+    comentarios = sanitize_transcriptions_pii(row.get("comentarios") or "" for row in rows)
+    for row, sanitized in zip(rows, comentarios):
+        writer.writerow(_csv_record(row, sanitized.text))
     return output.getvalue()
+
+
+def build_campaign_results_csv(rows: list[dict[str, Any]]) -> str:
+    return _csv_text((_project_row(r) for r in rows), header=True)
+
+
+def fetch_campaign_results_page(
+    campaign_id: int,
+    after: tuple[str, int] | None = None,
+    limit: int = EXPORT_PAGE_SIZE,
+) -> list[dict[str, Any]]:
+    """Página de resultados ordenada por (fecha, id) desc, tras el cursor ``after``."""
+    query = (
+        supabase.table("encuestas")
+        .select(_EXPORT_SELECT)
+        .eq("campaign_id", campaign_id)
+    )
+    if after is not None:
+        fecha, last_id = after
+        query = query.or_(f'fecha.lt."{fecha}",and(fecha.eq."{fecha}",id.lt.{int(last_id)})')
+    res = query.order("fecha", desc=True).order("id", desc=True).limit(limit).execute()
+    return res.data or []
+
+
+async def stream_campaign_results_csv(
+    campaign_id: int,
+    *,
+    gzip: bool = False,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> AsyncIterator[bytes]:
+    """CSV de la campaña por páginas; la cabecera sale antes de la primera consulta."""
+    compressor = zlib.compressobj(wbits=31) if gzip else None  # wbits=31 → formato gzip
+
+    def _encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        if compressor is None:
+            return data
+        # Sync flush: cada página sale comprimida sin esperar al final.
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    yield _encode(_csv_text((), header=True))
+
+    after: tuple[str, int] | None = None
+    while True:
+        page = await asyncio.to_thread(fetch_campaign_results_page, campaign_id, after, page_size)
+        if page:
+            chunk = _encode(_csv_text(page, header=False))
+            if chunk:
+                yield chunk
+        if len(page) < page_size:
+            break
+        last = page[-1]
+        after = (last["fecha"], last["id"])
+
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,429 @@
+"""
+campaign_lead_import.py — Importación masiva de leads de campaña.
+
+El fichero (CSV, XLSX o JSON/NDJSON) se lee registro a registro desde disco;
+la lectura, validación y normalización de teléfonos (E.164) corre en un hilo
+por lotes, fuera del event loop. Los leads válidos se reparten por hash del
+teléfono entre CAMPAIGN_LEAD_IMPORT_CONCURRENCY inserciones concurrentes de
+lotes de CAMPAIGN_LEAD_IMPORT_CHUNK filas (RPC ``insert_campaign_leads``, que
+descarta duplicados del lote y los ya existentes en la campaña). Como cada
+teléfono cae siempre en la misma inserción, dos lotes en vuelo nunca
+comparten número y la deduplicación no depende de un set en memoria.
+
+Los teléfonos se guardan en E.164 (+34612345678). Los leads insertados antes
+tal cual (612345678, "+34 612 34 56 78"...) cuentan igualmente como
+duplicados: la RPC compara la forma normalizada (``campaign_lead_phone_key``)
+y el camino legacy busca también la forma nacional.
+
+La memoria queda acotada por concurrencia × (lote en curso + lotes en cola),
+sin importar el número de leads. El progreso se publica en Redis
+(``ausarta:lead_import:<job_id>``) para que cualquier réplica lo sirva.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import itertools
+import json
+import logging
+import os
+import re
+import secrets
+import zlib
+from typing import Any, BinaryIO, Iterable, Iterator
+
+from services.redis_service import acquire_lock, get_redis, refresh_lock, release_lock
+from services.supabase_service import is_missing_rpc_error, sb_query, supabase
+from utils.sip_edge_config import normalize_e164
+
+logger = logging.getLogger("api-backend")
+
+LEAD_IMPORT_KEY_PREFIX = "ausarta:lead_import:"
+LEAD_IMPORT_TTL_SECONDS = 24 * 3600
+_LOCK_TTL_SECONDS = 600
+_READ_BATCH = 5000
+_RPC_ATTEMPTS = 3
+# Teléfonos por consulta de existencia en el camino legacy (GET con `in.(...)`).
+_LEGACY_LOOKUP_BATCH = 100
+
+_PHONE_HEADERS = {"phone", "phone_number", "telefono", "teléfono", "movil", "móvil", "numero", "número", "tel"}
+_NAME_HEADERS = {"name", "customer_name", "nombre", "cliente"}
+_DEFAULT_NAME = "Cliente"
+
+_jobs: set[asyncio.Task] = set()
+
+
+class LeadImportInProgressError(RuntimeError):
+    """Ya hay una importación en curso para la campaña."""
+
+
+# ── Lectura y normalización ────────────────────────────────────────────────────
+
+
+def normalize_lead_phone(raw: Any) -> str | None:
+    """Teléfono en E.164 o None si no es válido (9 dígitos españoles → +34)."""
+    if isinstance(raw, float) and raw.is_integer():
+        raw = int(raw)  # Excel guarda los móviles como número
+    cleaned = re.sub(r"[^\d+]", "", str(raw or ""))
+    if not cleaned:
+        return None
+    if len(cleaned) == 9 and cleaned[0] in "6789":
+        cleaned = f"+34{cleaned}"
+    try:
+        return normalize_e164(cleaned)
+    except ValueError:
+        return None
+
+
+def stored_phone_variants(phone: str) -> tuple[str, ...]:
+    """
+    Formas en que un teléfono E.164 puede estar ya guardado: antes de la
+    importación masiva los leads se insertaban tal cual (p. ej. 612345678).
+    """
+    if phone.startswith("+34") and len(phone) == 12:
+        return phone, phone[3:]
+    return (phone,)
+
+
+def normalize_lead(record: dict[str, Any]) -> dict[str, str] | None:
+    phone = normalize_lead_phone(record.get("phone_number"))
+    if phone is None:
+        return None
+    name = str(record.get("customer_name") or "").strip().strip("\"'") or _DEFAULT_NAME
+    return {"phone_number": phone, "customer_name": name[:200]}
+
+
+def _rows_to_records(rows: Iterator[list[Any]]) -> Iterator[dict[str, Any]]:
+    """Filas tabulares → registros; cabecera opcional (si no, teléfono, nombre)."""
+    first = next(rows, None)
+    if first is None:
+        return
+    headers = [str(h or "").strip().lower() for h in first]
+    phone_idx = next((i for i, h in enumerate(headers) if h in _PHONE_HEADERS), None)
+    if phone_idx is None:
+        phone_idx, name_idx = 0, 1
+        rows = itertools.chain([first], rows)
+    else:
+        name_idx = next((i for i, h in enumerate(headers) if h in _NAME_HEADERS), None)
+    for row in rows:
+        if not row or phone_idx >= len(row):
+            continue
+        name = row[name_idx] if name_idx is not None and name_idx < len(row) else None
+        yield {"phone_number": row[phone_idx], "customer_name": name}
+
+
+def _iter_json_records(text: io.TextIOBase) -> Iterator[dict[str, Any]]:
+    """Array JSON u objetos uno por línea (NDJSON), decodificados sin cargar el fichero."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    while True:
+        stripped = buffer.lstrip(" \t\r\n[,]")
+        if not stripped and eof:
+            return
+        if stripped:
+            try:
+                obj, end = decoder.raw_decode(stripped)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError("JSON de leads inválido")
+            else:
+                buffer = stripped[end:]
+                if isinstance(obj, dict):
+                    yield {
+                        "phone_number": obj.get("phone_number") or obj.get("phone") or obj.get("telefono"),
+                        "customer_name": obj.get("customer_name") or obj.get("name") or obj.get("nombre"),
+                    }
+                continue
+        chunk = text.read(64 * 1024)
+        eof = not chunk
+        buffer = stripped + chunk
+
+
+def iter_lead_records(source: BinaryIO, filename: str, content_type: str) -> Iterator[dict[str, Any]]:
+    """Registros crudos ``{phone_number, customer_name}`` de un fichero de leads."""
+    ext = (filename or "").lower().rsplit(".", 1)[-1] if "." in (filename or "") else ""
+    ctype = (content_type or "").lower()
+
+    if ext in ("xlsx", "xlsm") or "spreadsheetml" in ctype:
+        from openpyxl import load_workbook  # type: ignore
+
+        wb = load_workbook(source, read_only=True, data_only=True)
+        try:
+            sheet = wb[wb.sheetnames[0]]
+            yield from _rows_to_records(list(r) for r in sheet.iter_rows(values_only=True))
+        finally:
+            wb.close()
+        return
+
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        if ext in ("json", "jsonl", "ndjson") or "json" in ctype:
+            yield from _iter_json_records(text)
+        else:
+            # Los CSV exportados desde Excel en español suelen ir separados por ';'
+            sample = text.read(4096) + text.readline()
+            try:
+                dialect: Any = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            lines = itertools.chain(io.StringIO(sample), text)
+            yield from _rows_to_records(iter(csv.reader(lines, dialect)))
+    finally:
+        text.detach()
+
+
+# ── Progreso ───────────────────────────────────────────────────────────────────
+
+
+class LeadImportProgress:
+    """Contadores del job en un hash Redis (best-effort: sin Redis solo se loguea)."""
+
+    def __init__(self, job_id: str, campaign_id: int) -> None:
+        self.job_id = job_id
+        self.campaign_id = campaign_id
+        self.stats = {"leidos": 0, "validos": 0, "invalidos": 0, "duplicados": 0, "insertados": 0}
+        self.lock_token: str | None = None
+
+    @property
+    def key(self) -> str:
+        return f"{LEAD_IMPORT_KEY_PREFIX}{self.job_id}"
+
+    async def publish(self, status: str, error: str | None = None) -> None:
+        fields = {"status": status, "campaign_id": self.campaign_id, **self.stats}
+        if error:
+            fields["error"] = error[:500]
+        try:
+            redis = await get_redis()
+            await redis.hset(self.key, mapping=fields)
+            await redis.expire(self.key, LEAD_IMPORT_TTL_SECONDS)
+            if self.lock_token:
+                await refresh_lock(_lock_key(self.campaign_id), self.lock_token, _LOCK_TTL_SECONDS)
+        except Exception as exc:
+            logger.debug("[lead_import] Progreso no publicado (%s): %s", self.job_id, exc)
+
+
+async def get_lead_import_progress(job_id: str) -> dict[str, Any] | None:
+    redis = await get_redis()
+    raw = await redis.hgetall(f"{LEAD_IMPORT_KEY_PREFIX}{job_id}")
+    if not raw:
+        return None
+    return {k: v if k in ("status", "error") else int(v) for k, v in raw.items()}
+
+
+def _lock_key(campaign_id: int) -> str:
+    return f"lead_import:{campaign_id}"
+
+
+# ── Inserción ──────────────────────────────────────────────────────────────────
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _read_normalized_batch(iterator: Iterator[dict[str, Any]], size: int) -> tuple[int, list[dict[str, str]]]:
+    records = list(itertools.islice(iterator, size))
+    valid = [lead for lead in map(normalize_lead, records) if lead is not None]
+    return len(records), valid
+
+
+def _insert_chunk_legacy(campaign_id: int, chunk: list[dict[str, str]]) -> int:
+    """Inserción sin la RPC (migración pendiente): consulta los teléfonos ya presentes."""
+    unique = {lead["phone_number"]: lead for lead in chunk}
+    by_variant = {variant: phone for phone in unique for variant in stored_phone_variants(phone)}
+    variants = list(by_variant)
+    # Consultas cortas: con miles de teléfonos la URL del GET supera los límites del proxy.
+    for start in range(0, len(variants), _LEGACY_LOOKUP_BATCH):
+        res = (
+            supabase.table("campaign_leads")
+            .select("phone_number")
+            .eq("campaign_id", campaign_id)
+            .in_("phone_number", variants[start : start + _LEGACY_LOOKUP_BATCH])
+            .execute()
+        )
+        for row in res.data or []:
+            unique.pop(by_variant.get(row.get("phone_number"), ""), None)
+    if not unique:
+        return 0
+    supabase.table("campaign_leads").insert([
+        {**lead, "campaign_id": campaign_id, "status": "pending", "retries_attempted": 0}
+        for lead in unique.values()
+    ]).execute()
+    return len(unique)
+
+
+async def import_campaign_leads(
+    campaign_id: int,
+    records: Iterable[dict[str, Any]],
+    progress: LeadImportProgress | None = None,
+) -> dict[str, int]:
+    """
+    Normaliza, deduplica e inserta ``records`` en campaign_leads por lotes.
+
+    ``records`` puede ser un generador (se consume en un hilo). Devuelve los
+    contadores leidos / validos / invalidos / duplicados / insertados.
+    """
+    chunk_size = _env_int("CAMPAIGN_LEAD_IMPORT_CHUNK", 1000)
+    concurrency = _env_int("CAMPAIGN_LEAD_IMPORT_CONCURRENCY", 4)
+    progress = progress or LeadImportProgress(secrets.token_hex(8), campaign_id)
+    stats = progress.stats
+    queues: list[asyncio.Queue[list[dict[str, str]] | None]] = [
+        asyncio.Queue(maxsize=2) for _ in range(concurrency)
+    ]
+
+    use_rpc = True
+
+    async def _insert_chunk(chunk: list[dict[str, str]]) -> int:
+        # Los errores transitorios se reintentan sobre la RPC; solo si no está
+        # desplegada se pasa (para el resto del job) a la inserción legacy.
+        nonlocal use_rpc
+        for attempt in range(1, _RPC_ATTEMPTS + 1):
+            if not use_rpc:
+                break
+            try:
+                res = await sb_query(
+                    lambda: supabase.rpc(
+                        "insert_campaign_leads", {"p_campaign_id": campaign_id, "p_leads": chunk}
+                    ).execute()
+                )
+                return int(res.data or 0)
+            except Exception as e:
+                if is_missing_rpc_error(e, "insert_campaign_leads"):
+                    use_rpc = False
+                    logger.warning("[lead_import] RPC insert_campaign_leads no disponible (%s); inserción legacy", e)
+                    break
+                if attempt == _RPC_ATTEMPTS:
+                    raise
+                logger.warning("[lead_import] insert_campaign_leads falló (intento %d): %s", attempt, e)
+                await asyncio.sleep(0.5 * attempt)
+        return await asyncio.to_thread(_insert_chunk_legacy, campaign_id, chunk)
+
+    async def _insert_shard(queue: asyncio.Queue) -> None:
+        while (chunk := await queue.get()) is not None:
+            inserted = await _insert_chunk(chunk)
+            stats["insertados"] += inserted
+            stats["duplicados"] += len(chunk) - inserted
+            await progress.publish("running")
+
+    async def _produce() -> None:
+        iterator = iter(records)
+        shards: list[list[dict[str, str]]] = [[] for _ in range(concurrency)]
+        while True:
+            read, valid = await asyncio.to_thread(_read_normalized_batch, iterator, _READ_BATCH)
+            if not read:
+                break
+            stats["leidos"] += read
+            stats["validos"] += len(valid)
+            stats["invalidos"] += read - len(valid)
+            for lead in valid:
+                shard = zlib.crc32(lead["phone_number"].encode()) % concurrency
+                shards[shard].append(lead)
+                if len(shards[shard]) >= chunk_size:
+                    await queues[shard].put(shards[shard])
+                    shards[shard] = []
+        for shard, pending in enumerate(shards):
+            if pending:
+                await queues[shard].put(pending)
+        for queue in queues:
+            await queue.put(None)
+
+    await progress.publish("running")
+    tasks = [asyncio.create_task(_insert_shard(q)) for q in queues]
+    tasks.append(asyncio.create_task(_produce()))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    logger.info(
+        "[lead_import] Campaña %s: %d leídos, %d inválidos, %d duplicados, %d insertados",
+        campaign_id, stats["leidos"], stats["invalidos"], stats["duplicados"], stats["insertados"],
+    )
+    return dict(stats)
+
+
+# ── Jobs en segundo plano ──────────────────────────────────────────────────────
+
+
+async def start_lead_import(
+    campaign_id: int,
+    empresa_id: int | None,
+    source: BinaryIO,
+    filename: str,
+    content_type: str,
+) -> str:
+    """
+    Lanza la importación de ``source`` (fichero temporal que pasa a ser del
+    job y se cierra al acabar) y devuelve el job_id para consultar el progreso.
+    """
+    progress = LeadImportProgress(secrets.token_hex(8), campaign_id)
+    try:
+        progress.lock_token = await acquire_lock(_lock_key(campaign_id), _LOCK_TTL_SECONDS)
+        if progress.lock_token is None:
+            source.close()
+            raise LeadImportInProgressError(f"Ya hay una importación en curso para la campaña {campaign_id}")
+    except LeadImportInProgressError:
+        raise
+    except Exception as exc:
+        logger.warning("[lead_import] Sin lock Redis para la campaña %s: %s", campaign_id, exc)
+
+    await progress.publish("queued")
+    task = asyncio.create_task(_run_lead_import(progress, empresa_id, source, filename, content_type))
+    _jobs.add(task)
+    task.add_done_callback(_jobs.discard)
+    return progress.job_id
+
+
+async def _run_lead_import(
+    progress: LeadImportProgress,
+    empresa_id: int | None,
+    source: BinaryIO,
+    filename: str,
+    content_type: str,
+) -> None:
+    campaign_id = progress.campaign_id
+    try:
+        await import_campaign_leads(
+            campaign_id, iter_lead_records(source, filename, content_type), progress
+        )
+        await progress.publish("done")
+        if progress.stats["insertados"]:
+            await _tick_if_running(campaign_id, empresa_id)
+    except asyncio.CancelledError:
+        await progress.publish("failed", "Importación cancelada")
+        raise
+    except Exception as exc:
+        logger.error("[lead_import] Error importando leads en campaña %s: %s", campaign_id, exc)
+        await progress.publish("failed", str(exc))
+    finally:
+        source.close()
+        if progress.lock_token:
+            try:
+                await release_lock(_lock_key(campaign_id), progress.lock_token)
+            except Exception:
+                pass
+
+
+async def _tick_if_running(campaign_id: int, empresa_id: int | None) -> None:
+    from services.campaign_locks import enqueue_scheduler_tick
+
+    res = await sb_query(
+        lambda: supabase.table("campaigns").select("status").eq("id", campaign_id).limit(1).execute()
+    )
+    if res.data and res.data[0].get("status") in ("active", "running"):
+        await enqueue_scheduler_tick(empresa_id)
+
+
+async def close_lead_imports() -> None:
+    """Cancela las importaciones en curso (shutdown de la API)."""
+    for task in list(_jobs):
+        task.cancel()
+    if _jobs:
+        await asyncio.gather(*_jobs, return_exceptions=True)
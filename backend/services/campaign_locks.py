@@ -6,6 +6,7 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import time
 
 from config import get_settings
 from services.supabase_service import supabase
@@ -44,6 +45,9 @@ async def release_empresa_lock(empresa_id: int, token: str | None = None) -> Non
     except Exception:
         pass
     _empresas_en_llamada_fallback.discard(empresa_id)
+    from services.campaign_scheduler_queue import signal_empresa_ready
+
+    await signal_empresa_ready(empresa_id, "lock liberado")
 
 
 async def is_empresa_locked(empresa_id: int) -> bool:
@@ -56,8 +60,52 @@ async def is_empresa_locked(empresa_id: int) -> bool:
         return empresa_id in _empresas_en_llamada_fallback
 
 
+ACTIVE_CALL_LEASE_TTL = int(os.getenv("ACTIVE_CALL_LEASE_SECONDS", "900"))
+
+
+async def register_active_call(encuesta_id: int, empresa_id: int) -> str | None:
+    """
+    Registra una llamada saliente en curso (lease con TTL en Redis).
+
+    Devuelve el token del lease; None si Redis no está disponible o la llamada
+    ya estaba registrada. La baja llega con `release_active_call` (fin de
+    llamada o fallo de dispatch) o, en último caso, al caducar el lease.
+    """
+    try:
+        from services.redis_service import acquire_lock
+
+        return await acquire_lock(
+            f"call:{encuesta_id}",
+            ttl_seconds=ACTIVE_CALL_LEASE_TTL,
+            active_call_empresa_id=int(empresa_id or 0),
+        )
+    except Exception as e:
+        logger.warning(f"[RateLimit] No se pudo registrar llamada activa {encuesta_id}: {e}")
+        return None
+
+
+async def release_active_call(encuesta_id: int, token: str | None = None) -> None:
+    """
+    Da de baja una llamada del registro de llamadas activas y avisa al
+    scheduler de que hay un canal libre (para su empresa y las bloqueadas).
+    """
+    owner: int | None = None
+    try:
+        from services.redis_service import get_active_call_owner, release_lock
+
+        owner = await get_active_call_owner(f"call:{encuesta_id}")
+        if not await release_lock(f"call:{encuesta_id}", token):
+            return
+    except Exception as e:
+        logger.debug(f"[RateLimit] No se pudo liberar llamada activa {encuesta_id}: {e}")
+        return
+    from services.campaign_scheduler_queue import signal_slot_freed
+
+    await signal_slot_freed(owner)
+
+
 async def get_active_call_count() -> int:
-    """Retorna el número de empresas con llamada activa (distribuido)."""
+    """Retorna el número de llamadas activas en todas las empresas (distribuido, O(1))."""
     try:
         from services.redis_service import get_active_call_count as redis_active_count
 
@@ -66,12 +114,13 @@ async def get_active_call_count() -> int:
         return len(_empresas_en_llamada_fallback)
 
 
-async def get_active_call_count_for_empresa(empresa_id: int) -> int:
-    """
-    Retorna el número de llamadas activas (status calling/initiated/called)
-    para una empresa específica. Usado por el rate limiter por empresa.
-    """
-    if not supabase or not empresa_id:
+ACTIVE_CALL_DB_FLOOR_TTL = float(os.getenv("ACTIVE_CALL_DB_FLOOR_SECONDS", "5"))
+_db_active_floor_cache: dict[int, tuple[float, int]] = {}
+
+
+async def _count_active_encuestas(empresa_id: int) -> int:
+    """Encuestas en curso (status calling/initiated/called) de la empresa en Supabase."""
+    if not supabase:
         return 0
     try:
         res = await asyncio.to_thread(
@@ -87,11 +136,53 @@ async def get_active_call_count_for_empresa(empresa_id: int) -> int:
         return 0
 
 
-async def enqueue_scheduler_tick() -> None:
+async def _db_active_floor(empresa_id: int) -> int:
+    """Conteo en BD cacheado ACTIVE_CALL_DB_FLOOR_SECONDS por empresa (una query por ventana)."""
+    now = time.monotonic()
+    cached = _db_active_floor_cache.get(empresa_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    count = await _count_active_encuestas(empresa_id)
+    _db_active_floor_cache[empresa_id] = (now + ACTIVE_CALL_DB_FLOOR_TTL, count)
+    return count
+
+
+async def get_active_call_count_for_empresa(empresa_id: int) -> int:
+    """
+    Retorna el número de llamadas activas para una empresa específica.
+    Usado por el rate limiter por empresa.
+
+    El registro de leases en Redis solo ve las llamadas del drip y del
+    orquestador; las salientes manuales/API y las inbound solo existen como
+    encuestas en curso. Se devuelve el máximo entre el registro (exacto e
+    inmediato) y el conteo en BD, cacheado unos segundos por empresa.
+    """
+    if not empresa_id:
+        return 0
+    empresa_id = int(empresa_id)
+    registered = 0
+    try:
+        from services.redis_service import get_active_call_counts
+
+        _, registered = await get_active_call_counts(empresa_id)
+    except Exception as e:
+        logger.debug(f"[RateLimit] Registro de llamadas activas no disponible: {e}")
+    return max(registered, await _db_active_floor(empresa_id))
+
+
+async def enqueue_scheduler_tick(empresa_id: int | None = None) -> None:
     """
-    Encola una ejecución inmediata del scheduler ARQ.
-    Se usa al iniciar/reintentar campañas para no esperar al próximo cron (:00/:30).
+    Despierta al scheduler sin esperar al cron de reconciliación.
+
+    Con `empresa_id` encola solo esa empresa en la cola ready (camino normal al
+    iniciar campañas o insertar leads); sin ella encola una reconciliación
+    completa (`campaign_scheduler_task`).
     """
+    if empresa_id:
+        from services.campaign_scheduler_queue import signal_empresa_ready
+
+        await signal_empresa_ready(empresa_id, "tick")
+        return
     try:
         from services.queue_service import get_arq_pool
 
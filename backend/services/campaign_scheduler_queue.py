@@ -0,0 +1,164 @@
+"""
+Cola de trabajo del scheduler de campañas (event-driven).
+
+En lugar de recorrer todas las campañas cada 30 s, el scheduler atiende una
+cola "ready" de empresas con posible capacidad de marcado. Los eventos que
+pueden liberar o crear trabajo encolan la empresa afectada:
+
+  - Slot liberado: fin de llamada (lease de llamada activa) o liberación del
+    drip lock de la empresa.
+  - Campaña activada o leads insertados.
+  - Reintentos programados / fuera de horario: la empresa se aplaza a una cola
+    diferida y vuelve a la cola ready cuando vence.
+  - Límite global de canales: la empresa queda bloqueada hasta que se libere
+    cualquier llamada.
+
+Claves Redis (todas las operaciones de varias claves son scripts Lua):
+  ausarta:sched:ready    LIST  empresas pendientes de evaluar (FIFO)
+  ausarta:sched:queued   SET   empresas presentes en la lista (deduplicación)
+  ausarta:sched:delayed  ZSET  empresa → epoch en que debe reevaluarse
+  ausarta:sched:blocked  SET   empresas esperando cupo global
+
+Una empresa aparece como mucho una vez en la cola: ráfagas de eventos cuestan
+una sola evaluación. Una campaña sin eventos no cuesta ninguna consulta.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Iterable, Optional
+
+logger = logging.getLogger("api-backend")
+
+SCHED_READY_KEY = "ausarta:sched:ready"
+SCHED_QUEUED_KEY = "ausarta:sched:queued"
+SCHED_DELAYED_KEY = "ausarta:sched:delayed"
+SCHED_BLOCKED_KEY = "ausarta:sched:blocked"
+_PROMOTE_LIMIT = 100
+
+# KEYS = queued, ready, blocked · ARGV[1] = "1" para desbloquear todas las
+# empresas en espera de cupo global · ARGV[2..] = empresas a encolar.
+_SIGNAL_SCRIPT = """
+local function push(eid)
+    if redis.call("sadd", KEYS[1], eid) == 1 then
+        redis.call("rpush", KEYS[2], eid)
+        return 1
+    end
+    return 0
+end
+local pushed = 0
+for i = 2, #ARGV do
+    pushed = pushed + push(ARGV[i])
+end
+if ARGV[1] == "1" then
+    for _, eid in ipairs(redis.call("smembers", KEYS[3])) do
+        pushed = pushed + push(eid)
+    end
+    redis.call("del", KEYS[3])
+end
+return pushed
+"""
+
+# KEYS = delayed, queued, ready · ARGV = ahora, límite
+_PROMOTE_SCRIPT = """
+local due = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, tonumber(ARGV[2]))
+for _, eid in ipairs(due) do
+    redis.call("zrem", KEYS[1], eid)
+    if redis.call("sadd", KEYS[2], eid) == 1 then
+        redis.call("rpush", KEYS[3], eid)
+    end
+end
+return #due
+"""
+
+
+async def _signal(empresa_ids: Iterable[int], *, unblock: bool = False) -> int:
+    from services.redis_service import get_redis
+
+    ids = [str(int(e)) for e in empresa_ids if e and int(e) > 0]
+    if not ids and not unblock:
+        return 0
+    r = await get_redis()
+    pushed = await r.eval(
+        _SIGNAL_SCRIPT,
+        3,
+        SCHED_QUEUED_KEY,
+        SCHED_READY_KEY,
+        SCHED_BLOCKED_KEY,
+        "1" if unblock else "0",
+        *ids,
+    )
+    return int(pushed or 0)
+
+
+async def signal_empresa_ready(empresa_id: Optional[int], reason: str = "") -> None:
+    """Encola la empresa para evaluación inmediata (campaña activada, leads nuevos, lock libre)."""
+    try:
+        if await _signal([empresa_id or 0]):
+            logger.debug("[Scheduler] Empresa %s encolada (%s)", empresa_id, reason or "evento")
+    except Exception as e:
+        logger.warning(f"[Scheduler] No se pudo encolar empresa {empresa_id}: {e}")
+
+
+async def signal_slot_freed(empresa_id: Optional[int] = None) -> None:
+    """
+    Una llamada ha terminado: encola su empresa y las bloqueadas por el límite
+    global de canales (el canal liberado puede servir a cualquiera).
+    """
+    try:
+        await _signal([empresa_id or 0], unblock=True)
+    except Exception as e:
+        logger.warning(f"[Scheduler] No se pudo señalizar slot libre (empresa {empresa_id}): {e}")
+
+
+async def defer_empresa(empresa_id: int, delay_seconds: float) -> None:
+    """Reevalúa la empresa dentro de `delay_seconds` (conserva el vencimiento más próximo)."""
+    from services.redis_service import get_redis
+
+    r = await get_redis()
+    due = time.time() + max(0.0, float(delay_seconds))
+    await r.zadd(SCHED_DELAYED_KEY, {str(int(empresa_id)): due}, lt=True)
+
+
+async def block_empresa(empresa_id: int) -> None:
+    """Aparca la empresa hasta que se libere un canal (límite global alcanzado)."""
+    from services.redis_service import get_redis
+
+    r = await get_redis()
+    await r.sadd(SCHED_BLOCKED_KEY, str(int(empresa_id)))
+
+
+async def pop_ready_empresa(timeout_seconds: float = 1.0) -> Optional[int]:
+    """
+    Siguiente empresa de la cola ready (bloquea hasta `timeout_seconds`).
+
+    Antes de esperar mueve a la cola las empresas diferidas cuyo plazo venció.
+    La empresa sale del conjunto de deduplicación al extraerse: un evento que
+    llegue mientras se evalúa la vuelve a encolar.
+    """
+    from services.redis_service import get_redis
+
+    r = await get_redis()
+    await r.eval(
+        _PROMOTE_SCRIPT,
+        3,
+        SCHED_DELAYED_KEY,
+        SCHED_QUEUED_KEY,
+        SCHED_READY_KEY,
+        str(time.time()),
+        str(_PROMOTE_LIMIT),
+    )
+    item = await r.blpop([SCHED_READY_KEY], timeout=timeout_seconds)
+    if not item:
+        return None
+    _, raw = item
+    await r.srem(SCHED_QUEUED_KEY, raw)
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+async def signal_empresas_ready(empresa_ids: Iterable[int]) -> int:
+    """Encola varias empresas de una vez (reconciliación periódica)."""
+    return await _signal(empresa_ids)
@@ -159,12 +159,11 @@ async def _start_campaign(campaign_id: int) -> None:
         pass
 
 
-async def trigger_campaign_scheduler() -> None:
+async def trigger_campaign_scheduler(empresa_id: int) -> None:
     try:
-        from services.queue_service import get_arq_pool
+        from services.campaign_locks import enqueue_scheduler_tick
 
-        arq = await get_arq_pool()
-        await arq.enqueue_job("campaign_scheduler_task")
+        await enqueue_scheduler_tick(empresa_id)
     except Exception as exc:
         logger.warning("📣 [webhook/campaign] No se pudo encolar scheduler: %s", exc)
 
@@ -206,7 +205,7 @@ async def process_campaign_webhook(body: CampaignWebhookRequest) -> dict[str, An
         inserted = await _insert_leads(campaign_id, leads)
 
         if action == "create_and_start" or status == "active":
-            await trigger_campaign_scheduler()
+            await trigger_campaign_scheduler(empresa_id)
 
         logger.info(
             "📣 [webhook/campaign] Creada campaña %s empresa=%s leads=%s action=%s",
@@ -233,9 +232,11 @@ async def process_campaign_webhook(body: CampaignWebhookRequest) -> dict[str, An
 
         campaign = await _load_campaign_for_empresa(body.campaign_id, empresa_id)
         inserted = await _insert_leads(body.campaign_id, leads)
-        if body.auto_start and campaign.get("status") not in {"active", "running"}:
+        started = bool(body.auto_start and campaign.get("status") not in {"active", "running"})
+        if started:
             await _start_campaign(body.campaign_id)
-            await trigger_campaign_scheduler()
+        if inserted and (started or campaign.get("status") in {"active", "running"}):
+            await trigger_campaign_scheduler(empresa_id)
 
         logger.info(
             "📣 [webhook/campaign] Añadidos %s leads a campaña %s",
@@ -255,7 +256,7 @@ async def process_campaign_webhook(body: CampaignWebhookRequest) -> dict[str, An
             raise HTTPException(status_code=400, detail="campaign_id es obligatorio para start")
         await _load_campaign_for_empresa(body.campaign_id, empresa_id)
         await _start_campaign(body.campaign_id)
-        await trigger_campaign_scheduler()
+        await trigger_campaign_scheduler(empresa_id)
         logger.info("📣 [webhook/campaign] Campaña %s iniciada", body.campaign_id)
         return {
             "status": "ok",
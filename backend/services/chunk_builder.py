@@ -3,6 +3,9 @@ chunk_builder.py — Normaliza documentos a chunks semánticos (1 producto = 1 c
 
 Formato interno estándar antes de embeddings:
   {id, empresa_id, agent_id, categoria, titulo, contenido, pvp, tags, fuente, activo}
+
+Las filas de knowledge_base llevan además ``match_stats`` (frecuencias de
+tokens para el re-ranking, ver rag_hybrid.chunk_match_stats).
 """
 from __future__ import annotations
 
@@ -10,7 +13,9 @@ import json
 import re
 from datetime import date
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
+
+from services.rag_hybrid import chunk_match_stats
 
 
 def make_chunk_id(empresa_id: int, row_id: Any, nombre: str) -> str:
@@ -136,7 +141,15 @@ def chunks_to_kb_rows(
     Convierte chunks estándar en filas listas para insertar en knowledge_base.
     Cada chunk = una fila (sin re-chunking por tokens).
     """
-    rows: list[dict[str, Any]] = []
+    return list(iter_kb_rows(chunks, default_titulo=default_titulo))
+
+
+def iter_kb_rows(
+    chunks: Iterable[dict[str, Any]],
+    *,
+    default_titulo: str = "Catálogo servicios",
+) -> Iterator[dict[str, Any]]:
+    """Versión incremental de ``chunks_to_kb_rows`` (ingesta en streaming)."""
     for idx, chunk in enumerate(chunks):
         if chunk.get("activo") is False:
             continue
@@ -154,19 +167,26 @@ def chunks_to_kb_rows(
             "contenido": contenido,
             "chunk_index": idx,
             "source_type": str(chunk.get("source_type") or "jsonl"),
+            "match_stats": chunk_match_stats(titulo, contenido),
         }
         agent_id = chunk.get("agent_id")
         if agent_id is not None:
             row["agent_id"] = int(agent_id)
-        rows.append(row)
-    return rows
+        yield row
 
 
 def parse_jsonl_bytes(content: bytes, empresa_id: int | None = None) -> list[dict[str, Any]]:
     """Parsea un archivo JSONL a lista de chunks estándar."""
-    text = content.decode("utf-8", errors="replace")
-    chunks: list[dict[str, Any]] = []
-    for line_no, line in enumerate(text.splitlines(), start=1):
+    return list(iter_jsonl_chunks(content.splitlines(), empresa_id=empresa_id))
+
+
+def iter_jsonl_chunks(lines: Iterable[bytes | str], empresa_id: int | None = None) -> Iterator[dict[str, Any]]:
+    """
+    Chunks estándar línea a línea (p. ej. iterando el fichero subido), sin
+    decodificar el JSONL entero. Lanza ValueError en la primera línea inválida.
+    """
+    for line_no, raw in enumerate(lines, start=1):
+        line = raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw
         line = line.strip()
         if not line:
             continue
@@ -182,8 +202,7 @@ def parse_jsonl_bytes(content: bytes, empresa_id: int | None = None) -> list[dic
             continue
         obj.setdefault("source_type", "jsonl")
         obj.setdefault("activo", True)
-        chunks.append(obj)
-    return chunks
+        yield obj
 
 
 def write_jsonl(chunks: list[dict[str, Any]], output_path: str | Path) -> int:
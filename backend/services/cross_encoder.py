@@ -0,0 +1,127 @@
+"""
+Cross-encoder local (ONNX Runtime, CPU) para el re-ranking de chunks KB.
+
+Puntúa pares (consulta, documento) con un modelo cross-encoder pequeño y
+cuantizado, sin red: la latencia del re-ranking en llamada deja de depender
+de Groq y de su circuit breaker.
+
+El modelo se configura con RAG_CROSS_ENCODER_DIR, un directorio con:
+  - ``model.onnx``      (export ONNX del cross-encoder, p. ej. con optimum;
+                         se prefiere ``model_quantized.onnx`` si existe)
+  - ``tokenizer.json``  (tokenizer de HuggingFace `tokenizers`)
+
+Se carga una sola vez por proceso (``get_cross_encoder``) y la inferencia es
+síncrona: el llamador la ejecuta en un executor (ver reranker_service).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Sequence
+
+import numpy as np
+
+from config import get_settings
+
+logger = logging.getLogger("api-backend")
+
+_MODEL_FILES = ("model_quantized.onnx", "model.onnx")
+_TOKENIZER_FILE = "tokenizer.json"
+
+_model: "CrossEncoderModel | None" = None
+_load_failed = False
+_load_lock = threading.Lock()
+
+
+class CrossEncoderModel:
+    """Sesión ONNX + tokenizer; ``score`` devuelve una relevancia 0..1 por documento."""
+
+    def __init__(self, session: Any, tokenizer: Any, *, max_length: int = 256) -> None:
+        self._session = session
+        self._tokenizer = tokenizer
+        self._max_length = max_length
+        self._input_names = {i.name for i in session.get_inputs()}
+
+    def score(self, query: str, documents: Sequence[str], *, batch_size: int = 16) -> list[float]:
+        scores: list[float] = []
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start : start + batch_size]
+            encodings = self._tokenizer.encode_batch([(query, doc) for doc in batch])
+            width = max(len(e.ids) for e in encodings)
+            feeds: dict[str, np.ndarray] = {}
+            for name, attr in (
+                ("input_ids", "ids"),
+                ("attention_mask", "attention_mask"),
+                ("token_type_ids", "type_ids"),
+            ):
+                if name in self._input_names:
+                    feeds[name] = np.asarray(
+                        [_pad(getattr(e, attr), width) for e in encodings], dtype=np.int64
+                    )
+            logits = np.asarray(self._session.run(None, feeds)[0], dtype=np.float32)
+            scores.extend(_relevance(logits).tolist())
+        return scores
+
+    @classmethod
+    def load(cls, model_dir: str, *, max_length: int, threads: int) -> "CrossEncoderModel":
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = next(
+            (os.path.join(model_dir, f) for f in _MODEL_FILES if os.path.exists(os.path.join(model_dir, f))),
+            None,
+        )
+        if model_path is None:
+            raise FileNotFoundError(f"Sin {' ni '.join(_MODEL_FILES)} en {model_dir}")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = max(1, threads)
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        tokenizer = Tokenizer.from_file(os.path.join(model_dir, _TOKENIZER_FILE))
+        tokenizer.enable_truncation(max_length=max_length)
+        tokenizer.no_padding()
+        return cls(session, tokenizer, max_length=max_length)
+
+
+def _pad(values: Sequence[int], width: int) -> list[int]:
+    return list(values) + [0] * (width - len(values))
+
+
+def _relevance(logits: np.ndarray) -> np.ndarray:
+    """Logit único → sigmoide; dos clases → probabilidad de la clase relevante."""
+    if logits.ndim == 2 and logits.shape[1] == 2:
+        shifted = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(shifted)
+        return exp[:, 1] / exp.sum(axis=1)
+    return 1.0 / (1.0 + np.exp(-logits.reshape(-1)))
+
+
+def get_cross_encoder() -> CrossEncoderModel | None:
+    """Modelo compartido del proceso (None si no está configurado o no carga)."""
+    global _model, _load_failed
+    if _model is not None or _load_failed:
+        return _model
+    with _load_lock:
+        if _model is not None or _load_failed:
+            return _model
+        settings = get_settings()
+        model_dir = (settings.rag_cross_encoder_dir or "").strip()
+        if not model_dir:
+            logger.warning("[reranker] RAG_RERANKER=onnx sin RAG_CROSS_ENCODER_DIR; se usa el heurístico")
+            _load_failed = True
+            return None
+        try:
+            _model = CrossEncoderModel.load(
+                model_dir,
+                max_length=settings.rag_cross_encoder_max_length,
+                threads=settings.rag_cross_encoder_threads,
+            )
+            logger.info("[reranker] Cross-encoder ONNX cargado desde %s", model_dir)
+        except Exception as exc:
+            logger.warning("[reranker] Cross-encoder ONNX no disponible (%s); se usa el heurístico", exc)
+            _load_failed = True
+        return _model
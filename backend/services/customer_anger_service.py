@@ -18,6 +18,7 @@ from typing import Any, Final
 import aiohttp
 
 from config import get_settings
+from services.http_client import get_http_session
 
 logger = logging.getLogger("customer-anger")
 
@@ -217,25 +218,28 @@ async def analyze_customer_anger(transcript: str) -> CustomerAngerResult:
             {"llm.model": model, "llm.provider": "groq"},
             kind="client",
         ):
-            async with aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=timeout_s)
-            ) as session:
-                async with session.post(_GROQ_CHAT_URL, headers=headers, json=payload) as resp:
-                    if resp.status != 200:
-                        body = await resp.text()
-                        logger.warning(
-                            "Customer anger HTTP %s: %s",
-                            resp.status,
-                            body[:200],
-                        )
-                        await breaker.record_failure(RuntimeError(f"HTTP {resp.status}"))
-                        return CustomerAngerResult(
-                            customer_anger_score=1,
-                            requires_urgent_human_attention=False,
-                            skipped=True,
-                            reason=f"http_{resp.status}",
-                        )
-                    data = await resp.json()
+            session = get_http_session("groq")
+            async with session.post(
+                _GROQ_CHAT_URL,
+                headers=headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout_s),
+            ) as resp:
+                if resp.status != 200:
+                    body = await resp.text()
+                    logger.warning(
+                        "Customer anger HTTP %s: %s",
+                        resp.status,
+                        body[:200],
+                    )
+                    await breaker.record_failure(RuntimeError(f"HTTP {resp.status}"))
+                    return CustomerAngerResult(
+                        customer_anger_score=1,
+                        requires_urgent_human_attention=False,
+                        skipped=True,
+                        reason=f"http_{resp.status}",
+                    )
+                data = await resp.json()
     except asyncio.TimeoutError as exc:
         logger.debug("Customer anger timeout (%.0f ms)", timeout_s * 1000)
         await breaker.record_failure(exc, extreme=True)
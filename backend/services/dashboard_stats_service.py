@@ -0,0 +1,267 @@
+"""
+Estadísticas del dashboard: agregados calculados en SQL + snapshot en Redis.
+
+- RPC `dashboard_encuesta_stats`: totales, desglose por estado, medias de
+  puntuación y leads pendientes en una sola consulta (sin traer filas a Python).
+- Snapshot por tenant y filtros en Redis con stale-while-revalidate: dentro de
+  DASHBOARD_STATS_TTL_SECONDS se sirve tal cual; después se sirve el snapshot
+  antiguo y se recalcula en segundo plano (un único refresco por clave gracias
+  a un lock NX en Redis).
+- Si la RPC no está desplegada se usa el cálculo legacy (consultas PostgREST).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from services.redis_service import acquire_lock, cache_get, cache_set, release_lock
+from services.supabase_service import is_missing_rpc_error, sb_query, supabase
+
+logger = logging.getLogger("api-backend")
+
+STATS_FRESH_SECONDS = int(os.getenv("DASHBOARD_STATS_TTL_SECONDS", "30"))
+STATS_MAX_STALE_SECONDS = int(os.getenv("DASHBOARD_STATS_MAX_STALE_SECONDS", "600"))
+_REFRESH_LOCK_TTL = 30
+
+_inflight: dict[str, asyncio.Task[dict[str, Any]]] = {}
+_background: set[asyncio.Task[None]] = set()
+
+
+@dataclass(frozen=True)
+class DashboardStatsFilters:
+    empresa_id: Optional[int] = None
+    agent_id: Optional[int] = None
+    campaign_id: Optional[int] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+    @property
+    def snapshot_key(self) -> str:
+        # La empresa va en la clave además del prefijo de tenant: un superadmin
+        # sin filtro (todas las empresas) no debe compartir snapshot con su tenant.
+        parts = (
+            self.empresa_id or "all",
+            self.agent_id or "",
+            self.campaign_id or "",
+            self.start_date or "",
+            self.end_date or "",
+        )
+        return "dashboard:stats:" + ":".join(str(p) for p in parts)
+
+
+async def get_dashboard_stats(filters: DashboardStatsFilters) -> dict[str, Any]:
+    """Stats del dashboard desde snapshot (fresco o stale + refresco en segundo plano)."""
+    snapshot = await _read_snapshot(filters)
+    if snapshot is not None:
+        computed_at, data = snapshot
+        if time.time() - computed_at >= STATS_FRESH_SECONDS:
+            await _schedule_refresh(filters)
+        return data
+    return await _refresh(filters)
+
+
+async def _read_snapshot(filters: DashboardStatsFilters) -> tuple[float, dict[str, Any]] | None:
+    try:
+        raw = await cache_get(filters.snapshot_key, empresa_id=filters.empresa_id)
+        if not raw:
+            return None
+        payload = json.loads(raw)
+        return float(payload["computed_at"]), payload["data"]
+    except Exception as e:
+        logger.debug("[dashboard] Snapshot no disponible: %s", e)
+        return None
+
+
+async def _write_snapshot(filters: DashboardStatsFilters, data: dict[str, Any]) -> None:
+    try:
+        await cache_set(
+            filters.snapshot_key,
+            json.dumps({"computed_at": time.time(), "data": data}),
+            STATS_MAX_STALE_SECONDS,
+            empresa_id=filters.empresa_id,
+        )
+    except Exception as e:
+        logger.debug("[dashboard] No se pudo guardar snapshot: %s", e)
+
+
+async def _refresh(filters: DashboardStatsFilters) -> dict[str, Any]:
+    """Recalcula y guarda el snapshot; peticiones concurrentes comparten el cálculo."""
+    key = filters.snapshot_key
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_compute_and_store(filters))
+        _inflight[key] = task
+        task.add_done_callback(lambda _t, k=key: _inflight.pop(k, None))
+    return await asyncio.shield(task)
+
+
+async def _schedule_refresh(filters: DashboardStatsFilters) -> None:
+    if filters.snapshot_key in _inflight:
+        return
+    try:
+        token = await acquire_lock(f"{filters.snapshot_key}:refresh", ttl_seconds=_REFRESH_LOCK_TTL)
+    except Exception:
+        token = None
+    if not token:
+        return
+
+    async def _run() -> None:
+        try:
+            await _refresh(filters)
+        except Exception as e:
+            logger.warning("[dashboard] Refresco en segundo plano falló: %s", e)
+        finally:
+            try:
+                await release_lock(f"{filters.snapshot_key}:refresh", token)
+            except Exception:
+                pass
+
+    task = asyncio.create_task(_run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _compute_and_store(filters: DashboardStatsFilters) -> dict[str, Any]:
+    data = await compute_dashboard_stats(filters)
+    await _write_snapshot(filters, data)
+    return data
+
+
+async def compute_dashboard_stats(filters: DashboardStatsFilters) -> dict[str, Any]:
+    aggregates, is_question_based = await asyncio.gather(
+        _fetch_aggregates(filters),
+        asyncio.to_thread(_check_question_based, filters.agent_id, filters.campaign_id),
+    )
+    return {
+        "total_calls": int(aggregates["total_calls"] or 0),
+        "completed_calls": int(aggregates["completed_calls"] or 0),
+        "pending_calls": int(aggregates["pending_calls"] or 0),
+        "is_question_based": is_question_based,
+        "status_breakdown": aggregates.get("status_breakdown") or {},
+        "avg_scores": {
+            "comercial": round(float(aggregates.get("avg_comercial") or 0), 1),
+            "instalador": round(float(aggregates.get("avg_instalador") or 0), 1),
+            "rapidez": round(float(aggregates.get("avg_rapidez") or 0), 1),
+            "overall": round(float(aggregates.get("avg_overall") or 0), 1),
+        },
+    }
+
+
+async def _fetch_aggregates(filters: DashboardStatsFilters) -> dict[str, Any]:
+    try:
+        res = await sb_query(
+            lambda: supabase.rpc(
+                "dashboard_encuesta_stats",
+                {
+                    "p_empresa_id": filters.empresa_id,
+                    "p_agent_id": filters.agent_id,
+                    "p_campaign_id": filters.campaign_id,
+                    "p_start_date": filters.start_date,
+                    "p_end_date": filters.end_date,
+                },
+            ).execute()
+        )
+    except Exception as e:
+        # Solo la RPC sin desplegar cae al cálculo legacy (N consultas por petición);
+        # un timeout o error de BD se propaga en vez de multiplicar la carga.
+        if not is_missing_rpc_error(e, "dashboard_encuesta_stats"):
+            raise
+        logger.warning("[dashboard] RPC dashboard_encuesta_stats no disponible (%s); cálculo legacy", e)
+        return await asyncio.to_thread(_compute_aggregates_legacy, filters)
+    data = res.data
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        return data
+    raise ValueError("respuesta vacía de dashboard_encuesta_stats")
+
+
+def _filtered_encuestas(query, filters: DashboardStatsFilters):
+    if filters.empresa_id:
+        query = query.eq("empresa_id", filters.empresa_id)
+    if filters.agent_id:
+        query = query.eq("agent_id", filters.agent_id)
+    if filters.campaign_id:
+        query = query.eq("campaign_id", filters.campaign_id)
+    if filters.start_date:
+        query = query.gte("fecha", filters.start_date)
+    if filters.end_date:
+        query = query.lte("fecha", filters.end_date)
+    return query
+
+
+def _compute_aggregates_legacy(filters: DashboardStatsFilters) -> dict[str, Any]:
+    total = _filtered_encuestas(
+        supabase.table("encuestas").select("id", count="exact"), filters
+    ).execute().count or 0
+    completed = _filtered_encuestas(
+        supabase.table("encuestas").select("id", count="exact").eq("completada", 1), filters
+    ).execute().count or 0
+
+    rows = _filtered_encuestas(
+        supabase.table("encuestas").select(
+            "status, puntuacion_comercial, puntuacion_instalador, puntuacion_rapidez"
+        ),
+        filters,
+    ).execute().data or []
+    breakdown = dict(Counter((row.get("status") or "unknown") for row in rows))
+
+    def _avg(values: list[Any]) -> float:
+        return sum(values) / len(values) if values else 0.0
+
+    vals_com = [r["puntuacion_comercial"] for r in rows if r.get("puntuacion_comercial") is not None]
+    vals_ins = [r["puntuacion_instalador"] for r in rows if r.get("puntuacion_instalador") is not None]
+    vals_rap = [r["puntuacion_rapidez"] for r in rows if r.get("puntuacion_rapidez") is not None]
+
+    return {
+        "total_calls": total,
+        "completed_calls": completed,
+        "pending_calls": _count_pending_legacy(filters),
+        "status_breakdown": breakdown,
+        "avg_comercial": _avg(vals_com),
+        "avg_instalador": _avg(vals_ins),
+        "avg_rapidez": _avg(vals_rap),
+        "avg_overall": _avg(vals_com + vals_ins + vals_rap),
+    }
+
+
+def _count_pending_legacy(filters: DashboardStatsFilters) -> int:
+    q = supabase.table("campaign_leads").select("id", count="exact").eq("status", "pending")
+    if filters.empresa_id:
+        camps_res = supabase.table("campaigns").select("id").eq("empresa_id", filters.empresa_id).execute()
+        camp_ids = [c["id"] for c in camps_res.data or []]
+        if not camp_ids:
+            return 0
+        q = q.in_("campaign_id", camp_ids)
+    if filters.start_date:
+        q = q.gte("created_at", filters.start_date)
+    if filters.end_date:
+        q = q.lte("created_at", filters.end_date)
+    r = q.execute()
+    return r.count if r.count is not None else 0
+
+
+def _check_question_based(agent_id: Optional[int], campaign_id: Optional[int]) -> bool:
+    try:
+        target_agent_id = agent_id
+        if not target_agent_id and campaign_id:
+            camp_res = supabase.table("campaigns").select("agent_id").eq("id", campaign_id).limit(1).execute()
+            if camp_res.data:
+                target_agent_id = camp_res.data[0].get("agent_id")
+        if target_agent_id:
+            agent_res = supabase.table("agent_config").select("instructions").eq("id", target_agent_id).limit(1).execute()
+            if agent_res.data:
+                inst = (agent_res.data[0].get("instructions") or "").lower()
+                has_preguntas = "pregunta 1" in inst or "pregunta 2" in inst or "pregunta:" in inst
+                is_numeric = "1 al 10" in inst or "del uno al diez" in inst or "numérica" in inst or "puntuación" in inst
+                return has_preguntas and not is_numeric
+    except Exception as e:
+        logger.warning(f"⚠️ [dashboard] check_question_based falló: {e}")
+    return False
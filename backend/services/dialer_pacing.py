@@ -0,0 +1,192 @@
+"""
+Dialer con token buckets distribuidos (Redis) para marcar a ritmo constante.
+
+Antes de crear cada participante SIP, el orquestador y el drip piden un
+"token de marcado". Cada llamada consume un token de tres buckets a la vez
+(operación atómica en Lua):
+
+  ausarta:dialer:bucket:global            DIALER_GLOBAL_CPS
+  ausarta:dialer:bucket:trunk:{trunk_id}  DIALER_TRUNK_CPS   (límite del carrier)
+  ausarta:dialer:bucket:empresa:{id}      DIALER_EMPRESA_CPS
+
+Los buckets se rellenan de forma continua a `rate` tokens/s con capacidad
+`rate * DIALER_BURST_SECONDS`; si falta un token, el script devuelve cuánto
+esperar y el dialer duerme exactamente ese tiempo (sin ráfagas ni huecos).
+Un rate 0 desactiva ese bucket.
+
+Además del ritmo, el dialer respeta la concurrencia máxima (global
+MAX_CONCURRENT_CALLS y la de la empresa) leyendo el registro de llamadas
+activas. El lease de la llamada se registra al conceder el hueco, no antes:
+los leads de un lote que aún esperan turno no ocupan cupo (si no, un lote
+mayor que el límite se bloquearía a sí mismo). Tras registrar se vuelve a
+comprobar el cupo; si otro dialer se coló a la vez, se cede el hueco y se
+reintenta. Si Redis no responde, deja pasar la llamada (los guards SIP y los
+límites de admisión del scheduler siguen activos).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger("api-backend")
+
+DIALER_BUCKET_PREFIX = "ausarta:dialer:bucket:"
+_CONCURRENCY_POLL_SECONDS = 1.0
+
+# KEYS = buckets · ARGV[1] = ahora (s) · ARGV[2..] = pares rate, capacidad.
+# Devuelve "0" si concede el token (descontado en todos los buckets) o los
+# segundos a esperar hasta que el bucket más escaso tenga uno.
+_TAKE_TOKEN_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call("hmget", key, "tokens", "ts")
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    redis.call("hset", key, "tokens", levels[i] - 1, "ts", now)
+    redis.call("pexpire", key, math.ceil(capacity / rate * 1000) + 1000)
+end
+return "0"
+"""
+
+
+@dataclass(frozen=True)
+class DialBucket:
+    key: str
+    rate: float
+    capacity: float
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def dialer_max_wait_seconds() -> float:
+    return _env_float("DIALER_MAX_WAIT_SECONDS", 60.0)
+
+
+def dial_buckets(empresa_id: Optional[int], trunk_id: Optional[str]) -> list[DialBucket]:
+    """Buckets que consume una llamada de `empresa_id` por `trunk_id` (rate 0 → omitido)."""
+    burst_seconds = _env_float("DIALER_BURST_SECONDS", 1.0)
+    specs = [
+        ("global", _env_float("DIALER_GLOBAL_CPS", 5.0)),
+        (f"trunk:{trunk_id}" if trunk_id else "", _env_float("DIALER_TRUNK_CPS", 2.0)),
+        (f"empresa:{int(empresa_id)}" if empresa_id else "", _env_float("DIALER_EMPRESA_CPS", 1.0)),
+    ]
+    return [
+        DialBucket(f"{DIALER_BUCKET_PREFIX}{name}", rate, max(1.0, rate * burst_seconds))
+        for name, rate in specs
+        if name and rate > 0
+    ]
+
+
+async def take_dial_token(buckets: list[DialBucket]) -> float:
+    """Intenta consumir un token de todos los buckets. 0 = concedido; si no, segundos a esperar."""
+    if not buckets:
+        return 0.0
+    from services.redis_service import get_redis
+
+    r = await get_redis()
+    args: list[str] = [repr(time.time())]
+    for bucket in buckets:
+        args += [repr(bucket.rate), repr(bucket.capacity)]
+    wait = await r.eval(_TAKE_TOKEN_SCRIPT, len(buckets), *(b.key for b in buckets), *args)
+    return float(wait or 0)
+
+
+@dataclass(frozen=True)
+class DialSlot:
+    """Resultado de `acquire_dial_slot`: si se puede marcar y el lease registrado (si lo hay)."""
+
+    granted: bool
+    call_token: Optional[str] = None
+
+
+async def _concurrency_available(empresa_id: Optional[int], own: int = 0) -> bool:
+    """Hay cupo global y de empresa; `own` descuenta el lease recién registrado por este dialer."""
+    from services.empresa_limits_service import get_empresa_max_concurrent_calls
+    from services.redis_service import get_active_call_counts
+
+    total, tenant = await get_active_call_counts(int(empresa_id) if empresa_id else None)
+    if total - own >= int(os.getenv("MAX_CONCURRENT_CALLS", "10")):
+        return False
+    if empresa_id and tenant - own >= await get_empresa_max_concurrent_calls(int(empresa_id)):
+        return False
+    return True
+
+
+async def acquire_dial_slot(
+    *,
+    empresa_id: Optional[int],
+    trunk_id: Optional[str],
+    encuesta_id: Optional[int] = None,
+    max_wait_seconds: Optional[float] = None,
+    source: str = "unknown",
+) -> DialSlot:
+    """
+    Espera hasta poder marcar respetando ritmo (token buckets) y concurrencia.
+
+    Con `encuesta_id`, al conceder el hueco registra la llamada como activa y
+    devuelve el token del lease en `call_token` (el llamador lo libera si el
+    SIP no llega a lanzarse). `granted` es False si no hay hueco en
+    `max_wait_seconds` (por defecto DIALER_MAX_WAIT_SECONDS): el llamador
+    devuelve el lead a la cola.
+    """
+    from services.campaign_locks import register_active_call, release_active_call
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (dialer_max_wait_seconds() if max_wait_seconds is None else max_wait_seconds)
+    buckets = dial_buckets(empresa_id, trunk_id)
+    call_token: Optional[str] = None
+    try:
+        while True:
+            wait = _CONCURRENCY_POLL_SECONDS
+            if await _concurrency_available(empresa_id):
+                wait = await take_dial_token(buckets)
+                if wait <= 0:
+                    if encuesta_id is None:
+                        return DialSlot(True)
+                    call_token = await register_active_call(int(encuesta_id), int(empresa_id or 0))
+                    if call_token is None or await _concurrency_available(empresa_id, own=1):
+                        return DialSlot(True, call_token)
+                    # Otro dialer ocupó el último hueco a la vez: se cede y se reintenta
+                    # con jitter para que los que colisionaron no vuelvan a coincidir.
+                    await release_active_call(int(encuesta_id), call_token)
+                    call_token = None
+                    wait = _CONCURRENCY_POLL_SECONDS * random.uniform(0.5, 1.5)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                logger.warning(
+                    "[Dialer] Sin hueco de marcado tras la espera máxima (empresa=%s trunk=%s source=%s)",
+                    empresa_id,
+                    trunk_id,
+                    source,
+                )
+                return DialSlot(False)
+            await asyncio.sleep(min(wait, remaining))
+    except Exception as e:
+        logger.warning(f"[Dialer] Pacing no disponible, se marca sin esperar ({source}): {e}")
+        return DialSlot(True, call_token)
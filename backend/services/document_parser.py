@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import csv
 import io
 import json
-from typing import Any
+import logging
+from typing import Any, BinaryIO, Iterator
 
 from services.chunk_builder import service_row_to_chunk
 
+logger = logging.getLogger("api-backend")
+
 
 async def parse_services_excel(
     file_bytes: bytes,
@@ -15,56 +19,77 @@ async def parse_services_excel(
     fuente: str = "services_excel",
 ) -> list[dict[str, Any]]:
     """Convierte cada fila del Excel en un chunk semántico (1 producto = 1 chunk)."""
+    return list(
+        iter_services_excel(
+            io.BytesIO(file_bytes), empresa_id, sheet_name=sheet_name, agent_id=agent_id, fuente=fuente
+        )
+    )
+
+
+def iter_services_excel(
+    source: Any,
+    empresa_id: int,
+    sheet_name: str = "informe CRM",
+    agent_id: int | None = None,
+    fuente: str = "services_excel",
+) -> Iterator[dict[str, Any]]:
+    """
+    Igual que ``parse_services_excel`` pero fila a fila sobre un fichero
+    (ruta o binario con seek): openpyxl en modo read_only no carga la hoja
+    entera, así que la memoria no crece con el tamaño del catálogo.
+    """
     try:
         from openpyxl import load_workbook  # type: ignore
     except ImportError:
-        return []
-
-    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
-    sheet = wb[sheet_name] if sheet_name in wb.sheetnames else wb[wb.sheetnames[0]]
-    rows = list(sheet.iter_rows(values_only=True))
-    if not rows:
-        return []
-
-    headers = [str(h or "").strip() for h in rows[0]]
-    docs: list[dict[str, Any]] = []
-    active_rows = max(0, len(rows) - 1)
-
-    for values in rows[1:]:
-        row = {headers[idx]: values[idx] for idx in range(min(len(headers), len(values)))}
+        return
 
-        activo = row.get("Activo")
-        if activo is not None and activo != "":
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = wb[sheet_name] if sheet_name in wb.sheetnames else wb[wb.sheetnames[0]]
+        rows = sheet.iter_rows(values_only=True)
+        first = next(rows, None)
+        if first is None:
+            return
+
+        headers = [str(h or "").strip() for h in first]
+        # Dimensión declarada en el fichero; sin ella no se aplica el filtro de uds activas.
+        active_rows = max(0, (sheet.max_row or 0) - 1)
+
+        for values in rows:
+            row = {headers[idx]: values[idx] for idx in range(min(len(headers), len(values)))}
+
+            activo = row.get("Activo")
+            if activo is not None and activo != "":
+                try:
+                    if float(activo) == 0:
+                        continue
+                except (TypeError, ValueError):
+                    if str(activo).strip().lower() in {"0", "no", "false"}:
+                        continue
+
+            ofertable = str(row.get("Ofertable") or "").strip().lower()
+            activable = str(row.get("Activable") or "").strip().lower()
+            if ofertable not in {"si", "sí", "s"} and activable not in {"si", "sí", "s"}:
+                continue
+
+            uds_activas = row.get("Uds totales activas")
             try:
-                if float(activo) == 0:
-                    continue
+                uds_activas_num = float(uds_activas or 0)
             except (TypeError, ValueError):
-                if str(activo).strip().lower() in {"0", "no", "false"}:
-                    continue
-
-        ofertable = str(row.get("Ofertable") or "").strip().lower()
-        activable = str(row.get("Activable") or "").strip().lower()
-        if ofertable not in {"si", "sí", "s"} and activable not in {"si", "sí", "s"}:
-            continue
-
-        uds_activas = row.get("Uds totales activas")
-        try:
-            uds_activas_num = float(uds_activas or 0)
-        except (TypeError, ValueError):
-            uds_activas_num = 0
-        if active_rows > 50 and uds_activas_num == 0:
-            continue
-
-        chunk = service_row_to_chunk(
-            row,
-            empresa_id=empresa_id,
-            agent_id=agent_id,
-            fuente=fuente,
-        )
-        if chunk:
-            docs.append(chunk)
-
-    return docs
+                uds_activas_num = 0
+            if active_rows > 50 and uds_activas_num == 0:
+                continue
+
+            chunk = service_row_to_chunk(
+                row,
+                empresa_id=empresa_id,
+                agent_id=agent_id,
+                fuente=fuente,
+            )
+            if chunk:
+                yield chunk
+    finally:
+        wb.close()
 
 
 async def extract_text_from_docx(file_bytes: bytes) -> str:
@@ -77,6 +102,102 @@ async def extract_text_from_docx(file_bytes: bytes) -> str:
     return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
 
 
+def iter_document_text(source: BinaryIO, filename: str, content_type: str) -> Iterator[str]:
+    """
+    Texto de un fichero subido, por trozos (página de PDF, fila de Excel/CSV,
+    línea de texto) para trocearlo sin cargarlo entero en memoria.
+    JSON y DOCX se parsean completos: sus librerías no leen por partes.
+    """
+    ext = (filename or "").lower().rsplit(".", 1)[-1] if "." in (filename or "") else ""
+    content_type = (content_type or "").lower()
+    source.seek(0)
+
+    if "pdf" in content_type or ext == "pdf":
+        yield from _iter_pdf_pages(source)
+    elif ext in {"xlsx", "xls"} or "spreadsheet" in content_type or "excel" in content_type:
+        yield from _iter_excel_lines(source)
+    elif ext == "docx" or "word" in content_type:
+        try:
+            from docx import Document  # type: ignore
+
+            doc = Document(source)
+            yield from (p.text for p in doc.paragraphs if p.text.strip())
+        except Exception:
+            return
+    elif ext == "csv" or "csv" in content_type:
+        text = io.TextIOWrapper(source, encoding="utf-8", errors="replace", newline="")
+        try:
+            for row in csv.reader(text):
+                yield " | ".join(cell.strip() for cell in row if cell and cell.strip())
+        except Exception:
+            return
+        finally:
+            text.detach()
+    elif ext == "json" or "json" in content_type:
+        raw = source.read().decode("utf-8", errors="replace")
+        try:
+            yield stringify_json_document(json.loads(raw))
+        except Exception:
+            yield raw
+    else:
+        text = io.TextIOWrapper(source, encoding="utf-8", errors="replace")
+        try:
+            yield from text
+        finally:
+            text.detach()
+
+
+def _iter_pdf_pages(source: BinaryIO) -> Iterator[str]:
+    """Texto página a página. Intenta pypdf, luego pymupdf como fallback."""
+    try:
+        import pypdf  # type: ignore
+
+        reader = pypdf.PdfReader(source)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+    except ImportError:
+        pass
+
+    try:
+        import fitz  # type: ignore (PyMuPDF)
+
+        doc = fitz.open(stream=source.read(), filetype="pdf")
+        for page in doc:
+            yield page.get_text()
+        return
+    except ImportError:
+        pass
+
+    logger.warning("[knowledge] No hay librería PDF disponible (pypdf / PyMuPDF). Instala una de ellas.")
+
+
+def _iter_excel_lines(source: BinaryIO) -> Iterator[str]:
+    """Excel (.xlsx/.xls) como líneas tabuladas por fila, hoja a hoja."""
+    try:
+        from openpyxl import load_workbook  # type: ignore
+    except ImportError:
+        logger.warning("[knowledge] openpyxl no instalado: no se puede procesar Excel")
+        return
+
+    try:
+        wb = load_workbook(source, read_only=True, data_only=True)
+    except Exception as exc:
+        logger.warning("[knowledge] Error leyendo Excel: %s", exc)
+        return
+    try:
+        for sheet in wb.worksheets:
+            yield f"### Hoja: {sheet.title}"
+            for row in sheet.iter_rows(values_only=True):
+                row_vals = [str(c).strip() for c in row if c is not None and str(c).strip()]
+                if row_vals:
+                    yield " | ".join(row_vals)
+    except Exception as exc:
+        logger.warning("[knowledge] Error leyendo Excel: %s", exc)
+    finally:
+        wb.close()
+
+
 async def normalize_documents_for_preview(documents: list[dict[str, Any]]) -> list[dict[str, Any]]:
     preview: list[dict[str, Any]] = []
     for doc in documents:
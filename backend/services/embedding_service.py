@@ -1,6 +1,10 @@
 """
 Embedding Service — generación y búsqueda semántica con pgvector.
 Usa OpenAI text-embedding-3-small (1536 dims) con caché Redis 24h.
+
+- ``get_embedding``: un texto (consultas en vivo).
+- ``get_embeddings``: lote de textos para ingesta (MGET en Redis, varios
+  inputs por petición a OpenAI sobre el cliente HTTP compartido de OpenAI).
 """
 from __future__ import annotations
 
@@ -9,7 +13,7 @@ import hashlib
 import json
 import logging
 import os
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 import aiohttp
 
@@ -18,6 +22,25 @@ logger = logging.getLogger("api-backend")
 _EMBEDDING_MODEL = "text-embedding-3-small"
 _EMBEDDING_DIMS = 1536
 _CACHE_TTL = 86400  # 24h
+_OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+_MAX_INPUT_CHARS = 8000
+
+# OpenAI admite hasta 2048 inputs por petición; 128 mantiene el payload < 4 MB.
+_BATCH_MAX_INPUTS = max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", "128")))
+_BATCH_CONCURRENCY = max(1, int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", "4")))
+_BATCH_TIMEOUT_S = 60
+
+
+def _get_http_session() -> aiohttp.ClientSession:
+    """Sesión HTTP de larga duración (pool keep-alive hacia OpenAI)."""
+    from services.http_client import get_http_session
+
+    return get_http_session("openai")
+
+
+def _cache_key(text: str) -> str:
+    text_hash = hashlib.sha256(text.strip().encode()).hexdigest()
+    return f"ausarta:embedding:{text_hash}"
 
 
 async def get_embedding(text: str) -> list[float] | None:
@@ -36,8 +59,7 @@ async def get_embedding(text: str) -> list[float] | None:
         return None
 
     # Cache key basada en sha256 del texto normalizado
-    text_hash = hashlib.sha256(text.strip().encode()).hexdigest()
-    cache_key = f"ausarta:embedding:{text_hash}"
+    cache_key = _cache_key(text)
 
     # Intentar leer del cache Redis
     try:
@@ -52,35 +74,35 @@ async def get_embedding(text: str) -> list[float] | None:
     # Llamar a OpenAI con 2 reintentos
     for attempt in range(2):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.openai.com/v1/embeddings",
-                    json={"model": _EMBEDDING_MODEL, "input": text[:8000]},
-                    headers={
-                        "Authorization": f"Bearer {openai_key}",
-                        "Content-Type": "application/json",
-                    },
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        embedding: list[float] = data["data"][0]["embedding"]
-
-                        # Guardar en Redis
-                        try:
-                            from services.redis_service import get_redis
-                            r = await get_redis()
-                            await r.set(cache_key, json.dumps(embedding), ex=_CACHE_TTL)
-                        except Exception:
-                            pass
-
-                        return embedding
-
-                    body = await resp.text()
-                    logger.warning(
-                        "[embedding] OpenAI HTTP %s: %s", resp.status, body[:200]
-                    )
-                    return None
+            session = _get_http_session()
+            async with session.post(
+                _OPENAI_EMBEDDINGS_URL,
+                json={"model": _EMBEDDING_MODEL, "input": text[:_MAX_INPUT_CHARS]},
+                headers={
+                    "Authorization": f"Bearer {openai_key}",
+                    "Content-Type": "application/json",
+                },
+                timeout=aiohttp.ClientTimeout(total=10),
+            ) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    embedding: list[float] = data["data"][0]["embedding"]
+
+                    # Guardar en Redis
+                    try:
+                        from services.redis_service import get_redis
+                        r = await get_redis()
+                        await r.set(cache_key, json.dumps(embedding), ex=_CACHE_TTL)
+                    except Exception:
+                        pass
+
+                    return embedding
+
+                body = await resp.text()
+                logger.warning(
+                    "[embedding] OpenAI HTTP %s: %s", resp.status, body[:200]
+                )
+                return None
 
         except Exception as e:
             if attempt == 1:
@@ -91,6 +113,150 @@ async def get_embedding(text: str) -> list[float] | None:
     return None
 
 
+async def _cache_mget(keys: list[str]) -> list[list[float] | None]:
+    """Lee en bloque del caché Redis; cualquier fallo se trata como miss."""
+    if not keys:
+        return []
+    try:
+        from services.redis_service import get_redis
+        r = await get_redis()
+        raw = await r.mget(keys)
+    except Exception:
+        return [None] * len(keys)
+
+    out: list[list[float] | None] = []
+    for value in raw or [None] * len(keys):
+        try:
+            out.append(json.loads(value) if value else None)
+        except (TypeError, ValueError):
+            out.append(None)
+    return out
+
+
+async def _cache_store_many(items: dict[str, list[float]]) -> None:
+    if not items:
+        return
+    try:
+        from services.redis_service import get_redis
+        r = await get_redis()
+        pipe = r.pipeline(transaction=False)
+        for key, embedding in items.items():
+            pipe.set(key, json.dumps(embedding), ex=_CACHE_TTL)
+        await pipe.execute()
+    except Exception:
+        pass
+
+
+async def _request_embeddings_batch(texts: list[str], openai_key: str) -> list[list[float] | None]:
+    """Una petición a OpenAI con varios inputs; el orden se reconstruye por ``index``."""
+    for attempt in range(2):
+        try:
+            session = _get_http_session()
+            async with session.post(
+                _OPENAI_EMBEDDINGS_URL,
+                json={"model": _EMBEDDING_MODEL, "input": [t[:_MAX_INPUT_CHARS] for t in texts]},
+                headers={
+                    "Authorization": f"Bearer {openai_key}",
+                    "Content-Type": "application/json",
+                },
+                timeout=aiohttp.ClientTimeout(total=_BATCH_TIMEOUT_S),
+            ) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    out: list[list[float] | None] = [None] * len(texts)
+                    for item in data.get("data") or []:
+                        idx = int(item.get("index", -1))
+                        if 0 <= idx < len(texts):
+                            out[idx] = item.get("embedding")
+                    return out
+
+                body = await resp.text()
+                logger.warning(
+                    "[embedding] OpenAI batch HTTP %s (%d inputs): %s",
+                    resp.status, len(texts), body[:200],
+                )
+                if resp.status != 429 and resp.status < 500:
+                    break
+        except Exception as e:
+            if attempt == 1:
+                logger.error("[embedding] Error en lote de %d embeddings: %s", len(texts), e)
+                break
+        if attempt == 0:
+            await asyncio.sleep(1.0)
+
+    return [None] * len(texts)
+
+
+async def get_embeddings(texts: list[str]) -> list[list[float] | None]:
+    """
+    Genera embeddings para una lista de textos, alineados con la entrada.
+
+    Consulta el caché Redis con un único MGET, deduplica los textos que faltan
+    y los envía a OpenAI en lotes de ``EMBEDDING_BATCH_SIZE`` inputs con
+    ``EMBEDDING_BATCH_CONCURRENCY`` peticiones simultáneas. Los textos vacíos
+    o los lotes fallidos devuelven ``None`` en su posición.
+    """
+    results: list[list[float] | None] = [None] * len(texts)
+    if not texts:
+        return results
+
+    openai_key = os.getenv("OPENAI_API_KEY", "").strip()
+    if not openai_key:
+        logger.warning("[embedding] OPENAI_API_KEY no configurada — embeddings desactivados")
+        return results
+
+    positions_by_key: dict[str, list[int]] = {}
+    text_by_key: dict[str, str] = {}
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            continue
+        key = _cache_key(text)
+        positions_by_key.setdefault(key, []).append(i)
+        text_by_key.setdefault(key, text)
+
+    keys = list(positions_by_key)
+    cached = await _cache_mget(keys)
+    missing: list[str] = []
+    for key, embedding in zip(keys, cached):
+        if embedding:
+            for pos in positions_by_key[key]:
+                results[pos] = embedding
+        else:
+            missing.append(key)
+
+    if not missing:
+        return results
+
+    semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+    async def _run(batch_keys: list[str]) -> dict[str, list[float]]:
+        async with semaphore:
+            vectors = await _request_embeddings_batch(
+                [text_by_key[k] for k in batch_keys], openai_key
+            )
+        return {k: v for k, v in zip(batch_keys, vectors) if v}
+
+    batches = [
+        missing[i : i + _BATCH_MAX_INPUTS]
+        for i in range(0, len(missing), _BATCH_MAX_INPUTS)
+    ]
+    fresh: dict[str, list[float]] = {}
+    for produced in await asyncio.gather(*[_run(b) for b in batches]):
+        fresh.update(produced)
+
+    for key, embedding in fresh.items():
+        for pos in positions_by_key[key]:
+            results[pos] = embedding
+
+    await _cache_store_many(fresh)
+
+    logger.info(
+        "[embedding] Lote: %d textos, %d cache hits, %d generados en %d peticiones",
+        len(texts), len(keys) - len(missing), len(fresh), len(batches),
+    )
+    return results
+
+
 async def _search_knowledge_vector(
     empresa_id: int,
     query: str,
@@ -108,6 +274,19 @@ async def _search_knowledge_vector(
     if not embedding:
         return []
 
+    from services.knowledge_index import (
+        get_loaded_index,
+        is_knowledge_index_oversized,
+        schedule_knowledge_index_warmup,
+    )
+
+    # Empresa marcada como demasiado grande: directo al RPC, sin reprogramar la carga.
+    if not is_knowledge_index_oversized(empresa_id):
+        index = get_loaded_index(empresa_id)
+        if index is not None:
+            return index.search(embedding, limit=limit, threshold=threshold, agent_id=agent_id)
+        schedule_knowledge_index_warmup(empresa_id)
+
     rpc_args: dict[str, Any] = {
         "p_empresa_id": empresa_id,
         "p_embedding": embedding,
@@ -166,7 +345,7 @@ async def _search_knowledge_hybrid(
     agent_id: int | None,
 ) -> list[dict[str, Any]]:
     from config import get_settings
-    from services.rag_hybrid import KnowledgeChunk, reciprocal_rank_fusion
+    from services.rag_hybrid import KnowledgeChunk, reciprocal_rank_fusion, row_match_stats
     from services.reranker_service import get_reranker
 
     settings = get_settings()
@@ -200,6 +379,7 @@ async def _search_knowledge_hybrid(
                 contenido=str(row.get("contenido") or ""),
                 similarity=float(row.get("similarity") or 0.0),
                 sources=("vector",),
+                match_stats=row_match_stats(row),
             )
             for row in vector_rows
         ]
@@ -253,13 +433,17 @@ async def search_knowledge(
                 agent_id=agent_id,
             )
 
-        return await _search_knowledge_vector(
+        rows = await _search_knowledge_vector(
             empresa_id,
             query,
             limit=limit,
             threshold=threshold,
             agent_id=agent_id,
         )
+        # match_stats solo sirve al re-ranking; no sale hacia prompts ni API.
+        for row in rows:
+            row.pop("match_stats", None)
+        return rows
 
     except Exception as e:
         logger.warning("[knowledge] search_knowledge falló para empresa %s: %s", empresa_id, e)
@@ -271,23 +455,33 @@ def _split_into_chunks(text: str, max_tokens: int = 800, overlap: int = 100) ->
     Divide texto en chunks por palabras con solapamiento.
     Aproximación: 1 token ≈ 0.75 palabras (inglés/español).
     """
+    return list(iter_text_chunks([text], max_tokens=max_tokens, overlap=overlap))
+
+
+def iter_text_chunks(
+    pieces: Iterable[str], max_tokens: int = 800, overlap: int = 100
+) -> Iterator[str]:
+    """
+    Versión incremental de ``_split_into_chunks`` sobre trozos de texto
+    (páginas, líneas…): mismos chunks que sobre el texto concatenado, sin
+    tener nunca más de un chunk de palabras en memoria.
+    """
     # Convertimos tokens → palabras aproximadas
     max_words = int(max_tokens * 0.75)
     overlap_words = int(overlap * 0.75)
 
-    words = text.split()
-    if not words:
-        return []
-
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = min(start + max_words, len(words))
-        chunk = " ".join(words[start:end])
-        if chunk.strip():
-            chunks.append(chunk.strip())
-        if end >= len(words):
-            break
-        start = end - overlap_words
-
-    return chunks
+    step = max(1, max_words - overlap_words)
+
+    words: list[str] = []
+    for piece in pieces:
+        words.extend(piece.split())
+        # Índice de inicio en vez de recortar la lista en cada chunk (cuadrático
+        # con piezas enormes); se compacta una vez por pieza.
+        start = 0
+        while len(words) - start > max_words:
+            yield " ".join(words[start : start + max_words])
+            start += step
+        if start:
+            del words[:start]
+    if words:
+        yield " ".join(words)
@@ -3,15 +3,32 @@
 from __future__ import annotations
 
 import os
+import time
 
 from services.supabase_service import sb_query, supabase
 
 _DEFAULT = max(1, int(os.getenv("MAX_CALLS_PER_EMPRESA", "5")))
+_CACHE_TTL = float(os.getenv("EMPRESA_LIMITS_CACHE_SECONDS", "30"))
+_cache: dict[int, tuple[float, int]] = {}
 
 
 async def get_empresa_max_concurrent_calls(empresa_id: int) -> int:
+    """Límite de la empresa, cacheado EMPRESA_LIMITS_CACHE_SECONDS (el dialer lo consulta en cada sondeo)."""
     if not supabase or empresa_id <= 0:
         return _DEFAULT
+    now = time.monotonic()
+    cached = _cache.get(empresa_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    limit = await _fetch_empresa_max_concurrent_calls(empresa_id)
+    if limit is None:
+        return _DEFAULT
+    _cache[empresa_id] = (now + _CACHE_TTL, limit)
+    return limit
+
+
+async def _fetch_empresa_max_concurrent_calls(empresa_id: int) -> int | None:
+    """Límite configurado en BD; None si la consulta falla (no se cachea)."""
     try:
 
         def _fetch():
@@ -29,5 +46,5 @@ async def get_empresa_max_concurrent_calls(empresa_id: int) -> int:
             if raw is not None:
                 return max(1, int(raw))
     except Exception:
-        pass
+        return None
     return _DEFAULT
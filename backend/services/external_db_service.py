@@ -2,11 +2,22 @@
 External DB Service — consulta la BD externa del cliente (CRM, ERP, etc.).
 SEGURIDAD: solo ejecuta queries predefinidos en empresa_external_db.queries.
 Nunca acepta SQL libre del agente o de la API.
+
+Rendimiento (ruta de llamada en vivo):
+  - Config descifrada cacheada por empresa; invalidación entre procesos con una clave
+    de versión en Redis (INCR al guardar la config) + TTL como red de seguridad.
+  - Pools asyncpg por empresa (tamaño acotado, conexiones ociosas cerradas por asyncpg,
+    pools sin uso cerrados por LRU/inactividad).
+  - Caché de resultados de TTL corto por (empresa, query, parámetros).
 """
 from __future__ import annotations
 
 import asyncio
 import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Any
 
 import aiohttp
@@ -19,6 +30,132 @@ logger = logging.getLogger("api-backend")
 _MAX_ROWS = 20
 _QUERY_TIMEOUT = 8.0
 
+_CONFIG_TTL = float(os.getenv("EXTERNAL_DB_CONFIG_TTL_SECONDS", "300"))
+_RESULT_TTL = float(os.getenv("EXTERNAL_DB_RESULT_TTL_SECONDS", "30"))
+_RESULT_CACHE_MAX = 1024
+_POOL_MAX_SIZE = int(os.getenv("EXTERNAL_DB_POOL_MAX_SIZE", "3"))
+_POOL_IDLE_SECONDS = float(os.getenv("EXTERNAL_DB_POOL_IDLE_SECONDS", "300"))
+_MAX_POOLS = int(os.getenv("EXTERNAL_DB_MAX_POOLS", "16"))
+
+_CONFIG_VERSION_KEY = "ausarta:ext_db:version:{}"
+
+
+@dataclass
+class _CachedConfig:
+    cfg: dict | None
+    version: str | None
+    loaded_at: float
+    generation: int
+
+
+@dataclass
+class _TenantPool:
+    dsn: str
+    pool: Any
+    last_used: float
+
+
+_config_cache: dict[int, _CachedConfig] = {}
+_config_generation = 0
+_result_cache: OrderedDict[tuple, tuple[float, list[dict]]] = OrderedDict()
+_pools: OrderedDict[int, _TenantPool] = OrderedDict()
+_pools_lock = asyncio.Lock()
+
+
+def _get_http_session() -> aiohttp.ClientSession:
+    from services.http_client import get_http_session
+
+    return get_http_session("external_db")
+
+
+async def _config_version(empresa_id: int) -> str | None:
+    """Versión de la config en Redis; None si Redis no responde (manda el TTL)."""
+    try:
+        from services.redis_service import get_redis
+
+        r = await get_redis()
+        return await r.get(_CONFIG_VERSION_KEY.format(empresa_id)) or "0"
+    except Exception:
+        return None
+
+
+async def _get_config(empresa_id: int) -> _CachedConfig:
+    global _config_generation
+    version = await _config_version(empresa_id)
+    cached = _config_cache.get(empresa_id)
+    if (
+        cached is not None
+        and time.monotonic() - cached.loaded_at < _CONFIG_TTL
+        and (version is None or cached.version is None or version == cached.version)
+    ):
+        return cached
+
+    config_res = await sb_query(
+        lambda eid=empresa_id: supabase.table("empresa_external_db")
+        .select(
+            "db_type, connection_url, api_url, api_key_enc, "
+            "api_key_header, queries, activo"
+        )
+        .eq("empresa_id", eid)
+        .eq("activo", True)
+        .limit(1)
+        .execute()
+    )
+    cfg = dict(config_res.data[0]) if config_res.data else None
+    if cfg:
+        cfg["connection_url"] = _decrypt_or_raw(cfg.get("connection_url") or "")
+        cfg["api_key"] = _decrypt_or_raw(cfg.pop("api_key_enc", None) or "")
+
+    _config_generation += 1
+    entry = _CachedConfig(cfg=cfg, version=version, loaded_at=time.monotonic(), generation=_config_generation)
+    _config_cache[empresa_id] = entry
+    return entry
+
+
+def _decrypt_or_raw(value: str) -> str:
+    if not value:
+        return ""
+    try:
+        return decrypt_data(value)
+    except Exception:
+        return value
+
+
+async def invalidate_external_db_config(empresa_id: int) -> None:
+    """Invalida la config cacheada de la empresa en este y en el resto de procesos."""
+    _config_cache.pop(empresa_id, None)
+    for key in [k for k in _result_cache if k[0] == empresa_id]:
+        _result_cache.pop(key, None)
+    try:
+        from services.redis_service import get_redis
+
+        r = await get_redis()
+        await r.incr(_CONFIG_VERSION_KEY.format(empresa_id))
+    except Exception as e:
+        logger.warning("[ext_db] No se pudo publicar invalidación empresa %s: %s", empresa_id, e)
+
+
+def _result_cache_get(key: tuple) -> list[dict] | None:
+    hit = _result_cache.get(key)
+    if hit is None:
+        return None
+    expires_at, rows = hit
+    if expires_at < time.monotonic():
+        _result_cache.pop(key, None)
+        return None
+    _result_cache.move_to_end(key)
+    # Copia: el caller puede modificar las filas sin alterar la caché compartida.
+    return [dict(row) for row in rows]
+
+
+def _result_cache_put(key: tuple, rows: list[dict]) -> None:
+    if _RESULT_TTL <= 0:
+        return
+    _result_cache[key] = (time.monotonic() + _RESULT_TTL, [dict(row) for row in rows])
+    _result_cache.move_to_end(key)
+    while len(_result_cache) > _RESULT_CACHE_MAX:
+        _result_cache.popitem(last=False)
+
 
 async def query_external_db(
     empresa_id: int,
@@ -37,21 +174,11 @@ async def query_external_db(
         return None
 
     try:
-        config_res = await sb_query(
-            lambda eid=empresa_id: supabase.table("empresa_external_db")
-            .select(
-                "db_type, connection_url, api_url, api_key_enc, "
-                "api_key_header, queries, activo"
-            )
-            .eq("empresa_id", eid)
-            .eq("activo", True)
-            .limit(1)
-            .execute()
-        )
-        if not config_res.data:
+        cached = await _get_config(empresa_id)
+        cfg = cached.cfg
+        if not cfg:
             return None
 
-        cfg = config_res.data[0]
         queries: dict = cfg.get("queries") or {}
 
         # SECURITY: solo queries en lista blanca
@@ -62,15 +189,22 @@ async def query_external_db(
             )
             return None
 
+        cache_key = (empresa_id, cached.generation, query_name, tuple(str(p) for p in params or []))
+        hit = _result_cache_get(cache_key)
+        if hit is not None:
+            return hit
+
         db_type = (cfg.get("db_type") or "rest").lower()
 
         result = await asyncio.wait_for(
-            _execute_query(cfg, db_type, query_name, queries[query_name], params or []),
+            _execute_query(empresa_id, cfg, db_type, query_name, queries[query_name], params or []),
             timeout=_QUERY_TIMEOUT,
         )
         if result is None:
             return None
-        return result[:_MAX_ROWS]
+        rows = result[:_MAX_ROWS]
+        _result_cache_put(cache_key, rows)
+        return rows
 
     except asyncio.TimeoutError:
         logger.warning(
@@ -84,6 +218,7 @@ async def query_external_db(
 
 
 async def _execute_query(
+    empresa_id: int,
     cfg: dict,
     db_type: str,
     query_name: str,
@@ -91,11 +226,12 @@ async def _execute_query(
     params: list[Any],
 ) -> list[dict] | None:
     if db_type in ("postgresql", "postgres"):
-        return await _query_postgres(cfg, query_template, params)
+        return await _query_postgres(empresa_id, cfg, query_template, params)
     return await _query_rest_api(cfg, query_name, params)
 
 
 async def _query_postgres(
+    empresa_id: int,
     cfg: dict,
     query_template: Any,
     params: list[Any],
@@ -107,15 +243,10 @@ async def _query_postgres(
         logger.warning("[ext_db] asyncpg no disponible. Instala con: pip install asyncpg")
         return None
 
-    connection_url_raw = cfg.get("connection_url") or ""
-    if not connection_url_raw:
+    connection_url = cfg.get("connection_url") or ""
+    if not connection_url:
         return None
 
-    try:
-        connection_url = decrypt_data(connection_url_raw)
-    except Exception:
-        connection_url = connection_url_raw
-
     sql = (
         query_template
         if isinstance(query_template, str)
@@ -125,17 +256,63 @@ async def _query_postgres(
         return None
 
     try:
-        conn = await asyncpg.connect(connection_url, timeout=5)
-        try:
+        pool = await _get_pool(empresa_id, connection_url, asyncpg)
+        async with pool.acquire() as conn:
             rows = await conn.fetch(sql, *params)
             return [dict(row) for row in rows]
-        finally:
-            await conn.close()
     except Exception as pg_err:
         logger.warning("[ext_db] PostgreSQL error: %s", pg_err)
         return None
 
 
+async def _get_pool(empresa_id: int, dsn: str, asyncpg: Any) -> Any:
+    """Pool asyncpg de la empresa; lo recrea si cambió la URL y cierra los ociosos."""
+    now = time.monotonic()
+    async with _pools_lock:
+        entry = _pools.get(empresa_id)
+        if entry is not None and entry.dsn == dsn:
+            entry.last_used = now
+            _pools.move_to_end(empresa_id)
+            return entry.pool
+
+        stale: list[Any] = []
+        if entry is not None:
+            stale.append(_pools.pop(empresa_id).pool)
+        for eid in [e for e, p in _pools.items() if now - p.last_used > _POOL_IDLE_SECONDS]:
+            stale.append(_pools.pop(eid).pool)
+        while len(_pools) >= _MAX_POOLS:
+            stale.append(_pools.popitem(last=False)[1].pool)
+
+        pool = await asyncpg.create_pool(
+            dsn,
+            min_size=0,
+            max_size=_POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=60,
+            timeout=5,
+        )
+        _pools[empresa_id] = _TenantPool(dsn=dsn, pool=pool, last_used=now)
+
+    for old_pool in stale:
+        asyncio.create_task(_close_pool(old_pool))
+    return pool
+
+
+async def _close_pool(pool: Any) -> None:
+    try:
+        await asyncio.wait_for(pool.close(), timeout=5)
+    except Exception:
+        pool.terminate()
+
+
+async def close_external_db_pools() -> None:
+    """Cierra los pools asyncpg (llamar en shutdown; la sesión HTTP es de services.http_client)."""
+    async with _pools_lock:
+        pools = [p.pool for p in _pools.values()]
+        _pools.clear()
+    for pool in pools:
+        await _close_pool(pool)
+
+
 async def _query_rest_api(
     cfg: dict,
     query_name: str,
@@ -143,19 +320,12 @@ async def _query_rest_api(
 ) -> list[dict] | None:
     """Llama a la REST API externa con los parámetros como query params."""
     api_url = (cfg.get("api_url") or "").rstrip("/")
-    api_key_enc = cfg.get("api_key_enc") or ""
+    api_key = cfg.get("api_key") or ""
     api_key_header = cfg.get("api_key_header") or "Authorization"
 
     if not api_url:
         return None
 
-    api_key = ""
-    if api_key_enc:
-        try:
-            api_key = decrypt_data(api_key_enc)
-        except Exception:
-            api_key = api_key_enc
-
     headers: dict = {}
     if api_key:
         if api_key_header.lower() == "authorization":
@@ -168,24 +338,24 @@ async def _query_rest_api(
         req_params[f"param{i}"] = str(p)
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{api_url}/{query_name}",
-                params=req_params,
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=5),
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if isinstance(data, list):
-                        return data
-                    if isinstance(data, dict):
-                        return [data]
-                    return []
-                logger.warning(
-                    "[ext_db] REST API HTTP %s para '%s'", resp.status, query_name
-                )
-                return None
+        session = _get_http_session()
+        async with session.get(
+            f"{api_url}/{query_name}",
+            params=req_params,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=5),
+        ) as resp:
+            if resp.status == 200:
+                data = await resp.json()
+                if isinstance(data, list):
+                    return data
+                if isinstance(data, dict):
+                    return [data]
+                return []
+            logger.warning(
+                "[ext_db] REST API HTTP %s para '%s'", resp.status, query_name
+            )
+            return None
     except Exception as rest_err:
         logger.warning("[ext_db] REST API error: %s", rest_err)
         return None
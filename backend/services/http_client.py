@@ -0,0 +1,85 @@
+"""
+Clientes HTTP compartidos del proceso, uno por proveedor externo.
+
+Abrir un `aiohttp.ClientSession` por petición obliga a pagar DNS + TCP + TLS
+en cada llamada y, con concurrencia, agota puertos efímeros. Aquí cada
+proveedor (openai, groq, bridge, external_db, web_search…) tiene una sesión
+de larga duración con:
+
+  - pool keep-alive por host y caché DNS;
+  - un tope de conexiones que acota la concurrencia contra ese proveedor
+    (HTTP_MAX_CONNECTIONS_<PROVEEDOR>); las peticiones que exceden esperan
+    conexión libre dentro de su propio timeout.
+
+aiohttp no implementa HTTP/2: la reutilización es HTTP/1.1 keep-alive.
+
+Las sesiones pertenecen al event loop que las creó; si el loop cambia (tests,
+procesos de job del agente) se crea otra. Se cierran con `close_http_clients`
+en el lifespan de FastAPI, el shutdown del worker ARQ y el cleanup del job
+del agente.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+
+import aiohttp
+
+logger = logging.getLogger("api-backend")
+
+_DEFAULT_MAX_CONNECTIONS = 32
+_PROVIDER_MAX_CONNECTIONS = {
+    "openai": 16,
+    "groq": 32,
+    "bridge": 16,
+    "external_db": 20,
+    "web_search": 8,
+}
+_KEEPALIVE_SECONDS = 60
+_DNS_CACHE_SECONDS = 300
+
+# proveedor → (loop dueño, sesión)
+_clients: dict[str, tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = {}
+
+
+def provider_max_connections(provider: str) -> int:
+    raw = os.getenv(f"HTTP_MAX_CONNECTIONS_{provider.upper()}")
+    if raw:
+        try:
+            return max(1, int(raw))
+        except ValueError:
+            logger.warning(f"HTTP_MAX_CONNECTIONS_{provider.upper()} inválido: {raw!r}")
+    return _PROVIDER_MAX_CONNECTIONS.get(provider, _DEFAULT_MAX_CONNECTIONS)
+
+
+def get_http_session(provider: str) -> aiohttp.ClientSession:
+    """Sesión compartida del proveedor (se crea al primer uso en el loop actual)."""
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(provider)
+    if entry is not None and entry[0] is loop and not entry[1].closed:
+        return entry[1]
+    limit = provider_max_connections(provider)
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit,
+            ttl_dns_cache=_DNS_CACHE_SECONDS,
+            keepalive_timeout=_KEEPALIVE_SECONDS,
+        ),
+    )
+    _clients[provider] = (loop, session)
+    return session
+
+
+async def close_http_clients() -> None:
+    """Cierra las sesiones del loop actual y olvida las de loops ya terminados."""
+    loop = asyncio.get_running_loop()
+    for provider, (owner, session) in list(_clients.items()):
+        _clients.pop(provider, None)
+        if owner is not loop or session.closed:
+            continue
+        try:
+            await session.close()
+        except Exception as e:
+            logger.debug(f"Error cerrando cliente HTTP {provider}: {e}")
@@ -0,0 +1,483 @@
+"""
+knowledge_index.py — Índice vectorial en memoria por empresa (RAG en llamada).
+
+Evita el round-trip PostgREST de ``search_knowledge_base`` durante la llamada:
+cada proceso (worker del agente, API) mantiene una matriz float32 normalizada
+con los embeddings de la empresa y resuelve la similitud coseno con un único
+producto matriz·vector (sub-milisegundo para KBs por tenant de miles de chunks).
+
+Ciclo de vida:
+  - ``schedule_knowledge_index_warmup``: carga en segundo plano (arranque de job).
+  - ``get_loaded_index``: devuelve el índice solo si ya está caliente (nunca
+    bloquea la búsqueda; si no lo está, el caller usa el RPC).
+  - ``publish_knowledge_change``: lo llama routers/knowledge.py tras insertar o
+    borrar filas; el listener Redis de cada proceso aplica el cambio de forma
+    incremental (upsert por ids / borrado por ids).
+
+Semántica de scope idéntica al RPC: ``agent_id=None`` → solo documentos de
+empresa (agent_id NULL); con ``agent_id`` → empresa + documentos del agente.
+
+Activación: ``RAG_ANN_INDEX_ENABLED=true``. Tenants por encima de
+``RAG_ANN_MAX_VECTORS`` siguen usando pgvector: se marcan durante
+``RAG_ANN_OVERSIZE_TTL_SECONDS`` para no repetir la carga en cada búsqueda.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+import numpy as np
+
+from config import get_settings
+
+logger = logging.getLogger("api-backend")
+
+KB_CHANGES_CHANNEL = "ausarta:kb:changes"
+KB_VERSION_KEY_PREFIX = "ausarta:kb:version:"
+
+_EMBEDDING_DIMS = 1536
+_NO_AGENT = -1
+_LOAD_PAGE_SIZE = 500
+_FETCH_IDS_CHUNK = 200
+_LOAD_ATTEMPTS = 3
+
+_indexes: "OrderedDict[int, KnowledgeVectorIndex]" = OrderedDict()
+_loading: dict[int, asyncio.Task] = {}
+# Cambios recibidos mientras se carga el índice de la empresa (se aplican al terminar).
+_pending_changes: dict[int, list[dict[str, Any]]] = {}
+_listener_task: asyncio.Task | None = None
+# Empresas demasiado grandes para el índice → instante (monotonic) hasta el que no se reintenta.
+_oversized: dict[int, float] = {}
+
+
+def _parse_embedding(raw: Any) -> np.ndarray | None:
+    """pgvector llega por PostgREST como texto ``"[0.1,...]"`` o como lista."""
+    if raw is None:
+        return None
+    try:
+        values = json.loads(raw) if isinstance(raw, str) else raw
+        vec = np.asarray(values, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+    if vec.ndim != 1 or vec.shape[0] != _EMBEDDING_DIMS:
+        return None
+    norm = float(np.linalg.norm(vec))
+    if norm == 0.0:
+        return None
+    return vec / norm
+
+
+class KnowledgeVectorIndex:
+    """Índice exacto (coseno) sobre una matriz contigua de embeddings normalizados."""
+
+    def __init__(self, empresa_id: int, *, version: int = 0) -> None:
+        self.empresa_id = empresa_id
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._agent_ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, _EMBEDDING_DIMS), dtype=np.float32)
+        self._meta: dict[int, tuple[str, str, Any]] = {}
+
+    def __len__(self) -> int:
+        return int(self._ids.shape[0])
+
+    def upsert(self, rows: Iterable[dict[str, Any]]) -> int:
+        """Añade o reemplaza filas de knowledge_base (``id``, ``embedding``, ...)."""
+        new_ids: list[int] = []
+        new_agents: list[int] = []
+        new_vecs: list[np.ndarray] = []
+        for row in rows:
+            vec = _parse_embedding(row.get("embedding"))
+            if vec is None:
+                continue
+            chunk_id = int(row["id"])
+            agent_id = row.get("agent_id")
+            new_ids.append(chunk_id)
+            new_agents.append(int(agent_id) if agent_id is not None else _NO_AGENT)
+            new_vecs.append(vec)
+            self._meta[chunk_id] = (
+                str(row.get("titulo") or ""),
+                str(row.get("contenido") or ""),
+                row.get("match_stats"),
+            )
+
+        if not new_ids:
+            return 0
+
+        ids_arr = np.asarray(new_ids, dtype=np.int64)
+        keep = ~np.isin(self._ids, ids_arr)
+        self._ids = np.concatenate([self._ids[keep], ids_arr])
+        self._agent_ids = np.concatenate(
+            [self._agent_ids[keep], np.asarray(new_agents, dtype=np.int64)]
+        )
+        self._matrix = np.ascontiguousarray(
+            np.vstack([self._matrix[keep], np.stack(new_vecs)])
+        )
+        return len(new_ids)
+
+    def remove(self, chunk_ids: Iterable[int]) -> int:
+        ids_arr = np.asarray([int(i) for i in chunk_ids], dtype=np.int64)
+        if ids_arr.size == 0 or len(self) == 0:
+            return 0
+        drop = np.isin(self._ids, ids_arr)
+        removed = int(drop.sum())
+        if removed:
+            keep = ~drop
+            self._ids = self._ids[keep]
+            self._agent_ids = self._agent_ids[keep]
+            self._matrix = np.ascontiguousarray(self._matrix[keep])
+        for chunk_id in ids_arr.tolist():
+            self._meta.pop(int(chunk_id), None)
+        return removed
+
+    def search(
+        self,
+        embedding: list[float],
+        *,
+        limit: int,
+        threshold: float,
+        agent_id: int | None,
+    ) -> list[dict[str, Any]]:
+        """Mismo contrato que el RPC: ``[{id, titulo, contenido, similarity, match_stats}]``."""
+        if len(self) == 0:
+            return []
+        query = _parse_embedding(embedding)
+        if query is None:
+            return []
+
+        limit = max(1, min(int(limit), 20))
+        threshold = max(0.0, min(float(threshold), 1.0))
+
+        scores = self._matrix @ query
+        if agent_id is None:
+            scope = self._agent_ids == _NO_AGENT
+        else:
+            scope = (self._agent_ids == _NO_AGENT) | (self._agent_ids == int(agent_id))
+        candidates = np.flatnonzero(scope & (scores >= threshold))
+        if candidates.size == 0:
+            return []
+
+        if candidates.size > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        ordered = candidates[np.argsort(-scores[candidates])]
+
+        results: list[dict[str, Any]] = []
+        for pos in ordered.tolist():
+            chunk_id = int(self._ids[pos])
+            titulo, contenido, match_stats = self._meta.get(chunk_id, ("", "", None))
+            results.append(
+                {
+                    "id": chunk_id,
+                    "titulo": titulo,
+                    "contenido": contenido,
+                    "similarity": float(scores[pos]),
+                    "match_stats": match_stats,
+                }
+            )
+        return results
+
+
+# ──────────────────────────────────────────────
+# Registro por proceso
+# ──────────────────────────────────────────────
+
+def _enabled() -> bool:
+    return bool(get_settings().rag_ann_index_enabled)
+
+
+def get_loaded_index(empresa_id: int) -> KnowledgeVectorIndex | None:
+    """Índice caliente de la empresa o None (no dispara carga)."""
+    index = _indexes.get(int(empresa_id))
+    if index is not None:
+        _indexes.move_to_end(int(empresa_id))
+    return index
+
+
+def _store_index(index: KnowledgeVectorIndex) -> None:
+    _indexes[index.empresa_id] = index
+    _indexes.move_to_end(index.empresa_id)
+    max_tenants = max(1, int(get_settings().rag_ann_max_tenants))
+    while len(_indexes) > max_tenants:
+        evicted, _ = _indexes.popitem(last=False)
+        logger.info("[kb-index] Índice de empresa %s desalojado (LRU)", evicted)
+
+
+def is_knowledge_index_oversized(empresa_id: int) -> bool:
+    """True si la última carga superó RAG_ANN_MAX_VECTORS y el marcador sigue vigente."""
+    until = _oversized.get(int(empresa_id))
+    if until is None:
+        return False
+    if time.monotonic() >= until:
+        _oversized.pop(int(empresa_id), None)
+        return False
+    return True
+
+
+def drop_knowledge_index(empresa_id: int) -> None:
+    _indexes.pop(int(empresa_id), None)
+
+
+async def _current_version(empresa_id: int) -> int:
+    try:
+        from services.redis_service import get_redis
+
+        r = await get_redis()
+        raw = await r.get(f"{KB_VERSION_KEY_PREFIX}{empresa_id}")
+        return int(raw or 0)
+    except Exception:
+        return 0
+
+
+async def _fetch_rows(empresa_id: int, *, ids: list[int] | None = None) -> list[dict[str, Any]]:
+    from services.supabase_service import supabase, sb_query
+
+    if not supabase:
+        return []
+
+    columns = "id, titulo, contenido, agent_id, embedding, match_stats"
+    rows: list[dict[str, Any]] = []
+
+    if ids is not None:
+        for i in range(0, len(ids), _FETCH_IDS_CHUNK):
+            part = ids[i : i + _FETCH_IDS_CHUNK]
+            res = await sb_query(
+                lambda p=part: supabase.table("knowledge_base")
+                .select(columns)
+                .eq("empresa_id", empresa_id)
+                .in_("id", p)
+                .execute()
+            )
+            rows.extend(res.data or [])
+        return rows
+
+    max_vectors = int(get_settings().rag_ann_max_vectors)
+    offset = 0
+    while True:
+        res = await sb_query(
+            lambda off=offset: supabase.table("knowledge_base")
+            .select(columns)
+            .eq("empresa_id", empresa_id)
+            .not_.is_("embedding", "null")
+            .order("id")
+            .range(off, off + _LOAD_PAGE_SIZE - 1)
+            .execute()
+        )
+        batch = list(res.data or [])
+        rows.extend(batch)
+        if len(rows) > max_vectors:
+            raise OverflowError(f"{len(rows)} > RAG_ANN_MAX_VECTORS={max_vectors}")
+        if len(batch) < _LOAD_PAGE_SIZE:
+            return rows
+        offset += _LOAD_PAGE_SIZE
+
+
+async def load_knowledge_index(empresa_id: int) -> KnowledgeVectorIndex | None:
+    """
+    Carga (o recarga) el índice completo de una empresa.
+
+    Los cambios publicados durante la carga se acumulan y se aplican sobre el
+    índice recién cargado; si la versión avanzó sin que llegaran (o faltan
+    mensajes), se repite la carga para no dejar el índice desfasado.
+    """
+    started = time.perf_counter()
+    for attempt in range(1, _LOAD_ATTEMPTS + 1):
+        _pending_changes[empresa_id] = []
+        try:
+            version = await _current_version(empresa_id)
+            try:
+                rows = await _fetch_rows(empresa_id)
+            except OverflowError as exc:
+                ttl = max(0, int(get_settings().rag_ann_oversize_ttl_seconds))
+                _oversized[empresa_id] = time.monotonic() + ttl
+                logger.info(
+                    "[kb-index] Empresa %s demasiado grande para índice en memoria (%s); RPC durante %ss",
+                    empresa_id, exc, ttl,
+                )
+                return None
+            index = KnowledgeVectorIndex(empresa_id, version=version)
+            await asyncio.to_thread(index.upsert, rows)
+            latest = await _current_version(empresa_id)
+        finally:
+            buffered = _pending_changes.pop(empresa_id, [])
+
+        for message in sorted(buffered, key=lambda m: int(m.get("version") or 0)):
+            message_version = int(message.get("version") or 0)
+            if message_version <= index.version:
+                continue
+            if message.get("reload") or message_version > index.version + 1:
+                break
+            await _apply_to_index(index, message)
+        if index.version >= latest or attempt == _LOAD_ATTEMPTS:
+            break
+        logger.info(
+            "[kb-index] KB de empresa %s cambió durante la carga (v%s → v%s); recargando",
+            empresa_id, index.version, latest,
+        )
+
+    _store_index(index)
+    logger.info(
+        "[kb-index] Empresa %s cargada: %d vectores en %.0f ms",
+        empresa_id, len(index), (time.perf_counter() - started) * 1000,
+    )
+    return index
+
+
+def schedule_knowledge_index_warmup(empresa_id: int) -> asyncio.Task | None:
+    """Programa la carga en segundo plano (idempotente). No bloquea al caller."""
+    if not empresa_id or not _enabled():
+        return None
+    empresa_id = int(empresa_id)
+    if empresa_id in _indexes or is_knowledge_index_oversized(empresa_id):
+        return None
+    pending = _loading.get(empresa_id)
+    if pending is not None and not pending.done():
+        return pending
+
+    async def _run() -> None:
+        try:
+            await load_knowledge_index(empresa_id)
+            ensure_knowledge_change_listener()
+        except Exception as exc:
+            logger.warning("[kb-index] No se pudo cargar índice de empresa %s: %s", empresa_id, exc)
+        finally:
+            _loading.pop(empresa_id, None)
+
+    task = asyncio.create_task(_run())
+    _loading[empresa_id] = task
+    return task
+
+
+# ──────────────────────────────────────────────
+# Propagación de cambios (Redis pub/sub)
+# ──────────────────────────────────────────────
+
+async def publish_knowledge_change(
+    empresa_id: int,
+    *,
+    upserted_ids: list[int] | None = None,
+    deleted_ids: list[int] | None = None,
+    reload: bool = False,
+) -> None:
+    """Notifica a todos los procesos un cambio en knowledge_base. Nunca lanza."""
+    if not empresa_id:
+        return
+    message = {
+        "empresa_id": int(empresa_id),
+        "upserted_ids": [int(i) for i in upserted_ids or []],
+        "deleted_ids": [int(i) for i in deleted_ids or []],
+        "reload": bool(reload),
+    }
+    try:
+        from services.redis_service import get_redis
+
+        r = await get_redis()
+        message["version"] = int(await r.incr(f"{KB_VERSION_KEY_PREFIX}{int(empresa_id)}"))
+        await r.publish(KB_CHANGES_CHANNEL, json.dumps(message))
+    except Exception as exc:
+        logger.warning("[kb-index] No se pudo publicar cambio KB empresa %s: %s", empresa_id, exc)
+        return
+    # El proceso que publica también aplica el cambio aunque no tenga listener.
+    await apply_knowledge_change(message)
+
+
+async def apply_knowledge_change(message: dict[str, Any]) -> None:
+    empresa_id = int(message.get("empresa_id") or 0)
+    index = _indexes.get(empresa_id)
+    if index is None:
+        if empresa_id in _pending_changes:
+            _pending_changes[empresa_id].append(message)
+        return
+
+    version = int(message.get("version") or 0)
+    if version and version <= index.version:
+        return
+    if message.get("reload") or (version and version > index.version + 1):
+        # Mensajes perdidos o borrado sin ids: recarga completa en segundo plano.
+        drop_knowledge_index(empresa_id)
+        schedule_knowledge_index_warmup(empresa_id)
+        return
+
+    await _apply_to_index(index, message)
+
+
+async def _apply_to_index(index: KnowledgeVectorIndex, message: dict[str, Any]) -> None:
+    """Aplica un cambio incremental (borrado / upsert por ids) y avanza la versión."""
+    version = int(message.get("version") or 0)
+    if version:
+        index.version = version
+    deleted = message.get("deleted_ids") or []
+    upserted = message.get("upserted_ids") or []
+    if deleted:
+        index.remove(deleted)
+    if upserted:
+        rows = await _fetch_rows(index.empresa_id, ids=[int(i) for i in upserted])
+        index.upsert(rows)
+
+
+async def _listen_for_changes() -> None:
+    from services.redis_service import get_redis
+
+    backoff = 1.0
+    while True:
+        pubsub = None
+        try:
+            r = await get_redis()
+            pubsub = r.pubsub()
+            await pubsub.subscribe(KB_CHANGES_CHANNEL)
+            backoff = 1.0
+            # Al (re)conectar pueden haberse perdido mensajes: validar versiones.
+            for empresa_id, index in list(_indexes.items()):
+                if await _current_version(empresa_id) != index.version:
+                    drop_knowledge_index(empresa_id)
+                    schedule_knowledge_index_warmup(empresa_id)
+            async for msg in pubsub.listen():
+                if msg.get("type") != "message":
+                    continue
+                try:
+                    await apply_knowledge_change(json.loads(msg["data"]))
+                except Exception as exc:
+                    logger.warning("[kb-index] Cambio KB no aplicado: %s", exc)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("[kb-index] Listener de cambios KB caído (%s); reintento en %.0fs", exc, backoff)
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+
+def ensure_knowledge_change_listener() -> None:
+    """Arranca (una vez por proceso) el suscriptor de cambios de la KB."""
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_for_changes())
+
+
+async def close_knowledge_index() -> None:
+    """Detiene el listener y libera los índices (llamar en shutdown)."""
+    global _listener_task
+    task = _listener_task
+    _listener_task = None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+    for pending in list(_loading.values()):
+        pending.cancel()
+    _loading.clear()
+    _pending_changes.clear()
+    _oversized.clear()
+    _indexes.clear()
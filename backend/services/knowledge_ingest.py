@@ -0,0 +1,264 @@
+"""
+knowledge_ingest.py — Ingesta incremental de documentos en knowledge_base.
+
+Cada chunk se identifica por el hash de su contenido normalizado
+(``content_hash``) y pertenece a un documento (``document_key``: el título con
+el que se subió, dentro de empresa + scope de agente). Las filas existentes
+del documento forman su manifiesto; al re-ingerir:
+
+  - los chunks cuyo hash ya está en el manifiesto no se tocan;
+  - solo los nuevos o modificados se embeben e insertan;
+  - los que ya no aparecen se borran (después de insertar, para que la
+    búsqueda nunca vea el documento vacío).
+
+Chunks idénticos dentro del mismo documento se guardan una sola vez. Un chunk
+que se inserta sin embedding queda sin hash y se reintenta en la siguiente
+ingesta. Las filas anteriores a la migración (sin document_key) con el mismo
+título se sustituyen en la primera re-ingesta.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import re
+import unicodedata
+from typing import Any, Iterable
+
+from services.embedding_service import get_embeddings
+from services.knowledge_index import publish_knowledge_change
+from services.supabase_service import sb_query, supabase
+
+logger = logging.getLogger("api-backend")
+
+_WRITE_BATCH = 500
+_MANIFEST_PAGE_SIZE = 1000
+_WS_RE = re.compile(r"\s+")
+
+
+class EmptyDocumentError(ValueError):
+    """El documento no produjo ningún chunk (no se toca lo ya indexado)."""
+
+
+def chunk_content_hash(titulo: str, contenido: str) -> str:
+    """SHA-256 de título + contenido (NFC, espacios colapsados)."""
+    def _norm(text: str) -> str:
+        return _WS_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+    return hashlib.sha256(f"{_norm(titulo)}\n{_norm(contenido)}".encode("utf-8")).hexdigest()
+
+
+def _scoped(query, agent_id: int | None):
+    if agent_id is not None:
+        return query.eq("agent_id", int(agent_id))
+    return query.is_("agent_id", "null")
+
+
+async def _fetch_all(build) -> list[dict[str, Any]]:
+    """Todas las filas de ``build()`` paginando por id (PostgREST corta en max-rows)."""
+    rows: list[dict[str, Any]] = []
+    offset = 0
+    while True:
+        res = await sb_query(
+            lambda off=offset: build().order("id").range(off, off + _MANIFEST_PAGE_SIZE - 1).execute()
+        )
+        batch = list(res.data or [])
+        rows.extend(batch)
+        if len(batch) < _MANIFEST_PAGE_SIZE:
+            return rows
+        offset += _MANIFEST_PAGE_SIZE
+
+
+async def load_document_manifest(
+    empresa_id: int, agent_id: int | None, document_key: str
+) -> list[dict[str, Any]]:
+    """Filas (id, content_hash) del documento, incluidas las previas a document_key."""
+    current, legacy = await asyncio.gather(
+        _fetch_all(
+            lambda: _scoped(
+                supabase.table("knowledge_base")
+                .select("id, content_hash")
+                .eq("empresa_id", empresa_id)
+                .eq("document_key", document_key),
+                agent_id,
+            )
+        ),
+        _fetch_all(
+            lambda: _scoped(
+                supabase.table("knowledge_base")
+                .select("id, content_hash")
+                .eq("empresa_id", empresa_id)
+                .eq("titulo", document_key)
+                .is_("document_key", "null"),
+                agent_id,
+            )
+        ),
+    )
+    # Las filas legacy nunca se conservan: se re-insertan con document_key.
+    return current + [{"id": r["id"], "content_hash": None} for r in legacy]
+
+
+def diff_document_chunks(
+    manifest: list[dict[str, Any]], rows: list[dict[str, Any]]
+) -> tuple[list[dict[str, Any]], list[int], int]:
+    """
+    Compara las filas nuevas (con ``content_hash``) con el manifiesto.
+
+    Devuelve (filas a insertar, ids a borrar, nº de chunks sin cambios).
+    """
+    diff = _DocumentDiff(manifest)
+    to_insert = diff.add(rows)
+    return to_insert, diff.stale_ids(), len(diff.kept)
+
+
+class _DocumentDiff:
+    """Estado del diff contra el manifiesto mientras llegan lotes de filas."""
+
+    def __init__(self, manifest: list[dict[str, Any]]) -> None:
+        self._existing: dict[str, list[int]] = {}
+        self._legacy: list[int] = []
+        for entry in manifest:
+            h = entry.get("content_hash")
+            if h:
+                self._existing.setdefault(h, []).append(int(entry["id"]))
+            else:
+                self._legacy.append(int(entry["id"]))
+        self.kept: set[str] = set()
+        self._seen: set[str] = set()
+
+    def add(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Filas del lote que hay que insertar (nuevas o modificadas, sin repetir)."""
+        to_insert: list[dict[str, Any]] = []
+        for row in rows:
+            h = row["content_hash"]
+            if h in self._seen:
+                continue
+            self._seen.add(h)
+            if h in self._existing:
+                self.kept.add(h)
+            else:
+                to_insert.append(row)
+        return to_insert
+
+    def stale_ids(self) -> list[int]:
+        """Filas del manifiesto que ya no aparecen (o duplicadas de un chunk conservado)."""
+        stale = list(self._legacy)
+        for h, ids in self._existing.items():
+            stale.extend(ids[1:] if h in self.kept else ids)
+        return stale
+
+
+async def sync_document_chunks(
+    empresa_id: int,
+    agent_id: int | None,
+    document_key: str,
+    rows: Iterable[dict[str, Any]],
+) -> dict[str, int]:
+    """
+    Sincroniza knowledge_base con los chunks actuales del documento.
+
+    ``rows`` son filas de knowledge_base sin embedding (empresa_id, titulo,
+    contenido, chunk_index, source_type, match_stats, agent_id opcional). Puede
+    ser un generador: se consume por lotes de KB_INGEST_BATCH_ROWS en un
+    hilo (el parseo es síncrono) mientras el lote anterior se embebe e
+    inserta; como mucho KB_INGEST_PIPELINE_DEPTH lotes esperan en cola, así
+    que la memoria no depende del tamaño del documento.
+
+    Si ``rows`` no produce ninguna fila no se borra nada y se lanza
+    EmptyDocumentError; los ValueError del parseo se propagan tal cual.
+    """
+    batch_rows = _env_int("KB_INGEST_BATCH_ROWS", 512)
+    depth = _env_int("KB_INGEST_PIPELINE_DEPTH", 2)
+
+    manifest = await load_document_manifest(empresa_id, agent_id, document_key)
+    diff = _DocumentDiff(manifest)
+    queue: asyncio.Queue[list[dict[str, Any]] | BaseException | None] = asyncio.Queue(maxsize=depth)
+    iterator = iter(rows)
+
+    async def _produce() -> None:
+        try:
+            while True:
+                batch = await asyncio.to_thread(lambda: list(itertools.islice(iterator, batch_rows)))
+                if not batch:
+                    break
+                await queue.put(batch)
+        except Exception as exc:  # el consumidor la relanza
+            await queue.put(exc)
+            return
+        await queue.put(None)
+
+    producer = asyncio.create_task(_produce())
+    stats = {"chunks_total": 0, "nuevos": 0, "chunks_con_embedding": 0, "insertados": 0}
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            for row in item:
+                row["document_key"] = document_key
+                row["content_hash"] = chunk_content_hash(row.get("titulo") or "", row.get("contenido") or "")
+            to_insert = diff.add(item)
+            inserted_ids = await _embed_and_insert(to_insert)
+            stats["nuevos"] += len(to_insert)
+            stats["chunks_con_embedding"] += sum(1 for r in to_insert if r.get("embedding"))
+            stats["insertados"] += len(inserted_ids)
+            if inserted_ids:
+                await publish_knowledge_change(empresa_id, upserted_ids=inserted_ids)
+    finally:
+        if not producer.done():
+            producer.cancel()
+
+    if not diff.kept and not stats["nuevos"]:
+        raise EmptyDocumentError("El documento no generó chunks")
+
+    stale_ids = diff.stale_ids()
+    for start in range(0, len(stale_ids), _WRITE_BATCH):
+        batch_ids = stale_ids[start : start + _WRITE_BATCH]
+        await sb_query(
+            lambda ids=batch_ids: supabase.table("knowledge_base")
+            .delete()
+            .eq("empresa_id", empresa_id)
+            .in_("id", ids)
+            .execute()
+        )
+    if stale_ids:
+        await publish_knowledge_change(empresa_id, deleted_ids=stale_ids)
+
+    stats["sin_cambios"] = len(diff.kept)
+    stats["eliminados"] = len(stale_ids)
+    stats["chunks_total"] = stats["sin_cambios"] + stats["nuevos"]
+    logger.info(
+        "[knowledge] Documento '%s' sincronizado (empresa %d): %d nuevos, %d sin cambios, %d eliminados",
+        document_key, empresa_id, stats["nuevos"], stats["sin_cambios"], stats["eliminados"],
+    )
+    return stats
+
+
+async def _embed_and_insert(rows: list[dict[str, Any]]) -> list[int]:
+    if not rows:
+        return []
+    embeddings = await get_embeddings([r["contenido"] for r in rows])
+    for row, emb in zip(rows, embeddings):
+        row["embedding"] = emb
+        if emb is None:
+            logger.warning("[knowledge] Embedding fallido chunk %s, se inserta sin vector", row.get("chunk_index"))
+            # Sin hash: la próxima ingesta lo trata como nuevo y reintenta el embedding.
+            row["content_hash"] = None
+
+    inserted_ids: list[int] = []
+    for start in range(0, len(rows), _WRITE_BATCH):
+        batch = rows[start : start + _WRITE_BATCH]
+        res = await sb_query(lambda b=batch: supabase.table("knowledge_base").insert(b).execute())
+        inserted_ids.extend(int(r["id"]) for r in res.data or [] if r.get("id"))
+    return inserted_ids
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
@@ -2,6 +2,17 @@
 profile_cache.py — Caché de perfiles de usuario (memoria L1 + Redis L2).
 
 Reduce presión sobre Supabase/Postgres bajo alto tráfico de autenticación JWT.
+
+Invalidación entre procesos: ``invalidate_user_profile_cache`` borra la clave
+Redis y publica el user_id en ``ausarta:user_profile:invalidate``; cada
+proceso API escucha el canal (``ensure_profile_invalidation_listener``, en el
+lifespan) y descarta su entrada L1. Con el listener suscrito la L1 vive
+``USER_PROFILE_CACHE_TTL_SECONDS``; sin él (arranque, Redis caído) se limita a
+``USER_PROFILE_CACHE_FALLBACK_TTL_SECONDS`` y al (re)conectar se vacía, porque
+pueden haberse perdido invalidaciones. Cambios hechos fuera de la API (SQL
+directo) solo se ven al expirar el TTL.
+
+L1 es un LRU con TTL sobre OrderedDict: lectura, escritura y desalojo O(1).
 """
 from __future__ import annotations
 
@@ -10,6 +21,7 @@ import json
 import logging
 import os
 import time
+from collections import OrderedDict
 from typing import Any
 
 from fastapi import HTTPException
@@ -18,13 +30,21 @@ from services.supabase_service import supabase
 
 logger = logging.getLogger("api-backend")
 
-_USER_PROFILE_CACHE_TTL = max(5, int(os.getenv("USER_PROFILE_CACHE_TTL_SECONDS", "60")))
+_USER_PROFILE_CACHE_TTL = max(5, int(os.getenv("USER_PROFILE_CACHE_TTL_SECONDS", "900")))
+_MEM_FALLBACK_TTL = max(
+    5, min(_USER_PROFILE_CACHE_TTL, int(os.getenv("USER_PROFILE_CACHE_FALLBACK_TTL_SECONDS", "60")))
+)
 _MEM_PROFILE_CACHE_MAX = max(100, int(os.getenv("USER_PROFILE_CACHE_MAX_ENTRIES", "1000")))
-_MEM_PROFILE_CACHE: dict[str, tuple[float, dict[str, Any]]] = {}
+# user_id → (expira, perfil); orden = uso reciente (el primero es el LRU).
+_MEM_PROFILE_CACHE: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
 _MEM_PROFILE_LOCK = asyncio.Lock()
 _CACHE_GEN: dict[str, int] = {}
 
 _USER_PROFILE_CACHE_PREFIX = "ausarta:user_profile:"
+PROFILE_INVALIDATION_CHANNEL = "ausarta:user_profile:invalidate"
+
+_listener_task: asyncio.Task | None = None
+_listener_connected = False
 
 # Singleflight: una sola consulta a BD por user_id ante ráfagas concurrentes.
 _IN_FLIGHT: dict[str, asyncio.Future[dict[str, Any]]] = {}
@@ -90,26 +110,28 @@ def _mem_cache_get(user_id: str, now: float) -> dict[str, Any] | None:
         return None
     expires_at, row = hit
     if now >= expires_at:
+        del _MEM_PROFILE_CACHE[user_id]
         return None
+    _MEM_PROFILE_CACHE.move_to_end(user_id)
     return row
 
 
 def _mem_cache_evict_if_needed(now: float) -> None:
-    if len(_MEM_PROFILE_CACHE) < _MEM_PROFILE_CACHE_MAX:
-        return
-    expired_keys = [
-        cache_key for cache_key, (exp, _) in _MEM_PROFILE_CACHE.items() if now >= exp
-    ]
-    for cache_key in expired_keys:
-        del _MEM_PROFILE_CACHE[cache_key]
-    if len(_MEM_PROFILE_CACHE) < _MEM_PROFILE_CACHE_MAX:
-        return
-    oldest_key = min(_MEM_PROFILE_CACHE, key=lambda k: _MEM_PROFILE_CACHE[k][0])
-    del _MEM_PROFILE_CACHE[oldest_key]
+    """Desaloja el menos usado recientemente (O(1)); las expiradas caen al leerlas."""
+    while len(_MEM_PROFILE_CACHE) >= _MEM_PROFILE_CACHE_MAX:
+        _MEM_PROFILE_CACHE.popitem(last=False)
 
 
 def _mem_cache_set(user_id: str, row: dict[str, Any], now: float) -> None:
-    _MEM_PROFILE_CACHE[user_id] = (now + float(_USER_PROFILE_CACHE_TTL), row)
+    ttl = _USER_PROFILE_CACHE_TTL if _listener_connected else _MEM_FALLBACK_TTL
+    _MEM_PROFILE_CACHE[user_id] = (now + float(ttl), row)
+    _MEM_PROFILE_CACHE.move_to_end(user_id)
+
+
+def _mem_cache_drop(user_id: str) -> bool:
+    """Invalida la entrada L1 y las cargas en curso del usuario (llamar con el lock)."""
+    _CACHE_GEN[user_id] = _CACHE_GEN.get(user_id, 0) + 1
+    return _MEM_PROFILE_CACHE.pop(user_id, None) is not None
 
 
 async def _redis_get_profile(user_id: str) -> dict[str, Any] | None:
@@ -224,12 +246,10 @@ async def invalidate_user_profile_cache(user_id: str) -> None:
     Invalida la caché de perfil de un usuario en Redis y en memoria.
 
     Llamar siempre que se elimine o modifique un usuario para revocar acceso
-    inmediatamente, sin esperar a que expire el TTL de caché (por defecto 60s).
+    inmediatamente en todos los procesos, sin esperar a que expire el TTL.
     """
     async with _MEM_PROFILE_LOCK:
-        _CACHE_GEN[user_id] = _CACHE_GEN.get(user_id, 0) + 1
-        if user_id in _MEM_PROFILE_CACHE:
-            del _MEM_PROFILE_CACHE[user_id]
+        if _mem_cache_drop(user_id):
             logger.info("[ProfileCache] Caché memoria invalidada para user_id=%s", user_id)
 
     try:
@@ -239,9 +259,80 @@ async def invalidate_user_profile_cache(user_id: str) -> None:
         deleted = await r.delete(_cache_key(user_id))
         if deleted:
             logger.info("[ProfileCache] Caché Redis invalidada para user_id=%s", user_id)
+        # Resto de procesos: descartan su L1 al recibir el mensaje.
+        await r.publish(PROFILE_INVALIDATION_CHANNEL, user_id)
     except Exception as e:
         logger.warning(
             "[ProfileCache] No se pudo invalidar caché Redis para user_id=%s: %s",
             user_id,
             e,
         )
+
+
+async def _clear_mem_cache() -> None:
+    async with _MEM_PROFILE_LOCK:
+        for user_id in list(_MEM_PROFILE_CACHE):
+            _mem_cache_drop(user_id)
+
+
+async def _listen_for_invalidations() -> None:
+    global _listener_connected
+    from services.redis_service import get_redis
+
+    backoff = 1.0
+    while True:
+        pubsub = None
+        try:
+            r = await get_redis()
+            pubsub = r.pubsub()
+            await pubsub.subscribe(PROFILE_INVALIDATION_CHANNEL)
+            backoff = 1.0
+            # Al (re)conectar pueden haberse perdido invalidaciones.
+            await _clear_mem_cache()
+            _listener_connected = True
+            async for msg in pubsub.listen():
+                if msg.get("type") != "message":
+                    continue
+                user_id = _decode_redis_value(msg.get("data"))
+                if user_id:
+                    async with _MEM_PROFILE_LOCK:
+                        _mem_cache_drop(user_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning(
+                "[ProfileCache] Listener de invalidaciones caído (%s); reintento en %.0fs", exc, backoff
+            )
+        finally:
+            if _listener_connected:
+                _listener_connected = False
+                # Entradas con TTL largo sin invalidaciones garantizadas: fuera.
+                await _clear_mem_cache()
+            if pubsub is not None:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+
+def ensure_profile_invalidation_listener() -> None:
+    """Arranca (una vez por proceso) el suscriptor de invalidaciones de perfil."""
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_for_invalidations())
+
+
+async def close_profile_cache() -> None:
+    """Detiene el listener (llamar en shutdown)."""
+    global _listener_task, _listener_connected
+    task = _listener_task
+    _listener_task = None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+    _listener_connected = False
@@ -4,17 +4,13 @@ from __future__ import annotations
 
 import re
 import unicodedata
+from collections import Counter
 from dataclasses import dataclass, field
-from typing import Any, Final
+from typing import Any, Final, Mapping
 
 _RRF_K: Final[int] = 60
 
 
-def _normalize_for_match(text: str) -> str:
-    folded = unicodedata.normalize("NFKD", text.lower())
-    return "".join(ch for ch in folded if not unicodedata.combining(ch))
-
-
 @dataclass(frozen=True, slots=True)
 class KnowledgeChunk:
     id: int
@@ -24,6 +20,9 @@ class KnowledgeChunk:
     keyword_score: float = 0.0
     rrf_score: float = 0.0
     sources: tuple[str, ...] = field(default_factory=tuple)
+    # Frecuencias de tokens calculadas al ingerir (ver chunk_match_stats);
+    # None en filas antiguas.
+    match_stats: Mapping[str, Any] | None = field(default=None, compare=False, repr=False)
 
     def as_dict(self) -> dict[str, Any]:
         return {
@@ -47,6 +46,25 @@ def tokenize_query(query: str) -> list[str]:
     return [_normalize_token(t) for t in tokens if len(t) >= 2]
 
 
+def chunk_match_stats(titulo: str, contenido: str) -> dict[str, Any]:
+    """
+    Lado documento del re-ranking léxico, calculado una vez al ingerir:
+    frecuencia de cada token normalizado (NFKD, sin tildes) del chunk y
+    tokens del título. No guarda copias del texto: la fila y el payload de
+    las RPC de búsqueda apenas crecen.
+    """
+    title_tokens = tokenize_query(titulo)
+    return {
+        "tf": dict(Counter(title_tokens + tokenize_query(contenido))),
+        "title": sorted(set(title_tokens)),
+    }
+
+
+def row_match_stats(row: Mapping[str, Any]) -> Mapping[str, Any] | None:
+    stats = row.get("match_stats")
+    return stats if isinstance(stats, Mapping) else None
+
+
 def _chunk_from_row(row: dict[str, Any], *, source: str) -> KnowledgeChunk:
     return KnowledgeChunk(
         id=int(row["id"]),
@@ -55,6 +73,7 @@ def _chunk_from_row(row: dict[str, Any], *, source: str) -> KnowledgeChunk:
         similarity=float(row.get("similarity") or 0.0),
         keyword_score=float(row.get("keyword_score") or 0.0),
         sources=(source,),
+        match_stats=row_match_stats(row),
     )
 
 
@@ -92,6 +111,7 @@ def reciprocal_rank_fusion(
                 similarity=max(existing.similarity, float(row.get("similarity") or 0.0)),
                 keyword_score=max(existing.keyword_score, float(row.get("keyword_score") or 0.0)),
                 sources=sources,
+                match_stats=existing.match_stats or row_match_stats(row),
             )
 
     fused: list[KnowledgeChunk] = []
@@ -105,6 +125,7 @@ def reciprocal_rank_fusion(
                 keyword_score=chunk.keyword_score,
                 rrf_score=rrf_scores.get(chunk_id, 0.0),
                 sources=chunk.sources,
+                match_stats=chunk.match_stats,
             )
         )
 
@@ -5,12 +5,14 @@ Proporciona:
   - Conexión singleton (pool asíncrono) reutilizable en toda la app.
   - Distributed Lock con TTL y token de propiedad (release seguro vía Lua).
   - Helpers para sets distribuidos (reemplazo de _processing_rooms).
+  - Registro de llamadas activas (leases con TTL) con conteo O(1) global y por tenant.
 
 Configuración vía variable de entorno REDIS_URL (default: redis://redis:6379/0).
 """
 import os
 import logging
 import secrets
+import time
 from typing import Optional
 
 import redis.asyncio as aioredis
@@ -83,37 +85,119 @@ async def close_redis() -> None:
 
 LOCK_PREFIX = "ausarta:lock:"
 
-_RELEASE_LOCK_SCRIPT = """
-if redis.call("get", KEYS[1]) == ARGV[1] then
-    return redis.call("del", KEYS[1])
-else
+# Registro de llamadas activas: un lock adquirido con `active_call_empresa_id`
+# es además un lease de llamada. El alta/baja en el registro ocurre en el mismo
+# script Lua que adquiere/libera el lock, así que nunca se desincronizan.
+#   ACTIVE_CALLS_KEY        ZSET  lock_key → expiración del lease (epoch)
+#   ACTIVE_CALLS_OWNER_KEY  HASH  lock_key → empresa_id
+#   ACTIVE_CALLS_COUNT_KEY  HASH  empresa_id → nº de llamadas activas
+# Los leases caducados (lock expirado sin release) se purgan al consultar.
+ACTIVE_CALLS_KEY = "ausarta:active_calls"
+ACTIVE_CALLS_OWNER_KEY = "ausarta:active_calls:owner"
+ACTIVE_CALLS_COUNT_KEY = "ausarta:active_calls:count"
+_ACTIVE_CALLS_PRUNE_LIMIT = 100
+
+# KEYS[2..4] = registro (zset, owner, count) en todos los scripts que lo tocan.
+_UNTRACK_LUA = """
+local function untrack(member)
+    local owner = redis.call("hget", KEYS[3], member)
+    if owner then
+        redis.call("hdel", KEYS[3], member)
+        if redis.call("hincrby", KEYS[4], owner, -1) <= 0 then
+            redis.call("hdel", KEYS[4], owner)
+        end
+    end
+    redis.call("zrem", KEYS[2], member)
+end
+"""
+
+_ACQUIRE_TRACKED_LOCK_SCRIPT = _UNTRACK_LUA + """
+if not redis.call("set", KEYS[1], ARGV[1], "NX", "EX", ARGV[2]) then
     return 0
 end
+untrack(KEYS[1])
+redis.call("zadd", KEYS[2], tonumber(ARGV[4]) + tonumber(ARGV[2]), KEYS[1])
+redis.call("hset", KEYS[3], KEYS[1], ARGV[3])
+redis.call("hincrby", KEYS[4], ARGV[3], 1)
+return 1
+"""
+
+_RELEASE_LOCK_SCRIPT = _UNTRACK_LUA + """
+local current = redis.call("get", KEYS[1])
+if ARGV[1] == "" or current == ARGV[1] then
+    local deleted = redis.call("del", KEYS[1])
+    untrack(KEYS[1])
+    return ARGV[1] == "" and 1 or deleted
+end
+if not current then
+    untrack(KEYS[1])
+end
+return 0
 """
 
 _EXTEND_LOCK_SCRIPT = """
 if redis.call("get", KEYS[1]) == ARGV[1] then
+    redis.call("zadd", KEYS[2], "XX", tonumber(ARGV[3]) + tonumber(ARGV[2]), KEYS[1])
     return redis.call("expire", KEYS[1], ARGV[2])
 else
     return 0
 end
 """
 
+_ACTIVE_CALLS_SCRIPT = _UNTRACK_LUA + """
+local expired = redis.call("zrangebyscore", KEYS[2], "-inf", ARGV[1], "LIMIT", 0, tonumber(ARGV[3]))
+for _, member in ipairs(expired) do
+    local ttl = redis.call("ttl", member)
+    if ttl > 0 then
+        redis.call("zadd", KEYS[2], tonumber(ARGV[1]) + ttl, member)
+    else
+        untrack(member)
+    end
+end
+local tenant = 0
+if ARGV[2] ~= "" then
+    tenant = tonumber(redis.call("hget", KEYS[4], ARGV[2]) or "0")
+end
+return {redis.call("zcard", KEYS[2]), tenant}
+"""
+
+_REGISTRY_KEYS = (ACTIVE_CALLS_KEY, ACTIVE_CALLS_OWNER_KEY, ACTIVE_CALLS_COUNT_KEY)
+
 
 def _full_lock_key(key: str) -> str:
     return f"{LOCK_PREFIX}{key}"
 
 
-async def acquire_lock(key: str, ttl_seconds: int = 600) -> str | None:
+async def acquire_lock(
+    key: str,
+    ttl_seconds: int = 600,
+    *,
+    active_call_empresa_id: Optional[int] = None,
+) -> str | None:
     """
     Intenta adquirir un lock distribuido con token de propiedad.
 
+    Con `active_call_empresa_id` el lock cuenta además como llamada activa de
+    esa empresa (lease = TTL del lock) hasta que se libere o caduque.
+
     Returns:
         Token de propiedad si se adquirió el lock; None si otro proceso lo tiene.
     """
     r = await get_redis()
     token = secrets.token_urlsafe(16)
-    acquired = await r.set(_full_lock_key(key), token, nx=True, ex=ttl_seconds)
+    if active_call_empresa_id is None:
+        acquired = await r.set(_full_lock_key(key), token, nx=True, ex=ttl_seconds)
+    else:
+        acquired = await r.eval(
+            _ACQUIRE_TRACKED_LOCK_SCRIPT,
+            4,
+            _full_lock_key(key),
+            *_REGISTRY_KEYS,
+            token,
+            str(int(ttl_seconds)),
+            str(int(active_call_empresa_id)),
+            str(int(time.time())),
+        )
     if acquired:
         return token
     return None
@@ -121,18 +205,14 @@ async def acquire_lock(key: str, ttl_seconds: int = 600) -> str | None:
 
 async def release_lock(key: str, token: str | None = None) -> bool:
     """
-    Libera un lock distribuido.
+    Libera un lock distribuido (y su lease de llamada activa, si lo tiene).
 
     Con token: solo borra si el lock sigue siendo del mismo propietario (Lua).
     Sin token: borrado directo (legacy — evitar en código nuevo).
     """
     r = await get_redis()
-    full_key = _full_lock_key(key)
-    if token:
-        released = await r.eval(_RELEASE_LOCK_SCRIPT, 1, full_key, token)
-        return bool(released)
-    await r.delete(full_key)
-    return True
+    released = await r.eval(_RELEASE_LOCK_SCRIPT, 4, _full_lock_key(key), *_REGISTRY_KEYS, token or "")
+    return bool(released)
 
 
 async def is_locked(key: str) -> bool:
@@ -143,28 +223,59 @@ async def is_locked(key: str) -> bool:
 
 async def refresh_lock(key: str, token: str, ttl_seconds: int = 600) -> bool:
     """
-    Renueva el TTL solo si el token de propiedad coincide.
+    Renueva el TTL solo si el token de propiedad coincide (y el lease, si existe).
     """
     r = await get_redis()
-    extended = await r.eval(_EXTEND_LOCK_SCRIPT, 1, _full_lock_key(key), token, str(ttl_seconds))
+    extended = await r.eval(
+        _EXTEND_LOCK_SCRIPT,
+        2,
+        _full_lock_key(key),
+        ACTIVE_CALLS_KEY,
+        token,
+        str(ttl_seconds),
+        str(int(time.time())),
+    )
     return bool(extended)
 
 
 # ──────────────────────────────────────────────
-# Set distribuido (para contar locks activos)
+# Registro de llamadas activas
 # ──────────────────────────────────────────────
 
-ACTIVE_CALLS_KEY = "ausarta:active_calls"
+
+async def get_active_call_counts(empresa_id: Optional[int] = None) -> tuple[int, int]:
+    """
+    Retorna (llamadas activas globales, llamadas activas de `empresa_id`).
+
+    O(1) sobre el registro (ZCARD + HGET); purga antes los leases caducados.
+    """
+    r = await get_redis()
+    total, tenant = await r.eval(
+        _ACTIVE_CALLS_SCRIPT,
+        4,
+        ACTIVE_CALLS_KEY,
+        *_REGISTRY_KEYS,
+        str(int(time.time())),
+        str(int(empresa_id)) if empresa_id else "",
+        str(_ACTIVE_CALLS_PRUNE_LIMIT),
+    )
+    return int(total), int(tenant)
 
 
 async def get_active_call_count() -> int:
-    """Retorna el número de empresas con llamada activa."""
+    """Retorna el número de llamadas activas registradas (todas las empresas)."""
+    total, _ = await get_active_call_counts()
+    return total
+
+
+async def get_active_call_owner(key: str) -> Optional[int]:
+    """Empresa dueña del lease de llamada activa `key`; None si no está registrado."""
     r = await get_redis()
-    # Contar todas las keys que matchean el patrón de lock de empresa
-    keys = []
-    async for key in r.scan_iter(match=f"{LOCK_PREFIX}empresa:*"):
-        keys.append(key)
-    return len(keys)
+    owner = await r.hget(ACTIVE_CALLS_OWNER_KEY, _full_lock_key(key))
+    try:
+        return int(owner) if owner else None
+    except (TypeError, ValueError):
+        return None
 
 
 # ──────────────────────────────────────────────
@@ -1,22 +1,27 @@
-"""Re-ranking de chunks KB tras fusión híbrida (heurístico o Groq opcional)."""
+"""Re-ranking de chunks KB tras fusión híbrida (heurístico, cross-encoder ONNX local o Groq)."""
 
 from __future__ import annotations
 
 import asyncio
+import dataclasses
 import json
 import logging
 import os
 from abc import ABC, abstractmethod
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Mapping
 
 import aiohttp
 
 from config import get_settings
-from services.rag_hybrid import KnowledgeChunk, _normalize_for_match, tokenize_query
+from services.http_client import get_http_session
+from services.rag_hybrid import KnowledgeChunk, chunk_match_stats, tokenize_query
 
 logger = logging.getLogger("api-backend")
 
 _GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+_CROSS_ENCODER_MAX_DOCS = 32
+_CROSS_ENCODER_DOC_CHARS = 1200
 
 
 class BaseReranker(ABC):
@@ -31,8 +36,38 @@ class BaseReranker(ABC):
         raise NotImplementedError
 
 
+def _match_tokens(chunk: KnowledgeChunk) -> tuple[Mapping[str, Any], frozenset[str]]:
+    """Tokens del chunk y de su título (precalculados si existen; si no, una vez por chunk)."""
+    stats = chunk.match_stats
+    tf = stats.get("tf") if stats else None
+    if not isinstance(tf, Mapping):
+        stats = chunk_match_stats(chunk.titulo, chunk.contenido)
+        tf = stats["tf"]
+    title = stats.get("title")
+    if not isinstance(title, list):
+        title = tokenize_query(chunk.titulo)
+    return tf, frozenset(title)
+
+
+def _term_forms(term: str) -> tuple[str, ...]:
+    """El término y su singular/plural, para casar "tarifa" con "tarifas" sin buscar subcadenas."""
+    forms = [term, f"{term}s", f"{term}es"]
+    if term.endswith("es") and len(term) > 3:
+        forms.append(term[:-2])
+    if term.endswith("s") and len(term) > 2:
+        forms.append(term[:-1])
+    return tuple(forms)
+
+
 class HeuristicReranker(BaseReranker):
-    """Boost por coincidencia léxica en título/contenido + score RRF."""
+    """
+    Boost por coincidencia léxica en título/contenido + score RRF.
+
+    Por consulta solo se normaliza la query: el lado documento llega
+    precalculado en ``KnowledgeChunk.match_stats`` (filas sin él se
+    tokenizan al vuelo) y cada término se resuelve con búsquedas O(1) en sus
+    tokens.
+    """
 
     async def rerank(
         self,
@@ -51,11 +86,11 @@ class HeuristicReranker(BaseReranker):
         scored: list[KnowledgeChunk] = []
         max_rrf = max((c.rrf_score for c in chunks), default=1.0) or 1.0
 
+        term_forms = [_term_forms(term) for term in terms]
         for chunk in chunks:
-            title = _normalize_for_match(chunk.titulo)
-            body = _normalize_for_match(chunk.contenido)
-            term_hits = sum(1 for term in terms if term in title or term in body)
-            title_hits = sum(1 for term in terms if term in title)
+            tf, title = _match_tokens(chunk)
+            term_hits = sum(1 for forms in term_forms if any(form in tf for form in forms))
+            title_hits = sum(1 for forms in term_forms if any(form in title for form in forms))
             lexical = term_hits / len(terms)
             title_boost = title_hits / len(terms)
             vector_part = chunk.similarity * 0.25
@@ -64,17 +99,7 @@ class HeuristicReranker(BaseReranker):
             lexical_part = lexical * 0.15 + title_boost * 0.10
             final_score = min(1.0, vector_part + keyword_part + rrf_part + lexical_part)
 
-            scored.append(
-                KnowledgeChunk(
-                    id=chunk.id,
-                    titulo=chunk.titulo,
-                    contenido=chunk.contenido,
-                    similarity=final_score,
-                    keyword_score=chunk.keyword_score,
-                    rrf_score=chunk.rrf_score,
-                    sources=chunk.sources,
-                )
-            )
+            scored.append(dataclasses.replace(chunk, similarity=final_score))
 
         scored.sort(key=lambda item: item.similarity, reverse=True)
         return scored[:top_k]
@@ -118,29 +143,29 @@ class GroqReranker(BaseReranker):
         user_prompt = json.dumps({"query": query, "documents": payload_docs}, ensure_ascii=False)
 
         try:
-            timeout = aiohttp.ClientTimeout(total=self._timeout_s)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(
-                    _GROQ_URL,
-                    headers={
-                        "Authorization": f"Bearer {self._api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": self._model,
-                        "temperature": 0.0,
-                        "max_tokens": 256,
-                        "response_format": {"type": "json_object"},
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_prompt},
-                        ],
-                    },
-                ) as resp:
-                    if resp.status != 200:
-                        logger.warning("Groq reranker HTTP %s", resp.status)
-                        return await self._fallback.rerank(query, chunks, top_k=top_k)
-                    data = await resp.json()
+            session = get_http_session("groq")
+            async with session.post(
+                _GROQ_URL,
+                headers={
+                    "Authorization": f"Bearer {self._api_key}",
+                    "Content-Type": "application/json",
+                },
+                json={
+                    "model": self._model,
+                    "temperature": 0.0,
+                    "max_tokens": 256,
+                    "response_format": {"type": "json_object"},
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                },
+                timeout=aiohttp.ClientTimeout(total=self._timeout_s),
+            ) as resp:
+                if resp.status != 200:
+                    logger.warning("Groq reranker HTTP %s", resp.status)
+                    return await self._fallback.rerank(query, chunks, top_k=top_k)
+                data = await resp.json()
         except (asyncio.TimeoutError, aiohttp.ClientError) as exc:
             logger.warning("Groq reranker failed, using heuristic: %s", exc)
             return await self._fallback.rerank(query, chunks, top_k=top_k)
@@ -162,17 +187,7 @@ class GroqReranker(BaseReranker):
             seen.add(chunk_id)
             score = float(item.get("score") or 0.0)
             base = by_id[chunk_id]
-            reranked.append(
-                KnowledgeChunk(
-                    id=base.id,
-                    titulo=base.titulo,
-                    contenido=base.contenido,
-                    similarity=max(0.0, min(score, 1.0)),
-                    keyword_score=base.keyword_score,
-                    rrf_score=base.rrf_score,
-                    sources=base.sources,
-                )
-            )
+            reranked.append(dataclasses.replace(base, similarity=max(0.0, min(score, 1.0))))
 
         if not reranked:
             return await self._fallback.rerank(query, chunks, top_k=top_k)
@@ -185,6 +200,86 @@ class GroqReranker(BaseReranker):
         return reranked[:top_k]
 
 
+_cross_encoder_executor: ThreadPoolExecutor | None = None
+
+
+def _get_cross_encoder_executor() -> ThreadPoolExecutor:
+    global _cross_encoder_executor
+    if _cross_encoder_executor is None:
+        _cross_encoder_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cross-encoder")
+    return _cross_encoder_executor
+
+
+def _default_cross_encoder_loader() -> Any:
+    from services.cross_encoder import get_cross_encoder
+
+    return get_cross_encoder()
+
+
+class CrossEncoderReranker(BaseReranker):
+    """
+    Cross-encoder local (ONNX Runtime en CPU, ver services/cross_encoder).
+
+    Puntúa todos los candidatos en un lote dentro de un executor propio; si el
+    modelo no está disponible o supera RAG_RERANKER_TIMEOUT_MS, heurístico.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout_s: float | None = None,
+        loader: Callable[[], Any] = _default_cross_encoder_loader,
+    ) -> None:
+        settings = get_settings()
+        self._timeout_s = timeout_s or (settings.rag_reranker_timeout_ms / 1000.0)
+        self._loader = loader
+        self._fallback = HeuristicReranker()
+
+    def warmup(self) -> bool:
+        """Carga el modelo (bloqueante): llamar fuera del camino crítico."""
+        return self._loader() is not None
+
+    def _score(self, query: str, chunks: list[KnowledgeChunk]) -> list[float] | None:
+        model = self._loader()
+        if model is None:
+            return None
+        documents = [f"{c.titulo}\n{c.contenido}"[:_CROSS_ENCODER_DOC_CHARS] for c in chunks]
+        return model.score(query, documents)
+
+    async def rerank(
+        self,
+        query: str,
+        chunks: list[KnowledgeChunk],
+        *,
+        top_k: int,
+    ) -> list[KnowledgeChunk]:
+        if not chunks:
+            return []
+        candidates = chunks[:_CROSS_ENCODER_MAX_DOCS]
+        loop = asyncio.get_running_loop()
+        try:
+            scores = await asyncio.wait_for(
+                loop.run_in_executor(_get_cross_encoder_executor(), self._score, query, candidates),
+                timeout=self._timeout_s,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Cross-encoder reranker timeout (%.0f ms), using heuristic", self._timeout_s * 1000)
+            return await self._fallback.rerank(query, chunks, top_k=top_k)
+        except Exception as exc:
+            logger.warning("Cross-encoder reranker failed, using heuristic: %s", exc)
+            return await self._fallback.rerank(query, chunks, top_k=top_k)
+        if scores is None:
+            return await self._fallback.rerank(query, chunks, top_k=top_k)
+
+        reranked = [
+            dataclasses.replace(chunk, similarity=max(0.0, min(float(score), 1.0)))
+            for chunk, score in zip(candidates, scores)
+        ]
+        reranked.sort(key=lambda item: item.similarity, reverse=True)
+        reranked.extend(chunks[_CROSS_ENCODER_MAX_DOCS:])
+        return reranked[:top_k]
+
+
 class NoOpReranker(BaseReranker):
     async def rerank(
         self,
@@ -196,10 +291,28 @@ class NoOpReranker(BaseReranker):
         return chunks[:top_k]
 
 
+_rerankers: dict[str, BaseReranker] = {}
+
+
 def get_reranker() -> BaseReranker:
+    """Instancia compartida por modo (RAG_RERANKER); los rerankers no guardan estado por consulta."""
     mode = (get_settings().rag_reranker or "heuristic").strip().lower()
-    if mode == "none":
-        return NoOpReranker()
-    if mode == "groq":
-        return GroqReranker()
-    return HeuristicReranker()
+    reranker = _rerankers.get(mode)
+    if reranker is None:
+        if mode == "none":
+            reranker = NoOpReranker()
+        elif mode == "groq":
+            reranker = GroqReranker()
+        elif mode == "onnx":
+            reranker = CrossEncoderReranker()
+        else:
+            reranker = HeuristicReranker()
+        _rerankers[mode] = reranker
+    return reranker
+
+
+def schedule_reranker_warmup() -> None:
+    """Carga en segundo plano el modelo del reranker activo (si tiene uno)."""
+    reranker = get_reranker()
+    if isinstance(reranker, CrossEncoderReranker):
+        asyncio.get_running_loop().run_in_executor(_get_cross_encoder_executor(), reranker.warmup)
@@ -19,6 +19,7 @@ from agents.semantic_routes import (
     TRANSFER_HUMAN_REGEXES,
 )
 from config import get_settings
+from services.http_client import get_http_session
 
 logger = logging.getLogger("semantic-router")
 
@@ -168,18 +169,20 @@ class SemanticRouterService:
                 {"llm.model": self._model, "llm.provider": "groq"},
                 kind="client",
             ):
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    async with session.post(_GROQ_CHAT_URL, headers=headers, json=payload) as resp:
-                        if resp.status != 200:
-                            body = await resp.text()
-                            logger.warning(
-                                "Groq classifier HTTP %s: %s",
-                                resp.status,
-                                body[:200],
-                            )
-                            await breaker.record_failure(RuntimeError(f"HTTP {resp.status}"))
-                            return None
-                        data = await resp.json()
+                session = get_http_session("groq")
+                async with session.post(
+                    _GROQ_CHAT_URL, headers=headers, json=payload, timeout=timeout
+                ) as resp:
+                    if resp.status != 200:
+                        body = await resp.text()
+                        logger.warning(
+                            "Groq classifier HTTP %s: %s",
+                            resp.status,
+                            body[:200],
+                        )
+                        await breaker.record_failure(RuntimeError(f"HTTP {resp.status}"))
+                        return None
+                    data = await resp.json()
         except asyncio.TimeoutError as exc:
             logger.debug("Groq classifier timeout (%.0f ms)", self._timeout_s * 1000)
             await breaker.record_failure(exc, extreme=True)
@@ -0,0 +1,220 @@
+"""
+sse_fanout.py — Un productor por tema SSE, compartido entre todos los clientes.
+
+Cada tema (``"metrics"``, ``"call:<room>"``...) tiene una única tarea que
+produce los snapshots mientras haya suscriptores: ``subscribe`` los construye
+cada ``interval`` segundos y ``subscribe_source`` los toma de un iterador
+async (p. ej. el tail de un stream de Redis). El coste de
+LiveKit/Redis/Supabase no depende del número de supervisores conectados. La
+tarea arranca con el primer suscriptor y se cancela cuando se va el último.
+
+La entrega es por suscriptor:
+  - ``view`` filtra el snapshot para ese cliente (p. ej. por empresa); las
+    vistas se memorizan por ``view_key`` dentro de cada snapshot, así que
+    clientes del mismo tenant comparten el trabajo;
+  - el primer evento es el snapshot completo (``data:``) y los siguientes
+    solo las claves de primer nivel que cambian (``event: patch``); si no
+    cambia nada no se envía nada;
+  - un cliente lento no acumula cola: siempre recibe el último snapshot.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Hashable
+
+logger = logging.getLogger("api-backend")
+
+SnapshotBuilder = Callable[[], Awaitable[dict]]
+SnapshotSource = Callable[[], AsyncIterator[dict]]
+SnapshotView = Callable[[dict], "dict | None"]
+
+_KEEPALIVE_INTERVAL = 30.0
+
+_topics: dict[str, "SnapshotTopic"] = {}
+
+
+class Snapshot:
+    """Resultado de una pasada del productor (o el error que la abortó)."""
+
+    __slots__ = ("version", "data", "error", "_views", "_frames")
+
+    def __init__(self, version: int, data: dict | None = None, error: str | None = None) -> None:
+        self.version = version
+        self.data = data
+        self.error = error
+        self._views: dict[Hashable, dict | None] = {}
+        self._frames: dict[tuple, str | None] = {}
+
+    def view(self, key: Hashable, view: SnapshotView | None) -> dict | None:
+        if key not in self._views:
+            self._views[key] = view(self.data) if view and self.data is not None else self.data
+        return self._views[key]
+
+    def frame(self, key: Hashable, prev: "Snapshot | None", current: dict, previous: dict | None) -> str | None:
+        """Evento SSE (completo o patch) desde ``prev``; memorizado por vista."""
+        memo = (key, prev.version if prev else None)
+        if memo not in self._frames:
+            self._frames[memo] = _encode_frame(current, previous)
+        return self._frames[memo]
+
+
+def _encode_frame(current: dict, previous: dict | None) -> str | None:
+    if previous is None:
+        return f"data: {json.dumps(current, ensure_ascii=False)}\n\n"
+    patch = {k: v for k, v in current.items() if previous.get(k) != v}
+    patch.update({k: None for k in previous.keys() - current.keys()})
+    if not patch:
+        return None
+    return f"event: patch\ndata: {json.dumps(patch, ensure_ascii=False)}\n\n"
+
+
+class SnapshotTopic:
+    """Productor de un tema y sus suscriptores."""
+
+    def __init__(self, name: str, source: SnapshotSource, retry_delay: float) -> None:
+        self.name = name
+        self.retry_delay = retry_delay
+        self.latest: Snapshot | None = None
+        self._source = source
+        self._subscribers: set[asyncio.Event] = set()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def add(self) -> asyncio.Event:
+        wake = asyncio.Event()
+        if self.latest is not None:
+            wake.set()
+        self._subscribers.add(wake)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"sse-topic:{self.name}")
+        return wake
+
+    def discard(self, wake: asyncio.Event) -> None:
+        self._subscribers.discard(wake)
+        if not self._subscribers:
+            self.close()
+
+    def close(self) -> None:
+        if _topics.get(self.name) is self:
+            del _topics[self.name]
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def _publish(self, snapshot: Snapshot) -> None:
+        self.latest = snapshot
+        for wake in self._subscribers:
+            wake.set()
+
+    async def _run(self) -> None:
+        version = self.latest.version if self.latest else 0
+        while True:
+            try:
+                async for data in self._source():
+                    version += 1
+                    self._publish(Snapshot(version, data=data))
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.warning("[SSE] Error construyendo snapshot '%s': %s", self.name, err)
+                version += 1
+                self._publish(Snapshot(version, error=str(err)))
+            await asyncio.sleep(self.retry_delay)
+
+
+def _periodic(builder: SnapshotBuilder, interval: float) -> SnapshotSource:
+    async def _source() -> AsyncIterator[dict]:
+        while True:
+            yield await builder()
+            await asyncio.sleep(interval)
+
+    return _source
+
+
+def subscribe(
+    topic: str,
+    builder: SnapshotBuilder,
+    interval: float,
+    *,
+    view: SnapshotView | None = None,
+    view_key: Hashable = None,
+    keepalive: float = _KEEPALIVE_INTERVAL,
+) -> AsyncGenerator[str, None]:
+    """
+    Eventos SSE de un tema que se reconstruye cada ``interval`` segundos.
+
+    ``builder`` e ``interval`` solo se usan si el tema no existe todavía.
+    ``view`` devuelve la parte del snapshot visible para el cliente (``None``
+    → no se envía nada para ese snapshot); ``view_key`` identifica vistas
+    idénticas entre clientes.
+    """
+    return subscribe_source(
+        topic, _periodic(builder, interval),
+        retry_delay=interval, view=view, view_key=view_key, keepalive=keepalive,
+    )
+
+
+async def subscribe_source(
+    topic: str,
+    source: SnapshotSource,
+    *,
+    retry_delay: float = 1.0,
+    view: SnapshotView | None = None,
+    view_key: Hashable = None,
+    keepalive: float = _KEEPALIVE_INTERVAL,
+) -> AsyncGenerator[str, None]:
+    """
+    Eventos SSE de un tema alimentado por ``source()`` (un iterador async de
+    snapshots; si falla se notifica el error y se reabre tras ``retry_delay``).
+    """
+    entry = _topics.get(topic)
+    if entry is None:
+        entry = _topics[topic] = SnapshotTopic(topic, source, retry_delay)
+    wake = entry.add()
+    loop = asyncio.get_running_loop()
+    last: Snapshot | None = None
+    last_view: dict | None = None
+    last_sent = loop.time()
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=max(0.0, last_sent + keepalive - loop.time()))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                last_sent = loop.time()
+                continue
+            wake.clear()
+            snap = entry.latest
+            if snap is None or snap is last:
+                continue
+            if snap.error is not None:
+                yield f"data: {json.dumps({'error': snap.error})}\n\n"
+                last, last_view, last_sent = None, None, loop.time()
+                continue
+            current = snap.view(view_key, view)
+            if current is None:
+                continue
+            frame = snap.frame(view_key, last, current, last_view)
+            last, last_view = snap, current
+            if frame:
+                yield frame
+                last_sent = loop.time()
+    finally:
+        entry.discard(wake)
+
+
+def topic_subscribers(topic: str) -> int:
+    entry = _topics.get(topic)
+    return entry.subscriber_count if entry else 0
+
+
+async def close_sse_topics() -> None:
+    """Cancela los productores activos (shutdown de la API)."""
+    for entry in list(_topics.values()):
+        entry.close()
@@ -41,6 +41,14 @@ async def sb_query(fn):
     return await asyncio.to_thread(fn)
 
 
+def is_missing_rpc_error(exc: BaseException, function_name: str) -> bool:
+    """True si el error indica que la RPC no está desplegada (migración pendiente)."""
+    text = str(exc)
+    if "PGRST202" in text or "42883" in text:
+        return True
+    return function_name in text and ("does not exist" in text or "Could not find the function" in text)
+
+
 def _apply_eq_filters(query, filters: dict[str, Any]):
     for col, val in filters.items():
         query = query.eq(col, val)
@@ -10,8 +10,7 @@ from fastapi.responses import JSONResponse
 from models.schemas import EncuestaData
 from services.call_results_service import (
     build_encuesta_results_update,
-    prepare_narrative_text_for_storage,
-    prepare_transcription_for_storage,
+    prepare_texts_for_storage,
 )
 from services.supabase_service import sb_query, supabase
 from services.telephony_lead_propagation import propagate_to_lead
@@ -92,9 +91,19 @@ async def guardar_encuesta(datos: EncuestaData, background_tasks: BackgroundTask
 
     logger.info("📥 [guardar-encuesta] encuesta=%s: %s", datos.id_encuesta, datos.dict(exclude_none=True))
 
+    resumen = None
+    if isinstance(datos.datos_extra, dict):
+        raw_resumen = datos.datos_extra.get("resumen_narrativo")
+        if raw_resumen and isinstance(raw_resumen, str) and raw_resumen.strip():
+            resumen = raw_resumen.strip()[:2000]
+    # Transcripción, resumen y comentarios se sanitizan en un único lote PII.
+    transcription, resumen, comentarios = prepare_texts_for_storage(
+        [datos.transcription, resumen, datos.comentarios]
+    )
+
     update_data: dict[str, Any] = {}
-    if datos.transcription is not None:
-        update_data["transcription"] = prepare_transcription_for_storage(datos.transcription)
+    if transcription is not None:
+        update_data["transcription"] = transcription
     if datos.seconds_used is not None:
         update_data["seconds_used"] = datos.seconds_used
     if datos.llm_model is not None:
@@ -102,12 +111,8 @@ async def guardar_encuesta(datos: EncuestaData, background_tasks: BackgroundTask
     if datos.datos_extra is not None:
         update_data["datos_extra"] = datos.datos_extra
 
-    if isinstance(datos.datos_extra, dict):
-        resumen = datos.datos_extra.get("resumen_narrativo")
-        if resumen and isinstance(resumen, str) and resumen.strip():
-            update_data["resumen_llamada"] = (
-                prepare_narrative_text_for_storage(resumen.strip()[:2000]) or ""
-            )
+    if resumen is not None:
+        update_data["resumen_llamada"] = resumen
 
     curr = await sb_query(
         lambda: supabase.table("encuestas")
@@ -131,7 +136,7 @@ async def guardar_encuesta(datos: EncuestaData, background_tasks: BackgroundTask
         nota_comercial=datos.nota_comercial,
         nota_instalador=datos.nota_instalador,
         nota_rapidez=datos.nota_rapidez,
-        comentarios=datos.comentarios,
+        comentarios=comentarios,
         datos_extra=datos.datos_extra if isinstance(datos.datos_extra, dict) else None,
         agent_results_patch=getattr(datos, "agent_results", None),
     )
@@ -170,7 +175,7 @@ async def guardar_encuesta(datos: EncuestaData, background_tasks: BackgroundTask
             "nota_comercial": datos.nota_comercial,
             "nota_instalador": datos.nota_instalador,
             "nota_rapidez": datos.nota_rapidez,
-            "comentarios": prepare_narrative_text_for_storage(datos.comentarios),
+            "comentarios": comentarios,
             "transcription": update_data.get("transcription", datos.transcription),
             "seconds_used": datos.seconds_used,
             "llm_model": datos.llm_model,
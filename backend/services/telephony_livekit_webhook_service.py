@@ -55,6 +55,9 @@ async def safe_stop_recording(encuesta_id: int) -> None:
 
 
 async def handle_room_finished(encuesta_id: int, room_name: str, room_metadata: dict | None = None) -> None:
+    from services.campaign_locks import release_active_call
+
+    await release_active_call(encuesta_id)
     if not supabase:
         return
 
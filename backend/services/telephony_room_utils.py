@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import json
+import re
 
 
 def parse_datos_extra(raw: object) -> dict:
@@ -23,7 +24,13 @@ def extract_encuesta_id_from_room(room_name: str) -> int | None:
       - Nuevo:   ..._encuesta_{id}
       - Intermedio: empresa_{id}_camp_{id}_call_{encuesta_id}
       - Legacy: último segmento numérico
+    Las salas warm no llevan la encuesta en el nombre: devuelve None y el
+    llamador usa el survey_id de la metadata de la sala.
     """
+    from services.warm_room_pool import is_warm_room
+
+    if is_warm_room(room_name):
+        return None
     try:
         if "encuesta_" in room_name:
             after_enc = room_name.split("encuesta_")[-1]
@@ -44,3 +51,48 @@ def extract_encuesta_id_from_room(room_name: str) -> int | None:
         return None
     except Exception:
         return None
+
+
+def _metadata_id(meta: dict, key: str) -> int | None:
+    try:
+        return int(meta.get(key) or 0) or None
+    except (TypeError, ValueError):
+        return None
+
+
+def resolve_room_call(room_name: str, metadata: object = None) -> dict[str, int | None]:
+    """
+    encuesta_id, empresa_id y campaign_id de una sala de llamada.
+
+    Las salas warm no llevan los ids en el nombre: se leen de la metadata que
+    escribe bind_warm_room (survey_id, empresa_id, campaign_id). Una sala warm
+    todavía sin vincular devuelve encuesta_id None.
+    """
+    from services.warm_room_pool import is_warm_room
+
+    if is_warm_room(room_name):
+        meta = parse_datos_extra(metadata)
+        return {
+            "encuesta_id": _metadata_id(meta, "survey_id"),
+            "empresa_id": _metadata_id(meta, "empresa_id"),
+            "campaign_id": _metadata_id(meta, "campaign_id"),
+        }
+    enc_m = re.search(r"encuesta_(\d+)", room_name)
+    emp_m = re.search(r"empresa_(\d+)", room_name)
+    camp_m = re.search(r"campana_(\d+)", room_name)
+    return {
+        "encuesta_id": int(enc_m.group(1)) if enc_m else None,
+        "empresa_id": int(emp_m.group(1)) if emp_m else None,
+        "campaign_id": int(camp_m.group(1)) if camp_m else None,
+    }
+
+
+def room_call_started_at(room_name: str, metadata: object, creation_time: int) -> int:
+    """Inicio de la llamada: en salas warm, la vinculación (no la creación de la sala)."""
+    from services.warm_room_pool import is_warm_room
+
+    if is_warm_room(room_name):
+        bound_at = _metadata_id(parse_datos_extra(metadata), "bound_at")
+        if bound_at:
+            return bound_at
+    return int(creation_time or 0)
@@ -0,0 +1,330 @@
+"""
+Pool de salas pre-calentadas: agente ya unido e inicializado antes del lead.
+
+Sin pool, cada llamada saliente paga en serie crear sala → dispatch del
+agente → arranque del agente (config, VAD, plugins) → SIP. Con pool, el
+dialer toma una sala "warm" cuyo agente ya tiene VAD cargado, STT/TTS
+construidos y con conexión abierta y la config del agente cacheada; la
+vincula al lead actualizando la metadata de la sala y crea el participante
+SIP de inmediato. El agente recibe la vinculación (evento
+room_metadata_changed) y termina el arranque mientras suena el teléfono.
+
+Claves Redis por (empresa, agente):
+  ausarta:warm:ready:{e}:{a}    ZSET  sala → epoch hasta el que puede reclamarse
+  ausarta:warm:warming:{e}:{a}  ZSET  sala → epoch de creación (agente arrancando)
+  ausarta:warm:dials:{e}:{a}:{minuto}  contador de demanda (dimensionado)
+  ausarta:warm:pools            SET   "{e}:{a}" con demanda reciente
+
+Tamaño objetivo (ley de Little): llamadas/s recientes × segundos que tarda un
+agente en calentarse, redondeado hacia arriba y acotado por
+WARM_POOL_MAX_PER_EMPRESA. Sin demanda reciente el pool se vacía solo.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from typing import Any, Optional
+
+logger = logging.getLogger("api-backend")
+
+WARM_ROOM_MARKER = "warm_empresa_"
+WARM_POOLS_KEY = "ausarta:warm:pools"
+_READY_PREFIX = "ausarta:warm:ready:"
+_WARMING_PREFIX = "ausarta:warm:warming:"
+_DIALS_PREFIX = "ausarta:warm:dials:"
+_ROOM_PREFIX = "llamada_ausarta_"
+# Margen para no entregar una sala cuyo agente está a punto de abandonar.
+_CLAIM_SAFETY_SECONDS = 15
+_WARMING_STALE_SECONDS = 90
+
+# KEYS = ready · ARGV = ahora
+_CLAIM_SCRIPT = """
+redis.call("zremrangebyscore", KEYS[1], "-inf", ARGV[1])
+local popped = redis.call("zpopmin", KEYS[1])
+return popped[1]
+"""
+
+# KEYS = warming, ready · ARGV = sala, caducidad
+_READY_SCRIPT = """
+redis.call("zrem", KEYS[1], ARGV[1])
+redis.call("zadd", KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
+
+def warm_pool_enabled() -> bool:
+    return os.getenv("WARM_ROOM_POOL", "true").lower() in ("1", "true", "yes")
+
+
+def warm_room_idle_seconds() -> int:
+    return max(60, int(os.getenv("WARM_ROOM_IDLE_SECONDS", "300")))
+
+
+def is_warm_room(room_name: str) -> bool:
+    return WARM_ROOM_MARKER in (room_name or "")
+
+
+def _pool_suffix(empresa_id: int, agent_id: int) -> str:
+    return f"{int(empresa_id)}:{int(agent_id)}"
+
+
+def _ready_key(empresa_id: int, agent_id: int) -> str:
+    return f"{_READY_PREFIX}{_pool_suffix(empresa_id, agent_id)}"
+
+
+def _warming_key(empresa_id: int, agent_id: int) -> str:
+    return f"{_WARMING_PREFIX}{_pool_suffix(empresa_id, agent_id)}"
+
+
+def warm_room_metadata(empresa_id: int, agent_id: int, agent_type: str) -> dict[str, Any]:
+    """Metadata de una sala sin vincular (el agente la reconoce por `warm`)."""
+    return {
+        "call_direction": "outbound",
+        "warm": True,
+        "empresa_id": int(empresa_id),
+        "agent_id": int(agent_id),
+        "agent_type": agent_type,
+        "campana_id": 0,
+        "survey_id": 0,
+    }
+
+
+async def record_dial_demand(empresa_id: int, agent_id: int) -> None:
+    from services.redis_service import get_redis
+
+    r = await get_redis()
+    key = f"{_DIALS_PREFIX}{_pool_suffix(empresa_id, agent_id)}:{int(time.time() // 60)}"
+    pipe = r.pipeline(transaction=False)
+    pipe.incr(key)
+    pipe.expire(key, 900)
+    pipe.sadd(WARM_POOLS_KEY, _pool_suffix(empresa_id, agent_id))
+    await pipe.execute()
+
+
+async def target_pool_size(empresa_id: int, agent_id: int) -> int:
+    """Salas warm a mantener según las marcaciones de los últimos minutos."""
+    from services.redis_service import get_redis
+
+    window = max(1, int(os.getenv("WARM_POOL_RATE_WINDOW_MINUTES", "5")))
+    warmup_seconds = float(os.getenv("WARM_ROOM_WARMUP_SECONDS", "8"))
+    cap = max(0, int(os.getenv("WARM_POOL_MAX_PER_EMPRESA", "5")))
+    now_minute = int(time.time() // 60)
+    r = await get_redis()
+    counts = await r.mget([
+        f"{_DIALS_PREFIX}{_pool_suffix(empresa_id, agent_id)}:{now_minute - i}" for i in range(window)
+    ])
+    dials = sum(int(c or 0) for c in counts)
+    if not dials:
+        return 0
+    rate_per_second = dials / (window * 60)
+    return min(cap, max(1, math.ceil(rate_per_second * warmup_seconds)))
+
+
+async def claim_warm_room(empresa_id: Optional[int], agent_id: Optional[int]) -> Optional[str]:
+    """
+    Reserva una sala warm del agente para un lead (None si no hay).
+
+    Registra la demanda (dimensionado del pool) y repone en segundo plano.
+    """
+    if not warm_pool_enabled() or not empresa_id or not agent_id:
+        return None
+    try:
+        from services.redis_service import get_redis
+
+        await record_dial_demand(int(empresa_id), int(agent_id))
+        r = await get_redis()
+        room_name = await r.eval(_CLAIM_SCRIPT, 1, _ready_key(int(empresa_id), int(agent_id)), str(time.time()))
+    except Exception as e:
+        logger.debug(f"[WarmPool] Pool no disponible (empresa={empresa_id} agente={agent_id}): {e}")
+        return None
+    schedule_replenish(int(empresa_id), int(agent_id))
+    return room_name or None
+
+
+async def bind_warm_room(room_name: str, metadata: dict[str, Any]) -> None:
+    """
+    Vincula la sala warm al lead: el agente la recibe vía room_metadata_changed.
+
+    `bound_at` marca el inicio real de la llamada (la sala existe desde antes).
+    """
+    from livekit import api
+
+    from services.livekit_service import lkapi
+    from utils.tracing import enrich_metadata_with_trace
+
+    metadata = {**metadata, "bound_at": int(time.time())}
+    await lkapi.room.update_room_metadata(
+        api.UpdateRoomMetadataRequest(
+            room=room_name,
+            metadata=json.dumps(enrich_metadata_with_trace(metadata), ensure_ascii=True),
+        )
+    )
+
+
+async def bound_encuesta_id(room_name: str) -> Optional[int]:
+    """encuesta_id vinculado a una sala warm (metadata en LiveKit); None si no hay."""
+    from livekit import api
+
+    from services.livekit_service import lkapi
+    from services.telephony_room_utils import resolve_room_call
+
+    if not lkapi:
+        return None
+    res = await lkapi.room.list_rooms(api.ListRoomsRequest(names=[room_name]))
+    if not res.rooms:
+        return None
+    return resolve_room_call(room_name, res.rooms[0].metadata)["encuesta_id"]
+
+
+async def mark_warm_room_ready(empresa_id: int, agent_id: int, room_name: str) -> None:
+    """Lo llama el agente cuando termina de calentarse: la sala pasa a reclamable."""
+    from services.redis_service import get_redis
+
+    r = await get_redis()
+    claimable_until = time.time() + warm_room_idle_seconds() - _CLAIM_SAFETY_SECONDS
+    await r.eval(
+        _READY_SCRIPT,
+        2,
+        _warming_key(empresa_id, agent_id),
+        _ready_key(empresa_id, agent_id),
+        room_name,
+        str(claimable_until),
+    )
+
+
+async def withdraw_warm_room(empresa_id: int, agent_id: int, room_name: str) -> bool:
+    """Retira la sala del pool. False si ya la reclamó un dialer (hay que esperar la vinculación)."""
+    from services.redis_service import get_redis
+
+    r = await get_redis()
+    return bool(await r.zrem(_ready_key(empresa_id, agent_id), room_name))
+
+
+async def _create_warm_room(empresa_id: int, agent_id: int, agent_type: str) -> str:
+    from services.livekit_service import create_isolated_room, dispatch_agent_explicit
+    from services.redis_service import get_redis
+
+    room_name = f"{_ROOM_PREFIX}{WARM_ROOM_MARKER}{empresa_id}_agente_{agent_id}_{uuid.uuid4().hex[:12]}"
+    metadata = warm_room_metadata(empresa_id, agent_id, agent_type)
+    r = await get_redis()
+    await r.zadd(_warming_key(empresa_id, agent_id), {room_name: time.time()})
+    await create_isolated_room(room_name, metadata=metadata)
+    await dispatch_agent_explicit(
+        room_name=room_name,
+        agent_name=(os.getenv("AGENT_NAME_DISPATCH") or "default_agent").strip(),
+        metadata=metadata,
+    )
+    return room_name
+
+
+async def _discard_room(room_name: str) -> None:
+    from livekit import api
+
+    from services.livekit_service import lkapi
+
+    try:
+        await lkapi.room.delete_room(api.DeleteRoomRequest(room=room_name))
+    except Exception as e:
+        logger.debug(f"[WarmPool] No se pudo borrar sala warm {room_name}: {e}")
+
+
+async def _resolve_agent_type(agent_id: int) -> str:
+    from services.supabase_service import sb_query, supabase
+
+    res = await sb_query(
+        lambda: supabase.table("agent_config")
+        .select("agent_type, tipo_resultados")
+        .eq("id", agent_id)
+        .limit(1)
+        .execute()
+    )
+    row = res.data[0] if res.data else {}
+    return row.get("agent_type") or row.get("tipo_resultados") or "ENCUESTA_NUMERICA"
+
+
+async def replenish_warm_pool(empresa_id: int, agent_id: int) -> int:
+    """
+    Ajusta el pool al tamaño objetivo: crea salas que falten (contando las que
+    aún calientan) y retira el exceso. Devuelve el delta aplicado.
+    """
+    from services.redis_service import acquire_lock, get_redis, release_lock
+
+    lock_key = f"warm:replenish:{_pool_suffix(empresa_id, agent_id)}"
+    token = await acquire_lock(lock_key, ttl_seconds=60)
+    if not token:
+        return 0
+    try:
+        r = await get_redis()
+        now = time.time()
+        ready_key = _ready_key(empresa_id, agent_id)
+        warming_key = _warming_key(empresa_id, agent_id)
+        await r.zremrangebyscore(ready_key, "-inf", now)
+        await r.zremrangebyscore(warming_key, "-inf", now - _WARMING_STALE_SECONDS)
+        target = await target_pool_size(empresa_id, agent_id)
+        current = int(await r.zcard(ready_key)) + int(await r.zcard(warming_key))
+
+        if target == 0 and current == 0:
+            await r.srem(WARM_POOLS_KEY, _pool_suffix(empresa_id, agent_id))
+            return 0
+
+        if current > target:
+            excess = await r.zpopmax(ready_key, current - target)
+            for room_name, _ in excess:
+                await _discard_room(room_name)
+            return -len(excess)
+
+        missing = target - current
+        if missing <= 0:
+            return 0
+        agent_type = await _resolve_agent_type(agent_id)
+        created = await asyncio.gather(
+            *[_create_warm_room(empresa_id, agent_id, agent_type) for _ in range(missing)],
+            return_exceptions=True,
+        )
+        errors = [c for c in created if isinstance(c, Exception)]
+        if errors:
+            logger.warning(f"[WarmPool] {len(errors)} sala(s) warm no creadas (empresa={empresa_id}): {errors[0]}")
+        logger.info(
+            f"[WarmPool] Pool empresa={empresa_id} agente={agent_id}: objetivo={target}, "
+            f"+{missing - len(errors)} sala(s)"
+        )
+        return missing - len(errors)
+    finally:
+        await release_lock(lock_key, token)
+
+
+_replenish_tasks: set[asyncio.Task] = set()
+
+
+def schedule_replenish(empresa_id: int, agent_id: int) -> None:
+    """Repone el pool en segundo plano tras una reclamación (fuera del camino crítico)."""
+
+    async def _run() -> None:
+        try:
+            await replenish_warm_pool(empresa_id, agent_id)
+        except Exception as e:
+            logger.warning(f"[WarmPool] Error reponiendo pool empresa={empresa_id} agente={agent_id}: {e}")
+
+    task = asyncio.create_task(_run())
+    _replenish_tasks.add(task)
+    task.add_done_callback(_replenish_tasks.discard)
+
+
+async def maintain_warm_pools() -> None:
+    """Recorre los pools con demanda reciente y los ajusta (cron del worker)."""
+    from services.redis_service import get_redis
+
+    if not warm_pool_enabled():
+        return
+    r = await get_redis()
+    for suffix in await r.smembers(WARM_POOLS_KEY):
+        try:
+            empresa_id, agent_id = (int(p) for p in str(suffix).split(":", 1))
+            await replenish_warm_pool(empresa_id, agent_id)
+        except Exception as e:
+            logger.warning(f"[WarmPool] Error manteniendo pool {suffix}: {e}")
@@ -4,7 +4,7 @@ from __future__ import annotations
 import logging
 import re
 
-import aiohttp
+from services.http_client import get_http_session
 
 logger = logging.getLogger("api-backend")
 
@@ -20,28 +20,28 @@ async def _fetch_wikipedia(query: str) -> str:
         "utf8": 1,
     }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://es.wikipedia.org/w/api.php", params=params, timeout=8
-            ) as resp:
-                if resp.status != 200:
-                    return ""
-                data = await resp.json()
-                results = (data.get("query") or {}).get("search") or []
-                if not results:
-                    return ""
-                top_title = results[0].get("title")
-                if not top_title:
-                    return ""
+        session = get_http_session("web_search")
+        async with session.get(
+            "https://es.wikipedia.org/w/api.php", params=params, timeout=8
+        ) as resp:
+            if resp.status != 200:
+                return ""
+            data = await resp.json()
+            results = (data.get("query") or {}).get("search") or []
+            if not results:
+                return ""
+            top_title = results[0].get("title")
+            if not top_title:
+                return ""
 
-            summary_url = (
-                f"https://es.wikipedia.org/api/rest_v1/page/summary/{top_title.replace(' ', '_')}"
-            )
-            async with session.get(summary_url, timeout=8) as resp2:
-                if resp2.status != 200:
-                    return ""
-                summary_data = await resp2.json()
-                return (summary_data.get("extract") or "").strip()
+        summary_url = (
+            f"https://es.wikipedia.org/api/rest_v1/page/summary/{top_title.replace(' ', '_')}"
+        )
+        async with session.get(summary_url, timeout=8) as resp2:
+            if resp2.status != 200:
+                return ""
+            summary_data = await resp2.json()
+            return (summary_data.get("extract") or "").strip()
     except Exception as exc:
         logger.warning("Wikipedia search failed: %s", exc)
         return ""
@@ -56,21 +56,21 @@ async def _fetch_duckduckgo(query: str) -> str:
         "skip_disambig": 1,
     }
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://api.duckduckgo.com/", params=params, timeout=8
-            ) as resp:
-                if resp.status != 200:
-                    return ""
-                data = await resp.json()
-                abstract = (data.get("AbstractText") or "").strip()
-                if abstract:
-                    return abstract
-                snippets: list[str] = []
-                for item in (data.get("RelatedTopics") or [])[:5]:
-                    if isinstance(item, dict) and item.get("Text"):
-                        snippets.append(str(item["Text"]).strip())
-                return " ".join(snippets).strip()
+        session = get_http_session("web_search")
+        async with session.get(
+            "https://api.duckduckgo.com/", params=params, timeout=8
+        ) as resp:
+            if resp.status != 200:
+                return ""
+            data = await resp.json()
+            abstract = (data.get("AbstractText") or "").strip()
+            if abstract:
+                return abstract
+            snippets: list[str] = []
+            for item in (data.get("RelatedTopics") or [])[:5]:
+                if isinstance(item, dict) and item.get("Text"):
+                    snippets.append(str(item["Text"]).strip())
+            return " ".join(snippets).strip()
     except Exception as exc:
         logger.warning("DuckDuckGo search failed: %s", exc)
         return ""
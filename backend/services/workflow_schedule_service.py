@@ -143,7 +143,7 @@ async def schedule_workflow_follow_up(
         try:
             from services.campaign_locks import enqueue_scheduler_tick
 
-            await enqueue_scheduler_tick()
+            await enqueue_scheduler_tick(empresa_id)
         except Exception as tick_exc:
             logger.debug("[workflow_schedule] enqueue_scheduler_tick: %s", tick_exc)
 
@@ -0,0 +1,66 @@
+-- ──────────────────────────────────────────────────────────────────────────────
+-- Orquestador de campañas: claim de leads por lotes.
+-- Un único RPC reclama N leads pendientes con FOR UPDATE SKIP LOCKED (varios
+-- workers en paralelo nunca reclaman el mismo lead) y otro enlaza en bloque
+-- cada lead con su fila de encuestas tras el insert multi-fila.
+-- ──────────────────────────────────────────────────────────────────────────────
+
+CREATE INDEX IF NOT EXISTS idx_campaign_leads_pending_claim
+    ON public.campaign_leads (campaign_id, next_retry_at NULLS FIRST, id)
+    WHERE status = 'pending';
+
+CREATE OR REPLACE FUNCTION public.claim_campaign_leads(
+    p_campaign_id BIGINT,
+    p_limit INTEGER DEFAULT 10
+)
+RETURNS SETOF public.campaign_leads
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH picked AS (
+        SELECT cl.id
+        FROM public.campaign_leads cl
+        WHERE cl.campaign_id = p_campaign_id
+          AND cl.status = 'pending'
+          AND (cl.next_retry_at IS NULL OR cl.next_retry_at <= now())
+        ORDER BY cl.next_retry_at ASC NULLS FIRST, cl.id
+        LIMIT LEAST(GREATEST(COALESCE(p_limit, 10), 1), 500)
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE public.campaign_leads cl
+    SET status = 'calling',
+        last_call_at = now()
+    FROM picked
+    WHERE cl.id = picked.id
+    RETURNING cl.*;
+$$;
+
+CREATE OR REPLACE FUNCTION public.link_campaign_lead_calls(p_links JSONB)
+RETURNS INTEGER
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH links AS (
+        SELECT
+            (l->>'lead_id')::BIGINT AS lead_id,
+            (l->>'call_id')::BIGINT AS call_id,
+            NULLIF(l->>'ab_variant', '') AS ab_variant
+        FROM jsonb_array_elements(COALESCE(p_links, '[]'::jsonb)) AS l
+    ),
+    updated AS (
+        UPDATE public.campaign_leads cl
+        SET call_id = links.call_id,
+            ab_variant = links.ab_variant
+        FROM links
+        WHERE cl.id = links.lead_id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+REVOKE ALL ON FUNCTION public.claim_campaign_leads(BIGINT, INTEGER) FROM PUBLIC;
+REVOKE ALL ON FUNCTION public.link_campaign_lead_calls(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.claim_campaign_leads(BIGINT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION public.link_campaign_lead_calls(JSONB) TO service_role;
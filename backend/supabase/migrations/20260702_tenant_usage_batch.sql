@@ -0,0 +1,44 @@
+-- Persistencia write-behind de consumo: un lote de eventos + agregados mensuales
+-- pre-sumados en una sola transacción (llamado desde el cron de volcado del worker ARQ).
+
+CREATE OR REPLACE FUNCTION public.record_tenant_usage_batch(
+    p_events JSONB,
+    p_monthly JSONB
+)
+RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    INSERT INTO public.tenant_usage_events (
+        empresa_id, event_type, period, quantity, unit, metadata
+    )
+    SELECT
+        (e->>'empresa_id')::INTEGER,
+        e->>'event_type',
+        e->>'period',
+        (e->>'quantity')::NUMERIC,
+        e->>'unit',
+        COALESCE(e->'metadata', '{}'::jsonb)
+    FROM jsonb_array_elements(COALESCE(p_events, '[]'::jsonb)) AS e;
+
+    INSERT INTO public.tenant_usage_monthly (
+        empresa_id, period, category, sub_key, quantity, updated_at
+    )
+    SELECT
+        (m->>'empresa_id')::INTEGER,
+        m->>'period',
+        m->>'category',
+        COALESCE(m->>'sub_key', ''),
+        SUM((m->>'quantity')::NUMERIC),
+        now()
+    FROM jsonb_array_elements(COALESCE(p_monthly, '[]'::jsonb)) AS m
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (empresa_id, period, category, sub_key)
+    DO UPDATE SET
+        quantity = tenant_usage_monthly.quantity + EXCLUDED.quantity,
+        updated_at = now();
+$$;
+
+REVOKE ALL ON FUNCTION public.record_tenant_usage_batch(JSONB, JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.record_tenant_usage_batch(JSONB, JSONB) TO service_role;
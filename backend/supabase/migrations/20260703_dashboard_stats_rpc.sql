@@ -0,0 +1,77 @@
+-- Estadísticas del dashboard calculadas en SQL (antes: filas completas agregadas en Python).
+-- Mismos filtros y semántica que routers/dashboard.get_dashboard_stats.
+
+CREATE INDEX IF NOT EXISTS idx_encuestas_empresa_fecha
+    ON public.encuestas (empresa_id, fecha);
+
+CREATE OR REPLACE FUNCTION public.dashboard_encuesta_stats(
+    p_empresa_id BIGINT DEFAULT NULL,
+    p_agent_id BIGINT DEFAULT NULL,
+    p_campaign_id BIGINT DEFAULT NULL,
+    p_start_date TIMESTAMPTZ DEFAULT NULL,
+    p_end_date TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH filtered AS (
+        SELECT e.status, e.completada,
+               e.puntuacion_comercial, e.puntuacion_instalador, e.puntuacion_rapidez
+        FROM public.encuestas e
+        WHERE (p_empresa_id IS NULL OR e.empresa_id = p_empresa_id)
+          AND (p_agent_id IS NULL OR e.agent_id = p_agent_id)
+          AND (p_campaign_id IS NULL OR e.campaign_id = p_campaign_id)
+          AND (p_start_date IS NULL OR e.fecha >= p_start_date)
+          AND (p_end_date IS NULL OR e.fecha <= p_end_date)
+    ),
+    totals AS (
+        SELECT
+            COUNT(*) AS total_calls,
+            COUNT(*) FILTER (WHERE completada = 1) AS completed_calls,
+            SUM(puntuacion_comercial) AS sum_com, COUNT(puntuacion_comercial) AS cnt_com,
+            SUM(puntuacion_instalador) AS sum_ins, COUNT(puntuacion_instalador) AS cnt_ins,
+            SUM(puntuacion_rapidez) AS sum_rap, COUNT(puntuacion_rapidez) AS cnt_rap
+        FROM filtered
+    ),
+    breakdown AS (
+        SELECT COALESCE(jsonb_object_agg(status_key, n), '{}'::jsonb) AS status_breakdown
+        FROM (
+            SELECT COALESCE(NULLIF(status, ''), 'unknown') AS status_key, COUNT(*) AS n
+            FROM filtered
+            GROUP BY 1
+        ) s
+    ),
+    pending AS (
+        SELECT COUNT(*) AS pending_calls
+        FROM public.campaign_leads l
+        WHERE l.status = 'pending'
+          AND (
+              p_empresa_id IS NULL
+              OR l.campaign_id IN (SELECT c.id FROM public.campaigns c WHERE c.empresa_id = p_empresa_id)
+          )
+          AND (p_start_date IS NULL OR l.created_at >= p_start_date)
+          AND (p_end_date IS NULL OR l.created_at <= p_end_date)
+    )
+    SELECT jsonb_build_object(
+        'total_calls', t.total_calls,
+        'completed_calls', t.completed_calls,
+        'pending_calls', p.pending_calls,
+        'status_breakdown', b.status_breakdown,
+        'avg_comercial', CASE WHEN t.cnt_com > 0 THEN t.sum_com::NUMERIC / t.cnt_com ELSE 0 END,
+        'avg_instalador', CASE WHEN t.cnt_ins > 0 THEN t.sum_ins::NUMERIC / t.cnt_ins ELSE 0 END,
+        'avg_rapidez', CASE WHEN t.cnt_rap > 0 THEN t.sum_rap::NUMERIC / t.cnt_rap ELSE 0 END,
+        'avg_overall', CASE
+            WHEN (t.cnt_com + t.cnt_ins + t.cnt_rap) > 0
+            THEN (COALESCE(t.sum_com, 0) + COALESCE(t.sum_ins, 0) + COALESCE(t.sum_rap, 0))::NUMERIC
+                 / (t.cnt_com + t.cnt_ins + t.cnt_rap)
+            ELSE 0
+        END
+    )
+    FROM totals t, breakdown b, pending p;
+$$;
+
+REVOKE ALL ON FUNCTION public.dashboard_encuesta_stats(BIGINT, BIGINT, BIGINT, TIMESTAMPTZ, TIMESTAMPTZ) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.dashboard_encuesta_stats(BIGINT, BIGINT, BIGINT, TIMESTAMPTZ, TIMESTAMPTZ) TO service_role;
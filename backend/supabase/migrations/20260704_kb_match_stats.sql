@@ -0,0 +1,107 @@
+-- =============================================================================
+-- Re-ranking léxico sin normalizar texto por consulta: knowledge_base.match_stats
+-- guarda (calculado al ingerir, ver services/rag_hybrid.chunk_match_stats) la
+-- frecuencia de cada token normalizado y los tokens del título, sin copias del
+-- texto. Las RPC de búsqueda lo devuelven junto a cada chunk.
+-- Filas anteriores quedan con NULL y el reranker las tokeniza al vuelo.
+-- =============================================================================
+
+ALTER TABLE knowledge_base
+  ADD COLUMN IF NOT EXISTS match_stats JSONB;
+
+-- Cambia el tipo de retorno: hay que recrear las funciones.
+DROP FUNCTION IF EXISTS search_knowledge_base(BIGINT, VECTOR, INT, FLOAT, BIGINT);
+
+CREATE OR REPLACE FUNCTION search_knowledge_base(
+  p_empresa_id BIGINT,
+  p_embedding  VECTOR(1536),
+  p_limit      INT DEFAULT 5,
+  p_threshold  FLOAT DEFAULT 0.75,
+  p_agent_id   BIGINT DEFAULT NULL
+)
+RETURNS TABLE(id BIGINT, titulo TEXT, contenido TEXT, similarity FLOAT, match_stats JSONB)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+  IF p_empresa_id IS NULL OR p_empresa_id <= 0 OR p_embedding IS NULL THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    kb.id,
+    kb.titulo,
+    kb.contenido,
+    (1 - (kb.embedding <=> p_embedding))::FLOAT AS similarity,
+    kb.match_stats
+  FROM knowledge_base kb
+  WHERE
+    kb.empresa_id = p_empresa_id
+    AND kb.embedding IS NOT NULL
+    AND (1 - (kb.embedding <=> p_embedding)) >= LEAST(GREATEST(p_threshold, 0.0), 1.0)
+    AND (
+      (p_agent_id IS NULL AND kb.agent_id IS NULL)
+      OR (p_agent_id IS NOT NULL AND (kb.agent_id IS NULL OR kb.agent_id = p_agent_id))
+    )
+  ORDER BY kb.embedding <=> p_embedding
+  LIMIT LEAST(GREATEST(p_limit, 1), 20);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION search_knowledge_base(BIGINT, VECTOR, INT, FLOAT, BIGINT) TO authenticated;
+GRANT EXECUTE ON FUNCTION search_knowledge_base(BIGINT, VECTOR, INT, FLOAT, BIGINT) TO service_role;
+
+DROP FUNCTION IF EXISTS public.search_knowledge_base_keyword(BIGINT, TEXT, INT, BIGINT);
+
+CREATE OR REPLACE FUNCTION public.search_knowledge_base_keyword(
+  p_empresa_id BIGINT,
+  p_query      TEXT,
+  p_limit      INT DEFAULT 10,
+  p_agent_id   BIGINT DEFAULT NULL
+)
+RETURNS TABLE(id BIGINT, titulo TEXT, contenido TEXT, keyword_score FLOAT, match_stats JSONB)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_query tsquery;
+BEGIN
+  IF p_empresa_id IS NULL OR p_empresa_id <= 0 THEN
+    RETURN;
+  END IF;
+
+  IF p_query IS NULL OR length(trim(p_query)) < 2 THEN
+    RETURN;
+  END IF;
+
+  v_query := plainto_tsquery('spanish', trim(p_query));
+  IF v_query IS NULL THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    kb.id,
+    kb.titulo,
+    kb.contenido,
+    ts_rank_cd(
+      to_tsvector('spanish', coalesce(kb.titulo, '') || ' ' || coalesce(kb.contenido, '')),
+      v_query
+    )::FLOAT AS keyword_score,
+    kb.match_stats
+  FROM public.knowledge_base kb
+  WHERE
+    kb.empresa_id = p_empresa_id
+    AND to_tsvector('spanish', coalesce(kb.titulo, '') || ' ' || coalesce(kb.contenido, '')) @@ v_query
+    AND (
+      (p_agent_id IS NULL AND kb.agent_id IS NULL)
+      OR (p_agent_id IS NOT NULL AND (kb.agent_id IS NULL OR kb.agent_id = p_agent_id))
+    )
+  ORDER BY keyword_score DESC
+  LIMIT LEAST(GREATEST(p_limit, 1), 30);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.search_knowledge_base_keyword(BIGINT, TEXT, INT, BIGINT)
+  TO authenticated, service_role;
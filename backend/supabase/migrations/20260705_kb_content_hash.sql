@@ -0,0 +1,16 @@
+-- =============================================================================
+-- Re-ingesta incremental de la KB (ver services/knowledge_ingest.py):
+--   - document_key: título con el que se subió el documento (agrupa sus chunks,
+--     aunque cada chunk semántico tenga su propio título).
+--   - content_hash: SHA-256 del título + contenido normalizados del chunk.
+-- Al re-subir un documento solo se embeben/insertan los hashes nuevos y se
+-- borran los que desaparecen. Filas anteriores quedan con NULL y se sustituyen
+-- en la primera re-ingesta.
+-- =============================================================================
+
+ALTER TABLE knowledge_base
+  ADD COLUMN IF NOT EXISTS document_key TEXT,
+  ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_kb_document
+  ON knowledge_base (empresa_id, document_key);
@@ -0,0 +1,7 @@
+-- =============================================================================
+-- Export de resultados de campaña en streaming (services/campaign_export_service):
+-- paginación keyset por (fecha, id) descendente dentro de la campaña.
+-- =============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_encuestas_campaign_fecha_id
+  ON public.encuestas (campaign_id, fecha DESC, id DESC);
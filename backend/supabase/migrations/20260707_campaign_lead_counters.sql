@@ -0,0 +1,134 @@
+-- ──────────────────────────────────────────────────────────────────────────────
+-- Contadores de progreso de leads por campaña.
+-- El listado de campañas hacía dos COUNT exactos sobre campaign_leads por cada
+-- campaña. Ahora campaigns guarda total / pending / calling / done y los
+-- mantienen triggers de sentencia sobre campaign_leads: cualquier transición
+-- (orquestador, claim RPC, propagación de telefonía, borrados) actualiza los
+-- contadores con un UPDATE por campaña afectada, no por fila.
+--   done = total - pending - calling (misma semántica que called_leads).
+-- ──────────────────────────────────────────────────────────────────────────────
+
+ALTER TABLE public.campaigns
+    ADD COLUMN IF NOT EXISTS leads_total INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS leads_pending INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS leads_calling INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS leads_done INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION public.campaign_leads_counters_trg()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_deltas JSONB;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(d) INTO v_deltas FROM (
+            SELECT campaign_id,
+                   COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+                   COUNT(*) FILTER (WHERE status = 'calling') AS calling
+            FROM new_leads
+            WHERE campaign_id IS NOT NULL
+            GROUP BY campaign_id
+        ) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(d) INTO v_deltas FROM (
+            SELECT campaign_id,
+                   -COUNT(*) AS total,
+                   -COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+                   -COUNT(*) FILTER (WHERE status = 'calling') AS calling
+            FROM old_leads
+            WHERE campaign_id IS NOT NULL
+            GROUP BY campaign_id
+        ) d;
+    ELSE
+        SELECT jsonb_agg(d) INTO v_deltas FROM (
+            SELECT campaign_id,
+                   SUM(sign) AS total,
+                   SUM(sign) FILTER (WHERE status = 'pending') AS pending,
+                   SUM(sign) FILTER (WHERE status = 'calling') AS calling
+            FROM (
+                SELECT n.campaign_id, n.status, 1 AS sign
+                FROM new_leads n JOIN old_leads o ON o.id = n.id
+                WHERE (n.status, n.campaign_id) IS DISTINCT FROM (o.status, o.campaign_id)
+                UNION ALL
+                SELECT o.campaign_id, o.status, -1 AS sign
+                FROM new_leads n JOIN old_leads o ON o.id = n.id
+                WHERE (n.status, n.campaign_id) IS DISTINCT FROM (o.status, o.campaign_id)
+            ) changes
+            WHERE campaign_id IS NOT NULL
+            GROUP BY campaign_id
+        ) d;
+    END IF;
+
+    IF v_deltas IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE public.campaigns c
+    SET leads_total = c.leads_total + d.total,
+        leads_pending = c.leads_pending + COALESCE(d.pending, 0),
+        leads_calling = c.leads_calling + COALESCE(d.calling, 0),
+        leads_done = c.leads_done + d.total - COALESCE(d.pending, 0) - COALESCE(d.calling, 0)
+    FROM jsonb_to_recordset(v_deltas) AS d(campaign_id BIGINT, total INTEGER, pending INTEGER, calling INTEGER)
+    WHERE c.id = d.campaign_id
+      AND (d.total <> 0 OR COALESCE(d.pending, 0) <> 0 OR COALESCE(d.calling, 0) <> 0);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_campaign_leads_counters_ins ON public.campaign_leads;
+DROP TRIGGER IF EXISTS trg_campaign_leads_counters_upd ON public.campaign_leads;
+DROP TRIGGER IF EXISTS trg_campaign_leads_counters_del ON public.campaign_leads;
+
+CREATE TRIGGER trg_campaign_leads_counters_ins
+    AFTER INSERT ON public.campaign_leads
+    REFERENCING NEW TABLE AS new_leads
+    FOR EACH STATEMENT EXECUTE FUNCTION public.campaign_leads_counters_trg();
+
+CREATE TRIGGER trg_campaign_leads_counters_upd
+    AFTER UPDATE ON public.campaign_leads
+    REFERENCING OLD TABLE AS old_leads NEW TABLE AS new_leads
+    FOR EACH STATEMENT EXECUTE FUNCTION public.campaign_leads_counters_trg();
+
+CREATE TRIGGER trg_campaign_leads_counters_del
+    AFTER DELETE ON public.campaign_leads
+    REFERENCING OLD TABLE AS old_leads
+    FOR EACH STATEMENT EXECUTE FUNCTION public.campaign_leads_counters_trg();
+
+-- Recalcula los contadores desde campaign_leads (backfill y reparación manual).
+CREATE OR REPLACE FUNCTION public.refresh_campaign_lead_counters(p_campaign_id BIGINT DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH counts AS (
+        SELECT c.id AS campaign_id,
+               COUNT(cl.id) AS total,
+               COUNT(cl.id) FILTER (WHERE cl.status = 'pending') AS pending,
+               COUNT(cl.id) FILTER (WHERE cl.status = 'calling') AS calling
+        FROM public.campaigns c
+        LEFT JOIN public.campaign_leads cl ON cl.campaign_id = c.id
+        WHERE p_campaign_id IS NULL OR c.id = p_campaign_id
+        GROUP BY c.id
+    ),
+    updated AS (
+        UPDATE public.campaigns c
+        SET leads_total = counts.total,
+            leads_pending = counts.pending,
+            leads_calling = counts.calling,
+            leads_done = counts.total - counts.pending - counts.calling
+        FROM counts
+        WHERE c.id = counts.campaign_id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+REVOKE ALL ON FUNCTION public.refresh_campaign_lead_counters(BIGINT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.refresh_campaign_lead_counters(BIGINT) TO service_role;
+
+SELECT public.refresh_campaign_lead_counters();
@@ -0,0 +1,60 @@
+-- ──────────────────────────────────────────────────────────────────────────────
+-- Importación masiva de leads (services/campaign_lead_import.py).
+-- El importador envía lotes acotados; este RPC inserta cada lote descartando
+-- los teléfonos repetidos dentro del lote y los que ya existen en la campaña.
+-- El importador reparte los teléfonos por hash entre sus inserciones
+-- concurrentes, así que dos lotes en vuelo nunca comparten número.
+-- ──────────────────────────────────────────────────────────────────────────────
+
+-- Los teléfonos llegan en E.164; los leads anteriores pueden estar guardados
+-- tal cual (612345678, "+34 612 34 56 78"). La deduplicación compara la misma
+-- forma normalizada que normalize_lead_phone (Python): solo dígitos y '+',
+-- 9 dígitos españoles → +34, prefijo 00 → +.
+CREATE OR REPLACE FUNCTION public.campaign_lead_phone_key(p_phone TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN d ~ '^[6789][0-9]{8}$' THEN '+34' || d
+        WHEN d LIKE '+%' THEN d
+        WHEN d LIKE '00%' THEN '+' || substr(d, 3)
+        ELSE '+' || ltrim(d, '0')
+    END
+    FROM (SELECT regexp_replace(COALESCE(p_phone, ''), '[^0-9+]', '', 'g') AS d) s;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_campaign_leads_campaign_phone_key
+    ON public.campaign_leads (campaign_id, public.campaign_lead_phone_key(phone_number));
+
+CREATE OR REPLACE FUNCTION public.insert_campaign_leads(
+    p_campaign_id BIGINT,
+    p_leads JSONB
+)
+RETURNS INTEGER
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    WITH incoming AS (
+        SELECT DISTINCT ON (l.phone_number) l.phone_number, l.customer_name
+        FROM jsonb_to_recordset(COALESCE(p_leads, '[]'::jsonb)) AS l(phone_number TEXT, customer_name TEXT)
+        WHERE COALESCE(l.phone_number, '') <> ''
+        ORDER BY l.phone_number
+    ),
+    inserted AS (
+        INSERT INTO public.campaign_leads (campaign_id, phone_number, customer_name, status, retries_attempted)
+        SELECT p_campaign_id, i.phone_number, i.customer_name, 'pending', 0
+        FROM incoming i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM public.campaign_leads cl
+            WHERE cl.campaign_id = p_campaign_id
+              AND public.campaign_lead_phone_key(cl.phone_number) = i.phone_number
+        )
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM inserted;
+$$;
+
+REVOKE ALL ON FUNCTION public.insert_campaign_leads(BIGINT, JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.insert_campaign_leads(BIGINT, JSONB) TO service_role;
@@ -0,0 +1,29 @@
+"""
+billing_flush.py — Cron ARQ: volcado write-behind del consumo por tenant.
+
+Los agentes encolan eventos de uso en un Redis Stream (ver billing_service); esta
+tarea los agrega y los persiste por lotes en Supabase.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+logger = logging.getLogger("arq-worker")
+
+
+async def flush_billing_usage_task(ctx: dict[str, Any]) -> None:
+    """
+    Tarea cron: persiste los eventos de uso pendientes del stream.
+
+    Frecuencia configurada en worker.py vía BILLING_FLUSH_INTERVAL_SECONDS.
+    """
+    _ = ctx
+    from services.billing_service import flush_usage_stream
+
+    try:
+        flushed = await flush_usage_stream()
+        if flushed:
+            logger.info("[billing_flush] %d evento(s) de uso persistidos", flushed)
+    except Exception as exc:
+        logger.error("[billing_flush] Error volcando uso: %s", exc)
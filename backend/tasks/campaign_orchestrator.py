@@ -4,8 +4,13 @@ campaign_orchestrator.py — Orquestador nativo de campañas (Cron ARQ cada minu
 Arquitectura fanout:
   1. El cron `campaign_orchestrator` escanea campañas orchestrated activas y encola
      un job `process_campaign_empresa` por cada una.
-  2. `process_campaign_empresa` adquiere un lock Redis por campaña (anti-race) y
-     reclama leads de forma atómica antes del dispatch SIP.
+  2. `process_campaign_empresa` adquiere un lock Redis por campaña (anti-race),
+     reclama un lote de leads con un único RPC (FOR UPDATE SKIP LOCKED), crea
+     todas las encuestas con un insert multi-fila y despacha cada lead por un
+     pipeline de etapas (sala+agente → readiness → SIP) con concurrencia propia.
+     Si hay una sala warm del agente (services/warm_room_pool) el lead se
+     vincula a ella y pasa directamente al SIP. La config enriquecida del
+     agente se precarga antes (services/agent_config_prefetch).
 
 Extraído de worker.py para mantener WorkerSettings limpio.
 """
@@ -19,7 +24,7 @@ from typing import Any
 
 from utils.call_schedule import is_call_allowed
 from services.agent_router import build_outbound_room_metadata
-from services.campaign_dispatch_service import resolve_campaign_dispatch_agent
+from services.campaign_dispatch_service import resolve_campaign_dispatch_agents
 from services.sip_call_service import create_sip_participant_with_retry, mark_call_failed, sip_retry_max_attempts
 
 logger = logging.getLogger("arq-worker")
@@ -27,6 +32,8 @@ logger = logging.getLogger("arq-worker")
 ORCHESTRATOR_QUEUE_TTL = int(os.getenv("ORCHESTRATOR_QUEUE_GUARD_TTL", "120"))
 ORCHESTRATOR_PROCESS_LOCK_TTL = int(os.getenv("ORCHESTRATOR_PROCESS_LOCK_TTL", "900"))
 LEAD_DISPATCH_LOCK_TTL = int(os.getenv("ORCHESTRATOR_LEAD_LOCK_TTL", "600"))
+# Etapa sala+dispatch de agente (llamadas LiveKit baratas; no ocupa slot SIP)
+ORCHESTRATOR_SETUP_PARALLEL = int(os.getenv("ORCHESTRATOR_SETUP_PARALLEL", "10"))
 
 
 def _is_orchestrated_campaign(campaign: dict) -> bool:
@@ -112,6 +119,120 @@ async def campaign_orchestrator(ctx: dict[str, Any]) -> None:
                 pass
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Operaciones de BD por lote
+# ──────────────────────────────────────────────────────────────────────────────
+
+async def _claim_leads_bulk(camp_id: Any, batch_size: int) -> list[dict]:
+    """
+    Reclama hasta ``batch_size`` leads en una sola transacción (RPC
+    ``claim_campaign_leads``). Si el RPC no existe aún en la BD, cae al
+    claim legacy: select + UPDATE condicional lead a lead.
+    """
+    from services.supabase_service import is_missing_rpc_error, supabase, sb_query
+
+    try:
+        res = await sb_query(
+            lambda: supabase.rpc(
+                "claim_campaign_leads",
+                {"p_campaign_id": int(camp_id), "p_limit": int(batch_size)},
+            ).execute()
+        )
+        return list(res.data or [])
+    except Exception as rpc_err:
+        # Solo el RPC ausente cae al claim legacy; un timeout o error de BD podría
+        # haber reclamado ya el lote y se propaga.
+        if not is_missing_rpc_error(rpc_err, "claim_campaign_leads"):
+            raise
+        logger.warning(
+            "[CampEmpresa] RPC claim_campaign_leads no disponible (%s); claim lead a lead.",
+            rpc_err,
+        )
+
+    now_utc = datetime.now(timezone.utc)
+    now_iso = now_utc.isoformat()
+    leads_res = await sb_query(
+        lambda: supabase.table("campaign_leads")
+        .select("id, phone_number, campaign_id, empresa_id")
+        .eq("campaign_id", camp_id)
+        .eq("status", "pending")
+        .or_(f"next_retry_at.is.null,next_retry_at.lte.{now_iso}")
+        .order("next_retry_at", desc=False, nullsfirst=True)
+        .limit(batch_size)
+        .execute()
+    )
+
+    claimed: list[dict] = []
+    for lead in leads_res.data or []:
+        lead_id = lead["id"]
+        try:
+            claim_res = await sb_query(
+                lambda lid=lead_id: supabase.table("campaign_leads")
+                .update({"status": "calling", "last_call_at": now_iso})
+                .eq("id", lid)
+                .eq("status", "pending")
+                .execute()
+            )
+            if not (claim_res.data or []):
+                logger.info("[CampEmpresa] Lead %s ya reclamado. Skipping.", lead_id)
+                continue
+            claimed.append(lead)
+        except Exception as claim_err:
+            logger.error("[CampEmpresa] Error claim lead %s: %s", lead_id, claim_err)
+    return claimed
+
+
+async def _set_leads_status(lead_ids: list[Any], payload: dict[str, Any]) -> None:
+    from services.supabase_service import supabase, sb_query
+
+    if not lead_ids:
+        return
+    await sb_query(
+        lambda: supabase.table("campaign_leads")
+        .update(payload)
+        .in_("id", list(lead_ids))
+        .execute()
+    )
+
+
+async def _insert_encuestas_bulk(rows: list[dict[str, Any]]) -> list[Any]:
+    """Insert multi-fila en encuestas; devuelve los ids en el mismo orden que ``rows``."""
+    from services.supabase_service import supabase, sb_query
+
+    res = await sb_query(lambda: supabase.table("encuestas").insert(rows).execute())
+    data = list(res.data or [])
+    if len(data) != len(rows):
+        raise RuntimeError(f"insert encuestas devolvió {len(data)} filas de {len(rows)}")
+    return [row["id"] for row in data]
+
+
+async def _link_leads_to_calls(links: list[dict[str, Any]]) -> None:
+    """Guarda call_id/ab_variant de todos los leads del lote con un RPC."""
+    from services.supabase_service import is_missing_rpc_error, supabase, sb_query
+
+    if not links:
+        return
+    try:
+        await sb_query(
+            lambda: supabase.rpc("link_campaign_lead_calls", {"p_links": links}).execute()
+        )
+        return
+    except Exception as rpc_err:
+        if not is_missing_rpc_error(rpc_err, "link_campaign_lead_calls"):
+            raise
+        logger.warning(
+            "[CampEmpresa] RPC link_campaign_lead_calls no disponible (%s); update lead a lead.",
+            rpc_err,
+        )
+    for link in links:
+        await sb_query(
+            lambda lk=link: supabase.table("campaign_leads")
+            .update({"call_id": lk["call_id"], "ab_variant": lk["ab_variant"]})
+            .eq("id", lk["lead_id"])
+            .execute()
+        )
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Job por empresa: claims + dispatch SIP
 # ──────────────────────────────────────────────────────────────────────────────
@@ -119,13 +240,23 @@ async def campaign_orchestrator(ctx: dict[str, Any]) -> None:
 async def process_campaign_empresa(ctx: dict[str, Any], campaign: dict) -> None:
     """
     Job ARQ (encolado por `campaign_orchestrator`): procesa una sola campaña.
-    Reclama leads de forma atómica y lanza llamadas SIP con concurrencia limitada.
+
+    El trabajo de BD se paga una vez por lote (horario, claim, límite de gasto,
+    resolución de agente, insert de encuestas y enlace lead→encuesta); después
+    cada lead avanza por el pipeline sala+agente → readiness → SIP, donde solo
+    la etapa SIP está limitada por ``ORCHESTRATOR_MAX_PARALLEL``.
     """
     from services.redis_service import acquire_lock, release_lock
-    from services.supabase_service import supabase, sb_query
+    from services.supabase_service import supabase
+    from services.agent_config_prefetch import prefetch_agent_config, with_inline_agent_config
+    from services.dialer_pacing import acquire_dial_slot
+    from services.warm_room_pool import bind_warm_room, claim_warm_room
     from services.livekit_service import create_isolated_room, dispatch_agent_explicit, wait_for_agent_ready
     from services.trunk_service import resolve_outbound_trunk_id
-    from services.campaign_locks import get_active_call_count_for_empresa as _get_active_call_count_for_empresa
+    from services.campaign_locks import (
+        get_active_call_count_for_empresa as _get_active_call_count_for_empresa,
+        release_active_call,
+    )
     from livekit import api as lk_api
 
     if not supabase:
@@ -146,7 +277,6 @@ async def process_campaign_empresa(ctx: dict[str, Any], campaign: dict) -> None:
 
     try:
         empresa_id = campaign.get("empresa_id") or 0
-        agent_id = campaign.get("agent_id") or "1"
         camp_name = campaign.get("name", "")
         batch_size = int(os.getenv("ORCHESTRATOR_BATCH_SIZE", "10"))
         max_parallel = int(os.getenv("ORCHESTRATOR_MAX_PARALLEL", "5"))
@@ -163,7 +293,22 @@ async def process_campaign_empresa(ctx: dict[str, Any], campaign: dict) -> None:
             )
             return
 
-        now_iso = datetime.now(timezone.utc).isoformat()
+        # No reclamar más leads de los que caben en el cupo de la empresa.
+        batch_size = min(batch_size, max_calls_per_empresa - empresa_active)
+
+        # El horario depende solo de la campaña: se evalúa una vez, antes de reclamar.
+        can_call, reason = is_call_allowed(
+            now=datetime.now(timezone.utc),
+            timezone_str=campaign.get("call_timezone") or "Europe/Madrid",
+            allowed_hours=(
+                int(campaign.get("call_start_hour") or 9),
+                int(campaign.get("call_end_hour") or 21),
+            ),
+            forbidden_weekdays=set(campaign.get("forbidden_weekdays") or {6}),
+        )
+        if not can_call:
+            logger.info("[CampEmpresa] Campaña %s fuera de horario: %s", camp_id, reason)
+            return
 
         logger.info(
             "[CampEmpresa] Procesando campaña=%s empresa=%s batch=%s",
@@ -173,182 +318,168 @@ async def process_campaign_empresa(ctx: dict[str, Any], campaign: dict) -> None:
         )
 
         try:
-            leads_res = await sb_query(
-                lambda: supabase.table("campaign_leads")
-                .select("id, phone_number, campaign_id, empresa_id")
-                .eq("campaign_id", camp_id)
-                .eq("status", "pending")
-                .or_(f"next_retry_at.is.null,next_retry_at.lte.{now_iso}")
-                .order("next_retry_at", desc=False, nullsfirst=True)
-                .limit(batch_size)
-                .execute()
-            )
-            leads = leads_res.data or []
+            claimed_leads = await _claim_leads_bulk(camp_id, batch_size)
         except Exception as e:
-            logger.error("[CampEmpresa] Error leyendo leads campaña %s: %s", camp_id, e)
+            logger.error("[CampEmpresa] Error reclamando leads campaña %s: %s", camp_id, e)
             return
 
-        if not leads:
+        if not claimed_leads:
             logger.info("[CampEmpresa] Sin leads pendientes para campaña=%s.", camp_id)
             return
 
-        for lead in leads:
-            lead["_campaign_agent_id"] = agent_id
-            lead["_campaign_name"] = camp_name
-
-        tz_name = campaign.get("call_timezone") or "Europe/Madrid"
-        allowed_hours = (
-            int(campaign.get("call_start_hour") or 9),
-            int(campaign.get("call_end_hour") or 21),
-        )
-        forbidden_days = set(campaign.get("forbidden_weekdays") or {6})
+        logger.info("[CampEmpresa] %s lead(s) reclamados en campaña=%s.", len(claimed_leads), camp_id)
 
-        claimed_leads: list[dict] = []
-        now_utc = datetime.now(timezone.utc)
+        claimed_ids = [lead["id"] for lead in claimed_leads]
 
-        for lead in leads:
-            lead_id = lead["id"]
-            can_call, reason = is_call_allowed(
-                now=now_utc,
-                timezone_str=tz_name,
-                allowed_hours=allowed_hours,
-                forbidden_weekdays=forbidden_days,
+        if empresa_id:
+            from services.billing_limits_service import (
+                TenantSpendingLimitExceeded,
+                enforce_tenant_spending_limit,
             )
-            if not can_call:
-                logger.info("[CampEmpresa] Lead %s saltado por horario: %s", lead_id, reason)
-                continue
 
             try:
-                claim_res = await sb_query(
-                    lambda: supabase.table("campaign_leads")
-                    .update({"status": "calling", "last_call_at": now_utc.isoformat()})
-                    .eq("id", lead_id)
-                    .eq("status", "pending")
-                    .execute()
+                await enforce_tenant_spending_limit(int(empresa_id), raise_http=False)
+            except TenantSpendingLimitExceeded as limit_exc:
+                logger.warning(
+                    "[CampEmpresa] %s lead(s) bloqueados por gasto empresa %s",
+                    len(claimed_ids),
+                    empresa_id,
                 )
-                if not (claim_res.data or []):
-                    logger.info("[CampEmpresa] Lead %s ya reclamado. Skipping.", lead_id)
-                    continue
-                claimed_leads.append(lead)
-            except Exception as claim_err:
-                logger.error("[CampEmpresa] Error claim lead %s: %s", lead_id, claim_err)
-
-        if not claimed_leads:
-            logger.info("[CampEmpresa] Sin leads reclamados en campaña=%s.", camp_id)
-            return
-
-        logger.info("[CampEmpresa] %s lead(s) reclamados en campaña=%s.", len(claimed_leads), camp_id)
-
-        semaphore = asyncio.Semaphore(max_parallel)
+                await _set_leads_status(
+                    claimed_ids,
+                    {"status": "failed", "error_msg": limit_exc.message[:500]},
+                )
+                return
 
-        async def _dispatch_one(lead: dict) -> None:
+        # Locks de dispatch por lead (otro worker podría estar reintentando uno)
+        lead_tokens: dict[Any, str] = {}
+        dispatchable: list[dict] = []
+        for lead in claimed_leads:
             lead_id = lead["id"]
-            lead_lock_token = await acquire_lock(
-                f"lead:dispatch:{lead_id}",
-                ttl_seconds=LEAD_DISPATCH_LOCK_TTL,
-            )
-            if not lead_lock_token:
+            if not lead.get("phone_number"):
+                logger.warning("[CampEmpresa] Lead %s sin teléfono. Skipping.", lead_id)
+                continue
+            token = await acquire_lock(f"lead:dispatch:{lead_id}", ttl_seconds=LEAD_DISPATCH_LOCK_TTL)
+            if not token:
                 logger.info("[CampEmpresa] Lead %s ya en dispatch por otro worker.", lead_id)
-                return
+                continue
+            lead_tokens[lead_id] = token
+            dispatchable.append(lead)
 
-            phone = lead.get("phone_number", "")
-            _camp_id = lead.get("campaign_id")
-            _empresa_id = lead.get("empresa_id") or 0
-            _agent_id = lead.get("_campaign_agent_id") or "1"
-            _camp_name = lead.get("_campaign_name", "")
+        async def _release_lead(lead_id: Any) -> None:
+            token = lead_tokens.pop(lead_id, None)
+            if token:
+                await release_lock(f"lead:dispatch:{lead_id}", token)
 
-            if not phone:
-                logger.warning("[CampEmpresa] Lead %s sin teléfono. Skipping.", lead_id)
-                await release_lock(f"lead:dispatch:{lead_id}", lead_lock_token)
-                return
-
-            if _empresa_id:
-                from services.billing_limits_service import (
-                    TenantSpendingLimitExceeded,
-                    enforce_tenant_spending_limit,
-                )
+        if not dispatchable:
+            return
 
-                try:
-                    await enforce_tenant_spending_limit(int(_empresa_id), raise_http=False)
-                except TenantSpendingLimitExceeded as limit_exc:
-                    logger.warning(
-                        "[CampEmpresa] Lead %s bloqueado por gasto empresa %s",
-                        lead_id,
-                        _empresa_id,
-                    )
-                    await sb_query(
-                        lambda: supabase.table("campaign_leads")
-                        .update({
-                            "status": "failed",
-                            "error_msg": limit_exc.message[:500],
-                        })
-                        .eq("id", lead_id)
-                        .execute()
-                    )
-                    await release_lock(f"lead:dispatch:{lead_id}", lead_lock_token)
-                    return
+        try:
+            resolved_by_lead = await resolve_campaign_dispatch_agents(
+                campaign, [int(lead["id"]) for lead in dispatchable]
+            )
+            now_iso = datetime.now(timezone.utc).isoformat()
+            encuesta_rows = []
+            for lead in dispatchable:
+                resolved = resolved_by_lead[int(lead["id"])]
+                encuesta_rows.append({
+                    "telefono": lead["phone_number"],
+                    "fecha": now_iso,
+                    "status": "initiated",
+                    "completada": 0,
+                    "agent_id": resolved["agent_id"],
+                    "agent_type": resolved["agent_type"],
+                    "empresa_id": lead.get("empresa_id") or empresa_id,
+                    "campaign_id": lead.get("campaign_id") or camp_id,
+                    "campaign_name": camp_name,
+                    "ab_variant": resolved.get("ab_variant"),
+                })
+            encuesta_ids = await _insert_encuestas_bulk(encuesta_rows)
+            await _link_leads_to_calls([
+                {
+                    "lead_id": lead["id"],
+                    "call_id": encuesta_id,
+                    "ab_variant": resolved_by_lead[int(lead["id"])].get("ab_variant"),
+                }
+                for lead, encuesta_id in zip(dispatchable, encuesta_ids)
+            ])
+        except Exception as batch_err:
+            logger.error("❌ [CampEmpresa] Error preparando lote campaña=%s: %s", camp_id, batch_err)
+            try:
+                await _set_leads_status([lead["id"] for lead in dispatchable], {"status": "pending"})
+            except Exception as revert_err:
+                logger.error("[CampEmpresa] Error revirtiendo lote campaña=%s: %s", camp_id, revert_err)
+            for lead in dispatchable:
+                await _release_lead(lead["id"])
+            return
 
-            async with semaphore:
-                try:
-                    resolved = await resolve_campaign_dispatch_agent(campaign, int(lead_id))
-                    resolved_agent_id = resolved["agent_id"]
-                    resolved_agent_type = resolved["agent_type"]
-                    ab_variant = resolved.get("ab_variant")
-
-                    enc_res = await sb_query(
-                        lambda: supabase.table("encuestas").insert({
-                            "telefono": phone,
-                            "fecha": datetime.now(timezone.utc).isoformat(),
-                            "status": "initiated",
-                            "completada": 0,
-                            "agent_id": resolved_agent_id,
-                            "agent_type": resolved_agent_type,
-                            "empresa_id": _empresa_id,
-                            "campaign_id": _camp_id,
-                            "campaign_name": _camp_name,
-                            "ab_variant": ab_variant,
-                        }).execute()
-                    )
-                    encuesta_id = enc_res.data[0]["id"]
+        sip_trunk_id = await resolve_outbound_trunk_id(int(empresa_id) if empresa_id else None)
+        agent_name = (os.getenv("AGENT_NAME_DISPATCH") or "default_agent").strip()
+        setup_semaphore = asyncio.Semaphore(max(1, ORCHESTRATOR_SETUP_PARALLEL))
+        sip_semaphore = asyncio.Semaphore(max_parallel)
 
-                    await sb_query(
-                        lambda: supabase.table("campaign_leads")
-                        .update({"call_id": encuesta_id, "ab_variant": ab_variant})
-                        .eq("id", lead_id)
-                        .execute()
-                    )
+        async def _dispatch_one(lead: dict, encuesta_id: Any) -> None:
+            lead_id = lead["id"]
+            phone = lead.get("phone_number", "")
+            _camp_id = lead.get("campaign_id") or camp_id
+            _empresa_id = lead.get("empresa_id") or empresa_id or 0
+            resolved = resolved_by_lead[int(lead_id)]
+            ab_variant = resolved.get("ab_variant")
+            room_name = (
+                f"llamada_ausarta_empresa_{_empresa_id}"
+                f"_campana_{_camp_id}"
+                f"_contacto_{lead_id}"
+                f"_encuesta_{encuesta_id}"
+            )
 
-                    room_name = (
-                        f"llamada_ausarta_empresa_{_empresa_id}"
-                        f"_campana_{_camp_id}"
-                        f"_contacto_{lead_id}"
-                        f"_encuesta_{encuesta_id}"
-                    )
-                    room_metadata = build_outbound_room_metadata(
-                        empresa_id=int(_empresa_id),
-                        survey_id=int(encuesta_id),
-                        agent_id=int(resolved_agent_id),
-                        agent_type=resolved_agent_type,
-                        campaign_id=int(_camp_id or 0),
-                        contacto_id=int(lead_id),
-                        extra={"ab_variant": ab_variant} if ab_variant else None,
-                    )
+            async def _revert_to_pending() -> None:
+                await _set_leads_status([lead_id], {"status": "pending"})
 
-                    await create_isolated_room(room_name, metadata=room_metadata)
+            # El lease (cupo de la empresa) lo registra el dialer al conceder el
+            # hueco; si el SIP no llega a lanzarse se libera aquí, si no en room_finished.
+            call_token: str | None = None
+            sip_started = False
+            try:
+                room_metadata = build_outbound_room_metadata(
+                    empresa_id=int(_empresa_id),
+                    survey_id=int(encuesta_id),
+                    agent_id=int(resolved["agent_id"]),
+                    agent_type=resolved["agent_type"],
+                    campaign_id=int(_camp_id or 0),
+                    contacto_id=int(lead_id),
+                    extra={"ab_variant": ab_variant} if ab_variant else None,
+                )
+                # Config enriquecida lista antes de que arranque el agente (sala warm o nueva).
+                prefetched_config = await prefetch_agent_config(int(encuesta_id), phone=str(phone))
 
-                    agent_name = (os.getenv("AGENT_NAME_DISPATCH") or "default_agent").strip()
-                    await dispatch_agent_explicit(
-                        room_name=room_name,
-                        agent_name=agent_name,
-                        metadata=room_metadata,
-                    )
+                # Sala warm (agente ya arrancado): se vincula y se salta sala/dispatch/readiness.
+                warm_room = await claim_warm_room(int(_empresa_id), int(resolved["agent_id"]))
+                if warm_room:
+                    try:
+                        await bind_warm_room(warm_room, room_metadata)
+                        room_name = warm_room
+                        logger.info("🔥 [CampEmpresa] Lead=%s vinculado a sala warm %s", lead_id, room_name)
+                    except Exception as bind_err:
+                        logger.warning("[CampEmpresa] Sala warm %s no vinculable: %s", warm_room, bind_err)
+                        warm_room = None
+
+                if not warm_room:
+                    # Etapa 1: sala + dispatch del agente
+                    async with setup_semaphore:
+                        await create_isolated_room(room_name, metadata=room_metadata)
+                        await dispatch_agent_explicit(
+                            room_name=room_name,
+                            agent_name=agent_name,
+                            metadata=with_inline_agent_config(room_metadata, prefetched_config),
+                        )
                     logger.info(
                         "[CampEmpresa] Agente despachado lead=%s tipo=%s sala=%s",
                         lead_id,
-                        resolved_agent_type,
+                        resolved["agent_type"],
                         room_name,
                     )
 
+                    # Etapa 2: readiness (espera pasiva, sin ocupar slot SIP)
                     agent_ready = await wait_for_agent_ready(room_name)
                     if not agent_ready:
                         logger.error(
@@ -365,15 +496,34 @@ async def process_campaign_empresa(ctx: dict[str, Any], campaign: dict) -> None:
                             phone=str(phone),
                             room_name=room_name,
                         )
-                        await sb_query(
-                            lambda: supabase.table("campaign_leads")
-                            .update({"status": "pending"})
-                            .eq("id", lead_id)
-                            .execute()
-                        )
+                        await _revert_to_pending()
                         return
 
-                    sip_trunk_id = await resolve_outbound_trunk_id(int(_empresa_id) if _empresa_id else None)
+                # Ritmo de marcado (token buckets global/trunk/empresa): se espera
+                # fuera del semáforo para no ocupar slots SIP.
+                dial_slot = await acquire_dial_slot(
+                    empresa_id=int(_empresa_id) if _empresa_id else None,
+                    trunk_id=sip_trunk_id,
+                    encuesta_id=int(encuesta_id),
+                    source="campaign_orchestrator",
+                )
+                call_token = dial_slot.call_token
+                if not dial_slot.granted:
+                    await mark_call_failed(
+                        int(encuesta_id),
+                        "Sin hueco de marcado (pacing del dialer)",
+                        error_code="dialer_pacing_timeout",
+                        notify=False,
+                        source="campaign_orchestrator",
+                        empresa_id=int(_empresa_id) if _empresa_id else None,
+                        phone=str(phone),
+                        room_name=room_name,
+                    )
+                    await _revert_to_pending()
+                    return
+
+                # Etapa 3: participante SIP (limitada por ORCHESTRATOR_MAX_PARALLEL)
+                async with sip_semaphore:
                     try:
                         await create_sip_participant_with_retry(
                             lk_api.CreateSIPParticipantRequest(
@@ -387,6 +537,7 @@ async def process_campaign_empresa(ctx: dict[str, Any], campaign: dict) -> None:
                             phone=str(phone),
                             source="campaign_orchestrator",
                         )
+                        sip_started = True
                         logger.info("✅ [CampEmpresa] Llamada SIP iniciada lead=%s → %s", lead_id, phone)
                     except Exception as sip_err:
                         logger.error("❌ [CampEmpresa] Error SIP lead=%s: %s", lead_id, sip_err)
@@ -400,31 +551,26 @@ async def process_campaign_empresa(ctx: dict[str, Any], campaign: dict) -> None:
                             room_name=room_name,
                             sip_attempts=sip_retry_max_attempts(),
                         )
-                        await sb_query(
-                            lambda: supabase.table("campaign_leads")
-                            .update({"status": "pending"})
-                            .eq("id", lead_id)
-                            .execute()
-                        )
+                        await _revert_to_pending()
                         return
 
-                except Exception as e:
-                    logger.error(
-                        "❌ [CampEmpresa] Error despachando lead=%s (%s): %s", lead_id, phone, e
-                    )
-                    try:
-                        await sb_query(
-                            lambda: supabase.table("campaign_leads")
-                            .update({"status": "pending"})
-                            .eq("id", lead_id)
-                            .execute()
-                        )
-                    except Exception as revert_err:
-                        logger.error("[CampEmpresa] Error revirtiendo lead=%s: %s", lead_id, revert_err)
-                finally:
-                    await release_lock(f"lead:dispatch:{lead_id}", lead_lock_token)
-
-        await asyncio.gather(*[_dispatch_one(lead) for lead in claimed_leads])
+            except Exception as e:
+                logger.error(
+                    "❌ [CampEmpresa] Error despachando lead=%s (%s): %s", lead_id, phone, e
+                )
+                try:
+                    await _revert_to_pending()
+                except Exception as revert_err:
+                    logger.error("[CampEmpresa] Error revirtiendo lead=%s: %s", lead_id, revert_err)
+            finally:
+                await _release_lead(lead_id)
+                if call_token and not sip_started:
+                    await release_active_call(int(encuesta_id), call_token)
+
+        await asyncio.gather(*[
+            _dispatch_one(lead, encuesta_id)
+            for lead, encuesta_id in zip(dispatchable, encuesta_ids)
+        ])
         logger.info("[CampEmpresa] ◀ Campaña=%s procesada.", camp_id)
     finally:
         await release_lock(f"campaign:process:{camp_id}", process_lock_token)
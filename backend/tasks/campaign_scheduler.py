@@ -11,16 +11,51 @@ from utils.call_schedule import is_call_allowed
 
 logger = logging.getLogger("arq-worker")
 
-async def campaign_scheduler_task(ctx: dict[str, Any]) -> None:
-    """
-    Cron: se ejecuta cada 30s (segundos :00 y :30 de cada minuto).
+# Reevaluación de campañas fuera de horario (no hay evento que las despierte).
+SCHEDULER_RECHECK_SECONDS = int(os.getenv("CAMPAIGN_SCHEDULER_RECHECK_SECONDS", "300"))
+# Reintento tras un error evaluando una empresa.
+_SCHEDULER_ERROR_BACKOFF_SECONDS = 30
+_SCHEDULER_POP_TIMEOUT_SECONDS = 1.0
+
+
+def _is_orchestrated(camp: dict) -> bool:
+    campaign_type = (camp.get("type") or "").strip().lower()
+    return campaign_type == "orchestrated" or bool(camp.get("use_orchestrator"))
+
 
-    Reemplaza campaign_scheduler_loop() de campaigns.py.
-    Escanea campañas activas en Supabase y encola dispatch_lead_drip_task
-    por cada empresa sin lock activo, usando ctx['redis'].enqueue_job().
+async def _seconds_until_next_retry(campaign_id: Any, now_iso: str) -> float | None:
+    """Segundos hasta el próximo lead con reintento programado; None si no hay."""
+    from services.supabase_service import supabase
+
+    res = await asyncio.to_thread(
+        supabase.table("campaign_leads")
+        .select("next_retry_at")
+        .eq("campaign_id", campaign_id)
+        .in_("status", ["pending", "pending_retry"])
+        .gt("next_retry_at", now_iso)
+        .order("next_retry_at", desc=False)
+        .limit(1)
+        .execute
+    )
+    if not res.data:
+        return None
+    try:
+        next_retry = datetime.fromisoformat(str(res.data[0]["next_retry_at"]).replace("Z", "+00:00"))
+    except (KeyError, ValueError):
+        return None
+    if next_retry.tzinfo is None:
+        next_retry = next_retry.replace(tzinfo=timezone.utc)
+    return max(1.0, (next_retry - datetime.now(timezone.utc)).total_seconds())
 
-    Ventaja frente al while-True en memoria: si el worker se reinicia,
-    el siguiente ciclo de 30s retoma el trabajo sin pérdida de estado.
+
+async def schedule_empresa(redis: ArqRedis, empresa_id: int) -> bool:
+    """
+    Evalúa una empresa sacada de la cola ready y, si tiene capacidad, encola
+    `dispatch_lead_drip_task` para su siguiente lead. Devuelve True si encoló.
+
+    Sin capacidad no hace falta reintentar: la liberación del drip lock o el
+    fin de una llamada vuelven a encolar la empresa. Solo los reintentos
+    programados y el horario se aplazan en la cola diferida.
     """
     from services.supabase_service import supabase
     from services.campaign_locks import (
@@ -30,48 +65,53 @@ async def campaign_scheduler_task(ctx: dict[str, Any]) -> None:
         is_empresa_locked as _is_empresa_locked,
     )
     from services.campaign_drip import check_campaign_completion as _check_campaign_completion
+    from services.campaign_scheduler_queue import block_empresa, defer_empresa
+    from services.empresa_limits_service import get_empresa_max_concurrent_calls
 
     if not supabase:
         logger.warning("[ARQ] Supabase no disponible en scheduler")
-        return
+        return False
 
-    redis: ArqRedis = ctx["redis"]
-    now_iso = datetime.utcnow().isoformat()
     max_concurrent_calls = int(os.getenv("MAX_CONCURRENT_CALLS", "10"))
-
-    try:
-        campaigns_res = await asyncio.to_thread(
-            supabase.table("campaigns").select("*").in_("status", ["active", "running"]).execute
+    if await _get_active_call_count() >= max_concurrent_calls:
+        logger.info(f"[ARQ] Límite global de canales SIP ({max_concurrent_calls}); empresa {empresa_id} en espera.")
+        await block_empresa(empresa_id)
+        return False
+
+    if await _is_empresa_locked(empresa_id):
+        return False
+
+    max_calls_per_empresa = await get_empresa_max_concurrent_calls(int(empresa_id))
+    empresa_active = await _get_active_call_count_for_empresa(empresa_id)
+    if empresa_active >= max_calls_per_empresa:
+        logger.info(
+            f"[ARQ] Rate limit empresa {empresa_id}: "
+            f"{empresa_active}/{max_calls_per_empresa} llamadas activas."
         )
-        campaigns = campaigns_res.data or []
-    except Exception as e:
-        logger.error(f"[ARQ] Error leyendo campañas activas: {e}")
-        return
+        return False
+
+    campaigns_res = await asyncio.to_thread(
+        supabase.table("campaigns")
+        .select("*")
+        .eq("empresa_id", empresa_id)
+        .in_("status", ["active", "running"])
+        .order("id")
+        .execute
+    )
+    campaigns = campaigns_res.data or []
 
-    if campaigns:
-        logger.info(f"[ARQ] Scheduler: {len(campaigns)} campañas activas.")
+    now_iso = datetime.utcnow().isoformat()
+    recheck_in: float | None = None
 
-    active_count = await _get_active_call_count()
-    if active_count >= max_concurrent_calls:
-        logger.warning(f"[ARQ] Límite global de canales SIP alcanzado ({max_concurrent_calls}).")
-        return
-
-    # Rate limit por empresa: máximo de llamadas concurrentes por tenant
-    from services.empresa_limits_service import get_empresa_max_concurrent_calls
+    def _recheck(seconds: float) -> None:
+        nonlocal recheck_in
+        recheck_in = seconds if recheck_in is None else min(recheck_in, seconds)
 
     for camp in campaigns:
         campaign_id = camp["id"]
-        empresa_id = camp.get("empresa_id") or 0
-        max_calls_per_empresa = await get_empresa_max_concurrent_calls(int(empresa_id or 0))
-        campaign_type = (camp.get("type") or "").strip().lower()
-        use_orchestrator = bool(camp.get("use_orchestrator"))
 
         # FIX A — evitar doble despacho con orquestador.
-        if campaign_type == "orchestrated" or use_orchestrator:
-            logger.debug(
-                f"[ARQ] Scheduler salta campaña {campaign_id} "
-                f"(type={campaign_type}, use_orchestrator={use_orchestrator})"
-            )
+        if _is_orchestrated(camp):
             continue
 
         cancel_key = f"ausarta:campaign:cancel:{campaign_id}"
@@ -81,37 +121,19 @@ async def campaign_scheduler_task(ctx: dict[str, Any]) -> None:
         except Exception:
             pass
 
-        if await _is_empresa_locked(empresa_id):
-            continue
-
         # FIX G — cumplimiento horario por campaña.
-        now_utc = datetime.now(timezone.utc)
-        allowed_hours = (
-            int(camp.get("call_start_hour") or 9),
-            int(camp.get("call_end_hour") or 21),
-        )
-        tz_name = camp.get("call_timezone") or "Europe/Madrid"
-        forbidden_days = set(camp.get("forbidden_weekdays") or {6})
         can_call, reason = is_call_allowed(
-            now=now_utc,
-            timezone_str=tz_name,
-            allowed_hours=allowed_hours,
-            forbidden_weekdays=forbidden_days,
+            now=datetime.now(timezone.utc),
+            timezone_str=camp.get("call_timezone") or "Europe/Madrid",
+            allowed_hours=(
+                int(camp.get("call_start_hour") or 9),
+                int(camp.get("call_end_hour") or 21),
+            ),
+            forbidden_weekdays=set(camp.get("forbidden_weekdays") or {6}),
         )
         if not can_call:
-            logger.info(
-                f"[ARQ] Scheduler salta campaña {campaign_id} por horario: {reason}"
-            )
-            continue
-
-        # Per-empresa concurrent call rate limit
-        empresa_active = await _get_active_call_count_for_empresa(empresa_id)
-        if empresa_active >= max_calls_per_empresa:
-            logger.info(
-                f"[ARQ] Rate limit empresa {empresa_id}: "
-                f"{empresa_active}/{max_calls_per_empresa} llamadas activas. "
-                f"Skipping campaña {campaign_id}."
-            )
+            logger.info(f"[ARQ] Scheduler salta campaña {campaign_id} por horario: {reason}")
+            _recheck(SCHEDULER_RECHECK_SECONDS)
             continue
 
         try:
@@ -127,11 +149,15 @@ async def campaign_scheduler_task(ctx: dict[str, Any]) -> None:
             )
         except Exception as fetch_err:
             logger.error(f"[ARQ] Error leyendo leads campaña {campaign_id}: {fetch_err}")
+            _recheck(_SCHEDULER_ERROR_BACKOFF_SECONDS)
             continue
 
         if not leads_res.data:
-            is_done = await _check_campaign_completion(campaign_id)
-            if is_done:
+            retry_in = await _seconds_until_next_retry(campaign_id, now_iso)
+            if retry_in is not None:
+                _recheck(retry_in)
+                continue
+            if await _check_campaign_completion(campaign_id):
                 try:
                     await asyncio.to_thread(
                         supabase.table("campaigns").update({"status": "completed"}).eq("id", campaign_id).execute
@@ -145,14 +171,82 @@ async def campaign_scheduler_task(ctx: dict[str, Any]) -> None:
 
         lock_token = await _acquire_empresa_lock(empresa_id)
         if not lock_token:
-            continue
+            return False
 
-        job_id = f"dispatch:{campaign_id}:{lead['id']}"
         await redis.enqueue_job(
             "dispatch_lead_drip_task",
             lead["id"],
             campaign_id,
             lock_token,
-            _job_id=job_id,
+            _job_id=f"dispatch:{campaign_id}:{lead['id']}",
+        )
+        return True
+
+    if recheck_in is not None:
+        await defer_empresa(empresa_id, recheck_in)
+    return False
+
+
+async def run_campaign_scheduler(ctx: dict[str, Any]) -> None:
+    """
+    Consumidor de la cola ready del scheduler (vive mientras el worker).
+
+    Reemplaza el sondeo cada 30 s: reacciona en milisegundos a los eventos de
+    `services.campaign_scheduler_queue` (slot liberado, campaña activada,
+    leads nuevos) y solo consulta Supabase para las empresas señalizadas.
+    Varios workers comparten la cola: cada empresa la evalúa uno solo.
+    """
+    from services.campaign_scheduler_queue import defer_empresa, pop_ready_empresa
+
+    redis: ArqRedis = ctx["redis"]
+    await campaign_scheduler_task(ctx)
+    logger.info("✅ [ARQ] Scheduler de campañas (event-driven) activo.")
+
+    while True:
+        empresa_id: int | None = None
+        try:
+            empresa_id = await pop_ready_empresa(_SCHEDULER_POP_TIMEOUT_SECONDS)
+            if empresa_id is None:
+                continue
+            await schedule_empresa(redis, empresa_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[ARQ] Error en scheduler de campañas (empresa {empresa_id}): {e}")
+            if empresa_id is not None:
+                try:
+                    await defer_empresa(empresa_id, _SCHEDULER_ERROR_BACKOFF_SECONDS)
+                except Exception:
+                    pass
+            await asyncio.sleep(1)
+
+
+async def campaign_scheduler_task(ctx: dict[str, Any]) -> None:
+    """
+    Cron de reconciliación (cada CAMPAIGN_SCHEDULER_RECONCILE_MINUTES).
+
+    El despacho lo hace `run_campaign_scheduler` por eventos; este job solo
+    vuelve a encolar las empresas con campañas activas, por si algún evento
+    se perdió (reinicio de Redis, worker caído a mitad de una evaluación).
+    También lo encola `enqueue_scheduler_tick()` cuando no se conoce la empresa.
+    """
+    from services.supabase_service import supabase
+    from services.campaign_scheduler_queue import signal_empresas_ready
+
+    if not supabase:
+        logger.warning("[ARQ] Supabase no disponible en scheduler")
+        return
+
+    try:
+        campaigns_res = await asyncio.to_thread(
+            supabase.table("campaigns").select("empresa_id").in_("status", ["active", "running"]).execute
         )
+    except Exception as e:
+        logger.error(f"[ARQ] Error leyendo campañas activas: {e}")
+        return
 
+    empresa_ids = {int(c["empresa_id"]) for c in campaigns_res.data or [] if c.get("empresa_id")}
+    if not empresa_ids:
+        return
+    queued = await signal_empresas_ready(empresa_ids)
+    logger.info(f"[ARQ] Reconciliación scheduler: {len(empresa_ids)} empresas activas, {queued} encoladas.")
@@ -105,6 +105,14 @@ async def generate_transfer_briefing_task(
             .execute()
         )
 
+        if room_name:
+            try:
+                from services.call_events import publish_call_event
+
+                await publish_call_event(room_name, "transfer_briefing", text=briefing)
+            except Exception as ev_err:
+                logger.debug(f"[worker] Briefing no publicado en el stream de la sala: {ev_err}")
+
         webhook_base = (os.getenv("N8N_WEBHOOK_BASE_URL") or "").strip().rstrip("/")
         if webhook_base:
             from tasks.notifications import process_n8n_webhook
@@ -0,0 +1,24 @@
+"""
+warm_room_pool.py — Cron ARQ: mantenimiento del pool de salas warm.
+
+Las reclamaciones reponen el pool al momento; este cron ajusta el tamaño de
+todos los pools con demanda reciente (crece con el ritmo de marcado y se
+vacía cuando la empresa deja de llamar).
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+logger = logging.getLogger("arq-worker")
+
+
+async def maintain_warm_room_pool_task(ctx: dict[str, Any]) -> None:
+    """Tarea cron (cada minuto): ajusta los pools de salas warm."""
+    _ = ctx
+    from services.warm_room_pool import maintain_warm_pools
+
+    try:
+        await maintain_warm_pools()
+    except Exception as exc:
+        logger.error("[warm_pool] Error manteniendo pools de salas warm: %s", exc)
@@ -0,0 +1,72 @@
+"""Tests del prefetch de config del agente en el dialer."""
+from __future__ import annotations
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from services import agent_config_prefetch as acp
+from utils.call_loader import enrich_agent_config_with_context
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("services.redis_service.get_redis", new=AsyncMock(return_value=client)):
+        yield client
+
+
+async def _fake_enrich(job_id, agent_config, empresa_id_str, meta_data):
+    agent_config["_kb_context"] = "kb"
+    agent_config["_customer_context"] = f"cliente {meta_data.get('telefono')}"
+
+
+@pytest.mark.asyncio
+async def test_prefetch_writes_enriched_config_to_agent_cache(fake_redis):
+    with (
+        patch(
+            "services.campaign_agent_config_service.resolve_agent_config_by_survey",
+            return_value={"name": "Bot", "empresa_id": 3},
+        ),
+        patch("utils.call_loader.enrich_agent_config_with_context", new=_fake_enrich),
+    ):
+        config = await acp.prefetch_agent_config(77, phone="+34600000000")
+
+    assert config["_context_prefetched"] is True
+    assert config["_customer_context"] == "cliente +34600000000"
+    cached = json.loads(await fake_redis.get("ausarta:agent_config:survey_77"))
+    assert cached == config
+    assert 0 < await fake_redis.ttl("ausarta:agent_config:survey_77")
+
+
+@pytest.mark.asyncio
+async def test_prefetch_failure_falls_back_to_agent_fetch(fake_redis):
+    with patch(
+        "services.campaign_agent_config_service.resolve_agent_config_by_survey",
+        side_effect=LookupError("Survey not found"),
+    ):
+        assert await acp.prefetch_agent_config(77) is None
+    assert await fake_redis.get("ausarta:agent_config:survey_77") is None
+
+
+def test_inline_config_only_when_it_fits(monkeypatch):
+    meta = {"survey_id": 1}
+    config = {"instructions": "x" * 100}
+    assert acp.with_inline_agent_config(meta, config)["agent_config"] == config
+    assert acp.with_inline_agent_config(meta, None) is meta
+
+    monkeypatch.setenv("AGENT_CONFIG_INLINE_MAX_BYTES", "50")
+    assert "agent_config" not in acp.with_inline_agent_config(meta, config)
+
+
+@pytest.mark.asyncio
+async def test_agent_skips_enrichment_for_prefetched_config():
+    config = {"empresa_id": 3, "_context_prefetched": True, "_kb_context": "kb"}
+    with patch("utils.call_loader._load_kb", new=AsyncMock()) as load_kb:
+        await enrich_agent_config_with_context("job", config, "3", {"telefono": "+34600000000"})
+
+    load_kb.assert_not_awaited()
+    assert config["_kb_context"] == "kb"
+    assert config["_customer_context"] == ""
@@ -0,0 +1,50 @@
+"""Tests del harness de benchmark offline (dobles y estadísticas)."""
+from __future__ import annotations
+
+import pytest
+
+from bench.fakes import FakeSupabase, LatencyProfile
+from bench.runner import compare_with_baseline, percentile
+
+
+def test_percentile_interpolates_linearly():
+    values = [10.0, 20.0, 30.0, 40.0]
+    assert percentile(values, 50) == 25.0
+    assert percentile(values, 100) == 40.0
+    assert percentile([], 95) == 0.0
+
+
+def test_latency_spec_parsing():
+    profile = LatencyProfile.from_spec("groq=200, openai=0,jitter=0")
+    assert profile.groq == 200.0
+    assert profile.sample("groq") == pytest.approx(0.2)
+    assert profile.sample("openai") == 0.0
+    with pytest.raises(ValueError):
+        LatencyProfile.from_spec("desconocido=5")
+
+
+def test_fake_supabase_filters_and_rpc_errors():
+    db = FakeSupabase(LatencyProfile.from_spec("supabase=0"))
+    db.seed("campaign_leads", [
+        {"campaign_id": 1, "status": "pending", "phone_number": "600"},
+        {"campaign_id": 1, "status": "called", "phone_number": "601"},
+        {"campaign_id": 2, "status": "pending", "phone_number": None},
+    ])
+
+    res = db.table("campaign_leads").select("id", count="exact").eq("status", "pending").execute()
+    assert res.count == 2
+    res = db.table("campaign_leads").select("*").not_.is_("phone_number", "null").order("phone_number", desc=True).execute()
+    assert [r["phone_number"] for r in res.data] == ["601", "600"]
+
+    inserted = db.table("encuestas").insert([{"telefono": "600"}, {"telefono": "601"}]).execute()
+    assert len(inserted.data) == 2 and all("id" in r for r in inserted.data)
+
+    with pytest.raises(Exception, match="does not exist"):
+        db.rpc("claim_campaign_leads", {}).execute()
+
+
+def test_baseline_comparison_flags_p95_regressions():
+    baseline = {"scenarios": {"a": {"p95_ms": 100.0, "errors": 0}, "b": {"p95_ms": 50.0, "errors": 0}}}
+    report = {"scenarios": {"a": {"p95_ms": 130.0, "errors": 0}, "b": {"p95_ms": 55.0, "errors": 0}}}
+    regressions = compare_with_baseline(report, baseline, tolerance=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("a:")
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -261,3 +262,108 @@ async def test_defer_persistence_schedules_background_task(mock_redis: AsyncMock
         await billing.log_telephony_seconds(2, 30, period="2026-06")
 
     assert len(scheduled) == 1
+
+
+@pytest.mark.asyncio
+async def test_write_behind_enqueues_to_stream_without_db_writes(mock_redis: AsyncMock):
+    billing = BillingService(defer_persistence=True, write_behind=True)
+    mock_redis.xadd = AsyncMock()
+    persist = AsyncMock()
+
+    with (
+        patch("services.billing_service.get_redis", new=AsyncMock(return_value=mock_redis)),
+        patch("services.billing_service.supabase", MagicMock()),
+        patch.object(billing, "_persist_usage", new=persist),
+    ):
+        await billing.log_tts_characters(3, 120, "cartesia", period="2026-06")
+
+    persist.assert_not_called()
+    mock_redis.xadd.assert_awaited_once()
+    payload = json.loads(mock_redis.xadd.await_args.args[1]["payload"])
+    assert payload["monthly"] == [["tts_characters", "cartesia", 120]]
+
+
+def test_aggregate_usage_entries_pre_sums_monthly_deltas():
+    from services.billing_service import aggregate_usage_entries
+
+    payloads = [
+        {"empresa_id": 1, "period": "2026-06", "event_type": "telephony_seconds",
+         "quantity": 30, "unit": "seconds", "metadata": {}, "monthly": [["telephony_seconds", "", 30]]},
+        {"empresa_id": 1, "period": "2026-06", "event_type": "telephony_seconds",
+         "quantity": 12, "unit": "seconds", "metadata": {}, "monthly": [["telephony_seconds", "", 12]]},
+        {"empresa_id": 2, "period": "2026-06", "event_type": "telephony_seconds",
+         "quantity": 5, "unit": "seconds", "metadata": {}, "monthly": [["telephony_seconds", "", 5]]},
+    ]
+
+    events, monthly = aggregate_usage_entries(payloads)
+
+    assert len(events) == 3
+    assert sorted((r["empresa_id"], r["quantity"]) for r in monthly) == [(1, 42), (2, 5)]
+
+
+@pytest.mark.asyncio
+async def test_flush_usage_stream_acks_only_after_persisting():
+    from services import billing_service
+
+    entry = {"payload": json.dumps({
+        "empresa_id": 1, "period": "2026-06", "event_type": "stt_audio_seconds",
+        "quantity": 10, "unit": "seconds", "metadata": {}, "monthly": [["stt_audio_seconds", "deepgram", 10]],
+    })}
+    redis = AsyncMock()
+    redis.xautoclaim = AsyncMock(return_value=["0-0", [], []])
+    redis.xreadgroup = AsyncMock(return_value=[[billing_service.USAGE_STREAM_KEY, [("1-0", entry)]]])
+
+    with (
+        patch("services.billing_service.get_redis", new=AsyncMock(return_value=redis)),
+        patch("services.billing_service.supabase", MagicMock()),
+        patch("services.billing_service._persist_usage_batch", new=AsyncMock(side_effect=RuntimeError("db down"))),
+    ):
+        assert await billing_service.flush_usage_stream(consumer="t") == 0
+    redis.xack.assert_not_called()
+
+    persist = AsyncMock()
+    with (
+        patch("services.billing_service.get_redis", new=AsyncMock(return_value=redis)),
+        patch("services.billing_service.supabase", MagicMock()),
+        patch("services.billing_service._persist_usage_batch", new=persist),
+    ):
+        assert await billing_service.flush_usage_stream(consumer="t") == 1
+
+    persist.assert_awaited_once()
+    redis.xack.assert_awaited_once_with(
+        billing_service.USAGE_STREAM_KEY, billing_service.USAGE_STREAM_GROUP, "1-0"
+    )
+
+
+@pytest.mark.asyncio
+async def test_persist_batch_retries_rpc_and_falls_back_only_when_missing():
+    from services import billing_service
+
+    events = [{"empresa_id": 1, "period": "2026-06", "event_type": "x", "quantity": "1", "unit": "u", "metadata": {}}]
+    monthly = [{"empresa_id": 1, "period": "2026-06", "category": "telephony_seconds", "sub_key": "", "quantity": 1}]
+
+    sb = MagicMock()
+    sb.rpc.return_value.execute.side_effect = [TimeoutError("read timeout"), None]
+    with (
+        patch("services.billing_service.supabase", sb),
+        patch("services.billing_service.asyncio.sleep", new=AsyncMock()),
+    ):
+        await billing_service._persist_usage_batch(events, monthly)
+    assert sb.rpc.call_count == 2
+    sb.table.assert_not_called()
+
+    sb = MagicMock()
+    sb.rpc.return_value.execute.side_effect = TimeoutError("read timeout")
+    with (
+        patch("services.billing_service.supabase", sb),
+        patch("services.billing_service.asyncio.sleep", new=AsyncMock()),
+        pytest.raises(TimeoutError),
+    ):
+        await billing_service._persist_usage_batch(events, monthly)
+    sb.table.assert_not_called()
+
+    sb = MagicMock()
+    sb.rpc.side_effect = [RuntimeError("PGRST202 Could not find the function public.record_tenant_usage_batch"), MagicMock()]
+    with patch("services.billing_service.supabase", sb):
+        await billing_service._persist_usage_batch(events, monthly)
+    sb.table.assert_called_once_with("tenant_usage_events")
@@ -0,0 +1,105 @@
+"""Tests del stream de eventos en vivo por sala y la vista de llamada que lo sigue."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from routers import monitoring
+from services import call_events
+from services.call_events import CallEventPublisher, read_call_history, watch_call_events
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def _get_redis():
+        return client
+
+    monkeypatch.setattr(call_events, "get_redis", _get_redis)
+    yield client
+    call_events._watchers.clear()
+    call_events._cursors.clear()
+
+
+@pytest.mark.asyncio
+async def test_publisher_keeps_order_and_sets_ttl(redis):
+    publisher = CallEventPublisher("sala_1")
+    publisher.emit("status", status="active")
+    publisher.emit("turn", role="assistant", text="Hola, le llamo de Ausarta")
+    publisher.emit("turn", role="user", text="Dígame")
+    await publisher.flush()
+
+    last_id, events = await read_call_history("sala_1")
+
+    assert [e["type"] for e in events] == ["status", "turn", "turn"]
+    assert events[2]["text"] == "Dígame"
+    assert last_id != "0-0"
+    assert 0 < await redis.ttl(call_events.call_events_key("sala_1")) <= call_events.CALL_EVENTS_TTL_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_publisher_swallows_redis_errors(monkeypatch):
+    async def _down():
+        raise ConnectionError("redis caído")
+
+    monkeypatch.setattr(call_events, "get_redis", _down)
+    publisher = CallEventPublisher("sala_x")
+    publisher.emit("turn", role="user", text="hola")
+    await publisher.flush()
+
+
+@pytest.mark.asyncio
+async def test_watchers_share_one_tail_and_get_only_new_events(redis):
+    await call_events.publish_call_event("sala_a", "turn", role="user", text="antes")
+    last_a, _ = await read_call_history("sala_a")
+
+    async with watch_call_events("sala_a", last_a) as queue_a, watch_call_events("sala_b", "0-0") as queue_b:
+        await call_events.publish_call_event("sala_a", "state", state="speaking")
+        await call_events.publish_call_event("sala_b", "status", status="ended")
+
+        events_a = await asyncio.wait_for(queue_a.get(), 3)
+        events_b = await asyncio.wait_for(queue_b.get(), 3)
+
+    assert [e["type"] for e in events_a] == ["state"]
+    assert events_b[0]["status"] == "ended"
+    assert not call_events._watchers
+    await call_events.close_call_events()
+
+
+@pytest.mark.asyncio
+async def test_call_view_follows_the_stream_without_polling_the_db(redis, monkeypatch):
+    db_reads = 0
+
+    async def _base(room_name):
+        nonlocal db_reads
+        db_reads += 1
+        return {
+            "room_name": room_name, "empresa_id": 1, "status": "active", "duration_seconds": 12,
+            "transcript": [], "contact": {"nombre": "Ana"}, "transfer_briefing": None,
+            "extensions_available": [],
+        }
+
+    monkeypatch.setattr(monitoring, "_build_call_payload", _base)
+    await call_events.publish_call_event("sala_live", "turn", role="assistant", text="Buenos días")
+
+    snapshots = monitoring._call_snapshots("sala_live")
+    first = await asyncio.wait_for(snapshots.__anext__(), 3)
+    assert [t["text"] for t in first["transcript"]] == ["Buenos días"]
+    assert first["duration_seconds"] >= 12 and first["contact"] == {"nombre": "Ana"}
+
+    await call_events.publish_call_event("sala_live", "turn", role="user", text="Hola")
+    await call_events.publish_call_event("sala_live", "transfer_briefing", text="CLIENTE: Ana")
+    await call_events.publish_call_event("sala_live", "status", status="transferred")
+    latest = first
+    while latest["status"] != "transferred":
+        latest = await asyncio.wait_for(snapshots.__anext__(), 3)
+
+    assert [t["speaker"] for t in latest["transcript"]] == ["agent", "user"]
+    assert latest["transfer_briefing"] == "CLIENTE: Ana"
+    assert db_reads == 1
+    await snapshots.aclose()
+    await call_events.close_call_events()
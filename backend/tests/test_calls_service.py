@@ -1,6 +1,11 @@
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 
-from services.calls_service import _parse_room_name, _call_direction_from_extra
+from services.calls_service import _parse_room_name, _call_direction_from_extra, fetch_live_rooms_map
 
 
 def test_parse_room_name():
@@ -15,3 +20,38 @@ def test_parse_room_name():
 def test_call_direction_from_extra():
     assert _call_direction_from_extra({"call_direction": "inbound"}) == "inbound"
     assert _call_direction_from_extra({}) is None
+
+
+@pytest.mark.asyncio
+async def test_live_rooms_map_resolves_bound_warm_rooms_from_metadata():
+    now = int(time.time())
+    rooms = [
+        SimpleNamespace(  # Sala warm vinculada: encuesta y duración desde la metadata.
+            name="llamada_ausarta_warm_empresa_3_agente_7_0123456789ab",
+            metadata=json.dumps({"survey_id": 55, "empresa_id": 3, "bound_at": now - 10}),
+            num_participants=2,
+            creation_time=now - 200,
+        ),
+        SimpleNamespace(  # Sala warm sin vincular: no es una llamada.
+            name="llamada_ausarta_warm_empresa_3_agente_7_ba9876543210",
+            metadata=json.dumps({"warm": True, "survey_id": 0, "empresa_id": 3}),
+            num_participants=1,
+            creation_time=now - 100,
+        ),
+        SimpleNamespace(
+            name="llamada_ausarta_empresa_3_campana_1_contacto_2_encuesta_99",
+            metadata="",
+            num_participants=2,
+            creation_time=now - 30,
+        ),
+    ]
+    lkapi = MagicMock()
+    lkapi.room.list_rooms = AsyncMock(return_value=SimpleNamespace(rooms=rooms))
+
+    with patch("services.livekit_service.lkapi", lkapi):
+        live = await fetch_live_rooms_map()
+
+    assert sorted(live) == [55, 99]
+    assert live[55]["room_name"].startswith("llamada_ausarta_warm_empresa_3")
+    assert 10 <= live[55]["duration_seconds"] < 15
+    assert 30 <= live[99]["duration_seconds"] < 35
@@ -0,0 +1,53 @@
+"""Tests del listado de campañas con contadores de leads agregados."""
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from bench.fakes import FakeSupabase, LatencyProfile
+from services import campaign_crud_service
+from services.campaign_crud_service import list_campaigns_for_user
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeSupabase(LatencyProfile.from_spec("supabase=0"))
+    monkeypatch.setattr(campaign_crud_service, "supabase", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_list_uses_campaign_counters_without_per_campaign_counts(db, monkeypatch):
+    db.seed("campaigns", [
+        {"id": 1, "empresa_id": 3, "created_at": "2026-07-01", "leads_total": 10,
+         "leads_pending": 4, "leads_calling": 1, "leads_done": 5},
+        {"id": 2, "empresa_id": 3, "created_at": "2026-07-02", "leads_total": 0,
+         "leads_pending": 0, "leads_calling": 0, "leads_done": 0},
+        {"id": 3, "empresa_id": 4, "created_at": "2026-07-03", "leads_total": 7,
+         "leads_pending": 0, "leads_calling": 0, "leads_done": 7},
+    ])
+    legacy = MagicMock()
+    monkeypatch.setattr(campaign_crud_service, "_count_leads_legacy", legacy)
+
+    campaigns = await list_campaigns_for_user(3)
+
+    assert [c["id"] for c in campaigns] == [2, 1]
+    first = campaigns[1]
+    assert (first["total_leads"], first["called_leads"], first["pending_leads"], first["calling_leads"]) == (10, 5, 4, 1)
+    assert campaigns[0]["total_leads"] == 0 and campaigns[0]["called_leads"] == 0
+    legacy.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_list_falls_back_to_counts_before_migration(db, monkeypatch):
+    db.seed("campaigns", [{"id": 1, "empresa_id": 3, "created_at": "2026-07-01"}])
+
+    def _legacy(campaign):
+        campaign["total_leads"], campaign["called_leads"] = 2, 1
+
+    monkeypatch.setattr(campaign_crud_service, "_count_leads_legacy", _legacy)
+
+    campaigns = await list_campaigns_for_user(None)
+
+    assert campaigns[0]["total_leads"] == 2 and campaigns[0]["called_leads"] == 1
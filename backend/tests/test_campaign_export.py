@@ -1,6 +1,12 @@
 """Tests de simulación y exportación de campañas."""
 
-from services.campaign_export_service import build_campaign_results_csv
+import gzip
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services import campaign_export_service as export
+from services.campaign_export_service import _project_row, build_campaign_results_csv
 
 
 def test_build_campaign_results_csv_includes_anger_fields():
@@ -25,3 +31,71 @@ def test_build_campaign_results_csv_includes_anger_fields():
     assert "customer_anger_score" in csv_text
     assert ",8," in csv_text or ",8\n" in csv_text
     assert "True" in csv_text
+
+
+def _rows(n: int) -> list[dict]:
+    return [
+        {
+            "id": 1000 - i,
+            "telefono": f"+34600{i:04d}",
+            "fecha": f"2026-06-22T10:{i // 60:02d}:{i % 60:02d}Z",
+            "status": "completed",
+            "seconds_used": i,
+            "comentarios": "ok",
+            "datos_extra": {"customer_anger_score": i % 10},
+            "agent_results": {"analysis": {"requires_urgent_human_attention": i % 2 == 0}},
+        }
+        for i in range(n)
+    ]
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_stream_pages_by_keyset_and_matches_full_csv():
+    rows = sorted(_rows(25), key=lambda r: (r["fecha"], r["id"]), reverse=True)
+    cursors = []
+
+    def fake_page(campaign_id, after, limit):
+        cursors.append(after)
+        start = 0 if after is None else next(i for i, r in enumerate(rows) if (r["fecha"], r["id"]) == after) + 1
+        return [_project_row(r) for r in rows[start : start + limit]]
+
+    with patch.object(export, "fetch_campaign_results_page", side_effect=fake_page):
+        body = await _collect(export.stream_campaign_results_csv(7, page_size=10))
+        gz = await _collect(export.stream_campaign_results_csv(7, gzip=True, page_size=10))
+
+    assert body.decode() == build_campaign_results_csv(rows)
+    assert gzip.decompress(gz) == body
+    assert cursors[:3] == [None, (rows[9]["fecha"], rows[9]["id"]), (rows[19]["fecha"], rows[19]["id"])]
+
+
+def test_fetch_page_selects_json_subfields_and_keyset_filter():
+    fake = MagicMock()
+    query = fake.table.return_value.select.return_value.eq.return_value
+    query.or_.return_value = query
+    query.order.return_value = query
+    query.limit.return_value.execute.return_value = MagicMock(data=[])
+
+    with patch.object(export, "supabase", fake):
+        export.fetch_campaign_results_page(7, ("2026-06-22T10:00:00Z", 42), 500)
+
+    select = fake.table.return_value.select.call_args.args[0]
+    assert "agent_results->analysis->customer_anger_score" in select
+    assert "datos_extra," not in select and not select.endswith("datos_extra")
+    query.or_.assert_called_once_with(
+        'fecha.lt."2026-06-22T10:00:00Z",and(fecha.eq."2026-06-22T10:00:00Z",id.lt.42)'
+    )
+    query.limit.assert_called_once_with(500)
+
+
+def test_export_redacts_pii_in_comentarios():
+    row = _rows(1)[0]
+    row["comentarios"] = "Cliente pide llamada al 612 345 678, DNI 12345678Z"
+
+    csv_text = build_campaign_results_csv([row])
+
+    assert "612 345 678" not in csv_text and "12345678Z" not in csv_text
+    assert "[REDACTED_PHONE]" in csv_text
@@ -0,0 +1,204 @@
+"""Tests de la importación masiva de leads (parseo, normalización y lotes)."""
+from __future__ import annotations
+
+import asyncio
+import io
+
+import pytest
+
+from bench.fakes import FakeSupabase, LatencyProfile
+from services import campaign_lead_import
+from services.campaign_lead_import import (
+    LeadImportInProgressError,
+    get_lead_import_progress,
+    import_campaign_leads,
+    iter_lead_records,
+    normalize_lead_phone,
+    start_lead_import,
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeSupabase(LatencyProfile.from_spec("supabase=0"))
+    monkeypatch.setattr(campaign_lead_import, "supabase", fake)
+    return fake
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def _get_redis():
+        return client
+
+    monkeypatch.setattr(campaign_lead_import, "get_redis", _get_redis)
+    monkeypatch.setattr("services.redis_service.get_redis", _get_redis)
+    return client
+
+
+def _insert_campaign_leads_rpc(db, args):
+    """Réplica en memoria de la RPC insert_campaign_leads."""
+    existing = {r["phone_number"] for r in db.tables.get("campaign_leads", []) if r["campaign_id"] == args["p_campaign_id"]}
+    inserted = 0
+    for lead in args["p_leads"]:
+        if lead["phone_number"] in existing:
+            continue
+        existing.add(lead["phone_number"])
+        db.insert_row("campaign_leads", {**lead, "campaign_id": args["p_campaign_id"], "status": "pending"})
+        inserted += 1
+    return inserted
+
+
+def test_normalize_lead_phone():
+    assert normalize_lead_phone("612 34 56 78") == "+34612345678"
+    assert normalize_lead_phone(612345678.0) == "+34612345678"
+    assert normalize_lead_phone("0034 612-345-678") == "+34612345678"
+    assert normalize_lead_phone("+44 20 7946 0958") == "+442079460958"
+    assert normalize_lead_phone("abc") is None
+    assert normalize_lead_phone("123") is None
+
+
+def test_csv_with_semicolons_and_header():
+    raw = "Nombre;Teléfono\nAna;612345678\nLuis;+34 699 000 111\n".encode()
+    records = list(iter_lead_records(io.BytesIO(raw), "leads.csv", "text/csv"))
+    assert records == [
+        {"phone_number": "612345678", "customer_name": "Ana"},
+        {"phone_number": "+34 699 000 111", "customer_name": "Luis"},
+    ]
+
+
+def test_csv_without_header_uses_phone_then_name():
+    raw = b"612345678,Ana\n699000111,Luis\n"
+    records = list(iter_lead_records(io.BytesIO(raw), "leads.csv", ""))
+    assert [r["customer_name"] for r in records] == ["Ana", "Luis"]
+
+
+def test_json_array_and_ndjson_are_streamed():
+    array = b'[{"phone_number": "612345678", "customer_name": "Ana"}, {"phone": "699000111"}]'
+    ndjson = b'{"telefono": "612345678", "nombre": "Ana"}\n{"phone_number": "699000111"}\n'
+    for raw in (array, ndjson):
+        records = list(iter_lead_records(io.BytesIO(raw), "leads.json", "application/json"))
+        assert [r["phone_number"] for r in records] == ["612345678", "699000111"]
+
+    with pytest.raises(ValueError):
+        list(iter_lead_records(io.BytesIO(b'[{"phone": '), "leads.json", ""))
+
+
+def test_xlsx_rows():
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    wb.active.append(["telefono", "cliente"])
+    wb.active.append([612345678, "Ana"])
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+
+    records = list(iter_lead_records(buf, "leads.xlsx", ""))
+    assert records == [{"phone_number": 612345678, "customer_name": "Ana"}]
+
+
+@pytest.mark.asyncio
+async def test_import_dedupes_across_chunks_and_existing_leads(db, redis, monkeypatch):
+    monkeypatch.setenv("CAMPAIGN_LEAD_IMPORT_CHUNK", "7")
+    monkeypatch.setenv("CAMPAIGN_LEAD_IMPORT_CONCURRENCY", "3")
+    db.rpcs["insert_campaign_leads"] = _insert_campaign_leads_rpc
+    db.seed("campaign_leads", [{"id": 1, "campaign_id": 5, "phone_number": "+34600000000", "status": "called"}])
+
+    records = [{"phone_number": f"6000000{i % 40:02d}", "customer_name": f"L{i}"} for i in range(100)]
+    records.append({"phone_number": "xx", "customer_name": "mal"})
+
+    stats = await import_campaign_leads(5, iter(records))
+
+    phones = [r["phone_number"] for r in db.tables["campaign_leads"]]
+    assert len(phones) == len(set(phones)) == 40
+    assert stats == {"leidos": 101, "validos": 100, "invalidos": 1, "duplicados": 61, "insertados": 39}
+
+
+@pytest.mark.asyncio
+async def test_import_falls_back_without_rpc(db, redis):
+    db.seed("campaign_leads", [{"id": 1, "campaign_id": 5, "phone_number": "+34612345678"}])
+
+    stats = await import_campaign_leads(5, [
+        {"phone_number": "612345678"}, {"phone_number": "699000111"}, {"phone_number": "699000111"},
+    ])
+
+    assert stats["insertados"] == 1
+    assert sorted(r["phone_number"] for r in db.tables["campaign_leads"]) == ["+34612345678", "+34699000111"]
+
+
+@pytest.mark.asyncio
+async def test_transient_rpc_error_is_retried_without_legacy_fallback(db, redis, monkeypatch):
+    calls = []
+
+    def _flaky_rpc(db, args):
+        calls.append(len(args["p_leads"]))
+        if len(calls) == 1:
+            raise RuntimeError("upstream timeout")
+        return _insert_campaign_leads_rpc(db, args)
+
+    db.rpcs["insert_campaign_leads"] = _flaky_rpc
+    monkeypatch.setattr(campaign_lead_import, "_insert_chunk_legacy", None)
+
+    stats = await import_campaign_leads(5, [{"phone_number": "612345678"}, {"phone_number": "699000111"}])
+
+    assert stats["insertados"] == 2
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_legacy_insert_skips_raw_format_leads_in_small_lookups(db, redis, monkeypatch):
+    monkeypatch.setattr(campaign_lead_import, "_LEGACY_LOOKUP_BATCH", 2)
+    db.seed("campaign_leads", [
+        {"id": 1, "campaign_id": 5, "phone_number": "612345678"},
+        {"id": 2, "campaign_id": 5, "phone_number": "+34699000111"},
+    ])
+
+    stats = await import_campaign_leads(5, [
+        {"phone_number": p} for p in ("612 345 678", "699000111", "655000001", "655000002", "655000003")
+    ])
+
+    assert stats["insertados"] == 3 and stats["duplicados"] == 2
+    assert len(db.tables["campaign_leads"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_create_campaign_rejects_invalid_inline_leads(db, monkeypatch):
+    from fastapi import HTTPException
+
+    from models.schemas import CampaignLeadModel, CampaignModel
+    from services import campaign_crud_service
+
+    monkeypatch.setattr(campaign_crud_service, "supabase", db)
+    leads = [
+        CampaignLeadModel(phone_number="612345678", customer_name="Ana"),
+        CampaignLeadModel(phone_number="12", customer_name="Luis"),
+    ]
+
+    with pytest.raises(HTTPException) as exc_info:
+        await campaign_crud_service.create_campaign_record(
+            CampaignModel(name="C", agent_id=1, empresa_id=1), leads, current_user=None
+        )
+
+    assert exc_info.value.status_code == 422
+    assert exc_info.value.detail["invalid_leads"] == [{"index": 1, "phone_number": "12"}]
+    assert not db.tables.get("campaigns")
+
+
+@pytest.mark.asyncio
+async def test_background_job_reports_progress_and_locks_campaign(db, redis):
+    db.rpcs["insert_campaign_leads"] = _insert_campaign_leads_rpc
+    db.seed("campaigns", [{"id": 5, "empresa_id": 1, "status": "draft"}])
+
+    job_id = await start_lead_import(5, 1, io.BytesIO(b"612345678\n699000111\n"), "leads.csv", "text/csv")
+    with pytest.raises(LeadImportInProgressError):
+        await start_lead_import(5, 1, io.BytesIO(b""), "leads.csv", "text/csv")
+
+    await asyncio.gather(*campaign_lead_import._jobs)
+    progress = await get_lead_import_progress(job_id)
+
+    assert progress["status"] == "done" and progress["insertados"] == 2
+    assert progress["campaign_id"] == 5
+    assert await redis.exists("ausarta:lock:lead_import:5") == 0
@@ -0,0 +1,115 @@
+"""Tests del claim por lotes del orquestador de campañas."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from tasks import campaign_orchestrator as orch
+
+
+def _sb_query_returning(*results):
+    calls = iter(results)
+
+    async def _fake(fn):
+        result = next(calls)
+        if isinstance(result, Exception):
+            raise result
+        return SimpleNamespace(data=result)
+
+    return _fake
+
+
+@pytest.mark.asyncio
+async def test_claim_uses_single_rpc():
+    leads = [{"id": 1, "phone_number": "600"}, {"id": 2, "phone_number": "601"}]
+    with (
+        patch("services.supabase_service.supabase", MagicMock()),
+        patch("services.supabase_service.sb_query", _sb_query_returning(leads)),
+    ):
+        claimed = await orch._claim_leads_bulk(7, 10)
+
+    assert claimed == leads
+
+
+@pytest.mark.asyncio
+async def test_claim_falls_back_to_per_lead_update_without_rpc():
+    pending = [{"id": 1, "phone_number": "600"}, {"id": 2, "phone_number": "601"}]
+    fake = _sb_query_returning(
+        RuntimeError("function claim_campaign_leads does not exist"),
+        pending,
+        [{"id": 1}],  # lead 1 reclamado
+        [],           # lead 2 ya reclamado por otro worker
+    )
+    with (
+        patch("services.supabase_service.supabase", MagicMock()),
+        patch("services.supabase_service.sb_query", fake),
+    ):
+        claimed = await orch._claim_leads_bulk(7, 10)
+
+    assert [lead["id"] for lead in claimed] == [1]
+
+
+@pytest.mark.asyncio
+async def test_rpc_errors_other_than_missing_function_are_raised():
+    # Un timeout tras el commit del RPC no debe reclamar/enlazar otra vez lead a lead.
+    fake = _sb_query_returning(TimeoutError("statement timeout"), TimeoutError("statement timeout"))
+    with (
+        patch("services.supabase_service.supabase", MagicMock()),
+        patch("services.supabase_service.sb_query", fake),
+    ):
+        with pytest.raises(TimeoutError):
+            await orch._claim_leads_bulk(7, 10)
+        with pytest.raises(TimeoutError):
+            await orch._link_leads_to_calls([{"lead_id": 1, "call_id": 9, "ab_variant": None}])
+
+
+@pytest.mark.asyncio
+async def test_link_falls_back_to_per_lead_update_without_rpc():
+    fake = AsyncMock(side_effect=[
+        RuntimeError("Could not find the function public.link_campaign_lead_calls"),
+        SimpleNamespace(data=[{"id": 1}]),
+        SimpleNamespace(data=[{"id": 2}]),
+    ])
+    with (
+        patch("services.supabase_service.supabase", MagicMock()),
+        patch("services.supabase_service.sb_query", fake),
+    ):
+        await orch._link_leads_to_calls([
+            {"lead_id": 1, "call_id": 9, "ab_variant": "A"},
+            {"lead_id": 2, "call_id": 10, "ab_variant": None},
+        ])
+
+    assert fake.await_count == 3  # RPC + un update por lead
+
+
+@pytest.mark.asyncio
+async def test_insert_encuestas_bulk_keeps_order_and_checks_count():
+    rows = [{"telefono": "600"}, {"telefono": "601"}]
+    with (
+        patch("services.supabase_service.supabase", MagicMock()),
+        patch("services.supabase_service.sb_query", _sb_query_returning([{"id": 11}, {"id": 12}])),
+    ):
+        assert await orch._insert_encuestas_bulk(rows) == [11, 12]
+
+    with (
+        patch("services.supabase_service.supabase", MagicMock()),
+        patch("services.supabase_service.sb_query", _sb_query_returning([{"id": 11}])),
+    ):
+        with pytest.raises(RuntimeError):
+            await orch._insert_encuestas_bulk(rows)
+
+
+@pytest.mark.asyncio
+async def test_batch_agent_resolution_queries_once_per_agent():
+    from services.campaign_dispatch_service import resolve_campaign_dispatch_agents
+
+    campaign = {"id": 3, "empresa_id": 1, "agent_id": 10}
+    resolver = AsyncMock(return_value={"agent_id": 10, "agent_type": "ENCUESTA_NUMERICA"})
+    with patch("services.campaign_dispatch_service.resolve_outbound_agent", resolver):
+        resolved = await resolve_campaign_dispatch_agents(campaign, [1, 2, 3])
+
+    assert resolver.await_count == 1
+    assert set(resolved) == {1, 2, 3}
+    assert all(r["agent_id"] == 10 and r["ab_variant"] == "A" for r in resolved.values())
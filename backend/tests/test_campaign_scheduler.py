@@ -0,0 +1,155 @@
+"""Tests del scheduler de campañas event-driven (cola ready/diferida/bloqueada)."""
+from __future__ import annotations
+
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services import campaign_scheduler_queue as q
+from tasks.campaign_scheduler import schedule_empresa
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("services.redis_service.get_redis", new=AsyncMock(return_value=client)):
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_signal_deduplicates_and_pop_allows_requeue(fake_redis):
+    await q.signal_empresa_ready(7, "test")
+    await q.signal_empresa_ready(7, "test")
+    await q.signal_empresa_ready(8, "test")
+
+    assert await fake_redis.llen(q.SCHED_READY_KEY) == 2
+    assert await q.pop_ready_empresa(0.01) == 7
+
+    # Un evento durante la evaluación vuelve a encolar la empresa.
+    await q.signal_empresa_ready(7, "test")
+    assert await q.pop_ready_empresa(0.01) == 8
+    assert await q.pop_ready_empresa(0.01) == 7
+    assert await q.pop_ready_empresa(0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_slot_freed_unblocks_empresas_waiting_global_capacity(fake_redis):
+    await q.block_empresa(3)
+    await q.block_empresa(4)
+
+    await q.signal_slot_freed(5)
+
+    popped = {await q.pop_ready_empresa(0.01) for _ in range(3)}
+    assert popped == {3, 4, 5}
+    assert not await fake_redis.exists(q.SCHED_BLOCKED_KEY)
+
+
+@pytest.mark.asyncio
+async def test_deferred_empresa_is_promoted_when_due(fake_redis):
+    await q.defer_empresa(9, 3600)
+    await q.defer_empresa(9, 0)  # conserva el vencimiento más próximo
+
+    assert await q.pop_ready_empresa(0.01) == 9
+    assert await fake_redis.zcard(q.SCHED_DELAYED_KEY) == 0
+
+    await q.defer_empresa(9, 3600)
+    assert await q.pop_ready_empresa(0.01) is None
+    assert await fake_redis.zscore(q.SCHED_DELAYED_KEY, "9") > time.time()
+
+
+def _supabase_with(campaigns: list[dict], leads: list[dict], future_retry: list[dict] | None = None):
+    chains = {name: MagicMock() for name in ("campaigns", "campaign_leads")}
+    for chain in chains.values():
+        for method in ("select", "eq", "in_", "or_", "order", "limit", "gt", "update"):
+            getattr(chain, method).return_value = chain
+    chains["campaigns"].execute.return_value = MagicMock(data=campaigns)
+    # Primera consulta: leads listos; segunda: próximo reintento futuro.
+    chains["campaign_leads"].execute.side_effect = [MagicMock(data=leads), MagicMock(data=future_retry or [])]
+
+    supabase = MagicMock()
+    supabase.table.side_effect = chains.__getitem__
+    return supabase
+
+
+def _patch_locks(*, global_active: int = 0, empresa_active: int = 0, locked: bool = False):
+    return (
+        patch("services.campaign_locks.get_active_call_count", new=AsyncMock(return_value=global_active)),
+        patch(
+            "services.campaign_locks.get_active_call_count_for_empresa",
+            new=AsyncMock(return_value=empresa_active),
+        ),
+        patch("services.campaign_locks.is_empresa_locked", new=AsyncMock(return_value=locked)),
+        patch("services.campaign_locks.acquire_empresa_lock", new=AsyncMock(return_value="tok")),
+        patch(
+            "services.empresa_limits_service.get_empresa_max_concurrent_calls",
+            new=AsyncMock(return_value=2),
+        ),
+    )
+
+
+_OPEN_CAMPAIGN = {
+    "id": 11,
+    "empresa_id": 1,
+    "status": "active",
+    "call_start_hour": "0",
+    "call_end_hour": 24,
+    "forbidden_weekdays": [7],
+}
+
+
+@pytest.mark.asyncio
+async def test_schedule_empresa_enqueues_dispatch_for_ready_lead():
+    arq = MagicMock()
+    arq.exists = AsyncMock(return_value=0)
+    arq.enqueue_job = AsyncMock()
+    supabase = _supabase_with([_OPEN_CAMPAIGN], [{"id": 501}])
+
+    p1, p2, p3, p4, p5 = _patch_locks()
+    with patch("services.supabase_service.supabase", supabase), p1, p2, p3, p4, p5:
+        assert await schedule_empresa(arq, 1) is True
+
+    arq.enqueue_job.assert_awaited_once_with(
+        "dispatch_lead_drip_task", 501, 11, "tok", _job_id="dispatch:11:501"
+    )
+
+
+@pytest.mark.asyncio
+async def test_schedule_empresa_blocks_on_global_limit(monkeypatch):
+    monkeypatch.setenv("MAX_CONCURRENT_CALLS", "1")
+    arq = MagicMock()
+    arq.enqueue_job = AsyncMock()
+
+    p1, p2, p3, p4, p5 = _patch_locks(global_active=1)
+    with (
+        patch("services.supabase_service.supabase", MagicMock()),
+        patch("services.campaign_scheduler_queue.block_empresa", new=AsyncMock()) as block,
+        p1, p2, p3, p4, p5,
+    ):
+        assert await schedule_empresa(arq, 1) is False
+
+    block.assert_awaited_once_with(1)
+    arq.enqueue_job.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_schedule_empresa_defers_until_next_retry():
+    arq = MagicMock()
+    arq.exists = AsyncMock(return_value=0)
+    arq.enqueue_job = AsyncMock()
+    retry_at = "2999-01-01T00:00:00+00:00"
+    supabase = _supabase_with([_OPEN_CAMPAIGN], [], future_retry=[{"next_retry_at": retry_at}])
+
+    p1, p2, p3, p4, p5 = _patch_locks()
+    with (
+        patch("services.supabase_service.supabase", supabase),
+        patch("services.campaign_scheduler_queue.defer_empresa", new=AsyncMock()) as defer,
+        p1, p2, p3, p4, p5,
+    ):
+        assert await schedule_empresa(arq, 1) is False
+
+    arq.enqueue_job.assert_not_awaited()
+    defer.assert_awaited_once()
+    assert defer.await_args.args[0] == 1
+    assert defer.await_args.args[1] > 3600
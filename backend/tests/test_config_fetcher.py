@@ -43,6 +43,11 @@ class _FakeHttpSession:
         return None
 
 
+@pytest.fixture(autouse=True)
+def _fresh_config_lru(monkeypatch):
+    monkeypatch.setattr(config_fetcher, "_config_lru", config_fetcher.OrderedDict())
+
+
 def _patch_client_session(responses: list[_FakeHttpResponse]) -> MagicMock:
     fake_session = _FakeHttpSession(responses)
     mock_cls = MagicMock(return_value=fake_session)
@@ -52,7 +57,7 @@ def _patch_client_session(responses: list[_FakeHttpResponse]) -> MagicMock:
 @pytest.mark.asyncio
 async def test_fetch_with_retries_success_first_attempt(monkeypatch):
     mock_cls = _patch_client_session([_FakeHttpResponse(200, {"name": "Bot"})])
-    monkeypatch.setattr(config_fetcher.aiohttp, "ClientSession", mock_cls)
+    monkeypatch.setattr(config_fetcher, "get_http_session", mock_cls)
 
     result = await config_fetcher._fetch_with_retries("http://example/config")
 
@@ -67,7 +72,7 @@ async def test_fetch_with_retries_retries_then_succeeds(monkeypatch):
         _FakeHttpResponse(503),
         _FakeHttpResponse(200, {"name": "Bot"}),
     ])
-    monkeypatch.setattr(config_fetcher.aiohttp, "ClientSession", mock_cls)
+    monkeypatch.setattr(config_fetcher, "get_http_session", mock_cls)
     sleep_mock = AsyncMock()
     monkeypatch.setattr(config_fetcher.asyncio, "sleep", sleep_mock)
 
@@ -83,7 +88,7 @@ async def test_fetch_with_retries_retries_then_succeeds(monkeypatch):
 @pytest.mark.asyncio
 async def test_fetch_with_retries_returns_none_after_max_attempts(monkeypatch):
     mock_cls = _patch_client_session([_FakeHttpResponse(500)] * 3)
-    monkeypatch.setattr(config_fetcher.aiohttp, "ClientSession", mock_cls)
+    monkeypatch.setattr(config_fetcher, "get_http_session", mock_cls)
     monkeypatch.setattr(config_fetcher.asyncio, "sleep", AsyncMock())
 
     result = await config_fetcher._fetch_with_retries("http://example/config")
@@ -104,7 +109,7 @@ async def test_fetch_with_retries_reraises_security_violation(monkeypatch):
         async def __aexit__(self, *_args: object) -> None:
             return None
 
-    monkeypatch.setattr(config_fetcher.aiohttp, "ClientSession", lambda: _ExplodingSession())
+    monkeypatch.setattr(config_fetcher, "get_http_session", lambda _provider: _ExplodingSession())
 
     with pytest.raises(RuntimeError, match="Violación de seguridad"):
         await config_fetcher._fetch_with_retries("http://example/config")
@@ -181,3 +186,48 @@ async def test_fetch_agent_config_by_agent_id_caches_http_result(monkeypatch):
 
     assert result == http_config
     cache_mock.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_fetch_agent_config_uses_inline_config_without_network(monkeypatch):
+    get_redis_mock = AsyncMock()
+    fetch_mock = AsyncMock()
+    monkeypatch.setattr(config_fetcher, "get_redis", get_redis_mock)
+    monkeypatch.setattr(config_fetcher, "_fetch_with_retries", fetch_mock)
+    inline = {"name": "Prefetched", "empresa_id": "1", "_context_prefetched": True}
+
+    result = await config_fetcher.fetch_agent_config("42", expected_empresa_id="1", inline_config=inline)
+
+    assert result == inline
+    get_redis_mock.assert_not_awaited()
+    fetch_mock.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_fetch_agent_config_inline_config_is_tenant_checked(monkeypatch):
+    with pytest.raises(Exception, match="Violación de seguridad"):
+        await config_fetcher.fetch_agent_config(
+            "42",
+            expected_empresa_id="1",
+            inline_config={"name": "Otro", "empresa_id": "2"},
+        )
+
+
+@pytest.mark.asyncio
+async def test_agent_id_lru_serves_repeats_and_drops_other_versions(monkeypatch):
+    redis_mock = AsyncMock()
+    redis_mock.get = AsyncMock(return_value=None)
+    monkeypatch.setattr(config_fetcher, "get_redis", AsyncMock(return_value=redis_mock))
+    monkeypatch.setattr(config_fetcher, "_cache_agent_config", AsyncMock())
+    fetch_mock = AsyncMock(return_value={"name": "A", "empresa_id": "3", "config_updated_at": "v1"})
+    monkeypatch.setattr(config_fetcher, "_fetch_with_retries", fetch_mock)
+
+    first = await config_fetcher.fetch_agent_config_by_agent_id("5", expected_empresa_id="3")
+    first["_kb_context"] = "mutado por el llamador"
+    again = await config_fetcher.fetch_agent_config_by_agent_id("5", expected_empresa_id="3", config_version="v1")
+
+    assert fetch_mock.await_count == 1
+    assert "_kb_context" not in again
+
+    await config_fetcher.fetch_agent_config_by_agent_id("5", expected_empresa_id="3", config_version="v2")
+    assert fetch_mock.await_count == 2
@@ -0,0 +1,131 @@
+"""Tests del reranker cross-encoder local (modelo ONNX y tokenizer simulados)."""
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from config import clear_settings_cache
+from services import cross_encoder, reranker_service
+from services.cross_encoder import CrossEncoderModel
+from services.rag_hybrid import KnowledgeChunk
+from services.reranker_service import CrossEncoderReranker, get_reranker
+
+
+@pytest.fixture(autouse=True)
+def _reset_state(monkeypatch):
+    clear_settings_cache()
+    monkeypatch.setattr(cross_encoder, "_model", None)
+    monkeypatch.setattr(cross_encoder, "_load_failed", False)
+    monkeypatch.setattr(reranker_service, "_rerankers", {})
+    yield
+    clear_settings_cache()
+
+
+class _FakeTokenizer:
+    """Un token por palabra del documento que aparece en la consulta."""
+
+    def encode_batch(self, pairs):
+        out = []
+        for query, doc in pairs:
+            words = query.lower().split()
+            ids = [101] + [1 if w in words else 2 for w in doc.lower().split()] + [102]
+            out.append(SimpleNamespace(ids=ids, attention_mask=[1] * len(ids), type_ids=[0] * len(ids)))
+        return out
+
+
+class _FakeSession:
+    """Logit = nº de tokens coincidentes - 1; registra el tamaño de cada lote."""
+
+    def __init__(self):
+        self.batches: list[tuple[int, ...]] = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, _outputs, feeds):
+        assert set(feeds) == {"input_ids", "attention_mask"}
+        ids = feeds["input_ids"]
+        self.batches.append(ids.shape)
+        return [((ids == 1).sum(axis=1, keepdims=True) - 1).astype(np.float32)]
+
+
+def _chunk(chunk_id: int, titulo: str, contenido: str, similarity: float = 0.5) -> KnowledgeChunk:
+    return KnowledgeChunk(id=chunk_id, titulo=titulo, contenido=contenido, similarity=similarity)
+
+
+def test_model_scores_in_padded_batches():
+    session = _FakeSession()
+    model = CrossEncoderModel(session, _FakeTokenizer())
+
+    scores = model.score("tarifa fibra", ["tarifa fibra hogar", "horario", "fibra", "nada aquí"], batch_size=3)
+
+    assert [shape[0] for shape in session.batches] == [3, 1]
+    assert session.batches[0][1] == 5  # lote rellenado al documento más largo
+    assert scores[0] > scores[2] > scores[1]
+    assert all(0.0 <= s <= 1.0 for s in scores)
+
+
+@pytest.mark.asyncio
+async def test_cross_encoder_reranker_orders_by_model_score():
+    model = CrossEncoderModel(_FakeSession(), _FakeTokenizer())
+    reranker = CrossEncoderReranker(loader=lambda: model)
+    chunks = [
+        _chunk(1, "Horario", "Atención de lunes a viernes", similarity=0.9),
+        _chunk(2, "Tarifas", "Tarifa fibra 1Gb", similarity=0.6),
+    ]
+
+    ranked = await reranker.rerank("tarifa fibra", chunks, top_k=2)
+
+    assert [c.id for c in ranked] == [2, 1]
+    assert ranked[0].similarity > ranked[1].similarity
+    assert chunks[1].similarity == 0.6  # los chunks originales no se mutan
+
+
+@pytest.mark.asyncio
+async def test_cross_encoder_reranker_falls_back_without_model():
+    reranker = CrossEncoderReranker(loader=lambda: None)
+    chunks = [
+        _chunk(1, "Política devoluciones", "Plazos generales", similarity=0.7),
+        _chunk(2, "Tarifas móviles", "Plan 20GB datos", similarity=0.65),
+    ]
+
+    ranked = await reranker.rerank("tarifas móviles", chunks, top_k=2)
+
+    assert ranked[0].id == 2
+    assert not reranker.warmup()
+
+
+@pytest.mark.asyncio
+async def test_cross_encoder_reranker_timeout_uses_heuristic():
+    class _SlowModel:
+        def score(self, query, documents):
+            time.sleep(0.2)
+            return [1.0] * len(documents)
+
+    reranker = CrossEncoderReranker(timeout_s=0.01, loader=_SlowModel)
+    chunks = [
+        _chunk(1, "Horario", "Atención", similarity=0.7),
+        _chunk(2, "Tarifas móviles", "Plan 20GB datos", similarity=0.65),
+    ]
+
+    ranked = await reranker.rerank("tarifas móviles", chunks, top_k=1)
+
+    assert [c.id for c in ranked] == [2]
+
+
+def test_get_cross_encoder_without_dir_disables_model(monkeypatch):
+    monkeypatch.setenv("RAG_CROSS_ENCODER_DIR", "")
+    clear_settings_cache()
+    assert cross_encoder.get_cross_encoder() is None
+    assert cross_encoder._load_failed
+
+
+def test_get_reranker_onnx_mode(monkeypatch):
+    monkeypatch.setenv("RAG_RERANKER", "onnx")
+    clear_settings_cache()
+    reranker = get_reranker()
+    assert isinstance(reranker, CrossEncoderReranker)
+    assert get_reranker() is reranker
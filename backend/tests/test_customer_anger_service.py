@@ -71,7 +71,7 @@ async def test_analyze_customer_anger_groq_success(monkeypatch):
         yield None
 
     with (
-        patch("services.customer_anger_service.aiohttp.ClientSession", return_value=mock_session),
+        patch("services.customer_anger_service.get_http_session", return_value=mock_session),
         patch("services.provider_circuit_service.groq_llm_breaker", AsyncMock(return_value=breaker)),
         patch("utils.tracing.traced_span", _noop_span),
     ):
@@ -0,0 +1,108 @@
+"""Tests de stats del dashboard: agregados RPC y snapshot stale-while-revalidate."""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from services import dashboard_stats_service as svc
+from services.dashboard_stats_service import DashboardStatsFilters
+
+_RPC_ROW = {
+    "total_calls": 10,
+    "completed_calls": 7,
+    "pending_calls": 3,
+    "status_breakdown": {"completed": 7, "failed": 3},
+    "avg_comercial": 8.25,
+    "avg_instalador": 7,
+    "avg_rapidez": 9,
+    "avg_overall": 8.08,
+}
+
+
+@pytest.fixture(autouse=True)
+def _no_question_check():
+    svc._inflight.clear()
+    with patch.object(svc, "_check_question_based", return_value=False):
+        yield
+    svc._inflight.clear()
+
+
+@pytest.mark.asyncio
+async def test_miss_computes_from_rpc_and_stores_snapshot():
+    cache_set = AsyncMock()
+    with (
+        patch.object(svc, "supabase", MagicMock()),
+        patch.object(svc, "sb_query", AsyncMock(return_value=SimpleNamespace(data=_RPC_ROW))),
+        patch.object(svc, "cache_get", AsyncMock(return_value=None)),
+        patch.object(svc, "cache_set", cache_set),
+    ):
+        stats = await svc.get_dashboard_stats(DashboardStatsFilters(empresa_id=4))
+
+    assert stats["total_calls"] == 10
+    assert stats["pending_calls"] == 3
+    assert stats["avg_scores"] == {"comercial": 8.2, "instalador": 7.0, "rapidez": 9.0, "overall": 8.1}
+    key, raw, ttl = cache_set.await_args.args
+    assert key == "dashboard:stats:4::::"
+    assert json.loads(raw)["data"] == stats
+    assert cache_set.await_args.kwargs["empresa_id"] == 4
+
+
+@pytest.mark.asyncio
+async def test_fresh_snapshot_served_without_queries():
+    snapshot = json.dumps({"computed_at": time.time(), "data": {"total_calls": 99}})
+    sb_query = AsyncMock()
+    with (
+        patch.object(svc, "cache_get", AsyncMock(return_value=snapshot)),
+        patch.object(svc, "sb_query", sb_query),
+    ):
+        stats = await svc.get_dashboard_stats(DashboardStatsFilters(empresa_id=4))
+
+    assert stats == {"total_calls": 99}
+    sb_query.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stale_snapshot_served_and_refreshed_in_background():
+    snapshot = json.dumps({"computed_at": time.time() - 3600, "data": {"total_calls": 1}})
+    cache_set = AsyncMock()
+    with (
+        patch.object(svc, "supabase", MagicMock()),
+        patch.object(svc, "cache_get", AsyncMock(return_value=snapshot)),
+        patch.object(svc, "cache_set", cache_set),
+        patch.object(svc, "acquire_lock", AsyncMock(return_value="tok")),
+        patch.object(svc, "release_lock", AsyncMock(return_value=True)),
+        patch.object(svc, "sb_query", AsyncMock(return_value=SimpleNamespace(data=[_RPC_ROW]))),
+    ):
+        stats = await svc.get_dashboard_stats(DashboardStatsFilters(empresa_id=4))
+        assert stats == {"total_calls": 1}
+        await asyncio.gather(*svc._background)
+
+    cache_set.assert_awaited_once()
+    assert json.loads(cache_set.await_args.args[1])["data"]["total_calls"] == 10
+
+
+@pytest.mark.asyncio
+async def test_legacy_fallback_only_when_rpc_is_missing():
+    legacy = MagicMock(return_value=_RPC_ROW)
+    filters = DashboardStatsFilters(empresa_id=4)
+    with (
+        patch.object(svc, "supabase", MagicMock()),
+        patch.object(svc, "_compute_aggregates_legacy", legacy),
+        patch.object(svc, "sb_query", AsyncMock(side_effect=RuntimeError("canceling statement due to statement timeout"))),
+    ):
+        with pytest.raises(RuntimeError):
+            await svc._fetch_aggregates(filters)
+    legacy.assert_not_called()
+
+    with (
+        patch.object(svc, "supabase", MagicMock()),
+        patch.object(svc, "_compute_aggregates_legacy", legacy),
+        patch.object(svc, "sb_query", AsyncMock(side_effect=RuntimeError("PGRST202 Could not find the function"))),
+    ):
+        assert await svc._fetch_aggregates(filters) == _RPC_ROW
+    legacy.assert_called_once_with(filters)
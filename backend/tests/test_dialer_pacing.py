@@ -0,0 +1,90 @@
+"""Tests del dialer con token buckets distribuidos."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from services import dialer_pacing as dp
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setenv("DIALER_GLOBAL_CPS", "100")
+    monkeypatch.setenv("DIALER_TRUNK_CPS", "2")
+    monkeypatch.setenv("DIALER_EMPRESA_CPS", "1")
+    monkeypatch.setenv("DIALER_BURST_SECONDS", "1")
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch("services.redis_service.get_redis", new=AsyncMock(return_value=client)):
+        yield client
+
+
+def test_dial_buckets_skip_disabled_and_unknown(monkeypatch):
+    monkeypatch.setenv("DIALER_GLOBAL_CPS", "0")
+    monkeypatch.setenv("DIALER_TRUNK_CPS", "3")
+    monkeypatch.setenv("DIALER_EMPRESA_CPS", "1")
+
+    keys = [b.key for b in dp.dial_buckets(7, None)]
+    assert keys == ["ausarta:dialer:bucket:empresa:7"]
+
+    trunk = dp.dial_buckets(None, "ST_1")[0]
+    assert trunk.key == "ausarta:dialer:bucket:trunk:ST_1"
+    assert trunk.capacity == 3
+
+
+@pytest.mark.asyncio
+async def test_empresa_bucket_paces_and_other_tenants_are_independent(fake_redis):
+    assert await dp.take_dial_token(dp.dial_buckets(1, "ST_1")) == 0
+    wait = await dp.take_dial_token(dp.dial_buckets(1, "ST_1"))
+    assert 0 < wait <= 1.0
+
+    # Otra empresa en el mismo trunk aún tiene hueco (capacidad del trunk = 2).
+    assert await dp.take_dial_token(dp.dial_buckets(2, "ST_1")) == 0
+    # El trunk ya está agotado para una tercera empresa.
+    assert await dp.take_dial_token(dp.dial_buckets(3, "ST_1")) > 0
+
+
+@pytest.mark.asyncio
+async def test_denied_request_does_not_consume_tokens(fake_redis):
+    await dp.take_dial_token(dp.dial_buckets(1, "ST_1"))
+    # Empresa 1 sin tokens: el intento fallido no debe gastar el del trunk.
+    assert await dp.take_dial_token(dp.dial_buckets(1, "ST_1")) > 0
+    assert await dp.take_dial_token(dp.dial_buckets(2, "ST_1")) == 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_dial_slot_gives_up_after_max_wait(fake_redis):
+    with patch.object(dp, "_concurrency_available", new=AsyncMock(return_value=True)):
+        assert (await dp.acquire_dial_slot(empresa_id=1, trunk_id="ST_1", max_wait_seconds=0.05)).granted
+        assert not (await dp.acquire_dial_slot(empresa_id=1, trunk_id="ST_1", max_wait_seconds=0.05)).granted
+
+
+@pytest.mark.asyncio
+async def test_acquire_dial_slot_fails_open_without_redis():
+    with patch("services.redis_service.get_redis", new=AsyncMock(side_effect=ConnectionError("down"))):
+        assert (await dp.acquire_dial_slot(empresa_id=1, trunk_id="ST_1", max_wait_seconds=0.05)).granted
+
+
+@pytest.mark.asyncio
+async def test_batch_larger_than_tenant_limit_dials_up_to_the_limit(fake_redis, monkeypatch):
+    from services.redis_service import get_active_call_counts
+
+    monkeypatch.setenv("DIALER_EMPRESA_CPS", "0")
+    monkeypatch.setenv("MAX_CONCURRENT_CALLS", "10")
+    monkeypatch.setattr(dp, "_CONCURRENCY_POLL_SECONDS", 0.01)
+    with patch(
+        "services.empresa_limits_service.get_empresa_max_concurrent_calls",
+        new=AsyncMock(return_value=3),
+    ), patch("services.campaign_scheduler_queue.signal_slot_freed", new=AsyncMock()):
+        # Lote de 4 leads con límite 3: los que esperan no ocupan cupo, así que
+        # marcan 3 y solo el cuarto agota la espera.
+        slots = await asyncio.gather(*(
+            dp.acquire_dial_slot(empresa_id=7, trunk_id="ST_1", encuesta_id=i, max_wait_seconds=0.5)
+            for i in range(1, 5)
+        ))
+
+        assert sorted(slot.granted for slot in slots) == [False, True, True, True]
+        assert all(slot.call_token for slot in slots if slot.granted)
+        assert await get_active_call_counts(7) == (3, 3)
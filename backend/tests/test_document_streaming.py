@@ -0,0 +1,93 @@
+"""Tests del parseo incremental de documentos subidos a la KB."""
+from __future__ import annotations
+
+import io
+import time
+
+import pytest
+
+from services.chunk_builder import iter_jsonl_chunks, parse_jsonl_bytes
+from services.document_parser import iter_document_text, iter_services_excel, parse_services_excel
+from services.embedding_service import _split_into_chunks, iter_text_chunks
+
+
+def test_iter_text_chunks_matches_split_over_pages():
+    words = [f"palabra{i}" for i in range(1500)]
+    pages = [" ".join(words[i : i + 137]) for i in range(0, len(words), 137)]
+
+    assert list(iter_text_chunks(pages)) == _split_into_chunks(" ".join(words))
+    assert list(iter_text_chunks([])) == []
+
+
+def _chunk_seconds(n_words: int) -> float:
+    text = "palabra " * n_words
+    started = time.perf_counter()
+    count = sum(1 for _ in iter_text_chunks([text]))
+    elapsed = time.perf_counter() - started
+    assert count == -(-(n_words - 75) // 525)
+    return elapsed
+
+
+def test_iter_text_chunks_is_linear_on_a_huge_single_piece():
+    # Una sola pieza de millones de palabras (catálogo sin saltos de página):
+    # recortar la lista en cada chunk era cuadrático (minutos con 3M palabras).
+    small = _chunk_seconds(300_000)
+    large = _chunk_seconds(3_000_000)
+
+    assert large < 5.0
+    assert large < max(small, 0.01) * 30
+
+
+def test_jsonl_is_parsed_line_by_line():
+    data = b'{"contenido": "Fibra 600Mb", "empresa_id": 1}\n\n{"contenido": "Otra empresa", "empresa_id": 2}\n'
+    chunks = list(iter_jsonl_chunks(io.BytesIO(data), empresa_id=1))
+
+    assert [c["contenido"] for c in chunks] == ["Fibra 600Mb"]
+    assert chunks == parse_jsonl_bytes(data, empresa_id=1)
+
+    lines = iter_jsonl_chunks(io.BytesIO(b'{"contenido": "ok"}\n{roto\n'))
+    assert next(lines)["contenido"] == "ok"
+    with pytest.raises(ValueError, match="Línea 2"):
+        next(lines)
+
+
+@pytest.mark.asyncio
+async def test_services_excel_streams_rows_from_file(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    sheet.append(["Nombre", "Información comercial", "Ofertable", "Activo", "PVP recomendado"])
+    sheet.append(["Fibra 600Mb", "Fibra simétrica con router wifi 6 incluido", "si", 1, 30])
+    sheet.append(["Línea antigua", "Tarifa descatalogada sin nuevas altas", "si", 0, 10])
+    path = tmp_path / "catalogo.xlsx"
+    wb.save(path)
+
+    chunks = list(iter_services_excel(str(path), 1, agent_id=7))
+
+    assert [c["titulo"] for c in chunks] == ["Fibra 600Mb"]
+    assert chunks[0]["agent_id"] == 7
+    assert chunks == await parse_services_excel(path.read_bytes(), 1, agent_id=7)
+
+
+def test_pdf_text_is_read_page_by_page():
+    pytest.importorskip("pypdf")
+    fpdf = pytest.importorskip("fpdf")
+    pdf = fpdf.FPDF()
+    pdf.set_font("Helvetica", size=12)
+    for text in ("Primera pagina", "Segunda pagina"):
+        pdf.add_page()
+        pdf.cell(text=text)
+    source = io.BytesIO(bytes(pdf.output()))
+
+    pages = list(iter_document_text(source, "manual.pdf", "application/pdf"))
+
+    assert len(pages) == 2
+    assert "Segunda" in pages[1]
+
+
+def test_plain_text_and_csv_are_streamed():
+    text = list(iter_document_text(io.BytesIO("línea 1\nlínea 2\n".encode()), "notas.txt", "text/plain"))
+    assert "".join(text) == "línea 1\nlínea 2\n"
+
+    rows = list(iter_document_text(io.BytesIO(b"a, b\n,c\n"), "tabla.csv", "text/csv"))
+    assert rows == ["a | b", "c"]
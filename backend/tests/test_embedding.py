@@ -5,6 +5,7 @@ Tests de embedding_service:
 - Cache miss: llama a OpenAI y guarda en Redis.
 - Sin OPENAI_API_KEY: devuelve None inmediatamente.
 - Texto vacío: devuelve None.
+- Lote: MGET devuelve hits, solo los misses (deduplicados) van a OpenAI en una petición.
 """
 from __future__ import annotations
 
@@ -48,14 +49,14 @@ async def test_cache_hit_skips_openai(monkeypatch):
 
     with (
         patch("services.redis_service.get_redis", AsyncMock(return_value=mock_redis)),
-        patch("aiohttp.ClientSession") as mock_session_cls,
+        patch("services.embedding_service._get_http_session") as mock_get_session,
     ):
         from services.embedding_service import get_embedding
         result = await get_embedding("tarifa móvil")
 
     assert result == MOCK_EMBEDDING
     # Nunca debió abrirse la sesión HTTP hacia OpenAI
-    mock_session_cls.assert_not_called()
+    mock_get_session.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -76,12 +77,10 @@ async def test_cache_miss_calls_openai_and_stores(monkeypatch):
 
     mock_session = MagicMock()
     mock_session.post = MagicMock(return_value=mock_http_resp)
-    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
-    mock_session.__aexit__ = AsyncMock(return_value=False)
 
     with (
         patch("services.redis_service.get_redis", AsyncMock(return_value=mock_redis)),
-        patch("aiohttp.ClientSession", return_value=mock_session),
+        patch("services.embedding_service._get_http_session", return_value=mock_session),
     ):
         from services.embedding_service import get_embedding
         result = await get_embedding("tarifa fibra")
@@ -106,14 +105,77 @@ async def test_openai_error_returns_none(monkeypatch):
 
     mock_session = MagicMock()
     mock_session.post = MagicMock(return_value=mock_http_resp)
-    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
-    mock_session.__aexit__ = AsyncMock(return_value=False)
 
     with (
         patch("services.redis_service.get_redis", AsyncMock(return_value=mock_redis)),
-        patch("aiohttp.ClientSession", return_value=mock_session),
+        patch("services.embedding_service._get_http_session", return_value=mock_session),
     ):
         from services.embedding_service import get_embedding
         result = await get_embedding("consulta")
 
     assert result is None
+
+
+def _batch_redis(cached_values):
+    mock_pipe = MagicMock()
+    mock_pipe.execute = AsyncMock(return_value=[])
+    mock_redis = AsyncMock()
+    mock_redis.mget = AsyncMock(return_value=cached_values)
+    mock_redis.pipeline = MagicMock(return_value=mock_pipe)
+    return mock_redis, mock_pipe
+
+
+@pytest.mark.asyncio
+async def test_batch_only_requests_cache_misses(monkeypatch):
+    """MGET resuelve los hits; los misses deduplicados van en una sola petición."""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    cached_vec = [0.2] * 1536
+    fresh_vec = [0.3] * 1536
+    # Claves únicas en orden: "a", "b" ("b" repetido y "" vacío no generan clave)
+    mock_redis, mock_pipe = _batch_redis([json.dumps(cached_vec), None])
+
+    mock_http_resp = MagicMock()
+    mock_http_resp.status = 200
+    mock_http_resp.json = AsyncMock(return_value={"data": [{"index": 0, "embedding": fresh_vec}]})
+    mock_http_resp.__aenter__ = AsyncMock(return_value=mock_http_resp)
+    mock_http_resp.__aexit__ = AsyncMock(return_value=False)
+    mock_session = MagicMock()
+    mock_session.post = MagicMock(return_value=mock_http_resp)
+
+    with (
+        patch("services.redis_service.get_redis", AsyncMock(return_value=mock_redis)),
+        patch("services.embedding_service._get_http_session", return_value=mock_session),
+    ):
+        from services.embedding_service import get_embeddings
+        result = await get_embeddings(["a", "b", "", "b"])
+
+    assert result == [cached_vec, fresh_vec, None, fresh_vec]
+    mock_redis.mget.assert_awaited_once()
+    assert mock_session.post.call_count == 1
+    assert mock_session.post.call_args.kwargs["json"]["input"] == ["b"]
+    mock_pipe.set.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_batch_all_cached_skips_openai(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    mock_redis, _ = _batch_redis([json.dumps(MOCK_EMBEDDING)])
+
+    with (
+        patch("services.redis_service.get_redis", AsyncMock(return_value=mock_redis)),
+        patch("services.embedding_service._get_http_session") as mock_get_session,
+    ):
+        from services.embedding_service import get_embeddings
+        result = await get_embeddings(["tarifa", "tarifa"])
+
+    assert result == [MOCK_EMBEDDING, MOCK_EMBEDDING]
+    mock_get_session.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_batch_no_api_key_returns_nones(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "")
+    from services.embedding_service import get_embeddings
+
+    assert await get_embeddings(["uno", "dos"]) == [None, None]
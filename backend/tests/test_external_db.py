@@ -45,6 +45,20 @@ def _mock_supabase_with_config(config: dict | None):
     return sb
 
 
+@pytest.fixture(autouse=True)
+def _reset_caches():
+    from services import external_db_service as ext
+
+    ext._config_cache.clear()
+    ext._result_cache.clear()
+    ext._pools.clear()
+    with patch.object(ext, "_config_version", AsyncMock(return_value="1")):
+        yield
+    ext._config_cache.clear()
+    ext._result_cache.clear()
+    ext._pools.clear()
+
+
 # ──────────────────────────────────────────────────────────────────
 # Tests
 # ──────────────────────────────────────────────────────────────────
@@ -110,13 +124,11 @@ async def test_valid_query_in_whitelist_calls_rest():
 
     mock_session = MagicMock()
     mock_session.get = MagicMock(return_value=mock_response)
-    mock_session.__aenter__ = AsyncMock(return_value=mock_session)
-    mock_session.__aexit__ = AsyncMock(return_value=False)
 
     with (
         patch("services.external_db_service.supabase", sb),
         patch("services.external_db_service.sb_query", side_effect=lambda fn: fn()),
-        patch("aiohttp.ClientSession", return_value=mock_session),
+        patch("services.external_db_service._get_http_session", return_value=mock_session),
     ):
         from services.external_db_service import query_external_db
         result = await query_external_db(1, "cliente_por_telefono", ["600000000"])
@@ -131,3 +143,107 @@ async def test_supabase_none_returns_none():
         from services.external_db_service import query_external_db
         result = await query_external_db(1, "any_query", [])
         assert result is None
+
+
+def _rest_session(payload):
+    response = MagicMock()
+    response.status = 200
+    response.json = AsyncMock(return_value=payload)
+    response.__aenter__ = AsyncMock(return_value=response)
+    response.__aexit__ = AsyncMock(return_value=False)
+    session = MagicMock()
+    session.get = MagicMock(return_value=response)
+    return session
+
+
+@pytest.mark.asyncio
+async def test_config_and_results_cached_between_lookups():
+    """La segunda consulta idéntica no toca Supabase ni el CRM."""
+    cfg = _make_config(queries={"cliente_por_telefono": "endpoint"})
+    sb = _mock_supabase_with_config(cfg)
+    session = _rest_session([{"nombre": "Ana"}])
+    sb_query = AsyncMock(side_effect=lambda fn: fn())
+
+    with (
+        patch("services.external_db_service.supabase", sb),
+        patch("services.external_db_service.sb_query", sb_query),
+        patch("services.external_db_service._get_http_session", return_value=session),
+    ):
+        from services.external_db_service import query_external_db
+
+        first = await query_external_db(1, "cliente_por_telefono", ["600"])
+        second = await query_external_db(1, "cliente_por_telefono", ["600"])
+        other = await query_external_db(1, "cliente_por_telefono", ["601"])
+
+    assert first == second == other == [{"nombre": "Ana"}]
+    assert sb_query.await_count == 1
+    assert session.get.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_results_are_copies():
+    """Modificar las filas devueltas no altera la caché compartida."""
+    cfg = _make_config(queries={"cliente_por_telefono": "endpoint"})
+    sb = _mock_supabase_with_config(cfg)
+    session = _rest_session([{"nombre": "Ana"}])
+
+    with (
+        patch("services.external_db_service.supabase", sb),
+        patch("services.external_db_service.sb_query", AsyncMock(side_effect=lambda fn: fn())),
+        patch("services.external_db_service._get_http_session", return_value=session),
+    ):
+        from services.external_db_service import query_external_db
+
+        first = await query_external_db(1, "cliente_por_telefono", ["600"])
+        first[0]["nombre"] = "mutado"
+        first.append({"nombre": "extra"})
+        second = await query_external_db(1, "cliente_por_telefono", ["600"])
+
+    assert second == [{"nombre": "Ana"}]
+    assert session.get.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_config_version_change_reloads_config():
+    """Si otro proceso invalida la config (versión Redis distinta), se recarga."""
+    from services import external_db_service as ext
+
+    cfg = _make_config(queries={"cliente_por_telefono": "endpoint"})
+    sb = _mock_supabase_with_config(cfg)
+    sb_query = AsyncMock(side_effect=lambda fn: fn())
+
+    with (
+        patch.object(ext, "supabase", sb),
+        patch.object(ext, "sb_query", sb_query),
+        patch.object(ext, "_get_http_session", return_value=_rest_session([])),
+    ):
+        await ext.query_external_db(1, "cliente_por_telefono", ["600"])
+        with patch.object(ext, "_config_version", AsyncMock(return_value="2")):
+            await ext.query_external_db(1, "cliente_por_telefono", ["600"])
+
+    assert sb_query.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_postgres_pool_reused_per_tenant():
+    """El pool asyncpg se crea una vez por empresa y DSN."""
+    from services import external_db_service as ext
+
+    conn = MagicMock()
+    conn.fetch = AsyncMock(return_value=[{"id": 1}])
+    acquire_ctx = MagicMock()
+    acquire_ctx.__aenter__ = AsyncMock(return_value=conn)
+    acquire_ctx.__aexit__ = AsyncMock(return_value=False)
+    pool = MagicMock()
+    pool.acquire = MagicMock(return_value=acquire_ctx)
+    asyncpg = MagicMock()
+    asyncpg.create_pool = AsyncMock(return_value=pool)
+
+    cfg = {"connection_url": "postgresql://crm/db"}
+    with patch.dict("sys.modules", {"asyncpg": asyncpg}):
+        for _ in range(3):
+            rows = await ext._query_postgres(7, cfg, "SELECT 1", [])
+            assert rows == [{"id": 1}]
+
+    asyncpg.create_pool.assert_awaited_once()
+    assert conn.fetch.await_count == 3
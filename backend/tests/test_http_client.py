@@ -0,0 +1,41 @@
+"""Tests del registro de clientes HTTP compartidos por proveedor."""
+from __future__ import annotations
+
+import pytest
+
+from services import http_client
+
+
+@pytest.fixture(autouse=True)
+def _empty_registry(monkeypatch):
+    monkeypatch.setattr(http_client, "_clients", {})
+
+
+@pytest.mark.asyncio
+async def test_one_session_per_provider_is_reused():
+    groq = http_client.get_http_session("groq")
+    assert http_client.get_http_session("groq") is groq
+    assert http_client.get_http_session("openai") is not groq
+
+    await http_client.close_http_clients()
+    assert groq.closed
+    assert http_client._clients == {}
+    assert http_client.get_http_session("groq") is not groq
+    await http_client.close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_connection_limit_bounds_provider_concurrency(monkeypatch):
+    monkeypatch.setenv("HTTP_MAX_CONNECTIONS_GROQ", "3")
+    session = http_client.get_http_session("groq")
+    try:
+        assert session.connector.limit == 3
+        assert session.connector.limit_per_host == 3
+        assert http_client.provider_max_connections("desconocido") == http_client._DEFAULT_MAX_CONNECTIONS
+    finally:
+        await http_client.close_http_clients()
+
+
+def test_invalid_limit_falls_back_to_default(monkeypatch):
+    monkeypatch.setenv("HTTP_MAX_CONNECTIONS_OPENAI", "muchas")
+    assert http_client.provider_max_connections("openai") == 16
@@ -0,0 +1,189 @@
+"""Tests del índice vectorial en memoria de la KB (scope, umbral, cambios incrementales)."""
+
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+
+from services import knowledge_index
+from services.knowledge_index import KnowledgeVectorIndex
+
+
+def _vec(*head: float) -> list[float]:
+    values = np.zeros(1536, dtype=np.float32)
+    values[: len(head)] = head
+    return values.tolist()
+
+
+def _row(chunk_id: int, vec: list[float], agent_id: int | None = None) -> dict:
+    return {
+        "id": chunk_id,
+        "titulo": f"Doc {chunk_id}",
+        "contenido": f"contenido {chunk_id}",
+        "agent_id": agent_id,
+        "embedding": "[" + ",".join(str(v) for v in vec) + "]",
+    }
+
+
+@pytest.fixture(autouse=True)
+def _clean_registry():
+    knowledge_index._indexes.clear()
+    knowledge_index._oversized.clear()
+    yield
+    knowledge_index._indexes.clear()
+    knowledge_index._oversized.clear()
+
+
+def test_search_orders_by_cosine_and_applies_threshold():
+    index = KnowledgeVectorIndex(1)
+    index.upsert([_row(1, _vec(1, 0)), _row(2, _vec(1, 1)), _row(3, _vec(0, 1))])
+
+    results = index.search(_vec(1, 0), limit=5, threshold=0.5, agent_id=None)
+
+    assert [r["id"] for r in results] == [1, 2]
+    assert results[0]["similarity"] == pytest.approx(1.0)
+    assert results[0]["titulo"] == "Doc 1"
+
+
+def test_agent_scope_matches_rpc_semantics():
+    index = KnowledgeVectorIndex(1)
+    index.upsert([
+        _row(1, _vec(1, 0)),
+        _row(2, _vec(1, 0), agent_id=7),
+        _row(3, _vec(1, 0), agent_id=8),
+    ])
+
+    shared = index.search(_vec(1, 0), limit=5, threshold=0.1, agent_id=None)
+    agent7 = index.search(_vec(1, 0), limit=5, threshold=0.1, agent_id=7)
+
+    assert {r["id"] for r in shared} == {1}
+    assert {r["id"] for r in agent7} == {1, 2}
+
+
+def test_upsert_replaces_and_remove_drops():
+    index = KnowledgeVectorIndex(1)
+    index.upsert([_row(1, _vec(1, 0)), _row(2, _vec(0, 1))])
+    index.upsert([_row(1, _vec(0, 1))])
+    assert len(index) == 2
+
+    index.remove([2])
+    results = index.search(_vec(0, 1), limit=5, threshold=0.5, agent_id=None)
+    assert [r["id"] for r in results] == [1]
+
+
+@pytest.mark.asyncio
+async def test_apply_change_fetches_only_upserted_ids():
+    index = KnowledgeVectorIndex(5, version=1)
+    index.upsert([_row(1, _vec(1, 0))])
+    knowledge_index._indexes[5] = index
+
+    fetch = AsyncMock(return_value=[_row(9, _vec(0, 1))])
+    with patch.object(knowledge_index, "_fetch_rows", fetch):
+        await knowledge_index.apply_knowledge_change(
+            {"empresa_id": 5, "version": 2, "upserted_ids": [9], "deleted_ids": [1]}
+        )
+
+    fetch.assert_awaited_once_with(5, ids=[9])
+    assert index.version == 2
+    assert [r["id"] for r in index.search(_vec(0, 1), limit=5, threshold=0.5, agent_id=None)] == [9]
+
+
+@pytest.mark.asyncio
+async def test_change_published_during_load_is_applied_after_it():
+    versions = iter([1, 2])
+
+    async def _fetch(empresa_id, *, ids=None):
+        if ids is None:
+            # Documento publicado mientras se pagina la carga completa
+            await knowledge_index.apply_knowledge_change(
+                {"empresa_id": 5, "version": 2, "upserted_ids": [9], "deleted_ids": []}
+            )
+            return [_row(1, _vec(1, 0))]
+        return [_row(9, _vec(0, 1))]
+
+    with (
+        patch.object(knowledge_index, "_current_version", AsyncMock(side_effect=lambda _e: next(versions))),
+        patch.object(knowledge_index, "_fetch_rows", _fetch),
+    ):
+        index = await knowledge_index.load_knowledge_index(5)
+
+    assert index.version == 2 and len(index) == 2
+    assert not knowledge_index._pending_changes
+
+
+@pytest.mark.asyncio
+async def test_load_retries_when_version_moves_without_events():
+    versions = iter([1, 2, 2, 2])
+    fetch = AsyncMock(side_effect=[[_row(1, _vec(1, 0))], [_row(1, _vec(1, 0)), _row(9, _vec(0, 1))]])
+
+    with (
+        patch.object(knowledge_index, "_current_version", AsyncMock(side_effect=lambda _e: next(versions))),
+        patch.object(knowledge_index, "_fetch_rows", fetch),
+    ):
+        index = await knowledge_index.load_knowledge_index(5)
+
+    assert fetch.await_count == 2
+    assert index.version == 2 and len(index) == 2
+
+
+@pytest.mark.asyncio
+async def test_vector_search_uses_loaded_index_before_rpc(monkeypatch):
+    from services import embedding_service
+
+    index = KnowledgeVectorIndex(3)
+    index.upsert([_row(4, _vec(1, 0))])
+    knowledge_index._indexes[3] = index
+
+    monkeypatch.setattr(embedding_service, "get_embedding", AsyncMock(return_value=_vec(1, 0)))
+    mock_sb_query = AsyncMock()
+    with (
+        patch("services.supabase_service.supabase", object()),
+        patch("services.supabase_service.sb_query", mock_sb_query),
+    ):
+        rows = await embedding_service._search_knowledge_vector(
+            3, "fibra", limit=3, threshold=0.7, agent_id=None
+        )
+
+    assert [r["id"] for r in rows] == [4]
+    mock_sb_query.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_oversized_tenant_skips_warmup_until_ttl_expires(monkeypatch):
+    from services import embedding_service
+
+    fetch = AsyncMock(side_effect=OverflowError("20001 > RAG_ANN_MAX_VECTORS=20000"))
+    monkeypatch.setattr(knowledge_index, "_enabled", lambda: True)
+    monkeypatch.setattr(knowledge_index, "_current_version", AsyncMock(return_value=0))
+    monkeypatch.setattr(knowledge_index, "_fetch_rows", fetch)
+
+    assert await knowledge_index.load_knowledge_index(6) is None
+    assert knowledge_index.is_knowledge_index_oversized(6)
+    assert knowledge_index.schedule_knowledge_index_warmup(6) is None
+
+    # La búsqueda va directa al RPC sin volver a programar la carga.
+    monkeypatch.setattr(embedding_service, "get_embedding", AsyncMock(return_value=_vec(1, 0)))
+    warmup = AsyncMock()
+    mock_sb_query = AsyncMock(return_value=type("R", (), {"data": [{"id": 1}]})())
+    with (
+        patch("services.supabase_service.supabase", object()),
+        patch("services.supabase_service.sb_query", mock_sb_query),
+        patch.object(knowledge_index, "schedule_knowledge_index_warmup", warmup),
+    ):
+        rows = await embedding_service._search_knowledge_vector(
+            6, "fibra", limit=3, threshold=0.7, agent_id=None
+        )
+    assert rows == [{"id": 1}]
+    warmup.assert_not_called()
+    assert fetch.await_count == 1
+
+    # Caducado el marcador, la siguiente búsqueda vuelve a intentar la carga.
+    knowledge_index._oversized[6] = 0.0
+    assert not knowledge_index.is_knowledge_index_oversized(6)
+    task = knowledge_index.schedule_knowledge_index_warmup(6)
+    assert task is not None
+    await task
+    assert fetch.await_count == 2
+    await knowledge_index.close_knowledge_index()
@@ -0,0 +1,177 @@
+"""Tests de la re-ingesta incremental de documentos KB (diff por hash de contenido)."""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, call, patch
+
+import pytest
+
+from bench.fakes import FakeQuery, FakeSupabase, LatencyProfile
+from services import knowledge_ingest
+from services.knowledge_ingest import (
+    EmptyDocumentError,
+    chunk_content_hash,
+    load_document_manifest,
+    sync_document_chunks,
+)
+
+
+def _rows(*contents: str, titulo: str = "Tarifas") -> list[dict]:
+    return [
+        {"empresa_id": 1, "titulo": titulo, "contenido": c, "chunk_index": i, "source_type": "manual"}
+        for i, c in enumerate(contents)
+    ]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeSupabase(LatencyProfile.from_spec("supabase=0"))
+    monkeypatch.setattr(knowledge_ingest, "supabase", fake)
+    return fake
+
+
+@pytest.fixture
+def embeddings():
+    async def _embed(texts):
+        return [[0.1, 0.2] for _ in texts]
+
+    with (
+        patch.object(knowledge_ingest, "get_embeddings", new=AsyncMock(side_effect=_embed)) as embed,
+        patch.object(knowledge_ingest, "publish_knowledge_change", new=AsyncMock()) as publish,
+    ):
+        yield embed, publish
+
+
+def test_content_hash_ignores_whitespace_but_not_text():
+    assert chunk_content_hash("Tarifas", "Fibra  600Mb\n30€") == chunk_content_hash("Tarifas ", "Fibra 600Mb 30€")
+    assert chunk_content_hash("Tarifas", "Fibra 600Mb") != chunk_content_hash("Tarifas", "Fibra 1Gb")
+
+
+@pytest.mark.asyncio
+async def test_reingest_only_embeds_the_diff(db, embeddings):
+    embed, publish = embeddings
+    first = await sync_document_chunks(1, None, "Tarifas", _rows("Fibra 600Mb", "Fibra 1Gb", "Móvil 20GB"))
+    assert first["nuevos"] == 3 and first["eliminados"] == 0
+    old_ids = {r["contenido"]: r["id"] for r in db.tables["knowledge_base"]}
+
+    embed.reset_mock()
+    second = await sync_document_chunks(1, None, "Tarifas", _rows("Fibra 600Mb", "Fibra 1Gb 35€", "Móvil 20GB"))
+
+    embed.assert_awaited_once_with(["Fibra 1Gb 35€"])
+    assert second == {
+        "chunks_total": 3,
+        "nuevos": 1,
+        "sin_cambios": 2,
+        "eliminados": 1,
+        "chunks_con_embedding": 1,
+        "insertados": 1,
+    }
+    stored = {r["contenido"]: r for r in db.tables["knowledge_base"]}
+    assert set(stored) == {"Fibra 600Mb", "Fibra 1Gb 35€", "Móvil 20GB"}
+    assert stored["Fibra 600Mb"]["id"] == old_ids["Fibra 600Mb"]
+    assert all(r["document_key"] == "Tarifas" for r in stored.values())
+    assert publish.await_args_list[-2:] == [
+        call(1, upserted_ids=[stored["Fibra 1Gb 35€"]["id"]]),
+        call(1, deleted_ids=[old_ids["Fibra 1Gb"]]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_unchanged_document_is_a_noop(db, embeddings):
+    embed, publish = embeddings
+    await sync_document_chunks(1, None, "Tarifas", _rows("Fibra 600Mb", "Fibra 600Mb"))
+    assert len(db.tables["knowledge_base"]) == 1  # chunks idénticos se guardan una vez
+
+    embed.reset_mock()
+    publish.reset_mock()
+    stats = await sync_document_chunks(1, None, "Tarifas", _rows("Fibra 600Mb"))
+
+    assert stats["nuevos"] == 0 and stats["sin_cambios"] == 1
+    embed.assert_not_awaited()
+    publish.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_scope_legacy_rows_and_failed_embeddings(db, embeddings):
+    embed, _ = embeddings
+    db.seed("knowledge_base", [
+        {"empresa_id": 1, "agent_id": None, "titulo": "Tarifas", "contenido": "Fibra 600Mb"},
+        {"empresa_id": 1, "agent_id": 7, "titulo": "Tarifas", "contenido": "Del agente 7"},
+    ])
+    embed.side_effect = lambda texts: [None for _ in texts]
+
+    stats = await sync_document_chunks(1, None, "Tarifas", _rows("Fibra 600Mb"))
+
+    # La fila legacy (sin document_key) se sustituye; la del agente 7 no se toca.
+    assert stats["eliminados"] == 1 and stats["nuevos"] == 1
+    rows = db.tables["knowledge_base"]
+    assert {r.get("agent_id") for r in rows} == {None, 7}
+    shared = next(r for r in rows if r.get("agent_id") is None)
+    assert shared["embedding"] is None and shared["content_hash"] is None
+
+    # Sin hash: la siguiente ingesta reintenta el embedding.
+    embed.side_effect = lambda texts: [[0.3] for _ in texts]
+    retry = await sync_document_chunks(1, None, "Tarifas", _rows("Fibra 600Mb"))
+    assert retry["nuevos"] == 1 and retry["eliminados"] == 1 and retry["chunks_con_embedding"] == 1
+
+
+@pytest.mark.asyncio
+async def test_streamed_rows_flow_through_a_bounded_pipeline(db, embeddings, monkeypatch):
+    embed, _ = embeddings
+    monkeypatch.setenv("KB_INGEST_BATCH_ROWS", "50")
+    monkeypatch.setenv("KB_INGEST_PIPELINE_DEPTH", "2")
+    produced = 0
+    in_flight: list[int] = []
+
+    def _rows_stream():
+        nonlocal produced
+        for i in range(1000):
+            produced += 1
+            yield {"empresa_id": 1, "titulo": "Catálogo", "contenido": f"Producto {i}", "chunk_index": i}
+
+    async def _embed(texts):
+        in_flight.append(produced - len(db.tables.get("knowledge_base", [])))
+        return [[0.1] for _ in texts]
+
+    embed.side_effect = _embed
+    stats = await sync_document_chunks(1, None, "Catálogo", _rows_stream())
+
+    assert stats["nuevos"] == 1000 and len(db.tables["knowledge_base"]) == 1000
+    assert all(len(c.args[0]) <= 50 for c in embed.await_args_list)
+    # Nunca hay más que el lote en curso + los que caben en la cola + el que se está leyendo.
+    assert max(in_flight) <= 50 * 4
+
+
+@pytest.mark.asyncio
+async def test_empty_stream_keeps_the_indexed_document(db, embeddings):
+    await sync_document_chunks(1, None, "Tarifas", _rows("Fibra 600Mb"))
+
+    with pytest.raises(EmptyDocumentError):
+        await sync_document_chunks(1, None, "Tarifas", iter(()))
+
+    assert [r["contenido"] for r in db.tables["knowledge_base"]] == ["Fibra 600Mb"]
+
+
+@pytest.mark.asyncio
+async def test_manifest_pages_past_postgrest_max_rows(db, monkeypatch):
+    run = FakeQuery._run
+
+    def _capped(self):
+        # PostgREST devuelve como mucho max-rows (1000) por petición.
+        data, count = run(self)
+        return (data[:1000] if self._op == "select" else data), count
+
+    monkeypatch.setattr(FakeQuery, "_run", _capped)
+    db.seed("knowledge_base", [
+        {"empresa_id": 1, "agent_id": None, "titulo": "Catálogo", "document_key": "Catálogo",
+         "contenido": f"Producto {i}", "content_hash": f"h{i}"}
+        for i in range(2500)
+    ] + [
+        {"empresa_id": 1, "agent_id": None, "titulo": "Catálogo", "contenido": f"Legacy {i}"}
+        for i in range(1200)
+    ])
+
+    manifest = await load_document_manifest(1, None, "Catálogo")
+
+    assert len(manifest) == 3700
+    assert len({m["id"] for m in manifest}) == 3700
+    assert sum(1 for m in manifest if m["content_hash"] is None) == 1200
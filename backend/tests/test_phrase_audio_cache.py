@@ -0,0 +1,107 @@
+"""Tests de la caché de audio pre-sintetizado para frases fijas del agente."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from livekit import rtc
+
+from agents import phrase_audio_cache
+from agents.phrase_audio_cache import PhraseAudioCache, say_phrase
+
+
+def _frame(samples: int = 4800) -> rtc.AudioFrame:
+    return rtc.AudioFrame(
+        data=b"\x01\x00" * samples,
+        sample_rate=24000,
+        num_channels=1,
+        samples_per_channel=samples,
+    )
+
+
+def _fake_tts():
+    tts = MagicMock()
+    tts.synthesize = MagicMock(
+        side_effect=lambda text: SimpleNamespace(collect=AsyncMock(return_value=_frame()))
+    )
+    tts.aclose = AsyncMock()
+    return tts
+
+
+def _cache() -> PhraseAudioCache:
+    return PhraseAudioCache(voice_id="v1", language="es", speaking_speed=1.0, tts_model="sonic")
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(phrase_audio_cache, "_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(phrase_audio_cache, "_ENABLED", True)
+    phrase_audio_cache._memory.clear()
+    yield
+    phrase_audio_cache._memory.clear()
+
+
+@pytest.mark.asyncio
+async def test_warm_renders_each_phrase_once_and_persists_to_disk():
+    tts = _fake_tts()
+    with patch("agents.stt_tts_builder._build_tts_plugin", return_value=tts):
+        await _cache().warm(["¿Sigue ahí?", "Sí, dime.", "¿Sigue ahí?"])
+        assert tts.synthesize.call_count == 2
+
+        # Otro proceso (memoria vacía) reutiliza el WAV de disco sin llamar al TTS.
+        phrase_audio_cache._memory.clear()
+        tts.synthesize.reset_mock()
+        await _cache().warm(["¿Sigue ahí?"])
+
+    tts.synthesize.assert_not_called()
+    assert _cache().get("¿Sigue ahí?") is not None
+
+
+@pytest.mark.asyncio
+async def test_say_plays_cached_frames_and_falls_back_to_live_tts():
+    cache = _cache()
+    with patch("agents.stt_tts_builder._build_tts_plugin", return_value=_fake_tts()):
+        await cache.warm(["Entiendo..."])
+
+    session = SimpleNamespace(say=AsyncMock())
+    owner = SimpleNamespace(phrase_audio=cache, lang_state={"active_lang": "es"})
+
+    await say_phrase(owner, session, "Entiendo...")
+    audio = session.say.await_args.kwargs["audio"]
+    frames = [f async for f in audio]
+    assert sum(f.samples_per_channel for f in frames) == 4800
+    assert all(f.samples_per_channel <= 480 for f in frames)
+
+    await say_phrase(owner, session, "Frase nueva", allow_interruptions=False)
+    assert "audio" not in session.say.await_args.kwargs
+
+    # Tras cambiar de idioma, el audio cacheado (español) no se usa.
+    owner.lang_state["active_lang"] = "en"
+    await say_phrase(owner, session, "Entiendo...")
+    assert "audio" not in session.say.await_args.kwargs
+
+
+@pytest.mark.asyncio
+async def test_private_phrases_stay_in_memory(tmp_path):
+    cache = _cache()
+    with patch("agents.stt_tts_builder._build_tts_plugin", return_value=_fake_tts()):
+        await cache.warm(["Sí, dime."], private=["Hola Ana, le llamo de Ausarta"])
+
+    assert cache.get("Hola Ana, le llamo de Ausarta") is not None
+    assert len(list(tmp_path.glob("*.wav"))) == 1
+
+
+def test_prune_disk_cache_by_age_and_size(tmp_path, monkeypatch):
+    import os
+
+    now = 1_000_000.0
+    for name, age, size in (("viejo", 10_000, 10), ("a", 30, 40), ("b", 20, 40), ("c", 10, 40)):
+        path = tmp_path / f"{name}.wav"
+        path.write_bytes(b"\0" * size)
+        os.utime(path, (now - age, now - age))
+    monkeypatch.setattr(phrase_audio_cache, "_DISK_MAX_AGE_SECONDS", 3600)
+    monkeypatch.setattr(phrase_audio_cache, "_DISK_MAX_BYTES", 100)
+
+    assert phrase_audio_cache.prune_disk_cache(now) == 2
+    assert sorted(p.stem for p in tmp_path.glob("*.wav")) == ["b", "c"]
@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
+import pytest
+
 from config import clear_settings_cache
 from services.call_results_service import (
     prepare_narrative_text_for_storage,
     prepare_transcription_for_storage,
 )
-from utils.pii_sanitizer import sanitize_transcription_pii
+from utils.pii_sanitizer import _REGEX_RULES, sanitize_transcription_pii, sanitize_transcriptions_pii
 
 
 def setup_function() -> None:
@@ -70,3 +72,157 @@ def test_sanitize_disabled_via_flag(monkeypatch):
     result = sanitize_transcription_pii(raw)
     assert result.text == raw
     assert result.redaction_count == 0
+
+
+def _sequential_reference(text: str) -> str:
+    """Implementación original: una pasada por regla, en orden."""
+    for entity_type, pattern in _REGEX_RULES:
+        label = {"dni_nie": "DNI_NIE", "credit_card": "CREDIT_CARD", "ip_address": "IP_ADDRESS",
+                 "long_number": "NUMBER"}.get(entity_type, entity_type.upper())
+        text = pattern.sub(f"[REDACTED_{label}]", text)
+    return text
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("vivo en calle Mayor 600 123 456", "vivo en calle Mayor [REDACTED_PHONE]"),
+        ("avenida de la paz 12 612 345 678", "avenida de la paz [REDACTED_PHONE]"),
+    ],
+)
+def test_rule_priority_keeps_phone_out_of_address(raw, expected):
+    assert sanitize_transcription_pii(raw).text == expected
+    assert sanitize_transcription_pii(raw).text == _sequential_reference(raw)
+
+
+def test_output_matches_sequential_passes():
+    texts = [
+        "mi DNI es 12345678Z y mi NIE X1234567L",
+        "Cliente: Un 8",
+        "escribe a hola@empresa.com o al 612 345 678",
+        "IBAN ES91 2100 0418 4502 0005 1332, tarjeta 4111 1111 1111 1111",
+        "conecta a 192.168.1.10, referencia 1234567890123",
+        "paseo de Gracia 45 3º, llámame al +34 699-000-111",
+        "plaza Mayor 3 y calle Sol 600123456",
+    ]
+    for raw in texts:
+        assert sanitize_transcription_pii(raw).text == _sequential_reference(raw)
+
+
+def test_presidio_engines_built_once_per_process(monkeypatch):
+    import sys
+    import types
+
+    from utils import pii_sanitizer
+
+    built: list[str] = []
+
+    class _Analyzer:
+        def __init__(self):
+            built.append("analyzer")
+
+        def analyze(self, text, language):
+            return []
+
+    class _Anonymizer:
+        def __init__(self):
+            built.append("anonymizer")
+
+    monkeypatch.setitem(sys.modules, "presidio_analyzer", types.SimpleNamespace(AnalyzerEngine=_Analyzer))
+    monkeypatch.setitem(sys.modules, "presidio_anonymizer", types.SimpleNamespace(AnonymizerEngine=_Anonymizer))
+    monkeypatch.setitem(
+        sys.modules,
+        "presidio_anonymizer.entities",
+        types.SimpleNamespace(OperatorConfig=lambda *a, **k: None),
+    )
+    monkeypatch.setattr(pii_sanitizer, "_presidio_engines", None)
+    monkeypatch.setattr(pii_sanitizer, "_presidio_unavailable", False)
+    monkeypatch.setenv("PII_SANITIZER_ENGINE", "presidio")
+
+    for _ in range(3):
+        result = sanitize_transcription_pii("texto sin datos personales")
+        assert result.engine == "presidio"
+
+    assert built == ["analyzer", "anonymizer"]
+
+
+def test_batch_matches_single_text_sanitizer():
+    texts = [
+        "mi DNI es 12345678Z",
+        None,
+        "   ",
+        "Cliente: Un 8",
+        "escribe a hola@empresa.com o al 612 345 678",
+    ]
+    batch = sanitize_transcriptions_pii(texts)
+
+    assert [r.text for r in batch] == [sanitize_transcription_pii(t).text for t in texts]
+    assert [r.redaction_count for r in batch] == [1, 0, 0, 0, 2]
+
+
+def test_presidio_batch_analyzes_all_texts_in_one_call(monkeypatch):
+    import sys
+    import types
+
+    from utils import pii_sanitizer
+
+    batches: list[list[str]] = []
+
+    class _BatchAnalyzer:
+        def __init__(self, analyzer_engine):
+            self.analyzer_engine = analyzer_engine
+
+        def analyze_iterator(self, texts, language):
+            batches.append(list(texts))
+            return [[] for _ in texts]
+
+    monkeypatch.setitem(sys.modules, "presidio_analyzer", types.SimpleNamespace(BatchAnalyzerEngine=_BatchAnalyzer))
+    monkeypatch.setitem(
+        sys.modules,
+        "presidio_anonymizer.entities",
+        types.SimpleNamespace(OperatorConfig=lambda *a, **k: None),
+    )
+    monkeypatch.setattr(pii_sanitizer, "_presidio_engines", (object(), object()))
+    monkeypatch.setenv("PII_SANITIZER_ENGINE", "presidio")
+
+    results = sanitize_transcriptions_pii(["uno", None, "dos"])
+
+    assert batches == [["uno", "dos"]]
+    assert [r.engine for r in results] == ["presidio", "regex", "presidio"]
+
+
+@pytest.mark.asyncio
+async def test_guardar_encuesta_sanitizes_texts_before_persisting(monkeypatch):
+    from fastapi import BackgroundTasks
+
+    from bench.fakes import FakeSupabase, LatencyProfile
+    from models.schemas import EncuestaData
+    from services import telephony_encuesta_service
+
+    db = FakeSupabase(LatencyProfile.from_spec("supabase=0"))
+    db.seed("encuestas", [{"id": 7, "status": "calling", "empresa_id": 1, "agent_type": "encuesta"}])
+    monkeypatch.setattr(telephony_encuesta_service, "supabase", db)
+    batches: list[list] = []
+    original = telephony_encuesta_service.prepare_texts_for_storage
+
+    def _spy(texts):
+        batches.append(list(texts))
+        return original(texts)
+
+    monkeypatch.setattr(telephony_encuesta_service, "prepare_texts_for_storage", _spy)
+
+    await telephony_encuesta_service.guardar_encuesta(
+        EncuestaData(
+            id_encuesta=7,
+            transcription="Cliente: mi DNI es 12345678Z",
+            comentarios="Llamar al 612 345 678",
+            datos_extra={"resumen_narrativo": "Email cliente@empresa.com"},
+        ),
+        BackgroundTasks(),
+    )
+
+    assert len(batches) == 1
+    row = db.tables["encuestas"][0]
+    assert row["transcription"] == "Cliente: mi DNI es [REDACTED_DNI_NIE]"
+    assert row["resumen_llamada"] == "Email [REDACTED_EMAIL]"
+    assert "612 345 678" not in str(row.get("agent_results"))
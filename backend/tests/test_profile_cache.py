@@ -11,10 +11,11 @@ import services.profile_cache as pc
 
 
 @pytest.fixture(autouse=True)
-def _reset_profile_cache():
+def _reset_profile_cache(monkeypatch):
     pc._MEM_PROFILE_CACHE.clear()
     pc._CACHE_GEN.clear()
     pc._IN_FLIGHT.clear()
+    monkeypatch.setattr(pc, "_listener_connected", False)
     yield
     pc._MEM_PROFILE_CACHE.clear()
     pc._CACHE_GEN.clear()
@@ -117,11 +118,13 @@ async def test_invalidate_clears_mem_and_bumps_generation():
     pc._mem_cache_set(user_id, {"id": user_id}, now)
     gen_before = pc._CACHE_GEN.get(user_id, 0)
 
-    with patch("services.redis_service.get_redis", new=AsyncMock(return_value=MagicMock(delete=AsyncMock(return_value=1)))):
+    redis = MagicMock(delete=AsyncMock(return_value=1), publish=AsyncMock(return_value=1))
+    with patch("services.redis_service.get_redis", new=AsyncMock(return_value=redis)):
         await pc.invalidate_user_profile_cache(user_id)
 
     assert user_id not in pc._MEM_PROFILE_CACHE
     assert pc._CACHE_GEN[user_id] == gen_before + 1
+    redis.publish.assert_awaited_once_with(pc.PROFILE_INVALIDATION_CHANNEL, user_id)
 
 
 @pytest.mark.asyncio
@@ -134,3 +137,62 @@ async def test_fetch_user_profile_row_raises_when_missing():
         with pytest.raises(HTTPException) as exc:
             pc._fetch_user_profile_row("missing")
     assert exc.value.status_code == 403
+
+
+def test_mem_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(pc, "_MEM_PROFILE_CACHE_MAX", 2)
+    now = pc.time.monotonic()
+    for uid in ("a", "b"):
+        pc._mem_cache_evict_if_needed(now)
+        pc._mem_cache_set(uid, {"id": uid}, now)
+
+    assert pc._mem_cache_get("a", now) == {"id": "a"}  # "a" pasa a ser el más reciente
+    pc._mem_cache_evict_if_needed(now)
+    pc._mem_cache_set("c", {"id": "c"}, now)
+
+    assert list(pc._MEM_PROFILE_CACHE) == ["a", "c"]
+
+
+def test_mem_ttl_is_long_only_while_listening(monkeypatch):
+    now = pc.time.monotonic()
+    pc._mem_cache_set("u", {"id": "u"}, now)
+    assert pc._MEM_PROFILE_CACHE["u"][0] == now + pc._MEM_FALLBACK_TTL
+    assert pc._mem_cache_get("u", now + pc._MEM_FALLBACK_TTL) is None
+    assert "u" not in pc._MEM_PROFILE_CACHE
+
+    monkeypatch.setattr(pc, "_listener_connected", True)
+    pc._mem_cache_set("u", {"id": "u"}, now)
+    assert pc._MEM_PROFILE_CACHE["u"][0] == now + pc._USER_PROFILE_CACHE_TTL
+
+
+@pytest.mark.asyncio
+async def test_invalidation_is_broadcast_to_other_processes():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    with patch("services.redis_service.get_redis", new=AsyncMock(return_value=client)):
+        pc.ensure_profile_invalidation_listener()
+        try:
+            for _ in range(100):
+                if pc._listener_connected:
+                    break
+                await asyncio.sleep(0.01)
+            assert pc._listener_connected
+
+            now = pc.time.monotonic()
+            pc._mem_cache_set("remote-user", {"id": "remote-user"}, now)
+            gen_before = pc._CACHE_GEN.get("remote-user", 0)
+
+            # Otra réplica invalida: aquí solo llega el mensaje pub/sub.
+            await client.publish(pc.PROFILE_INVALIDATION_CHANNEL, "remote-user")
+            for _ in range(100):
+                if "remote-user" not in pc._MEM_PROFILE_CACHE:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert "remote-user" not in pc._MEM_PROFILE_CACHE
+            assert pc._CACHE_GEN["remote-user"] == gen_before + 1
+        finally:
+            await pc.close_profile_cache()
+
+    assert not pc._listener_connected
@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
+import dataclasses
 from unittest.mock import AsyncMock, patch
 
 import pytest
 
 from config import clear_settings_cache
-from services.rag_hybrid import KnowledgeChunk, reciprocal_rank_fusion, tokenize_query
+from services.chunk_builder import chunks_to_kb_rows
+from services.rag_hybrid import KnowledgeChunk, chunk_match_stats, reciprocal_rank_fusion, tokenize_query
 from services.reranker_service import HeuristicReranker, get_reranker
 
 
@@ -120,3 +122,73 @@ def test_get_reranker_none_mode(monkeypatch):
     clear_settings_cache()
     reranker = get_reranker()
     assert reranker.__class__.__name__ == "NoOpReranker"
+
+
+def test_get_reranker_is_shared_per_mode(monkeypatch):
+    monkeypatch.setenv("RAG_RERANKER", "heuristic")
+    clear_settings_cache()
+    assert get_reranker() is get_reranker()
+
+
+def test_chunk_match_stats_normalizes_and_counts_tokens():
+    stats = chunk_match_stats("Tarifas Móviles", "Plan móvil: móviles con 20GB")
+    assert stats["title"] == ["moviles", "tarifas"]
+    assert stats["tf"]["moviles"] == 2
+    assert stats["tf"]["movil"] == 1
+    # Sin copias del texto: solo frecuencias y tokens del título.
+    assert set(stats) == {"tf", "title"}
+
+
+@pytest.mark.asyncio
+async def test_heuristic_reranker_scores_precomputed_stats_like_raw_text():
+    rows = [
+        {"id": 1, "titulo": "Política devoluciones", "contenido": "Plazos generales de fibra óptica"},
+        {"id": 2, "titulo": "Tarifas móviles", "contenido": "Plan 20GB datos"},
+        {"id": 3, "titulo": "Instalación", "contenido": "Técnico de fibras a domicilio"},
+    ]
+    raw = [
+        KnowledgeChunk(id=r["id"], titulo=r["titulo"], contenido=r["contenido"], rrf_score=0.01 * r["id"])
+        for r in rows
+    ]
+    precomputed = [
+        dataclasses.replace(c, match_stats=chunk_match_stats(c.titulo, c.contenido)) for c in raw
+    ]
+    reranker = HeuristicReranker()
+
+    expected = await reranker.rerank("tarifas fibra optica", raw, top_k=3)
+    with patch("services.reranker_service.chunk_match_stats", side_effect=AssertionError("tokenizó el chunk")):
+        ranked = await reranker.rerank("tarifas fibra optica", precomputed, top_k=3)
+
+    assert [(c.id, c.similarity) for c in ranked] == [(c.id, c.similarity) for c in expected]
+    assert ranked[0].match_stats is not None
+    assert "match_stats" not in ranked[0].as_dict()
+
+
+def test_kb_rows_carry_match_stats():
+    rows = chunks_to_kb_rows([{"empresa_id": 1, "titulo": "Fibra", "contenido": "Fibra 1Gb simétrica"}])
+    assert rows[0]["match_stats"] == chunk_match_stats("Fibra", "Fibra 1Gb simétrica")
+
+
+def test_rrf_keeps_match_stats_from_rows():
+    stats = chunk_match_stats("A", "vector chunk")
+    fused = reciprocal_rank_fusion(
+        [
+            [{"id": 1, "titulo": "A", "contenido": "vector chunk", "match_stats": stats}],
+            [{"id": 1, "titulo": "A", "contenido": "vector chunk"}],
+        ],
+        list_labels=["vector", "keyword"],
+    )
+    assert fused[0].match_stats == stats
+
+
+@pytest.mark.asyncio
+async def test_heuristic_reranker_matches_singular_and_plural_tokens():
+    chunk = KnowledgeChunk(id=1, titulo="Tarifa fibra", contenido="Instalaciones incluidas")
+    reranker = HeuristicReranker()
+
+    (plural,) = await reranker.rerank("tarifas instalacion", [chunk], top_k=1)
+    (unrelated,) = await reranker.rerank("roaming internacional", [chunk], top_k=1)
+
+    # Ambos términos casan (uno en el título) pese a singular/plural.
+    assert plural.similarity == pytest.approx(0.15 + 0.05)
+    assert unrelated.similarity == 0.0
@@ -58,6 +58,62 @@ async def test_acquire_returns_none_when_busy():
     assert token is None
 
 
+@pytest.mark.asyncio
+async def test_tracked_lock_registers_active_call_in_same_script():
+    mock_redis = AsyncMock()
+    mock_redis.eval = AsyncMock(return_value=1)
+
+    with patch.object(rs, "get_redis", new=AsyncMock(return_value=mock_redis)):
+        token = await rs.acquire_lock("call:42", ttl_seconds=900, active_call_empresa_id=7)
+
+    assert token is not None
+    mock_redis.set.assert_not_called()
+    args = mock_redis.eval.await_args.args
+    assert args[0] is rs._ACQUIRE_TRACKED_LOCK_SCRIPT
+    assert args[1:6] == (
+        4,
+        "ausarta:lock:call:42",
+        rs.ACTIVE_CALLS_KEY,
+        rs.ACTIVE_CALLS_OWNER_KEY,
+        rs.ACTIVE_CALLS_COUNT_KEY,
+    )
+    assert args[6:9] == (token, "900", "7")
+
+
+@pytest.mark.asyncio
+async def test_active_call_counts_come_from_registry_without_scan():
+    mock_redis = AsyncMock()
+    mock_redis.eval = AsyncMock(return_value=[5, 2])
+
+    with patch.object(rs, "get_redis", new=AsyncMock(return_value=mock_redis)):
+        assert await rs.get_active_call_counts(7) == (5, 2)
+        assert await rs.get_active_call_count() == 5
+
+    mock_redis.scan_iter.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_empresa_active_count_uses_registry_with_cached_db_floor():
+    from services import campaign_locks
+
+    campaign_locks._db_active_floor_cache.clear()
+    sb = MagicMock()
+    # Una saliente manual sin lease: la BD ve 4 encuestas en curso, el registro 3.
+    sb.table.return_value.select.return_value.eq.return_value.in_.return_value.execute.return_value.count = 4
+    with (
+        patch.object(rs, "get_active_call_counts", new=AsyncMock(return_value=(9, 3))),
+        patch.object(campaign_locks, "supabase", sb),
+    ):
+        assert await campaign_locks.get_active_call_count_for_empresa(7) == 4
+        assert await campaign_locks.get_active_call_count_for_empresa(7) == 4
+
+    assert sb.table.call_count == 1
+
+    with patch.object(rs, "get_active_call_counts", new=AsyncMock(return_value=(9, 6))):
+        assert await campaign_locks.get_active_call_count_for_empresa(7) == 6
+    campaign_locks._db_active_floor_cache.clear()
+
+
 def test_is_orchestrated_campaign_filter():
     from tasks.campaign_orchestrator import _is_orchestrated_campaign
 
@@ -78,7 +78,7 @@ async def test_classify_tier1_timeout_falls_back_to_continue():
     router = SemanticRouterService(tier0_only=False, timeout_ms=50)
 
     with patch("services.semantic_router_service.os.getenv", return_value="test-key"), patch(
-        "services.semantic_router_service.aiohttp.ClientSession",
+        "services.semantic_router_service.get_http_session",
         side_effect=TimeoutError("timeout"),
     ):
         result = await router.classify("texto ambiguo sin match regex")
@@ -95,3 +95,17 @@ async def test_livekit_client_singleton_and_close():
         await lk.close_livekit_admin_api()
         assert lk._client is None
     mock_api.aclose.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_turn_events_are_pii_sanitized():
+    cs = _make_session()
+    cs.call_events = MagicMock()
+
+    cs._append_transcript_event("user", "Mi teléfono es 612 345 678 y mi DNI 12345678Z")
+
+    cs.call_events.emit.assert_called_once()
+    text = cs.call_events.emit.call_args.kwargs["text"]
+    assert "612 345 678" not in text and "12345678Z" not in text
+    # El buffer local conserva el texto: se sanitiza al guardar la transcripción.
+    assert "12345678Z" in cs.transcript_event_buffer[-1]["content"]
@@ -0,0 +1,121 @@
+"""Tests del productor SSE compartido (services/sse_fanout.py) y su uso en monitoring."""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from routers import monitoring
+from services import call_events, sse_fanout
+from services.auth import CurrentUser
+
+
+def _parse(frame: str) -> tuple[str, dict]:
+    event, data = "message", None
+    for line in frame.strip().splitlines():
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            data = json.loads(line[len("data: "):])
+    return event, data
+
+
+async def _take(gen, n: int) -> list[tuple[str, dict]]:
+    return [_parse(await asyncio.wait_for(gen.__anext__(), 1)) for _ in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_single_producer_fans_out_full_snapshot_then_patches():
+    calls = 0
+
+    async def _builder():
+        nonlocal calls
+        calls += 1
+        return {"tick": calls, "redis": {"clients": 3}}
+
+    subscribers = [sse_fanout.subscribe("t-fanout", _builder, 0.01) for _ in range(30)]
+    first = await asyncio.gather(*(_take(s, 1) for s in subscribers))
+    second = await asyncio.gather(*(_take(s, 1) for s in subscribers))
+
+    assert all(events[0][0] == "message" and "redis" in events[0][1] for events in first)
+    assert all(events[0] == ("patch", {"tick": events[0][1]["tick"]}) for events in second)
+    # 30 clientes, pero el snapshot se construye una vez por intervalo.
+    assert calls <= 4
+    assert sse_fanout.topic_subscribers("t-fanout") == 30
+
+    for s in subscribers:
+        await s.aclose()
+    assert sse_fanout.topic_subscribers("t-fanout") == 0
+    stopped_at = calls
+    await asyncio.sleep(0.05)
+    assert calls == stopped_at
+
+
+@pytest.mark.asyncio
+async def test_metrics_are_filtered_per_tenant_at_delivery(monkeypatch):
+    builds = 0
+
+    async def _metrics():
+        nonlocal builds
+        builds += 1
+        rooms = [
+            {"name": f"llamada_empresa_{e}", "metadata": {"empresa_id": e}} for e in (1, 2, 2)
+        ]
+        return {"ts": builds, "live_calls": {"total": 3, "rooms": rooms}, "redis": {}}
+
+    monkeypatch.setattr(monitoring, "_build_metrics_payload", _metrics)
+    admin = monitoring._event_generator(CurrentUser(user_id="a", email=None, role="admin", empresa_id=2))
+    root = monitoring._event_generator(CurrentUser(user_id="s", email=None, role="superadmin", empresa_id=None))
+
+    (_, admin_view), = await _take(admin, 1)
+    (_, root_view), = await _take(root, 1)
+
+    assert admin_view["live_calls"]["total"] == 2
+    assert {r["metadata"]["empresa_id"] for r in admin_view["live_calls"]["rooms"]} == {2}
+    assert root_view["live_calls"]["total"] == 3
+    assert builds <= 2
+    await admin.aclose()
+    await root.aclose()
+
+
+@pytest.mark.asyncio
+async def test_call_stream_hides_other_tenants_and_reports_errors(monkeypatch):
+    async def _call(room_name):
+        return {"room_name": room_name, "empresa_id": 1, "status": "active", "transcript": []}
+
+    async def _no_redis():
+        raise ConnectionError("sin Redis")
+
+    monkeypatch.setattr(monitoring, "_build_call_payload", _call)
+    monkeypatch.setattr(call_events, "get_redis", _no_redis)  # polling de la BD como fallback
+    own = monitoring._call_event_generator("sala", CurrentUser(user_id="a", email=None, role="admin", empresa_id=1))
+    other = monitoring._call_event_generator("sala", CurrentUser(user_id="b", email=None, role="admin", empresa_id=2))
+
+    (_, own_view), = await _take(own, 1)
+    (_, other_view), = await _take(other, 1)
+
+    assert own_view == {"room_name": "sala", "status": "active", "transcript": []}
+    assert other_view == {"error": "Sin acceso a esta llamada"}
+    await own.aclose()
+    await other.aclose()
+
+    async def _broken():
+        raise RuntimeError("LiveKit caído")
+
+    gen = sse_fanout.subscribe("t-broken", _broken, 0.01)
+    (_, payload), = await _take(gen, 1)
+    assert payload == {"error": "LiveKit caído"}
+    await gen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_keepalive_is_sent_when_nothing_changes():
+    async def _static():
+        return {"redis": {"clients": 1}}
+
+    gen = sse_fanout.subscribe("t-static", _static, 0.01, keepalive=0.05)
+    first = await asyncio.wait_for(gen.__anext__(), 1)
+    assert first.startswith("data: ")
+    assert await asyncio.wait_for(gen.__anext__(), 1) == ": keep-alive\n\n"
+    await gen.aclose()
@@ -0,0 +1,46 @@
+"""Tests del STT resiliente (Deepgram + fallback OpenAI) del agente."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from agents import stt_tts_builder
+
+
+@pytest.fixture(autouse=True)
+def _api_keys(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("DEEPGRAM_API_KEY", "test")
+
+
+def _breaker(open_: bool):
+    return SimpleNamespace(name="deepgram_stt", is_open=AsyncMock(return_value=open_))
+
+
+@pytest.mark.asyncio
+async def test_fallback_adapter_builds_without_vad():
+    # Con el Whisper REST el adapter lanzaba "STTs do not support streaming".
+    with patch(
+        "services.provider_circuit_service.deepgram_stt_breaker",
+        new=AsyncMock(return_value=_breaker(False)),
+    ):
+        stt, resilient = await stt_tts_builder.build_resilient_stt_plugin("deepgram", "nova-3", "es")
+
+    assert resilient is True
+    assert stt.capabilities.streaming
+    assert all(inner.capabilities.streaming for inner in stt._stt_instances)
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_keeps_rest_whisper():
+    with patch(
+        "services.provider_circuit_service.deepgram_stt_breaker",
+        new=AsyncMock(return_value=_breaker(True)),
+    ):
+        stt, resilient = await stt_tts_builder.build_resilient_stt_plugin("deepgram", "nova-3", "es")
+
+    # Solo, sin adapter: la sesión lo envuelve con su VAD como antes.
+    assert resilient is False
+    assert not stt.capabilities.streaming
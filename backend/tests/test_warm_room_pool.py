@@ -0,0 +1,96 @@
+"""Tests del pool de salas warm (reclamación, caducidad, dimensionado y vinculación)."""
+from __future__ import annotations
+
+import json
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from agents.warm_room import parse_binding, pipeline_signature
+from services import warm_room_pool as wp
+from services.telephony_room_utils import extract_encuesta_id_from_room
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with (
+        patch("services.redis_service.get_redis", new=AsyncMock(return_value=client)),
+        patch.object(wp, "schedule_replenish"),
+    ):
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_claim_returns_ready_room_once(fake_redis):
+    assert await wp.claim_warm_room(1, 10) is None
+
+    await wp.mark_warm_room_ready(1, 10, "llamada_ausarta_warm_empresa_1_agente_10_abc")
+    assert await wp.claim_warm_room(1, 10) == "llamada_ausarta_warm_empresa_1_agente_10_abc"
+    assert await wp.claim_warm_room(1, 10) is None
+    # Pools aislados por agente.
+    await wp.mark_warm_room_ready(1, 11, "room-b")
+    assert await wp.claim_warm_room(1, 10) is None
+
+
+@pytest.mark.asyncio
+async def test_expired_rooms_are_never_claimed(fake_redis):
+    await fake_redis.zadd(wp._ready_key(1, 10), {"stale": time.time() - 1})
+    assert await wp.claim_warm_room(1, 10) is None
+    assert await fake_redis.zcard(wp._ready_key(1, 10)) == 0
+
+
+@pytest.mark.asyncio
+async def test_withdraw_fails_when_room_was_already_claimed(fake_redis):
+    await wp.mark_warm_room_ready(1, 10, "room-a")
+    assert await wp.claim_warm_room(1, 10) == "room-a"
+    assert await wp.withdraw_warm_room(1, 10, "room-a") is False
+
+    await wp.mark_warm_room_ready(1, 10, "room-b")
+    assert await wp.withdraw_warm_room(1, 10, "room-b") is True
+
+
+@pytest.mark.asyncio
+async def test_target_size_follows_recent_dial_rate(fake_redis, monkeypatch):
+    monkeypatch.setenv("WARM_POOL_RATE_WINDOW_MINUTES", "1")
+    monkeypatch.setenv("WARM_ROOM_WARMUP_SECONDS", "10")
+    monkeypatch.setenv("WARM_POOL_MAX_PER_EMPRESA", "4")
+
+    assert await wp.target_pool_size(1, 10) == 0
+    await wp.record_dial_demand(1, 10)
+    assert await wp.target_pool_size(1, 10) == 1
+    for _ in range(59):
+        await wp.record_dial_demand(1, 10)
+    # 60 llamadas/min × 10 s de calentamiento → 10 salas, acotado a 4.
+    assert await wp.target_pool_size(1, 10) == 4
+    assert await fake_redis.sismember(wp.WARM_POOLS_KEY, "1:10")
+
+
+@pytest.mark.asyncio
+async def test_claim_disabled_by_env(fake_redis, monkeypatch):
+    monkeypatch.setenv("WARM_ROOM_POOL", "false")
+    await wp.mark_warm_room_ready(1, 10, "room-a")
+    assert await wp.claim_warm_room(1, 10) is None
+
+
+def test_warm_room_name_does_not_leak_ids_as_encuesta():
+    room = "llamada_ausarta_warm_empresa_3_agente_7_0123456789ab"
+    assert wp.is_warm_room(room)
+    assert extract_encuesta_id_from_room(room) is None
+    assert extract_encuesta_id_from_room("llamada_ausarta_empresa_3_campana_1_contacto_2_encuesta_99") == 99
+
+
+def test_parse_binding_ignores_unbound_metadata():
+    assert parse_binding(json.dumps(wp.warm_room_metadata(3, 7, "ENCUESTA_NUMERICA"))) is None
+    assert parse_binding("no-json") is None
+    bound = parse_binding(json.dumps({"empresa_id": 3, "survey_id": 55, "agent_id": 7}))
+    assert bound is not None and bound["survey_id"] == 55
+
+
+def test_pipeline_signature_detects_voice_changes():
+    base = {"llm_model": "m", "voice_id": "v1", "language": "es"}
+    assert pipeline_signature(base) == pipeline_signature(dict(base))
+    assert pipeline_signature(base) != pipeline_signature({**base, "voice_id": "v2"})
+    assert pipeline_signature(base) != pipeline_signature({**base, "extraction_schema": [{"k": 1}]})
@@ -162,8 +162,16 @@ async def enrich_agent_config_with_context(
       - ``_kb_context``       → str (vacío si no hay KB disponible)
       - ``_customer_context`` → str (vacío si no hay datos)
 
+    Si el dialer ya precargó el contexto (``_context_prefetched``, ver
+    services/agent_config_prefetch) no se repite ninguna consulta.
+
     Nunca lanza excepción: si cualquier fuente falla, continúa sin ese contexto.
     """
+    if agent_config.get("_context_prefetched"):
+        agent_config.setdefault("_kb_context", "")
+        agent_config.setdefault("_customer_context", "")
+        return
+
     try:
         empresa_id_int = int(empresa_id_str) if str(empresa_id_str).isdigit() else 0
     except Exception:
@@ -1,8 +1,14 @@
 """
 Sanitización de PII en transcripciones antes de persistencia (GDPR).
 
-Motor por defecto: regex de alto rendimiento (sin dependencias extra).
-Opcional: Presidio si PII_SANITIZER_ENGINE=presidio y paquetes instalados.
+Motor por defecto: regex de alto rendimiento (sin dependencias extra). Las reglas
+se aplican en pasadas sucesivas en el orden de _REGEX_RULES (la prioridad importa:
+p. ej. un teléfono tras "calle Mayor" debe redactarse como PHONE antes de que la
+regla de dirección lo absorba); las que exigen dígitos o "@" se saltan sin
+barrer el texto cuando no los hay.
+Opcional: Presidio si PII_SANITIZER_ENGINE=presidio y paquetes instalados (los
+motores se construyen una vez por proceso). ``sanitize_transcriptions_pii``
+sanitiza un lote de textos con un único BatchAnalyzerEngine.
 """
 
 from __future__ import annotations
@@ -10,8 +16,10 @@ from __future__ import annotations
 import logging
 import os
 import re
+import threading
+from collections.abc import Iterable
 from dataclasses import dataclass
-from typing import Final, Literal
+from typing import Any, Final, Literal
 
 from config import get_settings
 
@@ -84,6 +92,10 @@ _REGEX_RULES: Final[tuple[tuple[str, re.Pattern[str]], ...]] = (
 )
 
 
+# Todas las reglas salvo email necesitan al menos un dígito para casar.
+_DIGIT_PATTERN: Final[re.Pattern[str]] = re.compile(r"\d")
+
+
 @dataclass(frozen=True, slots=True)
 class PIISanitizationResult:
     text: str
@@ -101,8 +113,12 @@ def _sanitize_with_regex(text: str) -> PIISanitizationResult:
     sanitized = text
     redaction_count = 0
     redacted_types: list[str] = []
+    has_at = "@" in text
+    has_digit = _DIGIT_PATTERN.search(text) is not None
 
     for entity_type, pattern in _REGEX_RULES:
+        if not (has_at if entity_type == "email" else has_digit):
+            continue
 
         def _repl(match: re.Match[str], et: str = entity_type) -> str:
             nonlocal redaction_count
@@ -111,7 +127,7 @@ def _sanitize_with_regex(text: str) -> PIISanitizationResult:
                 redacted_types.append(et)
             return _placeholder(et)
 
-        sanitized, _ = pattern.subn(_repl, sanitized)
+        sanitized = pattern.sub(_repl, sanitized)
 
     return PIISanitizationResult(
         text=sanitized,
@@ -121,47 +137,97 @@ def _sanitize_with_regex(text: str) -> PIISanitizationResult:
     )
 
 
+_presidio_lock = threading.Lock()
+_presidio_engines: tuple[Any, Any] | None = None
+_presidio_unavailable = False
+
+
+def _get_presidio_engines() -> tuple[Any, Any] | None:
+    """AnalyzerEngine (carga spaCy) y AnonymizerEngine, construidos una vez por proceso."""
+    global _presidio_engines, _presidio_unavailable
+    if _presidio_engines is not None or _presidio_unavailable:
+        return _presidio_engines
+    with _presidio_lock:
+        if _presidio_engines is not None or _presidio_unavailable:
+            return _presidio_engines
+        try:
+            from presidio_analyzer import AnalyzerEngine
+            from presidio_anonymizer import AnonymizerEngine
+        except ImportError:
+            _presidio_unavailable = True
+            return None
+        try:
+            _presidio_engines = (AnalyzerEngine(), AnonymizerEngine())
+        except Exception as exc:
+            logger.warning("Presidio init failed, using regex engine: %s", exc)
+            _presidio_unavailable = True
+        return _presidio_engines
+
+
+def _anonymize_presidio_results(text: str, results: list[Any], anonymizer: Any) -> PIISanitizationResult:
+    from presidio_anonymizer.entities import OperatorConfig
+
+    if not results:
+        return PIISanitizationResult(
+            text=text,
+            redaction_count=0,
+            redacted_types=(),
+            engine="presidio",
+        )
+
+    operators = {
+        entity.entity_type: OperatorConfig("replace", {"new_value": _placeholder(entity.entity_type.lower())})
+        for entity in results
+    }
+    anonymized = anonymizer.anonymize(
+        text=text,
+        analyzer_results=results,
+        operators=operators,
+    )
+    redacted_types = tuple(sorted({r.entity_type.lower() for r in results}))
+    return PIISanitizationResult(
+        text=anonymized.text,
+        redaction_count=len(results),
+        redacted_types=redacted_types,
+        engine="presidio",
+    )
+
+
 def _sanitize_with_presidio(text: str) -> PIISanitizationResult | None:
-    try:
-        from presidio_analyzer import AnalyzerEngine
-        from presidio_anonymizer import AnonymizerEngine
-        from presidio_anonymizer.entities import OperatorConfig
-    except ImportError:
+    engines = _get_presidio_engines()
+    if engines is None:
         return None
 
+    analyzer, anonymizer = engines
     try:
-        analyzer = AnalyzerEngine()
-        anonymizer = AnonymizerEngine()
         results = analyzer.analyze(text=text, language="es")
-        if not results:
-            return PIISanitizationResult(
-                text=text,
-                redaction_count=0,
-                redacted_types=(),
-                engine="presidio",
-            )
-
-        operators = {
-            entity.entity_type: OperatorConfig("replace", {"new_value": _placeholder(entity.entity_type.lower())})
-            for entity in results
-        }
-        anonymized = anonymizer.anonymize(
-            text=text,
-            analyzer_results=results,
-            operators=operators,
-        )
-        redacted_types = tuple(sorted({r.entity_type.lower() for r in results}))
-        return PIISanitizationResult(
-            text=anonymized.text,
-            redaction_count=len(results),
-            redacted_types=redacted_types,
-            engine="presidio",
-        )
+        return _anonymize_presidio_results(text, results, anonymizer)
     except Exception as exc:
         logger.warning("Presidio PII sanitization failed, falling back to regex: %s", exc)
         return None
 
 
+def _sanitize_many_with_presidio(texts: list[str]) -> list[PIISanitizationResult] | None:
+    engines = _get_presidio_engines()
+    if engines is None:
+        return None
+
+    analyzer, anonymizer = engines
+    try:
+        from presidio_analyzer import BatchAnalyzerEngine
+
+        batch_results = BatchAnalyzerEngine(analyzer_engine=analyzer).analyze_iterator(
+            texts, language="es"
+        )
+        return [
+            _anonymize_presidio_results(text, list(results), anonymizer)
+            for text, results in zip(texts, batch_results)
+        ]
+    except Exception as exc:
+        logger.warning("Presidio batch PII sanitization failed, falling back to regex: %s", exc)
+        return None
+
+
 def _resolve_engine() -> PIIEngine:
     raw = (os.getenv("PII_SANITIZER_ENGINE") or "regex").strip().lower()
     return "presidio" if raw == "presidio" else "regex"
@@ -200,12 +266,7 @@ def sanitize_transcription_pii(
                     presidio_result.redaction_count,
                     presidio_result.redacted_types,
                 )
-            return PIISanitizationResult(
-                text=presidio_result.text,
-                redaction_count=presidio_result.redaction_count,
-                redacted_types=presidio_result.redacted_types,
-                engine="presidio",
-            )
+            return presidio_result
 
     result = _sanitize_with_regex(stripped)
     if result.redaction_count:
@@ -217,6 +278,41 @@ def sanitize_transcription_pii(
     return result
 
 
+def sanitize_transcriptions_pii(
+    texts: Iterable[str | None],
+    *,
+    enabled: bool | None = None,
+) -> list[PIISanitizationResult]:
+    """Versión por lotes de sanitize_transcription_pii (mismo orden y semántica por elemento)."""
+    items = list(texts)
+    if enabled is None:
+        enabled = get_settings().pii_sanitization_enabled
+    if not enabled:
+        return [sanitize_transcription_pii(t, enabled=False) for t in items]
+
+    results: list[PIISanitizationResult | None] = [None] * len(items)
+    pending: list[tuple[int, str]] = []
+    for idx, text in enumerate(items):
+        if text is None or not text.strip():
+            results[idx] = sanitize_transcription_pii(text, enabled=False)
+        else:
+            pending.append((idx, text.strip()))
+
+    presidio_results: list[PIISanitizationResult] | None = None
+    if pending and _resolve_engine() == "presidio":
+        presidio_results = _sanitize_many_with_presidio([text for _, text in pending])
+
+    total = 0
+    for pos, (idx, text) in enumerate(pending):
+        result = presidio_results[pos] if presidio_results is not None else _sanitize_with_regex(text)
+        total += result.redaction_count
+        results[idx] = result
+
+    if total:
+        logger.info("PII sanitization batch: %s redaction(s) in %s text(s)", total, len(pending))
+    return [r for r in results if r is not None]
+
+
 def sanitize_free_text_pii(text: str | None, *, enabled: bool | None = None) -> str | None:
     """Sanitiza campos narrativos derivados (comentarios, resumen)."""
     if text is None:
@@ -12,6 +12,7 @@ de las tasks. La lógica de negocio vive en backend/tasks/.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 import re
@@ -23,7 +24,7 @@ from arq.connections import ArqRedis, RedisSettings
 logger = logging.getLogger("arq-worker")
 
 # ── Tasks ──────────────────────────────────────────────────────────────────────
-from tasks.campaign_scheduler import campaign_scheduler_task
+from tasks.campaign_scheduler import campaign_scheduler_task, run_campaign_scheduler
 from tasks.lead_dispatcher import dispatch_lead_drip_task
 from tasks.call_actions import (
     agent_post_colgar,
@@ -40,6 +41,8 @@ from tasks.notifications import (
     process_yeastar_webhook,
 )
 from tasks.yeastar_health import check_yeastar_health_task
+from tasks.billing_flush import flush_billing_usage_task
+from tasks.warm_room_pool import maintain_warm_room_pool_task
 from utils.tracing import init_tracing, instrument_aiohttp_client, wrap_arq_task
 
 
@@ -89,12 +92,34 @@ async def startup(ctx: dict[str, Any]) -> None:
         logger.info("✅ [ARQ Worker] Redis locks singleton OK.")
     except Exception as exc:
         logger.warning("[ARQ Worker] Redis locks no disponibles: %s", exc)
+    ctx["campaign_scheduler"] = asyncio.create_task(run_campaign_scheduler(ctx))
     logger.info("✅ [ARQ Worker] Redis OK. Listo para consumir tareas.")
 
 
 async def shutdown(ctx: dict[str, Any]) -> None:
     """Limpieza al apagar el worker."""
     logger.info("🌙 [ARQ Worker] Apagando...")
+    scheduler = ctx.pop("campaign_scheduler", None)
+    if scheduler is not None:
+        scheduler.cancel()
+        try:
+            await scheduler
+        except (asyncio.CancelledError, Exception):
+            pass
+    # Último volcado del uso encolado; lo que quede sin ACK lo reclama otro worker.
+    await flush_billing_usage_task(ctx)
+    try:
+        from services.http_client import close_http_clients
+
+        await close_http_clients()
+    except Exception as exc:
+        logger.debug("[ARQ Worker] Error cerrando clientes HTTP: %s", exc)
+    try:
+        from services.external_db_service import close_external_db_pools
+
+        await close_external_db_pools()
+    except Exception as exc:
+        logger.debug("[ARQ Worker] Error cerrando pools de BD externas: %s", exc)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -123,6 +148,7 @@ class WorkerSettings:
         wrap_arq_task(dispatch_lead_drip_task),
         wrap_arq_task(campaign_orchestrator),
         wrap_arq_task(process_campaign_empresa),
+        wrap_arq_task(maintain_warm_room_pool_task),
         # Llamadas
         wrap_arq_task(agent_post_guardar_encuesta),
         wrap_arq_task(agent_post_colgar),
@@ -136,16 +162,26 @@ class WorkerSettings:
         wrap_arq_task(send_telegram_alert_task),
         wrap_arq_task(process_yeastar_webhook),
         wrap_arq_task(check_yeastar_health_task),
+        # Billing
+        wrap_arq_task(flush_billing_usage_task),
     ]
 
     _health_interval = int(os.getenv("YEASTAR_HEALTH_CHECK_INTERVAL_SECONDS", "120"))
     _health_minute_step = max(1, _health_interval // 60)
     _health_cron_minutes = set(range(0, 60, _health_minute_step))
 
+    # El scheduler de campañas es event-driven; el cron solo reconcilia.
+    _scheduler_reconcile_minutes = max(1, int(os.getenv("CAMPAIGN_SCHEDULER_RECONCILE_MINUTES", "5")))
+    _scheduler_cron_minutes = set(range(0, 60, _scheduler_reconcile_minutes))
+
+    _billing_flush_interval = max(1, min(60, int(os.getenv("BILLING_FLUSH_INTERVAL_SECONDS", "10"))))
+    _billing_flush_seconds = set(range(0, 60, _billing_flush_interval))
+
     cron_jobs = [
         cron(
             campaign_scheduler_task,
-            second={0, 30},
+            minute=_scheduler_cron_minutes,
+            second={0},
             unique=True,
             timeout=25,
         ),
@@ -155,6 +191,13 @@ class WorkerSettings:
             unique=True,
             timeout=55,
         ),
+        cron(
+            maintain_warm_room_pool_task,
+            minute=None,   # cada minuto
+            second={30},
+            unique=True,
+            timeout=50,
+        ),
         cron(
             check_yeastar_health_task,
             minute=_health_cron_minutes,
@@ -162,6 +205,12 @@ class WorkerSettings:
             unique=True,
             timeout=120,
         ),
+        cron(
+            flush_billing_usage_task,
+            second=_billing_flush_seconds,
+            unique=True,
+            timeout=30,
+        ),
     ]
 
     max_jobs: int = int(os.getenv("ARQ_MAX_JOBS", "10"))
@@ -26,7 +26,7 @@ if os.getenv("ENVIRONMENT", "production") == "development":
     load_dotenv(ROOT / ".env")
 
 from services.chunk_builder import chunks_to_kb_rows, parse_jsonl_bytes  # noqa: E402
-from services.embedding_service import get_embedding  # noqa: E402
+from services.embedding_service import get_embeddings  # noqa: E402
 from services.supabase_service import supabase, sb_query  # noqa: E402
 
 
@@ -35,7 +35,7 @@ async def ingest_jsonl(
     *,
     empresa_id: int | None = None,
     dry_run: bool = False,
-    batch_size: int = 5,
+    batch_size: int = 200,
 ) -> dict:
     if not supabase:
         raise SystemExit("❌ Supabase no configurado. Revisa SUPABASE_URL y SUPABASE_SERVICE_KEY.")
@@ -65,15 +65,10 @@ async def ingest_jsonl(
 
     for i in range(0, len(kb_rows), batch_size):
         batch = kb_rows[i : i + batch_size]
-        embeddings = await asyncio.gather(
-            *[get_embedding(r["contenido"]) for r in batch],
-            return_exceptions=True,
-        )
+        embeddings = await get_embeddings([r["contenido"] for r in batch])
         for row, emb in zip(batch, embeddings):
-            if isinstance(emb, Exception) or emb is None:
-                row["embedding"] = None
-            else:
-                row["embedding"] = emb
+            row["embedding"] = emb
+            if emb is not None:
                 with_embedding += 1
 
         res = await sb_query(
@@ -45,6 +45,7 @@ interface CallData {
     contact: ContactInfo;
     transfer_briefing: string | null;
     extensions_available: Extension[];
+    agent_state?: string | null;
 }
 
 interface LiveCallPanelProps {
@@ -52,6 +53,12 @@ interface LiveCallPanelProps {
     onClose: () => void;
 }
 
+const AGENT_STATE_LABELS: Record<string, string> = {
+    speaking: 'Agente hablando',
+    listening: 'Escuchando',
+    thinking: 'Pensando…',
+};
+
 function formatSeconds(s: number): string {
     const m = Math.floor(s / 60);
     const sec = s % 60;
@@ -143,6 +150,14 @@ export const LiveCallPanel: React.FC<LiveCallPanelProps> = ({ roomName, onClose
             } catch { /* ignore */ }
         };
 
+        // Tras el snapshot inicial el servidor solo envía los campos que cambian.
+        es.addEventListener('patch', (evt) => {
+            try {
+                const patch: Partial<CallData> = JSON.parse((evt as MessageEvent).data);
+                setData((prev) => (prev ? { ...prev, ...patch } : prev));
+            } catch { /* ignore */ }
+        });
+
         es.onerror = () => {
             setConnected(false);
             es.close();
@@ -257,6 +272,11 @@ export const LiveCallPanel: React.FC<LiveCallPanelProps> = ({ roomName, onClose
                             </div>
                             <div className="shrink-0 text-right space-y-1">
                                 <StatusBadge status={data.status} />
+                                {data.status === 'active' && data.agent_state && (
+                                    <p className="text-[10px] text-gray-400">
+                                        {AGENT_STATE_LABELS[data.agent_state] ?? data.agent_state}
+                                    </p>
+                                )}
                                 <div className="flex items-center justify-end gap-1 text-[10px] text-gray-400">
                                     <Clock size={10} />
                                     <span className="tabular-nums font-mono">{formatSeconds(data.duration_seconds)}</span>
@@ -149,7 +149,8 @@ export const LiveMonitoring: React.FC = () => {
         const es = new EventSource(url);
         sseRef.current = es;
 
-        es.onmessage = (evt) => {
+        // Primer evento: snapshot completo; 'patch': solo las claves que cambian.
+        const applyPayload = (evt: MessageEvent) => {
             try {
                 const payload = JSON.parse(evt.data);
                 if (payload.error) {
@@ -179,6 +180,8 @@ export const LiveMonitoring: React.FC = () => {
                 console.warn('[SSE] Parse error:', parseErr);
             }
         };
+        es.onmessage = applyPayload;
+        es.addEventListener('patch', applyPayload as EventListener);
 
         es.onerror = () => {
             // EventSource reconecta automáticamente; sólo actualizamos el estado visual.
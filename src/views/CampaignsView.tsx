@@ -442,9 +442,8 @@ export function CampaignsView() {
     try {
       let leads: { phone_number: string, customer_name?: string }[] = [];
 
-      if (dataSource === 'csv' && csvFile) {
-        leads = await parseCSV(csvFile);
-      } else if (dataSource === 'csv' && !csvFile) {
+      // El CSV no se parsea aquí: se sube tal cual al import por lotes tras crear la campaña
+      if (dataSource === 'csv' && !csvFile) {
         throw new Error(t("Please upload a CSV file", "Por favor, sube un archivo CSV"));
       } else if (dataSource === 'manual') {
         leads = parseLines(manualInput);
@@ -476,7 +475,23 @@ export function CampaignsView() {
         body: JSON.stringify(payload)
       });
 
-      if (!res.ok) throw new Error(t('Error creating campaign', 'Error al crear la campaña'));
+      if (!res.ok) {
+        // 422: teléfonos inválidos en los leads (detail.message con el número de filas)
+        const err = await res.json().catch(() => null);
+        throw new Error(err?.detail?.message || t('Error creating campaign', 'Error al crear la campaña'));
+      }
+
+      if (dataSource === 'csv' && csvFile) {
+        const created = await res.json();
+        const form = new FormData();
+        form.append('file', csvFile);
+        const importRes = await fetch(`${API_URL}/api/campaigns/${created.id}/leads/import`, {
+          method: 'POST',
+          body: form
+        });
+        if (!importRes.ok) throw new Error(t('Campaign created, but the lead import failed', 'Campaña creada, pero falló la importación de leads'));
+        toast(t('Importing leads in the background...', 'Importando leads en segundo plano...'));
+      }
 
       setShowCreate(false);
       setName('');
@@ -1237,9 +1252,9 @@ export function CampaignsView() {
                 Usa nuestra API para agregar prospectos de forma programática a esta campaña.
               </p>
               <code className="text-xs bg-gray-100 p-2 block rounded overflow-x-auto">
-                curl -X POST {API_URL}/api/campaigns/{'{id}'}/leads \
-                -H "Content-Type: application/json" \
-                -d '{'{ "phone": "+34600000000" }'}'
+                curl -X POST {API_URL}/api/campaigns/{'{id}'}/leads/import \
+                -H "Content-Type: application/x-ndjson" \
+                --data-binary @leads.ndjson
               </code>
             </div>
           )}